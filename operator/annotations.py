@@ -1,7 +1,10 @@
 """Annotation parsing utilities for DNS record management."""
 
 import os
-from providers.base import RecordType
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from providers.base import ExtraRecord, RecordType, RoutingPolicy
 
 # Default target source - can be "loadbalancer" (default) or "annotation"
 DEFAULT_TARGET_SOURCE = os.environ.get("DEFAULT_TARGET_SOURCE", "loadbalancer")
@@ -11,14 +14,36 @@ ANNOTATION_RECORD_TYPE = "hub-dns-operator.io/record-type"
 ANNOTATION_TARGET_HOSTNAME = "hub-dns-operator.io/target-hostname"
 ANNOTATION_TARGET_SOURCE = "hub-dns-operator.io/target-source"
 
+# Routing policy annotations (records shared by several spoke clusters)
+ANNOTATION_SET_IDENTIFIER = "hub-dns-operator.io/set-identifier"
+ANNOTATION_WEIGHT = "hub-dns-operator.io/weight"
+ANNOTATION_REGION = "hub-dns-operator.io/region"
+ANNOTATION_GEO_LOCATION = "hub-dns-operator.io/geo-location"
+ANNOTATION_HEALTH_CHECK_ID = "hub-dns-operator.io/health-check-id"
+
+GEO_LOCATION_KEYS = ("continent", "country", "subdivision")
+
+# Write the primary record as an apex-safe alias of this (provider-specific) target
+ANNOTATION_ALIAS = "hub-dns-operator.io/alias"
+
+# Extra records written in the same change as the primary record, one per line
+ANNOTATION_TXT = "hub-dns-operator.io/txt"
+ANNOTATION_SRV = "hub-dns-operator.io/srv"
+ANNOTATION_CAA = "hub-dns-operator.io/caa"
+
+CAA_TAGS = ("issue", "issuewild", "iodef")
+
 
 def get_record_type(annotations: dict) -> RecordType:
     """Determine record type from annotations or auto-detect.
 
     Priority:
-    1. Explicit annotation: hub-dns-operator.io/record-type: CNAME
-    2. Default to A record (auto-detect happens later based on target value)
+    1. hub-dns-operator.io/alias: an ALIAS record
+    2. Explicit annotation: hub-dns-operator.io/record-type: CNAME
+    3. Default to A record (auto-detect happens later based on target value)
     """
+    if annotations.get(ANNOTATION_ALIAS):
+        return RecordType.ALIAS
     explicit = annotations.get(ANNOTATION_RECORD_TYPE, "").upper()
     if explicit == "CNAME":
         return RecordType.CNAME
@@ -46,3 +71,112 @@ def get_target_value(ingress: dict, annotations: dict) -> str:
                 return ingress_list[0]["ip"]
 
     raise ValueError("No target value found for DNS record")
+
+
+def get_routing_policy(annotations: dict) -> Optional[RoutingPolicy]:
+    """Build the routing policy requested by annotations, if any.
+
+    A policy needs hub-dns-operator.io/set-identifier plus exactly one of
+    weight (0-255), region (latency-based) or geo-location, e.g.
+    ``country=US,subdivision=CA`` or ``continent=EU``. Health-check-id is
+    optional. Raises ValueError for an incomplete or contradictory set.
+    """
+    set_identifier = annotations.get(ANNOTATION_SET_IDENTIFIER)
+    if not set_identifier:
+        return None
+    return _parse_routing_policy(
+        set_identifier,
+        annotations.get(ANNOTATION_WEIGHT),
+        annotations.get(ANNOTATION_REGION),
+        annotations.get(ANNOTATION_GEO_LOCATION),
+        annotations.get(ANNOTATION_HEALTH_CHECK_ID),
+    )
+
+
+@lru_cache(maxsize=4096)
+def _parse_routing_policy(set_identifier, weight, region, geo_location, health_check_id) -> RoutingPolicy:
+    chosen = [a for a, v in ((ANNOTATION_WEIGHT, weight), (ANNOTATION_REGION, region),
+                             (ANNOTATION_GEO_LOCATION, geo_location)) if v]
+    if len(chosen) != 1:
+        raise ValueError(
+            f"{ANNOTATION_SET_IDENTIFIER} requires exactly one of "
+            f"{ANNOTATION_WEIGHT}, {ANNOTATION_REGION} or {ANNOTATION_GEO_LOCATION}"
+        )
+
+    parsed_weight = None
+    if weight:
+        if not weight.isdigit() or int(weight) > 255:
+            raise ValueError(f"{ANNOTATION_WEIGHT} must be an integer between 0 and 255, got {weight!r}")
+        parsed_weight = int(weight)
+
+    geo = ()
+    if geo_location:
+        pairs = [part.split("=", 1) for part in geo_location.split(",") if part.strip()]
+        if any(len(p) != 2 or p[0].strip().lower() not in GEO_LOCATION_KEYS for p in pairs):
+            raise ValueError(f"{ANNOTATION_GEO_LOCATION} must be key=value pairs with keys {GEO_LOCATION_KEYS}")
+        geo = tuple((key.strip().lower(), code.strip()) for key, code in pairs)
+
+    return RoutingPolicy(
+        set_identifier=set_identifier,
+        weight=parsed_weight,
+        region=region or None,
+        geo=geo,
+        health_check_id=health_check_id or None,
+    )
+
+
+def get_extra_records(host: str, annotations: dict) -> Tuple[ExtraRecord, ...]:
+    """Build the extra records requested by the txt, srv and caa annotations.
+
+    Each annotation holds one record per line. A line may start with an
+    underscore label, which names the record ``<label>.<host>`` instead of
+    the host itself::
+
+        hub-dns-operator.io/txt: |
+          google-site-verification=abc123
+          _dmarc v=DMARC1; p=reject
+        hub-dns-operator.io/srv: _sip._tcp 10 5 5060      # priority weight port [target]
+        hub-dns-operator.io/caa: 0 issue letsencrypt.org  # flags tag value
+
+    SRV targets default to the host. Lines for the same name and type form
+    one record set. Raises ValueError for a malformed line.
+    """
+    txt, srv, caa = (annotations.get(a) for a in (ANNOTATION_TXT, ANNOTATION_SRV, ANNOTATION_CAA))
+    if not (txt or srv or caa):
+        return ()
+    return _parse_extra_records(host, txt, srv, caa)
+
+
+@lru_cache(maxsize=4096)
+def _parse_extra_records(host, txt, srv, caa) -> Tuple[ExtraRecord, ...]:
+    sets: Dict[Tuple[str, RecordType], list] = {}
+    for record_type, text in ((RecordType.TXT, txt), (RecordType.SRV, srv), (RecordType.CAA, caa)):
+        for line in (text or "").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            label, _, rest = line.partition(" ")
+            if not (label.startswith("_") and rest.strip()):
+                label, rest = "", line
+            name = f"{label}.{host}" if label else host
+            sets.setdefault((name, record_type), []).append(_extra_value(record_type, rest.strip(), host, line))
+    return tuple(ExtraRecord(name, record_type, tuple(values)) for (name, record_type), values in sets.items())
+
+
+def _extra_value(record_type: RecordType, rdata: str, host: str, line: str) -> str:
+    if record_type == RecordType.TXT:
+        return rdata[1:-1] if len(rdata) > 1 and rdata[0] == rdata[-1] == '"' else rdata
+    fields = rdata.split(None, 2 if record_type == RecordType.CAA else 3)
+    if record_type == RecordType.SRV:
+        numbers_valid = all(f.isdigit() and int(f) <= 65535 for f in fields[:3])
+        # rdata == line: the line has no _service._proto label
+        if rdata == line or len(fields) not in (3, 4) or not numbers_valid:
+            raise ValueError(
+                f"{ANNOTATION_SRV} lines must be '_service._proto priority weight port [target]': {line!r}"
+            )
+        target = fields[3] if len(fields) == 4 else host
+        return f"{fields[0]} {fields[1]} {fields[2]} {target.rstrip('.')}."
+    if len(fields) != 3 or not fields[0].isdigit() or int(fields[0]) > 255 or fields[1].lower() not in CAA_TAGS:
+        raise ValueError(f"{ANNOTATION_CAA} lines must be 'flags tag value' with a tag in {CAA_TAGS}: {line!r}")
+    value = fields[2].strip('"')
+    return f'{fields[0]} {fields[1].lower()} "{value}"'
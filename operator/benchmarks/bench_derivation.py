@@ -0,0 +1,84 @@
+"""Micro-benchmark: per-event cost of deriving the desired DNS record.
+
+Compares the original per-event path (annotation parsing, split/isdigit
+hostname detection and environment reads on every event) with the
+precompiled derive_record() over a resync-sized replay of Ingress events.
+
+Run from the operator directory:
+
+    python -m benchmarks.bench_derivation [events] [distinct_ingresses]
+"""
+
+import os
+import sys
+import timeit
+
+from annotations import get_record_type, get_target_value
+from derivation import OperatorConfig, derive_record
+from providers.base import RecordType
+
+
+def _legacy_is_hostname(value):
+    parts = value.split('.')
+    if len(parts) == 4 and all(part.isdigit() for part in parts):
+        return False
+    return any(c.isalpha() for c in value)
+
+
+def legacy_derive(ingress):
+    domain = ingress["spec"]["rules"][0]["host"]
+    annotations = ingress["metadata"].get("annotations", {})
+    record_type = get_record_type(annotations)
+    target_value = get_target_value(ingress, annotations)
+    if record_type == RecordType.A and _legacy_is_hostname(target_value):
+        record_type = RecordType.CNAME
+    custom_ip = os.environ.get("CUSTOM_IP", None)
+    use_custom_ip = custom_ip and (
+        annotations.get("kubernetes.io/ingress.class") != "nginx-internal"
+        and ingress["spec"].get("ingressClassName") != "nginx-internal"
+    )
+    if use_custom_ip and record_type == RecordType.A:
+        target_value = custom_ip
+    ttl = int(os.environ.get("CUSTOM_TTL", 300))
+    return domain, target_value, record_type, ttl
+
+
+def make_events(count, distinct):
+    events = []
+    for i in range(count):
+        n = i % distinct
+        annotations = {"team": f"team-{n % 17}", "kubernetes.io/ingress.class": "nginx"}
+        if n % 10 == 0:
+            annotations["hub-dns-operator.io/target-hostname"] = f"lb-{n % 3}.elb.example.net"
+        events.append({
+            "spec": {"rules": [{"host": f"app-{n}.example.com"}], "ingressClassName": "nginx"},
+            "metadata": {"annotations": annotations, "resourceVersion": str(i)},
+            "status": {"loadBalancer": {"ingress": [{"ip": f"10.0.{n % 4}.1"}]}},
+        })
+    return events
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    os.environ.setdefault("CUSTOM_IP", "203.0.113.1")
+    os.environ.setdefault("CUSTOM_TTL", "300")
+    events = make_events(count, distinct)
+    config = OperatorConfig.from_env()
+
+    for event in events[:100]:
+        legacy = legacy_derive(event)
+        record = derive_record(event, config)
+        assert legacy == (record.domain, record.value, record.record_type, record.ttl)
+
+    legacy_s = min(timeit.repeat(lambda: [legacy_derive(e) for e in events], number=1, repeat=5))
+    fast_s = min(timeit.repeat(lambda: [derive_record(e, config) for e in events], number=1, repeat=5))
+
+    print(f"{count} events over {distinct} distinct Ingresses")
+    print(f"  legacy derivation:      {legacy_s * 1e6 / count:6.2f} us/event  ({legacy_s * 1e3:7.1f} ms total)")
+    print(f"  precompiled derivation: {fast_s * 1e6 / count:6.2f} us/event  ({fast_s * 1e3:7.1f} ms total)")
+    print(f"  speed-up: {legacy_s / fast_s:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Micro-benchmark: end-to-end plan time for a large migration.
+
+Builds a JSON IngressList and a paged zone of the same size, where every
+tenth record needs an update and one in twenty is missing, then times
+each stage of plan mode: loading the manifests, deriving the desired
+records and diffing them against one streamed zone read.
+
+Run from the operator directory:
+
+    python -m benchmarks.bench_plan [ingresses]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import plan
+from derivation import OperatorConfig
+from providers.base import DNSProvider, RecordType, ZoneRecord
+
+
+class FakeZoneProvider(DNSProvider):
+    def __init__(self, count):
+        self._count = count
+
+    @property
+    def provider_name(self):
+        return "bench"
+
+    async def create_or_update_record(self, record_name, value, record_type=RecordType.A, ttl=300, routing=None):
+        raise AssertionError("plan mode must not write")
+
+    async def delete_record(self, record_name, record_type=RecordType.A, routing=None):
+        raise AssertionError("plan mode must not write")
+
+    def _zone_pages(self, page_size):
+        hosts = (i for i in range(self._count) if i % 20)
+        page = []
+        for i in hosts:
+            ip = _ip(i + 1 if i % 10 == 0 else i)
+            page.append(ZoneRecord(f"app-{i}.example.com.", "A", 300, (ip,)))
+            if len(page) == page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+
+def _ip(i):
+    return f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+
+
+def _manifest(count):
+    return {
+        "apiVersion": "v1",
+        "kind": "List",
+        "items": [
+            {
+                "kind": "Ingress",
+                "metadata": {"name": f"app-{i}", "namespace": f"team-{i % 50}", "annotations": {}},
+                "spec": {"ingressClassName": "nginx", "rules": [{"host": f"app-{i}.example.com"}]},
+                "status": {"loadBalancer": {"ingress": [{"ip": _ip(i)}]}},
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(_manifest(count), f)
+    try:
+        start = time.perf_counter()
+        ingresses = list(plan.load_manifests([f.name]))
+        loaded = time.perf_counter()
+        state = plan.desired_state(ingresses, OperatorConfig(dns_zone="example.com", ttl=300))
+        derived = time.perf_counter()
+        result = asyncio.run(plan.plan_provider(FakeZoneProvider(count), state.records.values()))
+        done = time.perf_counter()
+    finally:
+        os.unlink(f.name)
+
+    print(f"{count} Ingresses, {result.zone_records} zone record sets")
+    print(f"  load manifests: {loaded - start:6.2f}s")
+    print(f"  derive records: {derived - loaded:6.2f}s")
+    print(f"  zone read+diff: {done - derived:6.2f}s  ({result.counts})")
+    print(f"  total:          {done - start:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
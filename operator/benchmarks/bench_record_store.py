@@ -0,0 +1,73 @@
+"""Micro-benchmark: memory held by a cache of managed DNS records.
+
+Compares a dict of plain (non-slotted) dataclass records, as DNSRecord used
+to be, against the same records in RecordStore. Targets are drawn from a
+small set of load balancer IPs and hostnames, as in a real cluster.
+
+Run from the operator directory:
+
+    python -m benchmarks.bench_record_store [records] [distinct_targets]
+"""
+
+import sys
+import tracemalloc
+from dataclasses import dataclass
+
+from providers.base import DNSRecord, RecordType
+from record_store import RecordStore
+
+
+@dataclass
+class LegacyDNSRecord:
+    name: str
+    value: str
+    record_type: RecordType
+    ttl: int
+
+
+def _records(count, distinct):
+    for i in range(count):
+        n = i % distinct
+        if n % 5 == 0:
+            yield f"app-{i}.team-{i % 7}.example.com", f"lb-{n}.elb.example.net", RecordType.CNAME
+        else:
+            yield f"app-{i}.team-{i % 7}.example.com", f"10.0.{n >> 8}.{n & 255}", RecordType.A
+
+
+def _measure(build):
+    tracemalloc.start()
+    held = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held, current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    def legacy():
+        # Names and values as they arrive from parsed Ingress JSON: fresh strings per record
+        return {
+            "".join(name): LegacyDNSRecord("".join(name), "".join(value), rtype, 300)
+            for name, value, rtype in _records(count, distinct)
+        }
+
+    def compact():
+        store = RecordStore()
+        for name, value, rtype in _records(count, distinct):
+            store.put(DNSRecord("".join(name), "".join(value), rtype, 300))
+        return store
+
+    legacy_cache, legacy_bytes = _measure(legacy)
+    store, store_bytes = _measure(compact)
+    assert len(legacy_cache) == len(store)
+
+    print(f"{count} records, {distinct} distinct targets")
+    print(f"  dict of dataclasses: {legacy_bytes / 2**20:7.1f} MiB  ({legacy_bytes / count:5.0f} B/record)")
+    print(f"  RecordStore:         {store_bytes / 2**20:7.1f} MiB  ({store_bytes / count:5.0f} B/record)")
+    print(f"  saving: {1 - store_bytes / legacy_bytes:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Micro-benchmark: peak memory of a full-zone diff, materialised vs streamed.
+
+Simulates a Route53-style zone whose pages arrive as lists of response
+dicts. The materialised path collects every record set before diffing (as
+a plain loop over a non-paged listing would); the streamed path feeds
+DNSProvider.iter_zone_records() straight into reconcile.diff_zone().
+
+Run from the operator directory:
+
+    python -m benchmarks.bench_zone_stream [zone_records] [desired_records]
+"""
+
+import asyncio
+import sys
+import tracemalloc
+
+from derivation import DesiredRecord
+from providers.aws import AWSDNSProvider
+from providers.base import DNSProvider, RecordType
+from reconcile import diff_zone
+
+
+def _response_page(start, size):
+    return [
+        {
+            "Name": f"host-{i}.example.com.",
+            "Type": "A",
+            "TTL": 300,
+            "ResourceRecords": [{"Value": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"}],
+        }
+        for i in range(start, start + size)
+    ]
+
+
+class FakeZoneProvider(DNSProvider):
+    """Serves ``zone_size`` synthetic record sets in pages, like a paged list API."""
+
+    def __init__(self, zone_size):
+        self._zone_size = zone_size
+
+    @property
+    def provider_name(self):
+        return "bench"
+
+    async def create_or_update_record(self, record_name, value, record_type=RecordType.A, ttl=300):
+        pass
+
+    async def delete_record(self, record_name, record_type=RecordType.A):
+        pass
+
+    def raw_pages(self, page_size):
+        for start in range(0, self._zone_size, page_size):
+            yield _response_page(start, min(page_size, self._zone_size - start))
+
+    def _zone_pages(self, page_size):
+        for page in self.raw_pages(page_size):
+            yield [AWSDNSProvider._to_zone_record(rs) for rs in page]
+
+
+async def _stream_list(records):
+    for record in records:
+        yield record
+
+
+async def materialised(provider, desired):
+    record_sets = [rs for page in provider.raw_pages(300) for rs in page]
+    zone = [AWSDNSProvider._to_zone_record(rs) for rs in record_sets]
+    return sum([1 async for _ in diff_zone(desired, _stream_list(zone))])
+
+
+async def streamed(provider, desired):
+    return sum([1 async for _ in diff_zone(desired, provider.iter_zone_records(300))])
+
+
+def _peak(coro_fn, provider, desired):
+    tracemalloc.start()
+    changes = asyncio.run(coro_fn(provider, desired))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return changes, peak
+
+
+def main():
+    zone_size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    desired_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    provider = FakeZoneProvider(zone_size)
+    desired = [
+        DesiredRecord(f"host-{i}.example.com", "192.0.2.1", RecordType.A, 300) for i in range(desired_size)
+    ]
+
+    changes_a, peak_a = _peak(materialised, provider, desired)
+    changes_b, peak_b = _peak(streamed, provider, desired)
+    assert changes_a == changes_b
+
+    print(f"{zone_size} zone records, {desired_size} desired ({changes_b} changes)")
+    print(f"  materialised zone: {peak_a / 2**20:7.1f} MiB peak")
+    print(f"  streamed zone:     {peak_b / 2**20:7.1f} MiB peak")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Per-object debouncing of DNS writes during load balancer status churn."""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Pending:
+    """Debounce state for a single key."""
+    fingerprint: Optional[Hashable]
+    value: Any
+    first_seen: float
+    changed_at: float
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+    changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+
+class Debouncer:
+    """Wait for a value to settle before handing it to ``callback``.
+
+    Every submission for a key restarts the settle window when its
+    fingerprint differs from the previous one; submissions with an unchanged
+    fingerprint are coalesced into the pending value. The callback runs once
+    the fingerprint has been stable for ``settle_seconds``, or at the latest
+    ``max_delay_seconds`` after the first submission. A fingerprint of None
+    means "nothing writable yet" (e.g. the load balancer has no IP); if that is
+    still the case when the maximum delay expires, the value is dropped.
+
+    Cancelling a key drops its pending value only; a callback already running
+    for it can be awaited with ``wait_idle``.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[Any], Awaitable[None]],
+        settle_seconds: float,
+        max_delay_seconds: float,
+        coalesce: Optional[Callable[[Any, Any], Any]] = None,
+    ):
+        self._callback = callback
+        self._settle = settle_seconds
+        self._max_delay = max(max_delay_seconds, settle_seconds)
+        self._coalesce = coalesce
+        self._pending: Dict[Hashable, _Pending] = {}
+        self._running: Dict[Hashable, asyncio.Task] = {}
+
+    def submit(self, key: Hashable, fingerprint: Optional[Hashable], value: Any) -> None:
+        now = time.monotonic()
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = _Pending(fingerprint=fingerprint, value=value, first_seen=now, changed_at=now)
+            self._pending[key] = pending
+            pending.task = asyncio.create_task(self._settle_and_run(key, pending))
+            return
+
+        if fingerprint != pending.fingerprint:
+            pending.fingerprint = fingerprint
+            pending.changed_at = now
+            pending.changed.set()
+        pending.value = self._coalesce(pending.value, value) if self._coalesce else value
+
+    def cancel(self, key: Hashable) -> bool:
+        """Drop pending work for ``key``. Returns True if something was pending."""
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return False
+        if pending.task is not None:
+            pending.task.cancel()
+        return True
+
+    async def wait_idle(self, key: Hashable) -> None:
+        """Wait until no callback is running for ``key``."""
+        while (task := self._running.get(key)) is not None and task is not asyncio.current_task():
+            await asyncio.wait({task})  # not cancelled with the waiter
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Describe the pending keys (for debugging endpoints)."""
+        now = time.monotonic()
+        return [
+            {
+                "key": str(key),
+                "fingerprint": None if p.fingerprint is None else str(p.fingerprint),
+                "pending_seconds": round(now - p.first_seen, 3),
+                "stable_seconds": round(now - p.changed_at, 3),
+            }
+            for key, p in self._pending.items()
+        ]
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def _settle_and_run(self, key: Hashable, pending: _Pending) -> None:
+        while True:
+            now = time.monotonic()
+            hard_deadline = pending.first_seen + self._max_delay
+            settled = pending.fingerprint is not None and now >= pending.changed_at + self._settle
+            if settled or now >= hard_deadline:
+                break
+            wake_at = hard_deadline
+            if pending.fingerprint is not None:
+                wake_at = min(wake_at, pending.changed_at + self._settle)
+            pending.changed.clear()
+            try:
+                await asyncio.wait_for(pending.changed.wait(), timeout=max(0.0, wake_at - now))
+            except asyncio.TimeoutError:
+                pass
+
+        if self._pending.get(key) is pending:
+            del self._pending[key]
+
+        if pending.fingerprint is None:
+            logger.warning("[debounce] %s: no stable target after %ss, skipping write", key, self._max_delay)
+            return
+
+        task = asyncio.current_task()
+        self._running[key] = task
+        try:
+            await self._callback(pending.value)
+        except Exception as e:
+            logger.error("[debounce] %s: settled write failed: %s", key, e)
+        finally:
+            if self._running.get(key) is task:
+                del self._running[key]
@@ -0,0 +1,156 @@
+"""Opt-in debug HTTP endpoints for diagnosing a lagging operator in place.
+
+Served by a separate aiohttp app on its own port (see ``create_debug_app``):
+
+- ``/debug/tasks``       asyncio task dump with the innermost frames of each task
+- ``/debug/queues``      contents of registered queues (debouncer, scheduler, ...)
+- ``/debug/inflight``    provider calls currently in progress
+- ``/debug/profile``     sampling CPU profile of the event loop thread (folded stacks)
+- ``/debug/tracemalloc`` top memory allocations (``?action=start|stop`` toggles tracing)
+"""
+
+import asyncio
+import itertools
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator
+
+from aiohttp import web
+
+MAX_PROFILE_SECONDS = 60
+
+
+class InFlightTracker:
+    """Track provider calls that have started but not yet finished."""
+
+    def __init__(self):
+        self._calls: Dict[int, Dict[str, Any]] = {}
+        self._ids = itertools.count()
+
+    @contextmanager
+    def track(self, operation: str, host: str, provider: str) -> Iterator[None]:
+        call_id = next(self._ids)
+        self._calls[call_id] = {
+            "operation": operation, "host": host, "provider": provider, "started": time.monotonic(),
+        }
+        try:
+            yield
+        finally:
+            self._calls.pop(call_id, None)
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def snapshot(self):
+        now = time.monotonic()
+        calls = [
+            {**{k: v for k, v in call.items() if k != "started"}, "running_seconds": round(now - call["started"], 3)}
+            for call in self._calls.values()
+        ]
+        return sorted(calls, key=lambda c: c["running_seconds"], reverse=True)
+
+
+inflight = InFlightTracker()
+
+_queues: Dict[str, Callable[[], Any]] = {}
+
+
+def register_queue(name: str, snapshot: Callable[[], Any]) -> None:
+    """Expose a queue-like component on /debug/queues via its snapshot callable."""
+    _queues[name] = snapshot
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_filename}:{code.co_name}:{frame.f_lineno}"
+
+
+def sample_stacks(thread_id: int, seconds: float, interval: float) -> Counter:
+    """Sample the stack of ``thread_id`` every ``interval`` seconds, folded root-first."""
+    samples: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(_frame_label(frame))
+            frame = frame.f_back
+        if stack:
+            samples[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return samples
+
+
+async def tasks_handler(request):
+    limit = int(request.query.get("frames", 3))
+    tasks = []
+    for task in asyncio.all_tasks():
+        frames = task.get_stack(limit=limit)
+        tasks.append({
+            "name": task.get_name(),
+            "coro": getattr(task.get_coro(), "__qualname__", repr(task.get_coro())),
+            "done": task.done(),
+            "stack": [_frame_label(f) for f in frames],
+        })
+    return web.json_response({"count": len(tasks), "tasks": tasks})
+
+
+async def queues_handler(request):
+    return web.json_response({name: snapshot() for name, snapshot in _queues.items()})
+
+
+async def inflight_handler(request):
+    return web.json_response({"count": len(inflight), "calls": inflight.snapshot()})
+
+
+async def profile_handler(request):
+    """Sample the event loop thread for ``seconds`` and return folded stacks.
+
+    The output is the "folded" format understood by flamegraph.pl and
+    speedscope: one ``frame;frame;frame count`` line per distinct stack.
+    """
+    seconds = min(float(request.query.get("seconds", 10)), MAX_PROFILE_SECONDS)
+    interval = max(float(request.query.get("interval", 0.005)), 0.001)
+    loop_thread = threading.get_ident()
+    samples = await asyncio.to_thread(sample_stacks, loop_thread, seconds, interval)
+    body = "\n".join(f"{stack} {count}" for stack, count in samples.most_common())
+    return web.Response(text=body + "\n", content_type="text/plain")
+
+
+async def tracemalloc_handler(request):
+    action = request.query.get("action")
+    if action == "start":
+        tracemalloc.start(int(request.query.get("frames", 1)))
+        return web.json_response({"tracing": True})
+    if action == "stop":
+        tracemalloc.stop()
+        return web.json_response({"tracing": False})
+    if not tracemalloc.is_tracing():
+        raise web.HTTPConflict(text="tracemalloc is not running; start it with ?action=start")
+
+    limit = int(request.query.get("limit", 25))
+    snapshot = tracemalloc.take_snapshot()
+    stats = snapshot.statistics("lineno")[:limit]
+    current, peak = tracemalloc.get_traced_memory()
+    return web.json_response({
+        "current_bytes": current,
+        "peak_bytes": peak,
+        "top": [
+            {"location": str(stat.traceback[0]), "size_bytes": stat.size, "count": stat.count}
+            for stat in stats
+        ],
+    })
+
+
+def create_debug_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/debug/tasks", tasks_handler)
+    app.router.add_get("/debug/queues", queues_handler)
+    app.router.add_get("/debug/inflight", inflight_handler)
+    app.router.add_get("/debug/profile", profile_handler)
+    app.router.add_get("/debug/tracemalloc", tracemalloc_handler)
+    return app
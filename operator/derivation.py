@@ -0,0 +1,120 @@
+"""Derivation of the desired DNS record from an Ingress.
+
+Configuration is read from the environment once into an immutable
+OperatorConfig, and derivation results are cached on the handful of Ingress
+fields they depend on. Replaying tens of thousands of unchanged Ingresses
+on a resync therefore costs one dict lookup per event, not a re-parse.
+"""
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import FrozenSet, Optional, Tuple
+
+from annotations import (
+    ANNOTATION_ALIAS, ANNOTATION_RECORD_TYPE, ANNOTATION_TARGET_HOSTNAME, get_extra_records, get_routing_policy,
+)
+from providers.base import ExtraRecord, RecordType, RoutingPolicy, is_hostname
+
+ANNOTATION_INGRESS_CLASS = "kubernetes.io/ingress.class"
+
+
+@dataclass(frozen=True)
+class OperatorConfig:
+    """Settings that shape every derived record, loaded once at startup."""
+    ttl: int = 300
+    custom_ip: Optional[str] = None
+    # Ingress classes that always keep their own load balancer IP (never CUSTOM_IP)
+    internal_ingress_classes: FrozenSet[str] = frozenset({"nginx-internal"})
+    dns_zone: str = "unknown"
+
+    @property
+    def zone_suffix(self) -> str:
+        return f".{self.dns_zone}"
+
+    @classmethod
+    def from_env(cls) -> "OperatorConfig":
+        internal_classes = os.environ.get("INTERNAL_INGRESS_CLASSES", "nginx-internal")
+        return cls(
+            ttl=int(os.environ.get("CUSTOM_TTL", 300)),
+            custom_ip=os.environ.get("CUSTOM_IP") or None,
+            internal_ingress_classes=frozenset(c.strip() for c in internal_classes.split(",") if c.strip()),
+            dns_zone=(
+                os.environ.get("AZURE_DNS_ZONE")
+                or os.environ.get("GCP_DNS_ZONE")
+                or os.environ.get("AWS_DNS_ZONE", "unknown")
+            ),
+        )
+
+
+@dataclass(frozen=True)
+class DesiredRecord:
+    """The DNS record an Ingress should produce."""
+    domain: str
+    value: str
+    record_type: RecordType
+    ttl: int
+    routing: Optional[RoutingPolicy] = None
+    extras: Tuple[ExtraRecord, ...] = ()
+
+
+def derive_record(ingress: dict, config: OperatorConfig) -> DesiredRecord:
+    """Compute the desired record for an Ingress.
+
+    Raises ValueError if the Ingress has neither an alias or target-hostname
+    annotation nor a load balancer IP yet, or carries an invalid routing
+    policy or extra record.
+    """
+    spec = ingress["spec"]
+    annotations = ingress["metadata"].get("annotations") or {}
+    lb_ip = None
+    lb_ingress = ingress.get("status", {}).get("loadBalancer", {}).get("ingress")
+    if lb_ingress:
+        lb_ip = lb_ingress[0].get("ip")
+
+    host = spec["rules"][0]["host"]
+    return _derive(
+        config,
+        host,
+        annotations.get(ANNOTATION_RECORD_TYPE),
+        annotations.get(ANNOTATION_TARGET_HOSTNAME),
+        lb_ip,
+        annotations.get(ANNOTATION_INGRESS_CLASS),
+        spec.get("ingressClassName"),
+        get_routing_policy(annotations),
+        annotations.get(ANNOTATION_ALIAS),
+        get_extra_records(host, annotations),
+    )
+
+
+@lru_cache(maxsize=16384)
+def _derive(
+    config: OperatorConfig,
+    host: str,
+    record_type_annotation: Optional[str],
+    target_hostname: Optional[str],
+    lb_ip: Optional[str],
+    annotation_class: Optional[str],
+    ingress_class: Optional[str],
+    routing: Optional[RoutingPolicy] = None,
+    alias: Optional[str] = None,
+    extras: Tuple[ExtraRecord, ...] = (),
+) -> DesiredRecord:
+    if alias:
+        return DesiredRecord(host, alias, RecordType.ALIAS, config.ttl, routing, extras)
+
+    target = target_hostname or lb_ip
+    if not target:
+        raise ValueError("No target value found for DNS record")
+
+    explicit_cname = (record_type_annotation or "").upper() == "CNAME"
+    record_type = RecordType.CNAME if explicit_cname or is_hostname(target) else RecordType.A
+
+    internal = (
+        annotation_class in config.internal_ingress_classes
+        or ingress_class in config.internal_ingress_classes
+    )
+    if config.custom_ip and not internal and record_type == RecordType.A:
+        target = config.custom_ip
+
+    return DesiredRecord(host, target, record_type, config.ttl, routing, extras)
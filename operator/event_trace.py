@@ -0,0 +1,110 @@
+"""Recording of received events and provider calls, for offline replay.
+
+With TRACE_FILE set, every watch event the operator receives and every
+provider write or delete it makes is appended to a gzip-compressed JSON
+lines file. The first line is a header; each further line is one of:
+
+* ``{"t": 1.25, "source": "ingress", "type": "MODIFIED", "object": {...}}``
+  for an event, ``object`` keeping only the fields the operator reads
+  (identity, hub-dns-operator.io annotations, hosts, classes, load
+  balancer status and Gateway addresses);
+* ``{"t": 1.31, "call": "update", "host": "app.example.com",
+  "provider": "aws", "seconds": 0.18, "error": "Throttling"}`` for a
+  provider call (``create``, ``update`` or ``delete``), ``error`` only
+  present when it failed.
+
+``t`` is seconds since recording started (monotonic). The stream is
+flushed every ``flush_interval`` seconds, so a trace of a killed operator
+is readable up to its last flush. ``replay.py`` feeds a trace back through
+the handlers.
+"""
+
+import gzip
+import json
+import logging
+import time
+import zlib
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACE_VERSION = 1
+
+_ANNOTATION_PREFIXES = ("hub-dns-operator.io/", "kubernetes.io/ingress.class")
+_METADATA_FIELDS = ("name", "namespace", "uid", "resourceVersion", "creationTimestamp")
+_SPEC_FIELDS = ("ingressClassName", "type", "loadBalancerClass", "hostnames", "parentRefs", "gatewayClassName")
+_STATUS_FIELDS = ("loadBalancer", "addresses")
+
+
+def compact(obj: dict) -> dict:
+    """The fields of a watched object the operator reads; everything else is dropped."""
+    metadata = obj.get("metadata") or {}
+    spec = obj.get("spec") or {}
+    status = obj.get("status") or {}
+    slim = {"apiVersion": obj.get("apiVersion"), "kind": obj.get("kind")}
+    slim["metadata"] = {k: metadata[k] for k in _METADATA_FIELDS if metadata.get(k) is not None}
+    slim["metadata"]["annotations"] = {
+        k: v for k, v in (metadata.get("annotations") or {}).items() if k.startswith(_ANNOTATION_PREFIXES)
+    }
+    slim["spec"] = {k: spec[k] for k in _SPEC_FIELDS if spec.get(k) is not None}
+    if spec.get("rules"):
+        slim["spec"]["rules"] = [{"host": rule.get("host")} for rule in spec["rules"]]
+    slim["status"] = {k: status[k] for k in _STATUS_FIELDS if status.get(k) is not None}
+    return slim
+
+
+class TraceRecorder:
+    """Append-only, gzip-compressed trace of events and provider calls."""
+
+    def __init__(self, path: str, flush_interval: float = 5.0, version: str = ""):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._file = gzip.open(path, "wb")
+        self._start = time.monotonic()
+        self._flushed = self._start
+        self.records = 0
+        self._write({"trace": TRACE_VERSION, "started": time.time(), "version": version})
+
+    def event(self, source: str, event_type: Optional[str], obj: dict) -> None:
+        self._write({"t": self._now(), "source": source, "type": event_type, "object": compact(obj)})
+
+    def call(self, operation: str, host: str, provider: str, seconds: float,
+             error: Optional[BaseException] = None) -> None:
+        record = {"t": self._now(), "call": operation, "host": host, "provider": provider,
+                  "seconds": round(seconds, 6)}
+        if error is not None:
+            record["error"] = type(error).__name__
+        self._write(record)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+            logger.info("Trace %s closed after %d records", self.path, self.records)
+
+    def _now(self) -> float:
+        return round(time.monotonic() - self._start, 6)
+
+    def _write(self, record: dict) -> None:
+        if self._file.closed:
+            return
+        self._file.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+        self.records += 1
+        now = time.monotonic()
+        if now - self._flushed >= self.flush_interval:
+            self._file.flush(zlib.Z_SYNC_FLUSH)  # readable up to here even if never closed
+            self._flushed = now
+
+
+def read_trace(path: str) -> Iterator[dict]:
+    """Records of a trace after its header, stopping quietly at a truncated tail."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            header = json.loads(f.readline())
+            if header.get("trace") != TRACE_VERSION:
+                raise ValueError(f"{path} is not a version {TRACE_VERSION} trace")
+            for line in f:
+                if not line.endswith("\n"):
+                    return
+                yield json.loads(line)
+        except EOFError:
+            return
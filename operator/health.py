@@ -0,0 +1,158 @@
+"""Liveness and readiness signals: event-loop lag, executor saturation, watch and provider health."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from prometheus_client import Gauge
+
+event_loop_lag_seconds = Gauge(
+    'dns_operator_event_loop_lag_seconds',
+    'Most recently measured event loop scheduling lag in seconds'
+)
+
+executor_utilization = Gauge(
+    'dns_operator_executor_utilization',
+    'Executor work items running or queued divided by worker threads (>1 means calls are queueing)'
+)
+
+watch_last_event_timestamp = Gauge(
+    'dns_operator_watch_last_event_timestamp_seconds',
+    'Unix time of the last event received from any watch stream'
+)
+
+provider_reachable = Gauge(
+    'dns_operator_provider_reachable',
+    'Whether the DNS provider answered recent calls (1) or has failed repeatedly (0)'
+)
+
+provider_consecutive_failures = Gauge(
+    'dns_operator_provider_consecutive_failures',
+    'Number of consecutive failed DNS provider calls'
+)
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    """Thread pool that counts work items submitted and not yet finished.
+
+    Every ``asyncio.to_thread`` call lands here once the executor is the
+    loop's default, so a fan-out to N back-ends counts N, not one.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+        self._occupied = 0
+
+    @property
+    def occupied(self) -> int:
+        return self._occupied
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._lock:
+            self._occupied += 1
+        try:
+            future = super().submit(fn, *args, **kwargs)
+        except BaseException:
+            self._finished(None)
+            raise
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, _future) -> None:
+        with self._lock:
+            self._occupied -= 1
+
+
+class HealthMonitor:
+    """Collects health signals and evaluates them against thresholds.
+
+    A threshold of 0 disables the corresponding check. Watch idleness is
+    measured from the last event delivered by any watch (kopf does not pass
+    on stream restarts or bookmarks), so a quiet but healthy cluster looks
+    idle too; that check is off unless ``live_max_watch_idle`` is set.
+    """
+
+    def __init__(
+        self,
+        executor_workers: int,
+        in_flight: Callable[[], int],
+        ready_max_loop_lag: float = 1.0,
+        live_max_loop_lag: float = 10.0,
+        ready_max_executor_utilization: float = 1.0,
+        ready_provider_failure_threshold: int = 5,
+        live_max_watch_idle: float = 0.0,
+    ):
+        self._executor_workers = max(1, executor_workers)
+        self._in_flight = in_flight
+        self.ready_max_loop_lag = ready_max_loop_lag
+        self.live_max_loop_lag = live_max_loop_lag
+        self.ready_max_executor_utilization = ready_max_executor_utilization
+        self.ready_provider_failure_threshold = ready_provider_failure_threshold
+        self.live_max_watch_idle = live_max_watch_idle
+
+        self.loop_lag = 0.0
+        self.provider_failures = 0
+        self._started = time.time()
+        self._last_event: Optional[float] = None
+        provider_reachable.set(1)
+
+    # -- signal recording ----------------------------------------------------
+
+    def record_event(self) -> None:
+        self._last_event = time.time()
+        watch_last_event_timestamp.set(self._last_event)
+
+    def record_provider_result(self, success: bool) -> None:
+        self.provider_failures = 0 if success else self.provider_failures + 1
+        provider_consecutive_failures.set(self.provider_failures)
+        provider_reachable.set(0 if self._provider_unreachable() else 1)
+
+    async def run_lag_monitor(self, interval: float = 0.5) -> None:
+        """Measure how late the loop wakes up from a fixed sleep, forever."""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            self.loop_lag = max(0.0, loop.time() - started - interval)
+            event_loop_lag_seconds.set(self.loop_lag)
+            executor_utilization.set(self.executor_utilization)
+
+    # -- derived values ------------------------------------------------------
+
+    @property
+    def executor_utilization(self) -> float:
+        return self._in_flight() / self._executor_workers
+
+    @property
+    def watch_idle_seconds(self) -> float:
+        """Seconds since the last watch event, or since start before the first."""
+        return time.time() - (self._last_event or self._started)
+
+    def _provider_unreachable(self) -> bool:
+        threshold = self.ready_provider_failure_threshold
+        return threshold > 0 and self.provider_failures >= threshold
+
+    # -- probes --------------------------------------------------------------
+
+    def liveness(self) -> Tuple[bool, List[str]]:
+        problems = []
+        if self.live_max_loop_lag > 0 and self.loop_lag > self.live_max_loop_lag:
+            problems.append(f"event loop lag {self.loop_lag:.2f}s > {self.live_max_loop_lag}s")
+        if self.live_max_watch_idle > 0 and self.watch_idle_seconds > self.live_max_watch_idle:
+            problems.append(f"no watch events for {self.watch_idle_seconds:.0f}s > {self.live_max_watch_idle}s")
+        return not problems, problems
+
+    def readiness(self) -> Tuple[bool, List[str]]:
+        problems = []
+        if self.ready_max_loop_lag > 0 and self.loop_lag > self.ready_max_loop_lag:
+            problems.append(f"event loop lag {self.loop_lag:.2f}s > {self.ready_max_loop_lag}s")
+        utilization = self.executor_utilization
+        executor_utilization.set(utilization)
+        if self.ready_max_executor_utilization > 0 and utilization > self.ready_max_executor_utilization:
+            problems.append(f"executor utilization {utilization:.2f} > {self.ready_max_executor_utilization}")
+        if self._provider_unreachable():
+            problems.append(f"provider failed {self.provider_failures} consecutive calls")
+        return not problems, problems
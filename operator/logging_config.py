@@ -0,0 +1,126 @@
+"""Logging setup: plain or JSON output, sampling of repetitive messages, queued handlers."""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Pass as ``extra=STATE_TRANSITION`` to exempt a message from sampling.
+STATE_TRANSITION = {"state_transition": True}
+
+# Attributes every LogRecord has; anything else was passed through ``extra``.
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+_INTERNAL_ATTRS = frozenset({"state_transition", "sample_key"})
+
+
+class JsonFormatter(logging.Formatter):
+    """Render records as single-line JSON objects.
+
+    Fields passed through ``extra`` are included as top-level keys, so call
+    sites can attach structured context (host, provider, ...) without
+    building it into the message string.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and key not in _INTERNAL_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Let at most ``burst`` messages per key through every ``interval`` seconds.
+
+    Only records below WARNING are sampled; warnings, errors and records
+    flagged as state transitions always pass. The key is the logger name and
+    unformatted message template, or an explicit ``sample_key`` extra. The
+    first record of a new window carries a ``suppressed`` count of the
+    messages dropped in the previous one.
+    """
+
+    def __init__(self, interval: float, burst: int = 1):
+        super().__init__()
+        self._interval = interval
+        self._burst = max(1, burst)
+        self._windows: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or getattr(record, "state_transition", False):
+            return True
+
+        key = (record.name, getattr(record, "sample_key", None) or record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self._interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if window[1] < self._burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging() -> Optional[logging.handlers.QueueListener]:
+    """Configure the root logger from environment variables.
+
+    LOG_LEVEL (default INFO), LOG_FORMAT ("text" or "json"),
+    LOG_SAMPLE_INTERVAL (seconds, 0 disables sampling), LOG_SAMPLE_BURST and
+    LOG_ASYNC ("true" moves formatting and I/O to a background thread).
+    Returns the started QueueListener when LOG_ASYNC is enabled.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        # Like basicConfig(), leave an already configured root logger alone.
+        return None
+
+    level = os.environ.get("LOG_LEVEL", "INFO").upper()
+    log_format = os.environ.get("LOG_FORMAT", "text").lower()
+    sample_interval = float(os.environ.get("LOG_SAMPLE_INTERVAL", 0))
+    sample_burst = int(os.environ.get("LOG_SAMPLE_BURST", 1))
+    use_async = os.environ.get("LOG_ASYNC", "false").lower() == "true"
+
+    stream_handler = logging.StreamHandler()
+    if log_format == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+
+    listener = None
+    handler = stream_handler
+    if use_async:
+        handler = _DeferredQueueHandler(queue.SimpleQueue())
+        listener = logging.handlers.QueueListener(handler.queue, stream_handler)
+        listener.start()
+
+    # Sampling runs on the emitting side so dropped records are never queued.
+    if sample_interval > 0:
+        handler.addFilter(SamplingFilter(sample_interval, sample_burst))
+
+    root.addHandler(handler)
+    root.setLevel(level)
+    return listener
@@ -5,13 +5,35 @@ import asyncio
 import time
 from kubernetes import client, config
 from aiohttp import web
-from prometheus_client import Counter, Histogram, Gauge, generate_latest
-
-from providers.base import RecordType
-from annotations import get_record_type, get_target_value
-
-# Configure logging to INFO level
-logging.basicConfig(level=logging.INFO)
+from prometheus_client import Counter, Histogram, Gauge
+
+from annotations import get_extra_records, get_record_type, get_routing_policy, get_target_value
+from derivation import OperatorConfig, derive_record
+import debug
+from metrics import CachedExposition, RecordMetrics
+from health import CountingExecutor, HealthMonitor
+from debounce import Debouncer
+from event_trace import TraceRecorder
+from logging_config import STATE_TRANSITION, configure_logging
+from scheduler import Priority, PriorityScheduler
+from providers import create_provider
+from providers.accounting import ApiCallBudget
+from providers.aggregation import AggregatingDNSProvider
+from providers.circuit import CircuitBreakerDNSProvider
+from providers.base import DNSRecord, record_options
+from providers.dry_run import DryRunDNSProvider
+from ownership import HostOwnership, describe, ingress_slot
+from propagation import PropagationChecker, parse_server
+from record_store import RecordStore
+from resource_versions import LISTED, REPLAYED, ResourceVersionTracker
+from retry import RetryQueue
+import sources
+from sources import GatewayIndex
+import tracing
+from ttl_policy import TtlPolicy
+
+# Configure logging (LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_INTERVAL, LOG_ASYNC)
+log_listener = configure_logging()
 logger = logging.getLogger(__name__)
 
 # =============================================================================
@@ -33,10 +55,16 @@ dns_operation_duration_seconds = Histogram(
 
 dns_errors_total = Counter(
     'dns_operator_errors_total',
-    'Total number of DNS operation errors',
+    'Total number of DNS operation errors, by normalized error class (see providers.base.ERROR_CLASSES)',
     ['operation', 'error_type', 'provider']
 )
 
+dns_writes_skipped_total = Counter(
+    'dns_operator_writes_skipped_total',
+    'Writes not sent to the provider: unchanged since this process wrote them, or already served',
+    ['reason']
+)
+
 dns_records_managed = Gauge(
     'dns_operator_records_managed',
     'Number of DNS records currently managed by the operator'
@@ -52,45 +80,154 @@ operator_info = Gauge(
 # CLOUD PROVIDER FACTORY
 # =============================================================================
 
+# Aggregation mode: publish targets under this owner ID and keep each record
+# set as the union of all spokes' targets (empty = last writer wins)
+AGGREGATION_OWNER_ID = os.environ.get("AGGREGATION_OWNER_ID", "")
+# Prune other owners' entries not refreshed for this long (0 = never)
+AGGREGATION_STALE_SECONDS = float(os.environ.get("AGGREGATION_STALE_SECONDS", 0))
+
+
+# Open a back-end's circuit after this many consecutive transient failures (0 = no circuit breaker)
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", 0))
+CIRCUIT_RESET_TIMEOUT_SECONDS = float(os.environ.get("CIRCUIT_RESET_TIMEOUT_SECONDS", 30))
+CIRCUIT_MAX_RESET_TIMEOUT_SECONDS = float(os.environ.get("CIRCUIT_MAX_RESET_TIMEOUT_SECONDS", 300))
+
+circuit_breakers = {}
+# How long shutdown waits for the back-end queues of a fan-out to empty
+SHUTDOWN_DRAIN_SECONDS = float(os.environ.get("SHUTDOWN_DRAIN_SECONDS", 10))
+# Aggregating back-ends as built, before the circuit breaker and dry run wrap them
+aggregating_providers = []
+# The fan-out over several back-ends, if CLOUD_PROVIDER lists more than one
+multi_provider = None
+
+
+def _create_provider(provider_name):
+    provider = create_provider(provider_name)
+    if AGGREGATION_OWNER_ID:
+        provider = AggregatingDNSProvider(provider, AGGREGATION_OWNER_ID, AGGREGATION_STALE_SECONDS)
+        aggregating_providers.append(provider)
+    if CIRCUIT_FAILURE_THRESHOLD > 0:
+        provider = CircuitBreakerDNSProvider(
+            provider, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT_SECONDS, CIRCUIT_MAX_RESET_TIMEOUT_SECONDS
+        )
+        circuit_breakers[provider_name] = provider
+    return provider
+
 
 def create_dns_provider():
     """Create the appropriate DNS provider based on CLOUD_PROVIDER env var.
 
-    Supported values: azure (default), gcp, aws
+    Supported values: azure (default), gcp, aws, or a comma-separated list
+    (e.g. "azure,aws") to fan out every record to several back-ends. With
+    AGGREGATION_OWNER_ID set, each back-end is wrapped for aggregation; with
+    CIRCUIT_FAILURE_THRESHOLD set, each gets its own circuit breaker.
+    Several back-ends each get their own queue and retries (RETRY_*).
     """
-    provider_name = os.environ.get("CLOUD_PROVIDER", "azure").lower()
-
-    if provider_name == "azure":
-        from providers.azure import AzureDNSProvider
-        return AzureDNSProvider()
-    elif provider_name == "gcp":
-        from providers.gcp import GCPDNSProvider
-        return GCPDNSProvider()
-    elif provider_name == "aws":
-        from providers.aws import AWSDNSProvider
-        return AWSDNSProvider()
-    else:
-        raise ValueError(f"Unsupported cloud provider: {provider_name}. Use 'azure', 'gcp', or 'aws'.")
+    global multi_provider
+    provider_names = [
+        name.strip().lower()
+        for name in os.environ.get("CLOUD_PROVIDER", "azure").split(",")
+        if name.strip()
+    ] or ["azure"]
+
+    if len(provider_names) == 1:
+        return _create_provider(provider_names[0])
+
+    from providers.multi import MultiDNSProvider
+    providers = [_create_provider(name) for name in provider_names]
+    rate_limits = {
+        name: float(os.environ.get(f"{name.upper()}_RATE_LIMIT", os.environ.get("PROVIDER_RATE_LIMIT", 0)))
+        for name in provider_names
+    }
+    multi_provider = MultiDNSProvider(
+        providers,
+        max_concurrency=int(os.environ.get("PROVIDER_MAX_CONCURRENCY", 8)),
+        rate_limits=rate_limits,
+        retry_base_delay=float(os.environ.get("RETRY_BASE_DELAY_SECONDS", 1)),
+        retry_max_delay=float(os.environ.get("RETRY_MAX_DELAY_SECONDS", 300)),
+        retry_max_attempts=int(os.environ.get("RETRY_MAX_ATTEMPTS", 10)),
+    )
+    return multi_provider
 
 
 # =============================================================================
 # KUBERNETES & DNS PROVIDER SETUP
 # =============================================================================
 
-config.load_incluster_config()
+try:
+    config.load_incluster_config()
+except config.ConfigException:
+    # Outside a cluster (local runs, replay.py) kopf logs in from kubeconfig itself
+    logger.info("No in-cluster Kubernetes config found")
 api_client = client.NetworkingV1Api()
 
 # Initialize cloud DNS provider
 dns_provider = create_dns_provider()
 
-# Get DNS zone for metrics (provider-agnostic)
-dns_zone = (
-    os.environ.get("AZURE_DNS_ZONE")
-    or os.environ.get("GCP_DNS_ZONE")
-    or os.environ.get("AWS_DNS_ZONE", "unknown")
+# Dry run: run the full pipeline but only record intended changes (served at /plan)
+DRY_RUN = os.environ.get("DRY_RUN", "false").lower() == "true"
+if DRY_RUN:
+    dns_provider = DryRunDNSProvider(dns_provider)
+
+# TTL, custom IP policy, internal ingress classes and DNS zone, read once
+operator_config = OperatorConfig.from_env()
+dns_zone = operator_config.dns_zone
+
+# Records successfully written by this process (backs dns_operator_records_managed)
+managed_records = RecordStore()
+
+# Per-record TTLs: annotation overrides and, with TTL_MIN/TTL_MAX set, adaptive TTLs
+ttl_policy = TtlPolicy(
+    operator_config.ttl,
+    min_ttl=int(os.environ.get("TTL_MIN", 0)),
+    max_ttl=int(os.environ.get("TTL_MAX", 0)),
+    stable_seconds=float(os.environ.get("TTL_STABLE_SECONDS", 3600)),
+    min_update_interval=float(os.environ.get("TTL_MIN_UPDATE_INTERVAL_SECONDS", 300)),
+)
+TTL_REVIEW_INTERVAL_SECONDS = float(os.environ.get("TTL_REVIEW_INTERVAL_SECONDS", 60))
+
+
+async def _write_owned_record(record, force=False):
+    """Write a record outside an event (TTL review, drift repair); a failure is parked like an event's."""
+    error = await write_dns_record(record, 'update', force=force)
+    if error is None:
+        return
+    set_identifier = record.routing.set_identifier if record.routing is not None else ""
+    owners = host_ownership.owners((record.domain, set_identifier))
+    if owners:
+        # Retries re-derive from the owning Ingress, like failed event writes
+        retries.failed(record.domain, "upsert", owners[0], error, dns_provider.is_retryable_error(error))
+
+
+async def _repair_record(record):
+    await _schedule(Priority.LOW, f"repair {record.domain}", lambda: _write_owned_record(record, force=True))
+
+
+# Optional propagation checks against the zone's nameservers (empty = off)
+PROPAGATION_NAMESERVERS = [
+    parse_server(s) for s in os.environ.get("PROPAGATION_NAMESERVERS", "").split(",") if s.strip()
+]
+# Skip provider writes the nameservers already serve; never with aggregation, whose owner table must be written
+# Opt-in: don't resend a write this process already made with the same content.
+# Off by default, since resyncs re-upserting every record also repair records
+# changed or deleted out of band.
+SKIP_UNCHANGED_WRITES = os.environ.get("SKIP_UNCHANGED_WRITES", "false").lower() == "true"
+PROPAGATION_SKIP_SERVED_WRITES = (
+    os.environ.get("PROPAGATION_SKIP_SERVED_WRITES", "false").lower() == "true" and not AGGREGATION_OWNER_ID
+)
+propagation = (
+    PropagationChecker(
+        PROPAGATION_NAMESERVERS,
+        _repair_record,
+        timeout=float(os.environ.get("PROPAGATION_QUERY_TIMEOUT_SECONDS", 2)),
+        interval=float(os.environ.get("PROPAGATION_POLL_INTERVAL_SECONDS", 5)),
+        deadline=float(os.environ.get("PROPAGATION_DEADLINE_SECONDS", 120)),
+        concurrency=int(os.environ.get("PROPAGATION_CONCURRENCY", 8)),
+        max_repairs=int(os.environ.get("PROPAGATION_MAX_REPAIRS", 3)),
+    )
+    if PROPAGATION_NAMESERVERS and not DRY_RUN
+    else None
 )
-
-custom_ip_from_values = os.environ.get("CUSTOM_IP", None)
 
 OPERATOR_VERSION = os.environ.get("OPERATOR_VERSION", "0.4.5")
 operator_info.labels(
@@ -99,60 +236,151 @@ operator_info.labels(
     version=OPERATOR_VERSION
 ).set(1)
 
+# Optional trace of received events and provider calls, for replay.py (empty = off)
+TRACE_FILE = os.environ.get("TRACE_FILE", "")
+tracer = TraceRecorder(TRACE_FILE, version=OPERATOR_VERSION) if TRACE_FILE else None
+
+# OpenTelemetry spans per event (TRACING_EXPORTER: none, otlp, file or memory; see tracing.py)
+tracing.configure(
+    os.environ.get("TRACING_EXPORTER", "none"),
+    sample_ratio=float(os.environ.get("TRACING_SAMPLE_RATIO", 0.1)),
+    file_path=os.environ.get("TRACING_SPAN_FILE", ""),
+    version=OPERATOR_VERSION,
+)
+
+# Per-record operation counts, exported for the busiest records only (0 = off)
+METRICS_PER_RECORD_TOP_K = int(os.environ.get("METRICS_PER_RECORD_TOP_K", 0))
+record_metrics = RecordMetrics(METRICS_PER_RECORD_TOP_K) if METRICS_PER_RECORD_TOP_K > 0 else None
+
+# /metrics is rendered off the event loop, at most once per METRICS_CACHE_SECONDS (0 = every scrape)
+exposition = CachedExposition(float(os.environ.get("METRICS_CACHE_SECONDS", 0)))
+
+# Provider SDK calls run in the default executor (asyncio.to_thread); size it explicitly
+EXECUTOR_MAX_WORKERS = int(os.environ.get("EXECUTOR_MAX_WORKERS", 16))
+executor = CountingExecutor(max_workers=EXECUTOR_MAX_WORKERS)
+
+health = HealthMonitor(
+    executor_workers=EXECUTOR_MAX_WORKERS,
+    in_flight=lambda: executor.occupied,
+    ready_max_loop_lag=float(os.environ.get("READY_MAX_LOOP_LAG_SECONDS", 1.0)),
+    live_max_loop_lag=float(os.environ.get("LIVE_MAX_LOOP_LAG_SECONDS", 10.0)),
+    ready_max_executor_utilization=float(os.environ.get("READY_MAX_EXECUTOR_UTILIZATION", 1.0)),
+    ready_provider_failure_threshold=int(os.environ.get("READY_PROVIDER_FAILURE_THRESHOLD", 5)),
+    live_max_watch_idle=float(os.environ.get("LIVE_MAX_WATCH_IDLE_SECONDS", 0)),
+)
+
 # =============================================================================
 # DNS OPERATIONS
 # =============================================================================
 
 
-async def create_or_update_dns_record(ingress, action):
-    domain = ingress["spec"]["rules"][0]["host"]
-    annotations = ingress["metadata"].get("annotations", {})
-    provider_name = dns_provider.provider_name
+def _record_operation(action, domain, provider_name, start_time, error=None):
+    """Health, metrics and trace bookkeeping for one provider write or delete; returns its duration."""
+    health.record_provider_result(error is None)
+    duration = time.time() - start_time
+    dns_operation_duration_seconds.labels(operation=action, provider=provider_name).observe(duration)
+    status = 'success' if error is None else 'error'
+    dns_operations_total.labels(operation=action, status=status, provider=provider_name).inc()
+    if error is not None:
+        error_type = dns_provider.error_class(error)
+        dns_errors_total.labels(operation=action, error_type=error_type, provider=provider_name).inc()
+    if record_metrics is not None:
+        record_metrics.observe(domain, error is None)
+    if tracer is not None:
+        tracer.call(action, domain, provider_name, duration, error)
+    return duration
 
-    # Determine record type from annotation
-    record_type = get_record_type(annotations)
 
-    # Get target value (IP or hostname)
-    target_value = get_target_value(ingress, annotations)
+def _span_attributes(action, domain, provider_name):
+    return {"dns.operation": action, "dns.host": domain, "dns.provider": provider_name}
 
-    # Auto-detect: if target looks like hostname and no explicit annotation, use CNAME
-    if record_type == RecordType.A and dns_provider.is_hostname(target_value):
-        record_type = RecordType.CNAME
 
-    # Check for custom IP annotation and ingressclass
-    use_custom_ip = custom_ip_from_values and (
-        annotations.get("kubernetes.io/ingress.class") != "nginx-internal"
-        and ingress["spec"].get("ingressClassName") != "nginx-internal"
-    )
-    # Override target value if custom IP is configured (for A records only)
-    if use_custom_ip and record_type == RecordType.A:
-        target_value = custom_ip_from_values
-
-    ttl = int(os.environ.get("CUSTOM_TTL", 300))
+async def create_or_update_dns_record(ingress, action):
+    # Record type, target (LB IP, target-hostname annotation or CUSTOM_IP) and TTL
+    with tracing.span("dns.derive"):
+        record = derive_record(ingress, operator_config)
+        record = ttl_policy.apply(record, ingress["metadata"].get("annotations") or {})
+    error = await write_dns_record(record, action)
+    if error is not None:
+        retries.failed(record.domain, "upsert", ingress, error, dns_provider.is_retryable_error(error))
+
+
+async def write_dns_record(record, action, force=False):
+    """Write ``record``; return the exception if the write failed (it has been logged and counted).
+
+    With SKIP_UNCHANGED_WRITES, a record this process already wrote with
+    the same content is not sent again (resyncs, unrelated Ingress edits),
+    unless ``force`` is set, as for drift repairs. Records with a routing
+    policy or extras always go to the provider, since the record store does
+    not track those.
+    """
+    provider_name = dns_provider.provider_name
+    domain, target_value, record_type, ttl = record.domain, record.value, record.record_type, record.ttl
+
+    if (
+        SKIP_UNCHANGED_WRITES and not force and record.routing is None and not record.extras
+        and managed_records.unchanged(domain, target_value, record_type, ttl)
+    ):
+        dns_writes_skipped_total.labels(reason="unchanged").inc()
+        retries.succeeded(domain)
+        logger.debug("[%s] %s already written as %s; write skipped", provider_name, domain, target_value)
+        return None
+
+    if PROPAGATION_SKIP_SERVED_WRITES and propagation is not None and await propagation.serves(record):
+        dns_writes_skipped_total.labels(reason="served").inc()
+        managed_records.put(DNSRecord(domain, target_value, record_type, ttl))
+        dns_records_managed.set(len(managed_records))
+        ttl_policy.record_written(record)
+        retries.succeeded(domain)
+        logger.debug("[%s] %s already served as %s; write skipped", provider_name, domain, target_value)
+        return None
+
+    # A new record or a new target (IP or host change) is never sampled out of the log
+    previous = managed_records.get(domain)
+    transition = previous is None or (previous.value, previous.record_type) != (target_value, record_type)
 
     start_time = time.time()
     try:
-        await dns_provider.create_or_update_record(domain, target_value, record_type, ttl)
-
-        duration = time.time() - start_time
-        dns_operation_duration_seconds.labels(operation=action, provider=provider_name).observe(duration)
-        dns_operations_total.labels(operation=action, status='success', provider=provider_name).inc()
-
-        if action == 'create':
-            dns_records_managed.inc()
+        with debug.inflight.track(action, domain, provider_name), \
+                tracing.span("dns.provider", _span_attributes(action, domain, provider_name)):
+            await dns_provider.create_or_update_record(
+                domain, target_value, record_type, ttl, **record_options(record.routing, record.extras)
+            )
+
+        _record_operation(action, domain, provider_name, start_time)
+        managed_records.put(DNSRecord(domain, target_value, record_type, ttl))
+        ttl_policy.record_written(record)
+        dns_records_managed.set(len(managed_records))
+        retries.succeeded(domain)
+        if propagation is not None:
+            propagation.watch(record)
 
         verb = 'created' if action == 'create' else 'updated'
-        record_type_str = record_type.value
-        logger.info(f"[{provider_name}] DNS {verb} {domain} -> {target_value} ({record_type_str})")
+        logger.info(
+            "[%s] DNS %s %s -> %s (%s)", provider_name, verb, domain, target_value, record_type.value,
+            extra={"host": domain, "provider": provider_name, "state_transition": transition},
+        )
 
     except Exception as e:
-        duration = time.time() - start_time
-        dns_operation_duration_seconds.labels(operation=action, provider=provider_name).observe(duration)
-        dns_operations_total.labels(operation=action, status='error', provider=provider_name).inc()
-        dns_errors_total.labels(operation=action, error_type=type(e).__name__, provider=provider_name).inc()
-
+        _record_operation(action, domain, provider_name, start_time, e)
         action_verb = 'creating' if action == 'create' else 'updating'
-        logger.error(f"[{provider_name}] Error {action_verb} DNS record {domain}: {e}")
+        logger.error(
+            "[%s] Error %s DNS record %s: %s", provider_name, action_verb, domain, e,
+            extra={"host": domain, "provider": provider_name},
+        )
+        return e
+    return None
+
+
+def _written_record_type(ingress, domain, annotations):
+    """Type of the record a delete removes: as last written, else as the object derives it."""
+    written = managed_records.get(domain)
+    if written is not None:
+        return written.record_type
+    try:
+        return derive_record(ingress, operator_config).record_type
+    except ValueError:
+        return get_record_type(annotations)  # no target left; only annotations say it is not an A
 
 
 async def delete_dns_record(ingress):
@@ -160,49 +388,325 @@ async def delete_dns_record(ingress):
     annotations = ingress["metadata"].get("annotations", {})
     provider_name = dns_provider.provider_name
 
-    # Get record type to delete (use same logic as create)
-    record_type = get_record_type(annotations)
+    record_type = _written_record_type(ingress, domain, annotations)
+    routing = get_routing_policy(annotations)
+    try:
+        extras = get_extra_records(domain, annotations)
+    except ValueError:
+        extras = ()  # malformed extras were never written
 
     start_time = time.time()
     try:
-        await dns_provider.delete_record(domain, record_type)
-
-        duration = time.time() - start_time
-        dns_operation_duration_seconds.labels(operation='delete', provider=provider_name).observe(duration)
-        dns_operations_total.labels(operation='delete', status='success', provider=provider_name).inc()
-        dns_records_managed.dec()
-
-        record_type_str = record_type.value
-        logger.info(f"[{provider_name}] DNS record deleted: {domain} ({record_type_str}) ({duration:.3f}s)")
+        with debug.inflight.track('delete', domain, provider_name), \
+                tracing.span("dns.provider", _span_attributes('delete', domain, provider_name)):
+            await dns_provider.delete_record(domain, record_type, **record_options(routing, extras))
+
+        duration = _record_operation('delete', domain, provider_name, start_time)
+        if record_metrics is not None:
+            record_metrics.forget(domain)
+        managed_records.remove(domain)
+        retries.succeeded(domain)
+        ttl_policy.forget(domain)
+        if propagation is not None:
+            propagation.cancel(domain)
+        dns_records_managed.set(len(managed_records))
+
+        logger.info(
+            "[%s] DNS record deleted: %s (%s) (%.3fs)", provider_name, domain, record_type.value, duration,
+            extra={"host": domain, "provider": provider_name, **STATE_TRANSITION},
+        )
 
     except Exception as e:
-        duration = time.time() - start_time
-        dns_operation_duration_seconds.labels(operation='delete', provider=provider_name).observe(duration)
-        dns_operations_total.labels(operation='delete', status='error', provider=provider_name).inc()
-        dns_errors_total.labels(operation='delete', error_type=type(e).__name__, provider=provider_name).inc()
-
-        logger.error(f"[{provider_name}] Error deleting DNS record {domain}: {e}")
+        _record_operation('delete', domain, provider_name, start_time, e)
+        logger.error(
+            "[%s] Error deleting DNS record %s: %s", provider_name, domain, e,
+            extra={"host": domain, "provider": provider_name},
+        )
+        retries.failed(domain, "delete", ingress, e, dns_provider.is_retryable_error(e))
 
 
 # =============================================================================
 # KOPF EVENT HANDLERS
 # =============================================================================
 
-@kopf.on.event("networking.k8s.io/v1", "Ingress")
+def _ingress_key(ingress):
+    metadata = ingress.get("metadata") or {}
+    if metadata.get("uid"):
+        return metadata["uid"]
+    if metadata.get("name"):
+        return f"{metadata.get('namespace', '')}/{metadata['name']}"
+    return ingress["spec"]["rules"][0]["host"]
+
+
+def _target_fingerprint(ingress):
+    """Return the current DNS target of an Ingress, or None if it has none yet."""
+    try:
+        return get_target_value(ingress, ingress["metadata"].get("annotations", {}))
+    except ValueError:
+        return None
+
+
+# Last observed target per Ingress key, used to classify events by urgency
+_observed_targets = {}
+_UNSEEN = object()
+
+
+def classify_event(event_type, ingress):
+    """Map an Ingress event to a scheduling priority.
+
+    New hosts and deletions are HIGH, target changes MEDIUM, and everything
+    else (resyncs, status or annotation churn on an unchanged target) LOW.
+    """
+    key = _ingress_key(ingress)
+    if event_type == "DELETED":
+        _observed_targets.pop(key, None)
+        return Priority.HIGH
+
+    target = _target_fingerprint(ingress)
+    previous = _observed_targets.get(key, _UNSEEN)
+    _observed_targets[key] = target
+    if previous is _UNSEEN:
+        return Priority.HIGH if event_type == "ADDED" else Priority.LOW
+    if previous != target:
+        return Priority.MEDIUM
+    return Priority.LOW
+
+
+# Worker pool size for the priority scheduler (0 runs DNS work inline in the event handler)
+DNS_WORKERS = int(os.environ.get("DNS_WORKERS", 0))
+DNS_STARVATION_LIMIT = int(os.environ.get("DNS_STARVATION_LIMIT", 10))
+
+# Optional cap on cloud API calls per minute; LOW-priority work waits while it is spent
+api_call_budget = ApiCallBudget(int(os.environ.get("API_CALL_BUDGET_PER_MINUTE", 0)))
+
+
+def _defer_priority(priority):
+    return priority == Priority.LOW and api_call_budget.exceeded()
+
+
+scheduler = (
+    PriorityScheduler(DNS_WORKERS, DNS_STARVATION_LIMIT, defer=_defer_priority)
+    if DNS_WORKERS > 0
+    else None
+)
+if scheduler is not None:
+    debug.register_queue("scheduler", scheduler.snapshot)
+
+
+async def _schedule(priority, label, job):
+    if scheduler is None:
+        if priority == Priority.LOW:
+            with tracing.span("dns.rate_limit_wait"):
+                await api_call_budget.wait_for_capacity()
+        return await job()
+    return await scheduler.submit(
+        priority, label, tracing.carry(job, "dns.queue", {"dns.priority": priority.name.lower()}),
+    )
+
+
+async def _apply_settled(value):
+    ingress, action, priority = value
+    domain = ingress["spec"]["rules"][0]["host"]
+    # Continues the trace of the events the debouncer merged into this write
+    with tracing.settled_span("dns.apply", _ingress_key(ingress), {"dns.operation": action, "dns.host": domain}):
+        await _schedule(priority, f"{action} {domain}", lambda: create_or_update_dns_record(ingress, action))
+
+
+def _coalesce_actions(old, new):
+    # A create that is still pending stays a create, whatever followed it,
+    # and the merged write keeps the most urgent priority seen.
+    action = "create" if old[1] == "create" else new[1]
+    return new[0], action, min(old[2], new[2])
+
+
+# Settle window for load balancer status churn (0 disables debouncing)
+DNS_SETTLE_SECONDS = float(os.environ.get("DNS_SETTLE_SECONDS", 0))
+DNS_SETTLE_MAX_DELAY_SECONDS = float(os.environ.get("DNS_SETTLE_MAX_DELAY_SECONDS", 30))
+
+debouncer = (
+    Debouncer(_apply_settled, DNS_SETTLE_SECONDS, DNS_SETTLE_MAX_DELAY_SECONDS, coalesce=_coalesce_actions)
+    if DNS_SETTLE_SECONDS > 0
+    else None
+)
+if debouncer is not None:
+    debug.register_queue("debounce", debouncer.snapshot)
+
+
+# Which Ingress owns each host when several claim it (see ownership.py)
+host_ownership = HostOwnership()
+debug.register_queue("host_conflicts", host_ownership.conflicts)
+
+# Last handled resourceVersion per Ingress, to drop events replayed by re-lists
+resource_versions = ResourceVersionTracker()
+
+# Watch requests end server-side after WATCH_SERVER_TIMEOUT_SECONDS and are
+# resumed from the last resourceVersion; only an expired version re-lists
+WATCH_SERVER_TIMEOUT_SECONDS = int(os.environ.get("WATCH_SERVER_TIMEOUT_SECONDS", 60))
+WATCH_CONNECT_TIMEOUT_SECONDS = int(os.environ.get("WATCH_CONNECT_TIMEOUT_SECONDS", 60))
+# Client-side limit for a whole watch request (0 = none)
+WATCH_CLIENT_TIMEOUT_SECONDS = int(os.environ.get("WATCH_CLIENT_TIMEOUT_SECONDS", 0))
+
+
+def _kind(ingress):
+    return ingress.get("kind") or "Ingress"
+
+
+def _report_conflict(ingress, claim):
+    host = ingress["spec"]["rules"][0]["host"]
+    winner = describe(claim.winner)
+    if claim.displaced is not None:
+        kopf.warn(
+            claim.displaced, reason="DNSHostConflict",
+            message=f"Host {host} is now owned by older {winner}; this {_kind(claim.displaced)} no longer writes it",
+        )
+    if claim.new_conflict and not claim.is_winner:
+        kopf.warn(
+            ingress, reason="DNSHostConflict",
+            message=f"Host {host} is owned by {winner}; this {_kind(ingress)} does not write it",
+        )
+    if claim.new_conflict:
+        logger.warning(
+            "Host %s claimed by several objects; %s owns it", host, winner, extra={"host": host},
+        )
+
+
+async def _release(release, priority):
+    """Delete a released record once its last claimant is gone, or hand it to the next winner."""
+    domain = release.slot[0]
+    if release.remaining == 0:
+        await _schedule(priority, f"delete {domain}", lambda: delete_dns_record(release.ingress))
+    elif release.successor is not None:
+        successor = release.successor
+        logger.info(
+            "Host %s handed over to %s", domain, describe(successor),
+            extra={"host": domain, **STATE_TRANSITION},
+        )
+        await _apply_settled((successor, "update", Priority.MEDIUM))
+    else:
+        logger.info("Host %s still claimed by %d other object(s); record kept", domain, release.remaining)
+
+
+async def _handle_event(event_type, ingress):
+    """Run an event of an Ingress (or an Ingress-shaped source view) through the pipeline."""
+    if event_type in ("ADDED", "MODIFIED", None):
+        key = _ingress_key(ingress)
+        # None is kopf's (re-)listing: objects seen for the first time only
+        # rebuild the ownership index, and replayed versions are dropped
+        seen = resource_versions.observe(key, ingress["metadata"].get("resourceVersion"), event_type is None)
+        if seen == REPLAYED:
+            return
+        claim = host_ownership.claim(key, ingress)
+        if claim.moved_from is not None:
+            await _release(claim.moved_from, Priority.HIGH)
+        _report_conflict(ingress, claim)
+        if seen == LISTED or not claim.is_winner:
+            return
+        event_type = event_type or "MODIFIED"  # changed while the watch was down
+        action = "create" if event_type == "ADDED" else "update"
+        priority = classify_event(event_type, ingress)
+        if debouncer is not None:
+            tracing.defer(_ingress_key(ingress))
+            debouncer.submit(_ingress_key(ingress), _target_fingerprint(ingress), (ingress, action, priority))
+        else:
+            await _apply_settled((ingress, action, priority))
+    elif event_type == "DELETED":
+        priority = classify_event(event_type, ingress)
+        if debouncer is not None:
+            debouncer.cancel(_ingress_key(ingress))
+            tracing.discard(_ingress_key(ingress))
+            # A settled write already under way must land first, or it would recreate the record
+            await debouncer.wait_idle(_ingress_key(ingress))
+        resource_versions.forget(_ingress_key(ingress))
+        await _release(host_ownership.release(_ingress_key(ingress), ingress), priority)
+
+
+async def _handle_view(event_type, obj, view):
+    """Handle an event of a Service or HTTPRoute through its Ingress-shaped ``view``.
+
+    A view of None means the object publishes no record (not a LoadBalancer,
+    no hostname): a record it claimed before is released as if it had been
+    deleted.
+    """
+    if view is not None:
+        await _handle_event(event_type, view)
+        return
+    claimed = host_ownership.claimed(_ingress_key(obj))
+    if claimed is not None:
+        await _handle_event("DELETED", claimed)
+
+
+def _received(source, event):
+    """Account for a watch event; returns the span to handle it in."""
+    health.record_event()
+    if tracer is not None:
+        tracer.event(source, event["type"], event["object"])
+    if not tracing.enabled():
+        return tracing.span("dns.event")
+    metadata = event["object"].get("metadata") or {}
+    return tracing.span("dns.event", {
+        "dns.source": source,
+        "k8s.event.type": event["type"] or "LISTED",
+        "k8s.namespace.name": metadata.get("namespace", ""),
+        "k8s.object.name": metadata.get("name", ""),
+    })
+
+
 async def ingress_event_handler(event, **kwargs):
-    if event["type"] == "ADDED":
-        await create_or_update_dns_record(event["object"], "create")
-    elif event["type"] == "MODIFIED":
-        await create_or_update_dns_record(event["object"], "update")
-    elif event["type"] == "DELETED":
-        await delete_dns_record(event["object"])
+    with _received(sources.INGRESS, event):
+        await _handle_event(event["type"], event["object"])
+
+
+async def service_event_handler(event, **kwargs):
+    with _received(sources.SERVICE, event):
+        service = event["object"]
+        await _handle_view(event["type"], service, sources.service_view(service))
+
+
+# Gateway addresses and the HTTPRoutes attached to them (see sources.py)
+gateway_index = GatewayIndex()
+
+
+async def httproute_event_handler(event, **kwargs):
+    with _received(sources.HTTPROUTE, event):
+        route = event["object"]
+        view = gateway_index.route_view(route)
+        if event["type"] == "DELETED":
+            gateway_index.forget_route(route)
+        await _handle_view(event["type"], route, view)
+
+
+async def gateway_event_handler(event, **kwargs):
+    with _received(sources.GATEWAY, event):
+        gateway = event["object"]
+        if event["type"] == "DELETED":
+            routes = gateway_index.remove_gateway(gateway)
+        else:
+            routes = gateway_index.update_gateway(gateway)
+        for route in routes:
+            if event["type"] is None:
+                # Gateway from a (re-)listing: its routes are only claimed, as on startup
+                resource_versions.forget(_ingress_key(route))
+            await _handle_view(event["type"] and "MODIFIED", route, gateway_index.route_view(route))
+
+
+# Object kinds DNS records are published for (SOURCES, default "ingress")
+SOURCES = sources.enabled_sources()
+if sources.INGRESS in SOURCES:
+    kopf.on.event("networking.k8s.io/v1", "Ingress")(ingress_event_handler)
+if sources.SERVICE in SOURCES:
+    kopf.on.event("v1", "Service")(service_event_handler)
+if sources.HTTPROUTE in SOURCES:
+    kopf.on.event(f"{sources.GATEWAY_GROUP}/v1", "HTTPRoute")(httproute_event_handler)
+    kopf.on.event(f"{sources.GATEWAY_GROUP}/v1", "Gateway")(gateway_event_handler)
 
 
 @kopf.on.startup()
 def configure(settings: kopf.OperatorSettings, **_):
     settings.posting.level = logging.WARNING
-    settings.watching.connect_timeout = 60
-    settings.watching.server_timeout = 60
+    settings.watching.connect_timeout = WATCH_CONNECT_TIMEOUT_SECONDS
+    settings.watching.server_timeout = WATCH_SERVER_TIMEOUT_SECONDS
+    if WATCH_CLIENT_TIMEOUT_SECONDS > 0:
+        settings.watching.client_timeout = WATCH_CLIENT_TIMEOUT_SECONDS
 
 
 # =============================================================================
@@ -210,26 +714,122 @@ def configure(settings: kopf.OperatorSettings, **_):
 # =============================================================================
 
 async def health_check(request):
+    alive, problems = health.liveness()
+    if not alive:
+        return web.Response(status=503, text="\n".join(problems))
     return web.Response(text="OK")
 
 
 async def readiness_check(request):
+    ready, problems = health.readiness()
+    if not ready:
+        return web.Response(status=503, text="\n".join(problems))
     return web.Response(text="OK")
 
 
+async def plan_handler(request):
+    """Changes collected in dry-run mode, latest per record set"""
+    planned = dns_provider.plan()
+    return web.json_response({"dry_run": True, "count": len(planned), "changes": planned})
+
+
 async def metrics_handler(request):
-    """Prometheus metrics endpoint"""
-    return web.Response(
-        body=generate_latest(),
+    """Prometheus metrics endpoint (cached, and gzip-compressed when the scraper accepts it)"""
+    body, encoding = await exposition.get("gzip" in request.headers.get("Accept-Encoding", ""))
+    response = web.Response(
+        body=body,
         content_type="text/plain",
         charset="utf-8",
     )
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    return response
 
 
 app = web.Application()
 app.router.add_get("/healthz", health_check)
 app.router.add_get("/readyz", readiness_check)
 app.router.add_get("/metrics", metrics_handler)
+if DRY_RUN:
+    app.router.add_get("/plan", plan_handler)
+
+# Debug endpoints are opt-in and served on their own port, by default only on localhost
+DEBUG_ENDPOINTS_ENABLED = os.environ.get("DEBUG_ENDPOINTS_ENABLED", "false").lower() == "true"
+DEBUG_PORT = int(os.environ.get("DEBUG_PORT", 6060))
+DEBUG_BIND_ADDRESS = os.environ.get("DEBUG_BIND_ADDRESS", "127.0.0.1")
+
+
+async def refresh_aggregated_records(interval):
+    """Periodically re-publish this spoke's owner entries so peers never prune them as stale."""
+    while True:
+        await asyncio.sleep(interval)
+        for provider in aggregating_providers:
+            await _schedule(Priority.LOW, "refresh owner entries", provider.refresh)
+
+
+async def review_ttls(interval):
+    """Periodically write TTL-only changes the adaptive TTL policy has made due."""
+    while True:
+        await asyncio.sleep(interval)
+        for record in ttl_policy.due():
+            await _schedule(Priority.LOW, f"ttl {record.domain}", lambda record=record: _write_due_ttl(record))
+
+
+async def _write_due_ttl(record):
+    try:
+        await _write_owned_record(record)
+    finally:
+        ttl_policy.rearm(record)  # a write that did not land is due again at the next review
+
+
+async def _retry_operation(operation, ingress):
+    """Redo a failed operation, against the host's current owner if that changed meanwhile."""
+    domain = ingress["spec"]["rules"][0]["host"]
+    owners = host_ownership.owners(ingress_slot(ingress))
+    if operation == "delete":
+        if owners:
+            logger.info("Dropping retry of delete %s: the host has been claimed again", domain)
+            return
+        with tracing.span("dns.retry", {"dns.operation": operation, "dns.host": domain}):
+            await _schedule(Priority.LOW, f"retry delete {domain}", lambda: delete_dns_record(ingress))
+    else:
+        current = owners[0] if owners else ingress
+        with tracing.span("dns.retry", {"dns.operation": operation, "dns.host": domain}):
+            await _schedule(Priority.LOW, f"retry {domain}", lambda: create_or_update_dns_record(current, "update"))
+
+
+def _retry_payload(ingress):
+    """What the retry state file keeps of an object: its identity, host and this operator's annotations.
+
+    Enough to redo a delete; an upsert is redone against the host's current
+    owner, which kopf's listing has claimed again after a restart.
+    """
+    metadata = ingress.get("metadata") or {}
+    annotations = metadata.get("annotations") or {}
+    return {
+        "kind": _kind(ingress),
+        "metadata": {
+            **{k: metadata[k] for k in ("namespace", "name", "uid") if k in metadata},
+            "annotations": {k: v for k, v in annotations.items() if k.startswith("hub-dns-operator.io/")},
+        },
+        "spec": {"rules": [{"host": ingress["spec"]["rules"][0]["host"]}]},
+    }
+
+
+# Failed writes are retried with backoff instead of being dropped
+retries = RetryQueue(
+    _retry_operation,
+    base_delay=float(os.environ.get("RETRY_BASE_DELAY_SECONDS", 1)),
+    max_delay=float(os.environ.get("RETRY_MAX_DELAY_SECONDS", 300)),
+    max_attempts=int(os.environ.get("RETRY_MAX_ATTEMPTS", 10)),
+    state_file=os.environ.get("RETRY_STATE_FILE", ""),
+    concurrency=int(os.environ.get("RETRY_CONCURRENCY", 8)),
+    is_retryable=lambda error: dns_provider.is_retryable_error(error),
+    slim=_retry_payload,
+)
+debug.register_queue("retry", retries.snapshot)
+debug.register_queue("circuits", lambda: {name: c.snapshot() for name, c in circuit_breakers.items()})
+debug.register_queue("backends", lambda: multi_provider.snapshot() if multi_provider is not None else {})
 
 
 # =============================================================================
@@ -242,9 +842,38 @@ async def main():
     site = web.TCPSite(runner, "0.0.0.0", 8080)  # nosec B104
     await site.start()
 
-    kopf_operator = kopf.operator()
+    if DEBUG_ENDPOINTS_ENABLED:
+        debug_runner = web.AppRunner(debug.create_debug_app())
+        await debug_runner.setup()
+        await web.TCPSite(debug_runner, DEBUG_BIND_ADDRESS, DEBUG_PORT).start()
+        logger.warning("Debug endpoints enabled on %s:%s", DEBUG_BIND_ADDRESS, DEBUG_PORT)
+
+    asyncio.get_running_loop().set_default_executor(executor)
+    lag_monitor = asyncio.create_task(health.run_lag_monitor())
+    background = [lag_monitor, asyncio.create_task(retries.run())]
+    if AGGREGATION_OWNER_ID and AGGREGATION_STALE_SECONDS > 0:
+        background.append(asyncio.create_task(refresh_aggregated_records(AGGREGATION_STALE_SECONDS / 4)))
+    if ttl_policy.adaptive:
+        background.append(asyncio.create_task(review_ttls(TTL_REVIEW_INTERVAL_SECONDS)))
 
-    await asyncio.gather(runner.cleanup(), kopf_operator)
+    try:
+        await kopf.operator()
+    finally:
+        for task in background:
+            task.cancel()
+        await retries.flush()
+        if multi_provider is not None:
+            try:
+                await asyncio.wait_for(multi_provider.drain(), SHUTDOWN_DRAIN_SECONDS)
+            except asyncio.TimeoutError:
+                logger.warning("Back-end queues not drained within %ss; queued writes dropped", SHUTDOWN_DRAIN_SECONDS)
+            multi_provider.close()
+        if tracer is not None:
+            tracer.close()
+        tracing.shutdown()
+        await runner.cleanup()
+        if log_listener is not None:
+            log_listener.stop()  # writes out records still queued for the log thread
 
 
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+"""Bounded per-record metrics and a cached /metrics exposition.
+
+Per-record series make exposition cost and Prometheus storage grow with
+the zone. RecordMetrics keeps cheap per-host counters in memory but
+exports only the ``top_k`` records with the most operations, chosen
+afresh at each render. A record that drops out of the top simply ends its
+series. Totals over all records stay in ``dns_operator_operations_total``.
+
+Rendering the registry takes time proportional to the number of series,
+and several Prometheus replicas scraping often would pay it on every
+request. CachedExposition renders in a worker thread, so the event loop
+is never blocked. It renders at most once per ``max_age`` seconds; scrapes
+in between, and concurrent scrapes, share one rendering. A gzip copy is
+made once per rendering, the first time a scraper accepts it.
+"""
+
+import asyncio
+import gzip
+import heapq
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+dns_metrics_renders_total = Counter(
+    'dns_operator_metrics_renders_total',
+    'Renderings of the /metrics exposition (scrapes served from the cache are not counted)'
+)
+
+
+class RecordMetrics:
+    """Operation counts per record, exported for the ``top_k`` busiest records (a registry collector)."""
+
+    def __init__(self, top_k: int, registry: CollectorRegistry = REGISTRY):
+        self.top_k = top_k
+        self._counts: Dict[str, List[int]] = {}  # host -> [successes, errors]
+        registry.register(self)
+
+    def observe(self, host: str, success: bool) -> None:
+        counts = self._counts.get(host)
+        if counts is None:
+            counts = self._counts[host] = [0, 0]
+        counts[0 if success else 1] += 1
+
+    def forget(self, host: str) -> None:
+        self._counts.pop(host, None)
+
+    def collect(self):
+        # Runs on the rendering thread; list() copies the items atomically under the GIL
+        top = heapq.nlargest(self.top_k, list(self._counts.items()), key=lambda item: (sum(item[1]), item[0]))
+        operations = CounterMetricFamily(
+            'dns_operator_record_operations',
+            'DNS operations per record, for the records with the most operations (METRICS_PER_RECORD_TOP_K)',
+            labels=['host', 'status'],
+        )
+        for host, (successes, errors) in top:
+            operations.add_metric([host, 'success'], successes)
+            operations.add_metric([host, 'error'], errors)
+        yield operations
+        yield GaugeMetricFamily(
+            'dns_operator_record_metrics_hosts',
+            'Records with per-record operation counts in memory, exported or not',
+            value=len(self._counts),
+        )
+
+
+@dataclass(slots=True)
+class _Rendering:
+    body: bytes
+    gzipped: Optional[bytes] = None
+
+
+class CachedExposition:
+    """The registry's text exposition, rendered off the loop at most once per ``max_age`` seconds."""
+
+    def __init__(self, max_age: float = 0.0, registry: CollectorRegistry = REGISTRY):
+        self.max_age = max_age
+        self._registry = registry
+        self._task: Optional[asyncio.Task] = None
+        self._rendered_at = 0.0
+
+    async def get(self, accept_gzip: bool = False) -> Tuple[bytes, Optional[str]]:
+        """The exposition body and its Content-Encoding ("gzip" if accepted, else None)."""
+        stale = time.monotonic() - self._rendered_at >= self.max_age
+        if self._task is None or (stale and self._task.done()):
+            self._task = asyncio.create_task(self._render())
+        rendering = await asyncio.shield(self._task)
+        if not accept_gzip:
+            return rendering.body, None
+        if rendering.gzipped is None:
+            rendering.gzipped = await asyncio.to_thread(gzip.compress, rendering.body)
+        return rendering.gzipped, "gzip"
+
+    async def _render(self) -> _Rendering:
+        try:
+            body = await asyncio.to_thread(generate_latest, self._registry)
+        except BaseException:
+            self._task = None  # let the next scrape try again
+            raise
+        self._rendered_at = time.monotonic()
+        dns_metrics_renders_total.inc()
+        return _Rendering(body)
@@ -0,0 +1,167 @@
+"""Ownership of DNS records by the Ingresses that claim them.
+
+Several Ingresses may name the same host. Without coordination each one
+writes its own target (the records ping-pong between them) and deleting
+any of them removes the record the others still need. The index maps each
+record slot (host plus routing set identifier) to the Ingresses claiming
+it:
+
+* exactly one claimant is the winner and writes the record: the oldest
+  Ingress by creationTimestamp, ties broken by namespace/name, so every
+  replica and every restart picks the same one;
+* the others are losing claims and never write; each conflict is counted
+  and reported as a Kubernetes Warning event on the Ingresses involved;
+* claims are reference counted: deleting an Ingress removes the record only
+  when it was the last claimant, and hands the record to the next winner
+  when the winner goes away.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from annotations import ANNOTATION_SET_IDENTIFIER
+
+dns_contested_hosts = Gauge(
+    'dns_operator_contested_hosts',
+    'Record slots (host and set identifier) currently claimed by more than one Ingress'
+)
+
+dns_host_conflicts_total = Counter(
+    'dns_operator_host_conflicts_total',
+    'Ingresses found claiming a record slot another Ingress already owns'
+)
+
+Slot = Tuple[str, str]  # (host, set identifier or "")
+
+
+def ingress_slot(ingress: dict) -> Slot:
+    annotations = ingress.get("metadata", {}).get("annotations") or {}
+    return ingress["spec"]["rules"][0]["host"], annotations.get(ANNOTATION_SET_IDENTIFIER, "")
+
+
+def ingress_name(ingress: dict) -> str:
+    metadata = ingress.get("metadata") or {}
+    return f"{metadata.get('namespace', '')}/{metadata.get('name', '')}".strip("/") or ingress_slot(ingress)[0]
+
+
+def describe(ingress: dict) -> str:
+    """Kind and name of a claimant, e.g. ``Ingress team/app`` or ``Service team/api``."""
+    return f"{ingress.get('kind') or 'Ingress'} {ingress_name(ingress)}"
+
+
+def claim_rank(ingress: dict) -> Tuple[str, str, str]:
+    """Sort key of a claimant: the lowest rank wins its slot (also used by plan.py)."""
+    metadata = ingress.get("metadata") or {}
+    # RFC 3339 timestamps from the API server sort chronologically as strings
+    return metadata.get("creationTimestamp") or "", metadata.get("namespace") or "", metadata.get("name") or ""
+
+
+@dataclass(slots=True)
+class _Claim:
+    key: str
+    rank: Tuple[str, str, str]
+    ingress: dict
+
+
+class ClaimResult(NamedTuple):
+    is_winner: bool
+    winner: dict                   # Ingress that owns the slot
+    displaced: Optional[dict]      # previous winner that just lost the slot to this claim
+    new_conflict: bool             # this claim just started conflicting with another
+    moved_from: Optional["ReleaseResult"]  # release of the slot this Ingress claimed before, if its host changed
+
+
+class ReleaseResult(NamedTuple):
+    slot: Slot
+    ingress: dict                  # the released Ingress, in its final state if one was given
+    was_winner: bool
+    successor: Optional[dict]      # new winner, when the winner was released and others remain
+    remaining: int                 # claims left on the slot
+
+
+class HostOwnership:
+    """Index of record slot -> claiming Ingresses, keyed by Ingress identity."""
+
+    def __init__(self):
+        self._slots: Dict[Slot, Dict[str, _Claim]] = {}
+        self._owner_slot: Dict[str, Slot] = {}
+        self._contested = 0  # slots with more than one claim
+
+    def claim(self, key: str, ingress: dict) -> ClaimResult:
+        """Record that Ingress ``key`` wants the record described by ``ingress``."""
+        slot = ingress_slot(ingress)
+        moved_from = None
+        if self._owner_slot.get(key, slot) != slot:
+            moved_from = self.release(key)
+
+        claims = self._slots.setdefault(slot, {})
+        before = self._winner(claims)
+        known = key in claims
+        claims[key] = _Claim(key, claim_rank(ingress), ingress)
+        self._owner_slot[key] = slot
+        winner = self._winner(claims)
+
+        displaced = before.ingress if before is not None and before.key != key and winner.key == key else None
+        new_conflict = not known and len(claims) > 1
+        if new_conflict:
+            dns_host_conflicts_total.inc()
+            if len(claims) == 2:
+                self._set_contested(+1)
+        return ClaimResult(winner.key == key, winner.ingress, displaced, new_conflict, moved_from)
+
+    def release(self, key: str, ingress: Optional[dict] = None) -> ReleaseResult:
+        """Drop the claim of Ingress ``key``.
+
+        ``ingress``, if given, is its final state (e.g. from the DELETED
+        event) and is returned instead of the claimed one. An Ingress that
+        was never claimed (deleted before this process saw it) is looked up
+        by ``ingress``; it releases nothing, but the result still tells
+        whether others claim its slot.
+        """
+        slot = self._owner_slot.pop(key, None)
+        if slot is None:
+            slot = ingress_slot(ingress)
+            claims = self._slots.get(slot, {})
+            return ReleaseResult(slot, ingress, False, None, len(claims))
+
+        claims = self._slots[slot]
+        was_winner = self._winner(claims).key == key
+        released = claims.pop(key)
+        if len(claims) == 1:
+            self._set_contested(-1)
+        successor = None
+        if not claims:
+            del self._slots[slot]
+        elif was_winner:
+            successor = self._winner(claims).ingress
+        final = ingress if ingress is not None else released.ingress
+        return ReleaseResult(slot, final, was_winner, successor, len(claims))
+
+    def claimed(self, key: str) -> Optional[dict]:
+        """The object Ingress ``key`` last claimed with, or None if it holds no claim."""
+        slot = self._owner_slot.get(key)
+        return None if slot is None else self._slots[slot][key].ingress
+
+    def owners(self, slot: Slot) -> List[dict]:
+        """Claiming Ingresses of ``slot``, winner first."""
+        return [c.ingress for c in sorted(self._slots.get(slot, {}).values(), key=lambda c: (c.rank, c.key))]
+
+    def conflicts(self) -> Dict[str, List[str]]:
+        """Contested slots as ``host[/set-identifier]`` -> claimant names, winner first."""
+        return {
+            "/".join(filter(None, slot)): [ingress_name(i) for i in self.owners(slot)]
+            for slot, claims in self._slots.items() if len(claims) > 1
+        }
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @staticmethod
+    def _winner(claims: Dict[str, _Claim]) -> Optional[_Claim]:
+        return min(claims.values(), key=lambda c: (c.rank, c.key), default=None)
+
+    def _set_contested(self, delta: int) -> None:
+        self._contested += delta
+        dns_contested_hosts.set(self._contested)
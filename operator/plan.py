@@ -0,0 +1,257 @@
+"""Plan mode: compute the changes the operator would make to a zone, without writing.
+
+Desired records are derived from Ingress manifests (YAML or JSON files, or
+``-`` for stdin) or from a live LIST of the cluster, exactly as the operator
+derives them. Each configured back-end's zone is then read once, streamed
+page by page, and diffed against them. The output is the change plan, with
+counts and an estimate of the API calls needed to apply it.
+
+Run from the operator directory with the operator's environment
+(CLOUD_PROVIDER, provider settings, CUSTOM_IP, CUSTOM_TTL, ...):
+
+    python plan.py -f ingresses.yaml [-f more.json] [--format json]
+    python plan.py --live [--kubeconfig]
+
+Only creates and updates are planned: the operator deletes a record only
+when its Ingress is deleted, never because the zone holds extra records.
+Records with a routing policy are counted but not diffed, because zone
+reads do not distinguish their set identifiers; neither are alias records,
+whose zone form is provider specific. Extra records (TXT, SRV, CAA) are not
+planned.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import yaml
+
+from derivation import DesiredRecord, OperatorConfig, derive_record
+from ownership import claim_rank, ingress_slot
+from providers import create_provider
+from providers.base import DNSProvider, RecordType
+from reconcile import CREATE, UPDATE, Change, diff_zone, record_key
+from ttl_policy import TtlPolicy
+
+ZONE_PAGE_SIZE = 300
+LIST_PAGE_SIZE = 500
+
+
+# =============================================================================
+# INGRESS SOURCES
+# =============================================================================
+
+def _ingresses_in(document) -> Iterator[dict]:
+    if not isinstance(document, dict):
+        return
+    if document.get("kind", "").endswith("List") or ("items" in document and "spec" not in document):
+        for item in document.get("items") or []:
+            yield from _ingresses_in(item)
+    elif document.get("kind", "Ingress") == "Ingress":
+        yield document
+
+
+def load_manifests(paths: Iterable[str]) -> Iterator[dict]:
+    """Ingresses from YAML/JSON files, multi-document streams and List objects."""
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    for path in paths:
+        with (sys.stdin if path == "-" else open(path)) as f:
+            text = f.read()
+        if path.endswith(".json"):
+            yield from _ingresses_in(json.loads(text))
+            continue
+        for document in yaml.load_all(text, Loader=loader):  # nosec B506 - safe loader
+            yield from _ingresses_in(document)
+
+
+def list_ingresses(kubeconfig: bool = False) -> Iterator[dict]:
+    """Ingresses from the cluster, listed in pages and decoded as plain JSON (no model objects)."""
+    from kubernetes import client, config
+    if kubeconfig:
+        config.load_kube_config()
+    else:
+        config.load_incluster_config()
+    api = client.NetworkingV1Api()
+    token = None
+    while True:
+        kwargs = {"limit": LIST_PAGE_SIZE, "_preload_content": False}
+        if token:
+            kwargs["_continue"] = token
+        page = json.loads(api.list_ingress_for_all_namespaces(**kwargs).data)
+        yield from page.get("items") or []
+        token = (page.get("metadata") or {}).get("continue")
+        if not token:
+            return
+
+
+# =============================================================================
+# PLAN
+# =============================================================================
+
+@dataclass
+class DesiredState:
+    records: Dict[Tuple[str, str], DesiredRecord] = field(default_factory=dict)
+    ingresses: int = 0
+    skipped: Counter = field(default_factory=Counter)  # reason -> count
+
+
+def desired_state(ingresses: Iterable[dict], config: OperatorConfig) -> DesiredState:
+    """Derive desired records.
+
+    Of several Ingresses claiming the same host, only the one the operator
+    lets write it is derived: the oldest by creationTimestamp, ties broken
+    by namespace/name (see ownership.py).
+    """
+    state = DesiredState()
+    ttl_policy = TtlPolicy(config.ttl)  # annotation overrides only; adaptive TTLs need history
+    winners: Dict[Tuple[str, str], dict] = {}
+    for ingress in ingresses:
+        state.ingresses += 1
+        rules = (ingress.get("spec") or {}).get("rules") or []
+        if not rules or not rules[0].get("host"):
+            state.skipped["no host"] += 1
+            continue
+        slot = ingress_slot(ingress)
+        if slot in winners:
+            state.skipped["duplicate host"] += 1
+            if claim_rank(winners[slot]) <= claim_rank(ingress):
+                continue
+        winners[slot] = ingress
+
+    for ingress in winners.values():
+        try:
+            record = derive_record(ingress, config)
+        except ValueError:
+            state.skipped["no target yet or invalid annotations"] += 1
+            continue
+        if record.routing is not None:
+            state.skipped["routing policy (not diffed)"] += 1
+            continue
+        if record.record_type == RecordType.ALIAS:
+            state.skipped["alias (not diffed)"] += 1
+            continue
+        record = ttl_policy.apply(record, ingress["metadata"].get("annotations") or {})
+        state.records[record_key(record.domain, record.record_type.value)] = record
+    return state
+
+
+@dataclass
+class Plan:
+    provider: str
+    changes: List[Change]
+    zone_records: int
+    zone_pages: int
+    seconds: float
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        counts = Counter(change.action for change in self.changes)
+        return {action: counts.get(action, 0) for action in (CREATE, UPDATE)}
+
+    @property
+    def estimated_api_calls(self) -> Dict[str, int]:
+        # Zone read pages already spent computing the plan, plus one change call per
+        # write (the operator writes records one at a time)
+        return {"zone_read": self.zone_pages, "writes": len(self.changes)}
+
+    def to_dict(self) -> dict:
+        return {
+            "provider": self.provider,
+            "zone_records": self.zone_records,
+            "counts": self.counts,
+            "estimated_api_calls": self.estimated_api_calls,
+            "seconds": round(self.seconds, 3),
+            "changes": [
+                {
+                    "action": c.action,
+                    "name": c.name,
+                    "type": c.record_type,
+                    "value": c.desired.value,
+                    "ttl": c.desired.ttl,
+                    **({"current": list(c.current.values), "current_ttl": c.current.ttl} if c.current else {}),
+                }
+                for c in self.changes
+            ],
+        }
+
+
+async def plan_provider(provider: DNSProvider, desired: Iterable[DesiredRecord], page_size: int = ZONE_PAGE_SIZE):
+    """Diff one back-end's zone, read once and streamed, against the desired records."""
+    start = time.monotonic()
+    zone_records = 0
+
+    async def counted():
+        nonlocal zone_records
+        async for record in provider.iter_zone_records(page_size):
+            zone_records += 1
+            yield record
+
+    changes = [change async for change in diff_zone(desired, counted())]
+    return Plan(
+        provider.provider_name, changes, zone_records, max(1, math.ceil(zone_records / page_size)),
+        time.monotonic() - start,
+    )
+
+
+def format_text(state: DesiredState, plans: List[Plan]) -> str:
+    lines = [f"{state.ingresses} Ingresses -> {len(state.records)} desired records"]
+    for reason, count in sorted(state.skipped.items()):
+        lines.append(f"  skipped ({reason}): {count}")
+    for plan in plans:
+        lines.append("")
+        lines.append(f"[{plan.provider}] zone: {plan.zone_records} record sets read in {plan.seconds:.2f}s")
+        for change in plan.changes:
+            current = f" (was {','.join(change.current.values)} ttl {change.current.ttl})" if change.current else ""
+            lines.append(
+                f"  {change.action:6} {change.name} {change.record_type} -> {change.desired.value} "
+                f"ttl {change.desired.ttl}{current}"
+            )
+        counts, calls = plan.counts, plan.estimated_api_calls
+        lines.append(
+            f"  {counts[CREATE]} to create, {counts[UPDATE]} to update; estimated API calls: "
+            f"{calls['zone_read']} zone read pages + {calls['writes']} writes"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Show the DNS changes the operator would make, without writing.")
+    parser.add_argument("-f", "--filename", action="append", default=[], help="Ingress manifest file ('-' = stdin)")
+    parser.add_argument("--live", action="store_true", help="list Ingresses from the cluster")
+    parser.add_argument("--kubeconfig", action="store_true", help="with --live, use kubeconfig instead of in-cluster")
+    parser.add_argument("--format", choices=("text", "json"), default="text")
+    parser.add_argument("--page-size", type=int, default=ZONE_PAGE_SIZE, help="zone read page size")
+    args = parser.parse_args(argv)
+    if not args.filename and not args.live:
+        parser.error("give Ingress manifests with -f or use --live")
+
+    ingresses = list_ingresses(args.kubeconfig) if args.live else load_manifests(args.filename)
+    state = desired_state(ingresses, OperatorConfig.from_env())
+
+    names = [n.strip().lower() for n in os.environ.get("CLOUD_PROVIDER", "azure").split(",") if n.strip()]
+    plans = [
+        asyncio.run(plan_provider(create_provider(name), state.records.values(), args.page_size))
+        for name in names or ["azure"]
+    ]
+
+    if args.format == "json":
+        print(json.dumps({
+            "ingresses": state.ingresses,
+            "desired_records": len(state.records),
+            "skipped": dict(state.skipped),
+            "plans": [plan.to_dict() for plan in plans],
+        }, indent=2))
+    else:
+        print(format_text(state, plans))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
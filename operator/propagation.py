@@ -0,0 +1,269 @@
+"""Propagation checks against authoritative nameservers.
+
+A successful provider API call only means the change was accepted. When
+PROPAGATION_NAMESERVERS is set, every written record is watched: the
+configured servers (normally the zone's authoritative nameservers, but
+any address works, e.g. a local stub in tests) are polled until all of
+them serve the new value. The time from write to full propagation is
+recorded, and writes that have not taken effect within the deadline are
+handed back for repair.
+
+Queries use a minimal DNS-over-UDP client (A and CNAME only, no
+recursion), so no resolver library is needed.
+"""
+
+import asyncio
+import logging
+import random
+import socket
+import struct
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from derivation import DesiredRecord
+from providers.base import RecordType
+
+logger = logging.getLogger(__name__)
+
+QTYPES = {RecordType.A: 1, RecordType.CNAME: 5}
+CLASS_IN = 1
+RCODE_NXDOMAIN = 3
+
+dns_propagation_seconds = Histogram(
+    'dns_operator_propagation_seconds',
+    'Time from a successful provider write until every probed nameserver serves the new value',
+    buckets=[1, 2.5, 5, 10, 20, 30, 60, 120, 300],
+)
+
+dns_propagation_checks_total = Counter(
+    'dns_operator_propagation_checks_total',
+    'Propagation checks by result (propagated, timeout, superseded)',
+    ['result']
+)
+
+
+class Answer(NamedTuple):
+    ttl: int
+    value: str
+
+
+# =============================================================================
+# WIRE FORMAT
+# =============================================================================
+
+def encode_name(name: str) -> bytes:
+    labels = [label for label in name.rstrip(".").split(".") if label]
+    return b"".join(bytes([len(label)]) + label.encode("ascii") for label in labels) + b"\x00"
+
+
+def encode_query(query_id: int, name: str, qtype: int) -> bytes:
+    # Flags 0: standard query, recursion not desired (authoritative servers answer from their zone)
+    return struct.pack("!HHHHHH", query_id, 0, 1, 0, 0, 0) + encode_name(name) + struct.pack("!HH", qtype, CLASS_IN)
+
+
+def _read_name(message: bytes, offset: int) -> Tuple[str, int]:
+    """Decode a possibly compressed name; return it and the offset just past it."""
+    labels, end, jumps = [], None, 0
+    while True:
+        length = message[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | message[offset + 1]
+            jumps += 1
+            if jumps > 32:
+                raise ValueError("DNS name compression loop")
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(message[offset:offset + length].decode("ascii"))
+        offset += length
+    return ".".join(labels), end if end is not None else offset
+
+
+def decode_response(message: bytes, qtype: int) -> Tuple[int, int, List[Answer]]:
+    """Return (query ID, rcode, answers of ``qtype``) from a response message."""
+    query_id, flags, qdcount, ancount, _, _ = struct.unpack_from("!HHHHHH", message)
+    offset = 12
+    for _ in range(qdcount):
+        _, offset = _read_name(message, offset)
+        offset += 4
+    answers = []
+    for _ in range(ancount):
+        _, offset = _read_name(message, offset)
+        rtype, _, ttl, rdlength = struct.unpack_from("!HHIH", message, offset)
+        offset += 10
+        if rtype == qtype == QTYPES[RecordType.A] and rdlength == 4:
+            answers.append(Answer(ttl, socket.inet_ntoa(message[offset:offset + 4])))
+        elif rtype == qtype == QTYPES[RecordType.CNAME]:
+            answers.append(Answer(ttl, _read_name(message, offset)[0]))
+        offset += rdlength
+    return query_id, flags & 0x000F, answers
+
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, query_id: int):
+        self.query_id = query_id
+        self.response: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data, addr):
+        if len(data) >= 2 and struct.unpack_from("!H", data)[0] == self.query_id and not self.response.done():
+            self.response.set_result(data)
+
+    def error_received(self, exc):
+        if not self.response.done():
+            self.response.set_exception(exc)
+
+
+def parse_server(address: str) -> Tuple[str, int]:
+    """``host`` or ``host:port`` (IPv6 addresses without a port) to a socket address."""
+    address = address.strip()
+    if address.count(":") == 1:
+        host, port = address.split(":")
+        return host, int(port)
+    return address, 53
+
+
+async def query(server: Tuple[str, int], name: str, record_type: RecordType, timeout: float = 2.0) -> List[Answer]:
+    """Ask ``server`` for the ``record_type`` records of ``name``; NXDOMAIN yields no answers."""
+    qtype = QTYPES[record_type]
+    query_id = random.getrandbits(16)  # nosec B311 - matching responses, not security
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(lambda: _QueryProtocol(query_id), remote_addr=server)
+    try:
+        transport.sendto(encode_query(query_id, name, qtype))
+        message = await asyncio.wait_for(protocol.response, timeout)
+    finally:
+        transport.close()
+    _, rcode, answers = decode_response(message, qtype)
+    if rcode not in (0, RCODE_NXDOMAIN):
+        raise RuntimeError(f"DNS server {server[0]}:{server[1]} returned rcode {rcode} for {name}")
+    return answers
+
+
+# =============================================================================
+# CHECKER
+# =============================================================================
+
+def _serves(answers: Sequence[Answer], record: DesiredRecord) -> bool:
+    value = record.value.rstrip(".").lower()
+    return any(a.value.rstrip(".").lower() == value for a in answers)
+
+
+class PropagationChecker:
+    """Watch written records until every nameserver serves them.
+
+    ``repair`` is called with a record that did not propagate within
+    ``deadline`` seconds; each host is repaired at most ``max_repairs`` times
+    in a row. Queries across all watches are bounded by ``concurrency``.
+    Records with a routing policy are not checked, since the answer depends
+    on who is asking.
+    """
+
+    def __init__(
+        self,
+        servers: Sequence[Tuple[str, int]],
+        repair: Callable[[DesiredRecord], Awaitable[None]],
+        timeout: float = 2.0,
+        interval: float = 5.0,
+        deadline: float = 120.0,
+        concurrency: int = 8,
+        max_repairs: int = 3,
+    ):
+        self.servers = list(servers)
+        self.repair = repair
+        self.timeout = timeout
+        self.interval = interval
+        self.deadline = deadline
+        self.max_repairs = max_repairs
+        self._slots = asyncio.Semaphore(concurrency)
+        self._watches: Dict[str, asyncio.Task] = {}
+        self._repairs: Dict[str, int] = {}
+
+    async def serves(self, record: DesiredRecord) -> bool:
+        """True if every nameserver already answers exactly ``record`` (value and TTL).
+
+        Records with extras are never skipped, since only the primary record is queried.
+        """
+        if record.routing is not None or record.extras or record.record_type not in QTYPES:
+            return False
+        for answers in await self._ask_all(record):
+            if not isinstance(answers, list) or [(a.value.rstrip(".").lower(), a.ttl) for a in answers] != [
+                (record.value.rstrip(".").lower(), record.ttl)
+            ]:
+                return False
+        return True
+
+    def watch(self, record: DesiredRecord) -> None:
+        """Start checking ``record``, replacing any earlier watch of the same host."""
+        if record.routing is not None or record.record_type not in QTYPES:
+            return
+        self.cancel(record.domain)
+        task = asyncio.create_task(self._watch(record))
+        self._watches[record.domain] = task
+        task.add_done_callback(lambda t, domain=record.domain: self._finished(domain, t))
+
+    def cancel(self, domain: str) -> None:
+        task = self._watches.pop(domain, None)
+        if task is not None and not task.done():
+            task.cancel()
+            dns_propagation_checks_total.labels(result="superseded").inc()
+
+    def pending(self) -> int:
+        return len(self._watches)
+
+    def _finished(self, domain: str, task: asyncio.Task) -> None:
+        if self._watches.get(domain) is task:
+            del self._watches[domain]
+
+    async def _watch(self, record: DesiredRecord) -> None:
+        start = time.monotonic()
+        remaining = set(self.servers)
+        while True:
+            pending = sorted(remaining)
+            for server, answers in zip(pending, await self._ask_all(record, pending)):
+                if isinstance(answers, list) and _serves(answers, record):
+                    remaining.discard(server)
+                elif isinstance(answers, Exception):
+                    logger.debug("Propagation query for %s to %s failed: %s", record.domain, server, answers)
+            elapsed = time.monotonic() - start
+            if not remaining:
+                dns_propagation_seconds.observe(elapsed)
+                dns_propagation_checks_total.labels(result="propagated").inc()
+                self._repairs.pop(record.domain, None)
+                logger.debug("%s propagated to all nameservers in %.1fs", record.domain, elapsed)
+                return
+            if elapsed + self.interval > self.deadline:
+                break
+            await asyncio.sleep(self.interval)
+
+        dns_propagation_checks_total.labels(result="timeout").inc()
+        attempts = self._repairs.get(record.domain, 0)
+        if attempts >= self.max_repairs:
+            logger.error(
+                "%s still not served by %s after %d repairs; giving up",
+                record.domain, ", ".join(f"{h}:{p}" for h, p in sorted(remaining)), attempts,
+                extra={"host": record.domain},
+            )
+            self._repairs.pop(record.domain, None)
+            return
+        self._repairs[record.domain] = attempts + 1
+        # The repair write starts a new watch of this host; it must not cancel this task
+        self._watches.pop(record.domain, None)
+        logger.warning(
+            "%s not served by %s after %.0fs; re-writing",
+            record.domain, ", ".join(f"{h}:{p}" for h, p in sorted(remaining)), self.deadline,
+            extra={"host": record.domain},
+        )
+        await self.repair(record)
+
+    async def _ask_all(self, record: DesiredRecord, servers: Optional[Sequence[Tuple[str, int]]] = None):
+        async def ask(server):
+            async with self._slots:
+                return await query(server, record.domain, record.record_type, self.timeout)
+
+        servers = self.servers if servers is None else servers
+        return await asyncio.gather(*(ask(s) for s in servers), return_exceptions=True)
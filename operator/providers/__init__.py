@@ -4,5 +4,20 @@ from providers.base import DNSProvider
 from providers.azure import AzureDNSProvider
 from providers.gcp import GCPDNSProvider
 from providers.aws import AWSDNSProvider
+from providers.fake import FakeDNSProvider
 
-__all__ = ["DNSProvider", "AzureDNSProvider", "GCPDNSProvider", "AWSDNSProvider"]
+__all__ = ["DNSProvider", "AzureDNSProvider", "GCPDNSProvider", "AWSDNSProvider", "FakeDNSProvider", "create_provider"]
+
+
+def create_provider(provider_name: str) -> DNSProvider:
+    """Create one concrete provider by name (azure, gcp, aws or fake) from its environment."""
+    if provider_name == "azure":
+        return AzureDNSProvider()
+    elif provider_name == "gcp":
+        return GCPDNSProvider()
+    elif provider_name == "aws":
+        return AWSDNSProvider()
+    elif provider_name == "fake":
+        return FakeDNSProvider()
+    else:
+        raise ValueError(f"Unsupported cloud provider: {provider_name}. Use 'azure', 'gcp', or 'aws'.")
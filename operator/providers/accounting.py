@@ -0,0 +1,83 @@
+"""Accounting of cloud DNS API calls and an optional calls-per-minute budget."""
+
+import asyncio
+import threading
+import time
+from collections import deque
+
+from prometheus_client import Counter
+
+# Call kinds used as the ``kind`` label
+LIST_PAGE = "list_page"
+GET = "get"
+CHANGE = "change"
+RETRY = "retry"
+
+provider_api_calls_total = Counter(
+    'dns_operator_provider_api_calls_total',
+    'Cloud DNS API calls made by the operator',
+    ['provider', 'kind']
+)
+
+
+class SlidingWindowCounter:
+    """Count events over the trailing ``window`` seconds using one-second buckets.
+
+    Thread-safe, since provider SDK calls are accounted from executor threads.
+    """
+
+    def __init__(self, window: int = 60):
+        self._window = window
+        self._buckets = deque()  # [second, count] pairs, oldest first
+        self._lock = threading.Lock()
+
+    def add(self, count: int = 1) -> None:
+        second = int(time.monotonic())
+        with self._lock:
+            if self._buckets and self._buckets[-1][0] == second:
+                self._buckets[-1][1] += count
+            else:
+                self._buckets.append([second, count])
+            self._expire(second)
+
+    def total(self) -> int:
+        with self._lock:
+            self._expire(int(time.monotonic()))
+            return sum(count for _, count in self._buckets)
+
+    def _expire(self, now: int) -> None:
+        while self._buckets and self._buckets[0][0] <= now - self._window:
+            self._buckets.popleft()
+
+
+calls_last_minute = SlidingWindowCounter(60)
+
+
+def record_api_call(provider: str, kind: str, count: int = 1) -> None:
+    """Account ``count`` API calls of ``kind`` made by ``provider``."""
+    if count <= 0:
+        return
+    provider_api_calls_total.labels(provider=provider, kind=kind).inc(count)
+    calls_last_minute.add(count)
+
+
+class ApiCallBudget:
+    """Hard limit on API calls per minute across all providers (0 = unlimited).
+
+    The budget does not block calls itself; callers ask ``exceeded()`` or
+    wait for capacity before starting work that can be deferred.
+    """
+
+    def __init__(self, calls_per_minute: int, window: SlidingWindowCounter = calls_last_minute):
+        self.calls_per_minute = calls_per_minute
+        self._window = window
+
+    def used(self) -> int:
+        return self._window.total()
+
+    def exceeded(self) -> bool:
+        return self.calls_per_minute > 0 and self.used() >= self.calls_per_minute
+
+    async def wait_for_capacity(self, poll_interval: float = 1.0) -> None:
+        while self.exceeded():
+            await asyncio.sleep(poll_interval)
@@ -0,0 +1,212 @@
+"""Cross-cluster aggregation of spoke targets into one record set.
+
+Without aggregation, spokes that claim the same host overwrite each
+other's targets and the last UPSERT wins. In aggregation mode each spoke
+publishes its targets under an owner ID, and the record set holds the
+union of every owner's targets:
+
+* the owner table is stored next to the record set (a companion TXT record
+  on Route53 and Cloud DNS, record set metadata on Azure) and is always
+  written in the same atomic, conditional change as the record set.
+  Cloud DNS routing-policy writes reuse it to record each spoke's WRR item
+  under its set identifier;
+* updates are read-modify-write; if another spoke changed the set between
+  the read and the write, the provider raises ConcurrentChangeError and the
+  update is retried on a fresh read;
+* owners remove their own entry when their Ingress goes away. Optionally,
+  entries whose timestamp is older than ``stale_after`` seconds are pruned
+  by any writer, so a spoke that disappeared without cleaning up drops out.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from providers.base import DNSProvider, ExtraRecord, RecordType, RoutingPolicy, record_options
+
+logger = logging.getLogger(__name__)
+
+# Companion TXT record holding the owner table: _hdo-owners.<host>
+OWNER_RECORD_PREFIX = "_hdo-owners."
+
+# Read-modify-write attempts before giving up on concurrent edits
+CONFLICT_RETRIES = 5
+
+
+class ConcurrentChangeError(Exception):
+    """The record set changed between read and conditional write."""
+
+
+@dataclass(frozen=True)
+class OwnerEntry:
+    values: Tuple[str, ...]
+    updated: int  # unix time of the owner's last write
+    weight: Optional[float] = None  # set for a spoke's WRR routing item on Cloud DNS, keyed by set identifier
+
+    def encode(self) -> str:
+        text = f"values={','.join(self.values)};ts={self.updated}"
+        return text if self.weight is None else f"{text};weight={self.weight:g}"
+
+    @classmethod
+    def decode(cls, text: str) -> "OwnerEntry":
+        fields = dict(part.split("=", 1) for part in text.split(";") if "=" in part)
+        values = tuple(v for v in fields.get("values", "").split(",") if v)
+        weight = float(fields["weight"]) if fields.get("weight") else None
+        return cls(values, int(fields.get("ts", 0) or 0), weight)
+
+
+@dataclass
+class AggregateState:
+    """An aggregated record set as read from the provider."""
+    ttl: int
+    owners: Dict[str, OwnerEntry] = field(default_factory=dict)
+    version: Any = None  # provider-specific handle the conditional write checks against
+
+
+def encode_owner_txt(owner_id: str, entry: OwnerEntry) -> str:
+    return f"owner={owner_id};{entry.encode()}"
+
+
+def decode_owner_txt(text: str) -> Tuple[str, OwnerEntry]:
+    text = text.strip('"')
+    owner, _, rest = text.partition(";")
+    return owner.split("=", 1)[-1], OwnerEntry.decode(rest)
+
+
+def union(owners: Dict[str, OwnerEntry]) -> List[str]:
+    """Merged, de-duplicated targets of all owners in a stable order."""
+    return sorted({v for entry in owners.values() for v in entry.values})
+
+
+def merge_owners(
+    owners: Dict[str, OwnerEntry],
+    owner_id: str,
+    values: Optional[Tuple[str, ...]],
+    now: int,
+    stale_after: float = 0,
+) -> Dict[str, OwnerEntry]:
+    """Return the owner table with ``owner_id`` set to ``values`` (None removes it) and stale owners pruned."""
+    merged = {
+        owner: entry for owner, entry in owners.items()
+        if owner != owner_id and not (stale_after > 0 and now - entry.updated > stale_after)
+    }
+    if values:
+        merged[owner_id] = OwnerEntry(tuple(values), now)
+    return merged
+
+
+class AggregatingDNSProvider(DNSProvider):
+    """Maintain record sets as the union of every spoke's targets.
+
+    Wraps one concrete provider, which supplies the blocking primitives
+    ``_read_aggregate`` and ``_write_aggregate``. Only A records can hold
+    several targets; CNAMEs and records with an explicit routing policy are
+    passed straight to the wrapped provider.
+    """
+
+    def __init__(self, provider: DNSProvider, owner_id: str, stale_after: float = 0):
+        if not owner_id:
+            raise ValueError("AggregatingDNSProvider requires an owner ID")
+        self._provider = provider
+        self.owner_id = owner_id
+        self.stale_after = stale_after
+        # (record_name, record_type) -> (ttl, values) this spoke currently publishes
+        self._published: Dict[Tuple[str, RecordType], Tuple[int, Tuple[str, ...]]] = {}
+
+    @property
+    def provider_name(self) -> str:
+        return self._provider.provider_name
+
+    def is_retryable_error(self, error: BaseException) -> bool:
+        return isinstance(error, ConcurrentChangeError) or self._provider.is_retryable_error(error)
+
+    def error_class(self, error: BaseException) -> str:
+        return "conflict" if isinstance(error, ConcurrentChangeError) else self._provider.error_class(error)
+
+    async def create_or_update_record(
+        self,
+        record_name: str,
+        value: str,
+        record_type: RecordType = RecordType.A,
+        ttl: int = 300,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
+    ) -> None:
+        if routing is not None or record_type != RecordType.A:
+            extra = record_options(routing, extras)
+            await self._provider.create_or_update_record(record_name, value, record_type, ttl, **extra)
+            return
+        await self._update(record_name, record_type, ttl, (value,))
+        if extras:
+            await self._provider.write_extra_records(extras, ttl)
+
+    async def delete_record(
+        self,
+        record_name: str,
+        record_type: RecordType = RecordType.A,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
+    ) -> None:
+        if routing is not None or record_type != RecordType.A:
+            extra = record_options(routing, extras)
+            await self._provider.delete_record(record_name, record_type, **extra)
+            return
+        remaining = await self._update(record_name, record_type, None, None)
+        # Extras are shared by all spokes; only the last one out removes them
+        if extras and not remaining:
+            await self._provider.write_extra_records(extras, delete=True)
+
+    async def refresh(self) -> None:
+        """Re-publish every owned entry whose timestamp is getting old.
+
+        Run periodically when ``stale_after`` is set, so live spokes are
+        never pruned as stale by their peers.
+        """
+        for (record_name, record_type), (ttl, values) in list(self._published.items()):
+            try:
+                await asyncio.to_thread(self._read_modify_write, record_name, record_type, ttl, values)
+            except Exception as e:
+                logger.error("[%s] Error refreshing aggregated record %s: %s", self.provider_name, record_name, e)
+
+    async def _update(self, record_name, record_type, ttl, values) -> int:
+        remaining = await asyncio.to_thread(self._read_modify_write, record_name, record_type, ttl, values)
+        if values:
+            self._published[(record_name, record_type)] = (ttl, values)
+        else:
+            self._published.pop((record_name, record_type), None)
+        logger.info(
+            "[%s] Aggregated record %s %s for owner %s",
+            self.provider_name, record_name, "updated" if values else "released", self.owner_id,
+        )
+        return remaining
+
+    def _read_modify_write(self, record_name, record_type, ttl, values) -> int:
+        """Merge this spoke's values into the record set; return the number of owners left."""
+        last_error = None
+        for _ in range(CONFLICT_RETRIES):
+            current = self._provider._read_aggregate(record_name, record_type)
+            now = int(time.time())
+            owners = merge_owners(current.owners if current else {}, self.owner_id, values, now, self.stale_after)
+            new_ttl = ttl if ttl is not None else (current.ttl if current else 300)
+            if current is None and not owners:
+                return 0
+            if current is not None and not self._needs_write(current, owners, new_ttl, now):
+                return len(owners)
+            try:
+                self._provider._write_aggregate(record_name, record_type, new_ttl, owners, current)
+                return len(owners)
+            except ConcurrentChangeError as e:
+                logger.info("[%s] Concurrent change to %s, retrying", self.provider_name, record_name)
+                last_error = e
+        raise last_error
+
+    def _needs_write(self, current: AggregateState, owners, ttl, now) -> bool:
+        if current.ttl != ttl or set(current.owners) != set(owners):
+            return True
+        if any(current.owners[o].values != owners[o].values for o in owners):
+            return True
+        # Refresh our own timestamp well before other spokes would consider it stale
+        own = current.owners.get(self.owner_id)
+        return self.stale_after > 0 and own is not None and now - own.updated > self.stale_after / 3
@@ -3,13 +3,34 @@
 import asyncio
 import os
 import logging
+from typing import Optional, Sequence
+
 import boto3
-from botocore.exceptions import ClientError
+from botocore.exceptions import (
+    BotoCoreError, ClientError, ConnectTimeoutError, NoCredentialsError, PartialCredentialsError, ReadTimeoutError,
+)
 
-from providers.base import DNSProvider, RecordType
+from providers.accounting import CHANGE, LIST_PAGE, RETRY
+from providers.aggregation import (
+    OWNER_RECORD_PREFIX, AggregateState, ConcurrentChangeError, decode_owner_txt, encode_owner_txt, union,
+)
+from providers.base import (
+    DNSProvider, ExtraRecord, RecordType, RoutingPolicy, ZoneRecord, http_status_class, quote_txt,
+)
 
 logger = logging.getLogger(__name__)
 
+# Route53 error codes worth retrying (throttling, a batch still in progress, service faults)
+RETRYABLE_ERROR_CODES = frozenset({
+    "Throttling", "ThrottlingException", "PriorRequestNotComplete", "ServiceUnavailable", "InternalError",
+    "RequestTimeout",
+})
+THROTTLING_ERROR_CODES = frozenset({"Throttling", "ThrottlingException", "PriorRequestNotComplete"})
+
+# InvalidChangeBatch messages meaning a DELETE or CREATE no longer matches the
+# zone, i.e. someone else changed the sets since they were read
+STALE_CHANGE_MESSAGES = ("but it was not found", "values provided do not match the current values", "already exists")
+
 
 class AWSDNSProvider(DNSProvider):
     """AWS Route53 DNS provider."""
@@ -24,72 +45,266 @@ class AWSDNSProvider(DNSProvider):
     def provider_name(self) -> str:
         return "aws"
 
+    def is_retryable_error(self, error: BaseException) -> bool:
+        if isinstance(error, ClientError):
+            status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+            return error.response.get("Error", {}).get("Code") in RETRYABLE_ERROR_CODES or status >= 500
+        if isinstance(error, (NoCredentialsError, PartialCredentialsError)):
+            return False
+        if isinstance(error, BotoCoreError):
+            return True  # endpoint connection errors and timeouts
+        return super().is_retryable_error(error)
+
+    def error_class(self, error: BaseException) -> str:
+        if isinstance(error, ClientError):
+            code = error.response.get("Error", {}).get("Code")
+            if code in THROTTLING_ERROR_CODES:
+                return "throttled"
+            if code == "RequestTimeout":
+                return "timeout"
+            status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+            return http_status_class(status) if status else "other"
+        if isinstance(error, (NoCredentialsError, PartialCredentialsError)):
+            return "auth"
+        if isinstance(error, (ConnectTimeoutError, ReadTimeoutError)):
+            return "timeout"
+        if isinstance(error, BotoCoreError):
+            return "connection"
+        return super().error_class(error)
+
     async def create_or_update_record(
-        self, record_name: str, value: str, record_type: RecordType = RecordType.A, ttl: int = 300
+        self,
+        record_name: str,
+        value: str,
+        record_type: RecordType = RecordType.A,
+        ttl: int = 300,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
     ) -> None:
         name = self.extract_record_name(record_name, self._dns_zone)
-        fqdn = f"{name}.{self._dns_zone}."
+        fqdn = self._fqdn(record_name)
         record_type_str = record_type.value
 
         def _upsert():
-            self._client.change_resource_record_sets(
-                HostedZoneId=self._hosted_zone_id,
-                ChangeBatch={
-                    "Changes": [
-                        {
-                            "Action": "UPSERT",
-                            "ResourceRecordSet": {
-                                "Name": fqdn,
-                                "Type": record_type_str,
-                                "TTL": ttl,
-                                "ResourceRecords": [{"Value": value}],
-                            },
-                        }
-                    ]
-                },
-            )
+            record_sets = [self._record_set(fqdn, record_type, ttl, value, routing)]
+            record_sets += [self._extra_record_set(e, ttl) for e in extras]
+            changes = [{"Action": "UPSERT", "ResourceRecordSet": r} for r in record_sets]
+            self._change(HostedZoneId=self._hosted_zone_id, ChangeBatch={"Changes": changes})
 
         try:
             await asyncio.to_thread(_upsert)
-            logger.info(f"[AWS] DNS record upserted: {name} -> {value} ({record_type_str})")
+            logger.info("[AWS] DNS record upserted: %s -> %s (%s)", name, value, record_type_str)
         except ClientError as e:
-            logger.error(f"[AWS] Error upserting DNS record {name}: {e}")
+            logger.error("[AWS] Error upserting DNS record %s: %s", name, e)
             raise
 
-    async def delete_record(self, record_name: str, record_type: RecordType = RecordType.A) -> None:
+    async def delete_record(
+        self,
+        record_name: str,
+        record_type: RecordType = RecordType.A,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
+    ) -> None:
         name = self.extract_record_name(record_name, self._dns_zone)
-        fqdn = f"{name}.{self._dns_zone}."
-        record_type_str = record_type.value
+        fqdn = self._fqdn(record_name)
+        record_type_str = record_type.zone_type
+        set_identifier = routing.set_identifier if routing else None
 
         def _delete():
-            response = self._client.list_resource_record_sets(
+            query = {"StartRecordName": fqdn, "StartRecordType": record_type_str, "MaxItems": "1"}
+            if set_identifier:
+                query["StartRecordIdentifier"] = set_identifier
+            response = self._call(
+                LIST_PAGE,
+                self._client.list_resource_record_sets,
                 HostedZoneId=self._hosted_zone_id,
-                StartRecordName=fqdn,
-                StartRecordType=record_type_str,
-                MaxItems="1",
+                **query,
             )
             record_sets = response.get("ResourceRecordSets", [])
-            matching = [r for r in record_sets if r["Name"] == fqdn and r["Type"] == record_type_str]
+            matching = [
+                r for r in record_sets
+                if r["Name"] == fqdn and r["Type"] == record_type_str and r.get("SetIdentifier") == set_identifier
+            ]
 
             if not matching:
-                logger.warning(f"[AWS] DNS record not found for deletion: {name}")
+                logger.warning("[AWS] DNS record not found for deletion: %s", name)
+            # DELETE must match each record set exactly, so the extras are read first
+            changes = [{"Action": "DELETE", "ResourceRecordSet": r} for r in matching[:1] + self._find_extras(extras)]
+            if not changes:
                 return
 
-            self._client.change_resource_record_sets(
-                HostedZoneId=self._hosted_zone_id,
-                ChangeBatch={
-                    "Changes": [
-                        {
-                            "Action": "DELETE",
-                            "ResourceRecordSet": matching[0],
-                        }
-                    ]
-                },
-            )
-            logger.info(f"[AWS] DNS record deleted: {name}")
+            self._change(HostedZoneId=self._hosted_zone_id, ChangeBatch={"Changes": changes})
+            logger.info("[AWS] DNS record deleted: %s", name)
 
         try:
             await asyncio.to_thread(_delete)
         except ClientError as e:
-            logger.error(f"[AWS] Error deleting DNS record {name}: {e}")
+            logger.error("[AWS] Error deleting DNS record %s: %s", name, e)
+            raise
+
+    async def write_extra_records(self, extras: Sequence[ExtraRecord], ttl: int = 300, delete: bool = False) -> None:
+        def _write():
+            if delete:
+                changes = [{"Action": "DELETE", "ResourceRecordSet": r} for r in self._find_extras(extras)]
+            else:
+                changes = [{"Action": "UPSERT", "ResourceRecordSet": self._extra_record_set(e, ttl)} for e in extras]
+            if changes:
+                self._change(HostedZoneId=self._hosted_zone_id, ChangeBatch={"Changes": changes})
+
+        await asyncio.to_thread(_write)
+
+    # Route53 GeoLocation keys for the geo routing annotation
+    _GEO_KEYS = {"continent": "ContinentCode", "country": "CountryCode", "subdivision": "SubdivisionCode"}
+
+    def _fqdn(self, record_name):
+        if record_name == self._dns_zone:  # zone apex
+            return f"{record_name}."
+        return f"{self.extract_record_name(record_name, self._dns_zone)}.{self._dns_zone}."
+
+    def _record_set(self, fqdn, record_type, ttl, value, routing=None):
+        """Build a ResourceRecordSet, adding SetIdentifier and routing fields when a policy is given.
+
+        An ALIAS value is ``[hosted-zone-id/]dns-name``; without a hosted zone
+        ID it aliases a record in this zone.
+        """
+        if record_type == RecordType.ALIAS:
+            zone_id, _, dns_name = value.rpartition("/")
+            record_set = {
+                "Name": fqdn,
+                "Type": "A",
+                "AliasTarget": {
+                    "HostedZoneId": zone_id or self._hosted_zone_id,
+                    "DNSName": dns_name,
+                    "EvaluateTargetHealth": False,
+                },
+            }
+        else:
+            record_set = {
+                "Name": fqdn,
+                "Type": record_type.value,
+                "TTL": ttl,
+                "ResourceRecords": [{"Value": value}],
+            }
+        if routing is None:
+            return record_set
+        record_set["SetIdentifier"] = routing.set_identifier
+        if routing.weight is not None:
+            record_set["Weight"] = routing.weight
+        elif routing.region is not None:
+            record_set["Region"] = routing.region
+        else:
+            record_set["GeoLocation"] = {self._GEO_KEYS[key]: code for key, code in routing.geo}
+        if routing.health_check_id:
+            record_set["HealthCheckId"] = routing.health_check_id
+        return record_set
+
+    def _extra_record_set(self, extra, ttl):
+        values = [quote_txt(v) for v in extra.values] if extra.record_type == RecordType.TXT else extra.values
+        return {
+            "Name": self._fqdn(extra.name),
+            "Type": extra.record_type.value,
+            "TTL": ttl,
+            "ResourceRecords": [{"Value": v} for v in values],
+        }
+
+    def _find_extras(self, extras):
+        found = (self._get_simple_record_set(self._fqdn(e.name), e.record_type.value) for e in extras)
+        return [r for r in found if r is not None]
+
+    # -- aggregation (see providers.aggregation) -------------------------------
+
+    def _read_aggregate(self, record_name, record_type):
+        fqdn = self._fqdn(record_name)
+        record_set = self._get_simple_record_set(fqdn, record_type.value)
+        owner_set = self._get_simple_record_set(OWNER_RECORD_PREFIX + fqdn, "TXT")
+        if record_set is None and owner_set is None:
+            return None
+        owners = dict(decode_owner_txt(r["Value"]) for r in (owner_set or {}).get("ResourceRecords", []))
+        return AggregateState((record_set or owner_set).get("TTL", 300), owners, (record_set, owner_set))
+
+    def _write_aggregate(self, record_name, record_type, ttl, owners, previous):
+        # DELETE must match the sets exactly as read and CREATE fails if a set
+        # appeared meanwhile, so a concurrent edit rejects the whole batch.
+        fqdn = self._fqdn(record_name)
+        changes = [
+            {"Action": "DELETE", "ResourceRecordSet": old}
+            for old in (previous.version if previous else ()) if old is not None
+        ]
+        if owners:
+            changes.append({"Action": "CREATE", "ResourceRecordSet": {
+                "Name": fqdn,
+                "Type": record_type.value,
+                "TTL": ttl,
+                "ResourceRecords": [{"Value": v} for v in union(owners)],
+            }})
+            changes.append({"Action": "CREATE", "ResourceRecordSet": {
+                "Name": OWNER_RECORD_PREFIX + fqdn,
+                "Type": "TXT",
+                "TTL": ttl,
+                "ResourceRecords": [{"Value": f'"{encode_owner_txt(o, e)}"'} for o, e in sorted(owners.items())],
+            }})
+        try:
+            self._change(HostedZoneId=self._hosted_zone_id, ChangeBatch={"Changes": changes})
+        except ClientError as e:
+            error = e.response.get("Error", {})
+            code, message = error.get("Code"), error.get("Message") or ""
+            if code == "PriorRequestNotComplete" or (
+                code == "InvalidChangeBatch" and any(m in message for m in STALE_CHANGE_MESSAGES)
+            ):
+                raise ConcurrentChangeError(str(e)) from e
             raise
+
+    def _get_simple_record_set(self, fqdn, record_type):
+        response = self._call(
+            LIST_PAGE,
+            self._client.list_resource_record_sets,
+            HostedZoneId=self._hosted_zone_id,
+            StartRecordName=fqdn,
+            StartRecordType=record_type,
+            MaxItems="1",
+        )
+        for record_set in response.get("ResourceRecordSets", []):
+            if record_set["Name"] == fqdn and record_set["Type"] == record_type and "SetIdentifier" not in record_set:
+                return record_set
+        return None
+
+    def _zone_pages(self, page_size):
+        kwargs = {"HostedZoneId": self._hosted_zone_id, "MaxItems": str(min(page_size, 300))}
+        while True:
+            response = self._call(LIST_PAGE, self._client.list_resource_record_sets, **kwargs)
+            yield [self._to_zone_record(rs) for rs in response.get("ResourceRecordSets", [])]
+            if not response.get("IsTruncated"):
+                return
+            kwargs["StartRecordName"] = response["NextRecordName"]
+            kwargs["StartRecordType"] = response["NextRecordType"]
+            if "NextRecordIdentifier" in response:
+                kwargs["StartRecordIdentifier"] = response["NextRecordIdentifier"]
+            else:
+                kwargs.pop("StartRecordIdentifier", None)
+
+    @staticmethod
+    def _to_zone_record(record_set) -> ZoneRecord:
+        if "AliasTarget" in record_set:
+            values = (record_set["AliasTarget"]["DNSName"],)
+        else:
+            values = tuple(r["Value"] for r in record_set.get("ResourceRecords", []))
+        return ZoneRecord(record_set["Name"].rstrip("."), record_set["Type"], record_set.get("TTL", 0), values)
+
+    def _change(self, **kwargs):
+        return self._call(CHANGE, self._client.change_resource_record_sets, **kwargs)
+
+    def _call(self, kind, method, **kwargs):
+        """Invoke a Route53 API method, accounting the call and botocore's retries."""
+        self.account_api_call(kind)
+        try:
+            response = method(**kwargs)
+        except ClientError as e:
+            self.account_api_call(RETRY, self._retry_attempts(e.response))
+            raise
+        self.account_api_call(RETRY, self._retry_attempts(response))
+        return response
+
+    @staticmethod
+    def _retry_attempts(response) -> int:
+        attempts = response.get("ResponseMetadata", {}).get("RetryAttempts", 0) if isinstance(response, dict) else 0
+        return attempts if isinstance(attempts, int) else 0
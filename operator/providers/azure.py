@@ -3,14 +3,39 @@
 import asyncio
 import os
 import logging
+import re
+from typing import Optional, Sequence
+
 from azure.identity import ManagedIdentityCredential
 from azure.mgmt.dns import DnsManagementClient
-from azure.core.exceptions import HttpResponseError
+from azure.core.exceptions import (
+    ClientAuthenticationError, HttpResponseError, ResourceNotFoundError, ServiceRequestError,
+    ServiceRequestTimeoutError, ServiceResponseError, ServiceResponseTimeoutError,
+)
 
-from providers.base import DNSProvider, RecordType
+from providers.accounting import CHANGE, GET, LIST_PAGE, RETRY
+from providers.aggregation import AggregateState, ConcurrentChangeError, decode_owner_txt, encode_owner_txt, union
+from providers.base import DNSProvider, ExtraRecord, RecordType, RoutingPolicy, ZoneRecord, split_txt
 
 logger = logging.getLogger(__name__)
 
+# Attempts at a multi-value record set read-modify-write before giving up on concurrent edits
+ROUTING_CONFLICT_RETRIES = 5
+# Record set metadata key prefix recording which address each spoke owns
+OWNER_METADATA_PREFIX = "hubdns_set_"
+# Record set metadata key prefix for the aggregation owner table (disjoint from the one above)
+AGGREGATE_METADATA_PREFIX = "hubdns_owner_"
+# Request context key marking a call's first attempt as sent
+_ATTEMPTED = "hubdns_attempted"
+# Prefix spokes used before the two were kept apart; still read, and replaced on the next write
+LEGACY_OWNER_METADATA_PREFIX = "hubdns_"
+
+
+def _is_spoke_key(key: str) -> bool:
+    if key.startswith(OWNER_METADATA_PREFIX):
+        return True
+    return key.startswith(LEGACY_OWNER_METADATA_PREFIX) and not key.startswith(AGGREGATE_METADATA_PREFIX)
+
 
 class AzureDNSProvider(DNSProvider):
     """Azure DNS provider using Azure DNS Zones."""
@@ -20,7 +45,7 @@ class AzureDNSProvider(DNSProvider):
             client_id=os.environ["MANAGED_IDENTITY_CLIENT_ID"]
         )
         self._client = DnsManagementClient(
-            credential, os.environ["AZURE_SUBSCRIPTION_ID"]
+            credential, os.environ["AZURE_SUBSCRIPTION_ID"], raw_request_hook=self._on_attempt
         )
         self._dns_zone = os.environ["AZURE_DNS_ZONE"]
         self._resource_group = os.environ["AZURE_DNS_RESOURCE_GROUP"]
@@ -29,49 +54,292 @@ class AzureDNSProvider(DNSProvider):
     def provider_name(self) -> str:
         return "azure"
 
+    def _on_attempt(self, request) -> None:
+        """Account azure-core's retries: this hook sees every attempt of a call, which share one context."""
+        if request.context.get(_ATTEMPTED):
+            self.account_api_call(RETRY)
+        request.context[_ATTEMPTED] = True
+
+    def is_retryable_error(self, error: BaseException) -> bool:
+        # Credential failures raised before any request carry no status code
+        if isinstance(error, ClientAuthenticationError):
+            return False
+        return super().is_retryable_error(error)
+
+    def error_class(self, error: BaseException) -> str:
+        if isinstance(error, ClientAuthenticationError):
+            return "auth"
+        if isinstance(error, (ServiceRequestTimeoutError, ServiceResponseTimeoutError)):
+            return "timeout"
+        if isinstance(error, (ServiceRequestError, ServiceResponseError)):
+            return "connection"
+        return super().error_class(error)
+
     async def create_or_update_record(
-        self, record_name: str, value: str, record_type: RecordType = RecordType.A, ttl: int = 300
+        self,
+        record_name: str,
+        value: str,
+        record_type: RecordType = RecordType.A,
+        ttl: int = 300,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
     ) -> None:
-        name = self.extract_record_name(record_name, self._dns_zone)
+        name = self._relative_name(record_name)
         record_type_str = record_type.value
 
+        if routing is not None:
+            if record_type != RecordType.A:
+                raise ValueError(f"Azure DNS routing uses multi-value A record sets; {name} is a {record_type_str}")
+            await self._apply_spoke_address(name, ttl, routing, value)
+            if extras:
+                await self.write_extra_records(extras, ttl)
+            return
+
         def _upsert():
-            if record_type == RecordType.CNAME:
-                self._client.record_sets.create_or_update(
-                    self._resource_group,
-                    self._dns_zone,
-                    name,
-                    "CNAME",
-                    {"ttl": ttl, "cname_record": {"cname": value}},
-                )
-            else:
-                self._client.record_sets.create_or_update(
-                    self._resource_group,
-                    self._dns_zone,
-                    name,
-                    record_type_str,
-                    {"ttl": ttl, "arecords": [{"ipv4_address": value}]},
-                )
+            self.account_api_call(CHANGE)
+            self._client.record_sets.create_or_update(
+                self._resource_group,
+                self._dns_zone,
+                name,
+                record_type.zone_type,
+                self._record_set_params(name, record_type, ttl, value),
+            )
+            # Azure DNS has no multi-record-set change; extras follow in the same worker call
+            self._write_extras(extras, ttl)
 
         try:
             await asyncio.to_thread(_upsert)
-            logger.info(f"[Azure] DNS record upserted: {name} -> {value} ({record_type_str})")
+            logger.info("[Azure] DNS record upserted: %s -> %s (%s)", name, value, record_type_str)
         except HttpResponseError as e:
-            logger.error(f"[Azure] Error upserting DNS record {name}: {e.message}")
+            logger.error("[Azure] Error upserting DNS record %s: %s", name, e.message)
             raise
 
-    async def delete_record(self, record_name: str, record_type: RecordType = RecordType.A) -> None:
-        name = self.extract_record_name(record_name, self._dns_zone)
-        record_type_str = record_type.value
+    async def delete_record(
+        self,
+        record_name: str,
+        record_type: RecordType = RecordType.A,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
+    ) -> None:
+        name = self._relative_name(record_name)
+        record_type_str = record_type.zone_type
+
+        if routing is not None and record_type == RecordType.A:
+            await self._apply_spoke_address(name, None, routing, None)
+            if extras:
+                await self.write_extra_records(extras, delete=True)
+            return
 
         def _delete():
+            self.account_api_call(CHANGE)
             self._client.record_sets.delete(
                 self._resource_group, self._dns_zone, name, record_type_str
             )
+            self._write_extras(extras, None)
 
         try:
             await asyncio.to_thread(_delete)
-            logger.info(f"[Azure] DNS record deleted: {name} ({record_type_str})")
+            logger.info("[Azure] DNS record deleted: %s (%s)", name, record_type_str)
+        except HttpResponseError as e:
+            logger.error("[Azure] Error deleting DNS record %s: %s", name, e.message)
+            raise
+
+    async def write_extra_records(self, extras: Sequence[ExtraRecord], ttl: int = 300, delete: bool = False) -> None:
+        await asyncio.to_thread(self._write_extras, extras, None if delete else ttl)
+
+    def _relative_name(self, record_name):
+        return "@" if record_name == self._dns_zone else self.extract_record_name(record_name, self._dns_zone)
+
+    @staticmethod
+    def _record_set_params(name, record_type, ttl, value):
+        if record_type == RecordType.CNAME:
+            return {"ttl": ttl, "cname_record": {"cname": value}}
+        if record_type == RecordType.ALIAS:
+            # Alias record sets point at an Azure resource (public IP, Traffic Manager profile, Front Door)
+            if not value.startswith("/subscriptions/"):
+                raise ValueError(f"Azure alias target for {name} must be a resource ID, got {value!r}")
+            return {"ttl": ttl, "target_resource": {"id": value}}
+        return {"ttl": ttl, "arecords": [{"ipv4_address": value}]}
+
+    def _write_extras(self, extras, ttl):
+        """Upsert each extra record set, or delete them all when ``ttl`` is None (blocking)."""
+        for extra in extras:
+            name = self._relative_name(extra.name)
+            self.account_api_call(CHANGE)
+            if ttl is None:
+                self._client.record_sets.delete(self._resource_group, self._dns_zone, name, extra.record_type.value)
+            else:
+                self._client.record_sets.create_or_update(
+                    self._resource_group, self._dns_zone, name, extra.record_type.value,
+                    self._extra_params(extra, ttl),
+                )
+
+    @staticmethod
+    def _extra_params(extra, ttl):
+        if extra.record_type == RecordType.TXT:
+            return {"ttl": ttl, "txt_records": [{"value": split_txt(v)} for v in extra.values]}
+        if extra.record_type == RecordType.SRV:
+            records = []
+            for v in extra.values:
+                priority, weight, port, target = v.split()
+                records.append({"priority": int(priority), "weight": int(weight), "port": int(port), "target": target})
+            return {"ttl": ttl, "srv_records": records}
+        records = []
+        for v in extra.values:
+            flags, tag, value = v.split(None, 2)
+            records.append({"flags": int(flags), "tag": tag, "value": value.strip('"')})
+        return {"ttl": ttl, "caa_records": records}
+
+    # -- multi-value routing -------------------------------------------------
+    #
+    # Azure DNS has no weighted records without Traffic Manager. Spokes that
+    # share a hostname instead each contribute their address to one
+    # multi-value A record set; resolvers spread load across the addresses.
+    # A weight of 0 drains the spoke (removes its address); any other weight
+    # includes it.
+
+    async def _apply_spoke_address(self, name, ttl, routing, value):
+        if routing.kind != "weighted" or routing.health_check_id:
+            logger.warning(
+                "[Azure] Only weighted include/drain routing is supported; treating %s as weighted for %s",
+                routing.kind, name,
+            )
+        include = value is not None and (routing.weight is None or routing.weight > 0)
+        address = value if include else None
+        try:
+            await asyncio.to_thread(self._modify_multi_value, name, ttl, routing.set_identifier, address)
+            logger.info(
+                "[Azure] Spoke %s %s for %s", routing.set_identifier, "included" if include else "drained", name
+            )
         except HttpResponseError as e:
-            logger.error(f"[Azure] Error deleting DNS record {name}: {e.message}")
+            logger.error("[Azure] Error updating multi-value record %s: %s", name, e.message)
             raise
+
+    def _modify_multi_value(self, name, ttl, set_identifier, value):
+        """Set (or with ``value=None`` remove) this spoke's address in a shared A record set.
+
+        Each spoke records the address it owns in the record set's metadata,
+        so removal takes out exactly that address unless another spoke also
+        claims it. Writes are conditional on the etag that was read; if
+        another spoke changed the set in between, Azure answers 412 and the
+        edit is retried on a fresh read.
+        """
+        suffix = re.sub(r"[^A-Za-z0-9_]", "_", set_identifier)
+        owner_key = OWNER_METADATA_PREFIX + suffix
+        legacy_key = LEGACY_OWNER_METADATA_PREFIX + suffix
+        last_error = None
+        for _ in range(ROUTING_CONFLICT_RETRIES):
+            self.account_api_call(GET)
+            try:
+                current = self._client.record_sets.get(self._resource_group, self._dns_zone, name, "A")
+            except ResourceNotFoundError:
+                current = None
+
+            metadata = dict(current.metadata or {}) if current else {}
+            addresses = [r.ipv4_address for r in current.a_records or []] if current else []
+            original = (dict(metadata), list(addresses))
+            previous = metadata.pop(owner_key, None)
+            if _is_spoke_key(legacy_key):
+                previous = metadata.pop(legacy_key, None) or previous
+            claimed = {v for k, v in metadata.items() if _is_spoke_key(k)}
+            if previous and previous not in claimed and previous in addresses:
+                addresses.remove(previous)
+            if value is not None:
+                metadata[owner_key] = value
+                if value not in addresses:
+                    addresses.append(value)
+            new_ttl = ttl if ttl is not None else (current.ttl if current else 300)
+            if current is None and not addresses:
+                return
+            if current and (metadata, addresses) == original and current.ttl == new_ttl:
+                return
+
+            try:
+                self.account_api_call(CHANGE)
+                if addresses:
+                    self._client.record_sets.create_or_update(
+                        self._resource_group, self._dns_zone, name, "A",
+                        {"ttl": new_ttl, "arecords": [{"ipv4_address": a} for a in addresses], "metadata": metadata},
+                        if_match=current.etag if current else None,
+                        if_none_match=None if current else "*",
+                    )
+                elif current:
+                    self._client.record_sets.delete(
+                        self._resource_group, self._dns_zone, name, "A", if_match=current.etag
+                    )
+                return
+            except HttpResponseError as e:
+                if e.status_code != 412:
+                    raise
+                logger.info("[Azure] Concurrent change to %s, retrying", name)
+                last_error = e
+        raise last_error
+
+    # -- aggregation (see providers.aggregation) -------------------------------
+    #
+    # Azure has no multi-record transactions, so the owner table lives in
+    # the record set's own metadata and the etag guards both at once.
+
+    def _read_aggregate(self, record_name, record_type):
+        name = self._relative_name(record_name)
+        self.account_api_call(GET)
+        try:
+            current = self._client.record_sets.get(self._resource_group, self._dns_zone, name, record_type.value)
+        except ResourceNotFoundError:
+            return None
+        owners = dict(
+            decode_owner_txt(v) for k, v in (current.metadata or {}).items() if k.startswith(AGGREGATE_METADATA_PREFIX)
+        )
+        return AggregateState(current.ttl, owners, current)
+
+    def _write_aggregate(self, record_name, record_type, ttl, owners, previous):
+        name = self._relative_name(record_name)
+        current = previous.version if previous else None
+        metadata = {
+            k: v for k, v in ((current.metadata or {}) if current else {}).items()
+            if not k.startswith(AGGREGATE_METADATA_PREFIX)
+        }
+        for owner, entry in owners.items():
+            metadata[AGGREGATE_METADATA_PREFIX + re.sub(r"[^A-Za-z0-9_]", "_", owner)] = encode_owner_txt(owner, entry)
+        try:
+            self.account_api_call(CHANGE)
+            if owners:
+                self._client.record_sets.create_or_update(
+                    self._resource_group, self._dns_zone, name, record_type.value,
+                    {"ttl": ttl, "arecords": [{"ipv4_address": a} for a in union(owners)], "metadata": metadata},
+                    if_match=current.etag if current else None,
+                    if_none_match=None if current else "*",
+                )
+            elif current:
+                self._client.record_sets.delete(
+                    self._resource_group, self._dns_zone, name, record_type.value, if_match=current.etag
+                )
+        except HttpResponseError as e:
+            if e.status_code == 412:
+                raise ConcurrentChangeError(e.message) from e
+            raise
+
+    def _zone_pages(self, page_size):
+        record_sets = self._client.record_sets.list_all_by_dns_zone(
+            self._resource_group, self._dns_zone, top=page_size
+        )
+        for page in record_sets.by_page():
+            self.account_api_call(LIST_PAGE)
+            yield [self._to_zone_record(rs) for rs in page]
+
+    @staticmethod
+    def _to_zone_record(record_set) -> ZoneRecord:
+        record_type = record_set.type.rsplit("/", 1)[-1]
+        if record_set.cname_record:
+            values = (record_set.cname_record.cname,)
+        elif record_set.a_records:
+            values = tuple(r.ipv4_address for r in record_set.a_records)
+        elif record_set.aaaa_records:
+            values = tuple(r.ipv6_address for r in record_set.aaaa_records)
+        elif record_set.txt_records:
+            values = tuple("".join(r.value) for r in record_set.txt_records)
+        elif record_set.ns_records:
+            values = tuple(r.nsdname for r in record_set.ns_records)
+        else:
+            values = ()
+        return ZoneRecord(record_set.fqdn.rstrip("."), record_type, record_set.ttl or 0, values)
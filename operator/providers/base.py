@@ -1,28 +1,158 @@
 """Base DNS provider interface."""
 
 from abc import ABC, abstractmethod
+import asyncio
 from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache
+import ipaddress
 import logging
+from typing import AsyncIterator, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from opentelemetry import trace
+
+from providers.accounting import record_api_call
 
 logger = logging.getLogger(__name__)
 
+# Request timeout, conflict, failed precondition and throttling (plus any 5xx)
+RETRYABLE_HTTP_STATUSES = frozenset({408, 409, 412, 429})
+
+# Values of the error_type metric label: a fixed set, whatever the SDKs raise
+ERROR_CLASSES = (
+    "throttled", "timeout", "connection", "auth", "not_found", "conflict", "invalid", "server", "circuit_open",
+    "other",
+)
+_HTTP_STATUS_CLASSES = {401: "auth", 403: "auth", 404: "not_found", 408: "timeout", 409: "conflict",
+                        412: "conflict", 429: "throttled"}
+
+
+def http_status_class(status: int) -> str:
+    """Error class (one of ERROR_CLASSES) of an HTTP error status."""
+    if status in _HTTP_STATUS_CLASSES:
+        return _HTTP_STATUS_CLASSES[status]
+    if status >= 500:
+        return "server"
+    return "invalid" if 400 <= status < 500 else "other"
+
 
 class RecordType(Enum):
-    """DNS record types supported by the operator."""
+    """DNS record types supported by the operator.
+
+    ALIAS is the apex-safe alias of the primary record (a Route53 alias or
+    an Azure alias record set); it is stored as an A record set. TXT, SRV
+    and CAA are only written as extra records next to the primary one.
+    """
     A = "A"
     CNAME = "CNAME"
+    ALIAS = "ALIAS"
+    TXT = "TXT"
+    SRV = "SRV"
+    CAA = "CAA"
+
+    @property
+    def zone_type(self) -> str:
+        """Type of the record set in the zone."""
+        return "A" if self is RecordType.ALIAS else self.value
 
 
-@dataclass
+@dataclass(slots=True)
 class DNSRecord:
-    """Represents a DNS record with its properties."""
+    """Represents a DNS record with its properties.
+
+    Slotted, so records held in caches carry no per-instance ``__dict__``.
+    """
     name: str
     value: str  # IP address for A records, hostname for CNAME records
     record_type: RecordType
     ttl: int
 
 
+@dataclass(frozen=True)
+class ExtraRecord:
+    """A record set written in the same change as an Ingress's primary record.
+
+    ``values`` are in zone-file presentation format: TXT text unquoted,
+    SRV ``priority weight port target.`` and CAA ``flags tag "value"``.
+    """
+    name: str
+    record_type: RecordType
+    values: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class RoutingPolicy:
+    """Routing for one of several record sets that share a name.
+
+    Spoke clusters publishing the same hostname each write their own record
+    set, told apart by ``set_identifier``. Exactly one of ``weight``,
+    ``region`` (latency-based) or ``geo`` is set.
+    """
+    set_identifier: str
+    weight: Optional[int] = None
+    region: Optional[str] = None
+    geo: Tuple[Tuple[str, str], ...] = ()  # e.g. (("country", "US"), ("subdivision", "CA"))
+    health_check_id: Optional[str] = None
+
+    @property
+    def kind(self) -> str:
+        if self.weight is not None:
+            return "weighted"
+        if self.region is not None:
+            return "latency"
+        return "geo"
+
+
+class ZoneRecord(NamedTuple):
+    """A record set read back from a zone.
+
+    Zone reads convert each SDK object into one of these as soon as its page
+    arrives; a NamedTuple has no per-instance ``__dict__``, so it costs a
+    fraction of the SDK object it replaces.
+    """
+    name: str  # FQDN without the trailing dot
+    record_type: str  # any zone type, including ones the operator does not manage (NS, SOA, ...)
+    ttl: int
+    values: Tuple[str, ...]
+
+
+def record_options(routing: Optional[RoutingPolicy] = None, extras: Sequence[ExtraRecord] = ()) -> dict:
+    """Optional keyword arguments of a provider call, leaving out the ones not in use."""
+    options = {}
+    if routing is not None:
+        options["routing"] = routing
+    if extras:
+        options["extras"] = tuple(extras)
+    return options
+
+
+def split_txt(value: str) -> List[str]:
+    """Split TXT text into the 255-character strings a TXT record is made of."""
+    return [value[i:i + 255] for i in range(0, len(value), 255)] or [""]
+
+
+def quote_txt(value: str) -> str:
+    """TXT text in zone-file format: quoted, escaped strings of at most 255 characters."""
+    return " ".join('"' + part.replace("\\", "\\\\").replace('"', '\\"') + '"' for part in split_txt(value))
+
+
+@lru_cache(maxsize=8192)
+def is_hostname(value: str) -> bool:
+    """Check if value is a hostname (not an IP address).
+
+    Returns True if the value contains letters and does not parse as an IPv4
+    or IPv6 address. Results are cached, since the same load balancer targets
+    are seen over and over.
+    """
+    if not value:
+        return False
+    try:
+        ipaddress.ip_address(value)
+        return False
+    except ValueError:
+        return any(c.isalpha() for c in value)
+
+
 class DNSProvider(ABC):
     """Abstract base class for cloud DNS providers."""
 
@@ -34,16 +164,115 @@ class DNSProvider(ABC):
 
     @abstractmethod
     async def create_or_update_record(
-        self, record_name: str, value: str, record_type: RecordType = RecordType.A, ttl: int = 300
+        self,
+        record_name: str,
+        value: str,
+        record_type: RecordType = RecordType.A,
+        ttl: int = 300,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
     ) -> None:
-        """Create or update a DNS record (A or CNAME)."""
+        """Create or update a DNS record (A, CNAME or ALIAS), optionally as one set of a routing policy.
+
+        ``extras`` are written with the same TTL in the same change, where
+        the provider's API allows it.
+        """
         ...
 
     @abstractmethod
-    async def delete_record(self, record_name: str, record_type: RecordType = RecordType.A) -> None:
-        """Delete a DNS record."""
+    async def delete_record(
+        self,
+        record_name: str,
+        record_type: RecordType = RecordType.A,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
+    ) -> None:
+        """Delete a DNS record (only the set matching ``routing``, if given) and its ``extras``."""
         ...
 
+    async def write_extra_records(self, extras: Sequence[ExtraRecord], ttl: int = 300, delete: bool = False) -> None:
+        """Write (or delete) extra records on their own, without a primary record."""
+        raise NotImplementedError(f"{self.provider_name} provider does not support extra records")
+
+    async def iter_zone_records(self, page_size: int = 300) -> AsyncIterator[ZoneRecord]:
+        """Stream every record set in the zone, one page of API results at a time.
+
+        Each page is fetched on a worker thread and converted before the next
+        one is requested, so memory stays bounded by the page size rather
+        than the zone size.
+        """
+        pages = self._zone_pages(page_size)
+        try:
+            while True:
+                page = await asyncio.to_thread(next, pages, None)
+                if page is None:
+                    return
+                for record in page:
+                    yield record
+        finally:
+            pages.close()
+
+    def _zone_pages(self, page_size: int) -> Iterator[List[ZoneRecord]]:
+        """Yield the zone's record sets page by page (blocking; runs in a thread)."""
+        raise NotImplementedError(f"{self.provider_name} provider does not support zone enumeration")
+
+    def _read_aggregate(self, record_name: str, record_type: RecordType):
+        """Read a record set and its owner table as an AggregateState, or None (blocking).
+
+        See providers.aggregation.
+        """
+        raise NotImplementedError(f"{self.provider_name} provider does not support aggregation")
+
+    def _write_aggregate(self, record_name: str, record_type: RecordType, ttl: int, owners, previous) -> None:
+        """Replace ``previous`` (or create) with the union of ``owners`` in one conditional change.
+
+        Removes the record set when ``owners`` is empty. Raises
+        ConcurrentChangeError if the record set no longer matches ``previous``.
+        """
+        raise NotImplementedError(f"{self.provider_name} provider does not support aggregation")
+
+    def is_retryable_error(self, error: BaseException) -> bool:
+        """Whether an operation that failed with ``error`` may succeed if simply retried.
+
+        Timeouts, connection failures, throttling and server-side errors are
+        transient; invalid input and authorization failures are permanent.
+        Providers refine this for their SDK's exception types.
+        """
+        if isinstance(error, (ValueError, TypeError, KeyError, NotImplementedError)):
+            return False
+        status = getattr(error, "status_code", None) or getattr(error, "code", None)
+        if isinstance(status, int) and 400 <= status < 600:
+            return status in RETRYABLE_HTTP_STATUSES or status >= 500
+        return True
+
+    def error_class(self, error: BaseException) -> str:
+        """Normalized class of ``error``, one of ERROR_CLASSES, for bounded metric labels.
+
+        Providers refine this for their SDK's exception types, like
+        is_retryable_error.
+        """
+        if isinstance(error, TimeoutError):
+            return "timeout"
+        if isinstance(error, ConnectionError):
+            return "connection"
+        if isinstance(error, (ValueError, TypeError, KeyError, NotImplementedError)):
+            return "invalid"
+        status = getattr(error, "status_code", None) or getattr(error, "code", None)
+        if isinstance(status, int):
+            return http_status_class(status)
+        return "other"
+
+    def account_api_call(self, kind: str, count: int = 1) -> None:
+        """Record ``count`` cloud API calls of ``kind`` (see providers.accounting).
+
+        Each is also added as an event to the current span, if it is being traced.
+        """
+        record_api_call(self.provider_name, kind, count)
+        span = trace.get_current_span()
+        if count and span.is_recording():
+            span.add_event("dns.api_call", {"dns.provider": self.provider_name, "dns.api_call.kind": kind,
+                                            "dns.api_call.count": count})
+
     def extract_record_name(self, fqdn: str, dns_zone: str) -> str:
         """Extract the record name by stripping the DNS zone suffix from the FQDN."""
         zone_suffix = f".{dns_zone}"
@@ -52,16 +281,5 @@ class DNSProvider(ABC):
         return fqdn
 
     def is_hostname(self, value: str) -> bool:
-        """Check if value is a hostname (not an IP address).
-
-        Returns True if the value looks like a hostname (contains letters
-        and is not a simple IPv4 address).
-        """
-        if not value:
-            return False
-        # Check if it's an IP address (IPv4)
-        parts = value.split('.')
-        if len(parts) == 4 and all(part.isdigit() for part in parts):
-            return False
-        # Contains letters → likely hostname
-        return any(c.isalpha() for c in value)
+        """Check if value is a hostname (not an IP address)."""
+        return is_hostname(value)
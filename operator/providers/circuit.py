@@ -0,0 +1,197 @@
+"""Circuit breaker around one DNS back-end.
+
+During a cloud DNS outage every event would still call the provider, hold
+an executor thread until the SDK gives up and add load to the failing API.
+After ``failure_threshold`` consecutive transient failures the circuit
+opens: calls fail at once with CircuitOpenError (retryable, so the work is
+parked in the retry backlog) without touching the SDK. Once the open
+period has passed the circuit is half-open and lets a single probe call
+through. A successful probe closes the circuit; a failed one reopens it
+for twice as long, up to ``max_reset_timeout``.
+
+Permanent errors (e.g. an invalid record) prove the API is answering, so
+they never count as failures.
+"""
+
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence
+
+from prometheus_client import Counter, Gauge
+
+from providers.base import DNSProvider, ExtraRecord, RecordType, RoutingPolicy, ZoneRecord, record_options
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+dns_circuit_state = Gauge(
+    'dns_operator_circuit_state',
+    'Provider circuit breaker state (0 = closed, 1 = half-open, 2 = open)',
+    ['provider']
+)
+
+dns_circuit_transitions_total = Counter(
+    'dns_operator_circuit_transitions_total',
+    'Provider circuit breaker state changes, by the state entered',
+    ['provider', 'state']
+)
+
+dns_circuit_rejected_total = Counter(
+    'dns_operator_circuit_rejected_total',
+    'Provider calls rejected without reaching the API because the circuit was open',
+    ['provider']
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a back-end whose circuit is open.
+
+    ``retry_after`` is the number of seconds until the circuit lets a probe
+    through; the retry backlog waits that long and does not count the
+    rejection as an attempt.
+    """
+
+    def __init__(self, provider_name: str, retry_after: float):
+        self.provider_name = provider_name
+        self.retry_after = retry_after
+        super().__init__(f"circuit open for {provider_name}, next probe in {retry_after:.0f}s")
+
+
+class CircuitBreakerDNSProvider(DNSProvider):
+    """Shed calls to a failing back-end until a half-open probe succeeds."""
+
+    def __init__(
+        self,
+        provider: DNSProvider,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        max_reset_timeout: float = 300.0,
+    ):
+        self._provider = provider
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max(reset_timeout, max_reset_timeout)
+        self.state = CLOSED
+        self._failures = 0
+        self._open_for = reset_timeout
+        self._probe_at = 0.0  # monotonic time the open circuit may be probed
+        self._probing = False
+        dns_circuit_state.labels(provider=self.provider_name).set(_STATE_VALUES[CLOSED])
+
+    @property
+    def provider_name(self) -> str:
+        return self._provider.provider_name
+
+    @property
+    def provider(self) -> DNSProvider:
+        return self._provider
+
+    def is_hostname(self, value: str) -> bool:
+        return self._provider.is_hostname(value)
+
+    def is_retryable_error(self, error: BaseException) -> bool:
+        return isinstance(error, CircuitOpenError) or self._provider.is_retryable_error(error)
+
+    def error_class(self, error: BaseException) -> str:
+        return "circuit_open" if isinstance(error, CircuitOpenError) else self._provider.error_class(error)
+
+    async def create_or_update_record(
+        self,
+        record_name: str,
+        value: str,
+        record_type: RecordType = RecordType.A,
+        ttl: int = 300,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
+    ) -> None:
+        extra = record_options(routing, extras)
+        await self._call(lambda: self._provider.create_or_update_record(record_name, value, record_type, ttl, **extra))
+
+    async def delete_record(
+        self,
+        record_name: str,
+        record_type: RecordType = RecordType.A,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
+    ) -> None:
+        extra = record_options(routing, extras)
+        await self._call(lambda: self._provider.delete_record(record_name, record_type, **extra))
+
+    async def write_extra_records(self, extras: Sequence[ExtraRecord], ttl: int = 300, delete: bool = False) -> None:
+        await self._call(lambda: self._provider.write_extra_records(extras, ttl, delete))
+
+    def _zone_pages(self, page_size: int) -> Iterator[List[ZoneRecord]]:
+        return self._provider._zone_pages(page_size)
+
+    def snapshot(self) -> Dict[str, Any]:
+        view = {"state": self.state, "consecutive_failures": self._failures}
+        if self.state != CLOSED:
+            view["probe_in_seconds"] = round(max(0.0, self._probe_at - time.monotonic()), 1)
+        return view
+
+    async def _call(self, call: Callable[[], Awaitable[None]]) -> None:
+        probe = self._admit()
+        try:
+            await call()
+        except Exception as e:
+            if self._provider.is_retryable_error(e):
+                self._failed(probe)
+            else:
+                self._succeeded(probe)
+            raise
+        finally:
+            if probe:
+                self._probing = False
+        self._succeeded(probe)
+
+    def _admit(self) -> bool:
+        """Let a call through (True if it is the half-open probe) or raise CircuitOpenError."""
+        if self.state == CLOSED:
+            return False
+        now = time.monotonic()
+        if self.state == OPEN and now >= self._probe_at:
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        dns_circuit_rejected_total.labels(provider=self.provider_name).inc()
+        raise CircuitOpenError(self.provider_name, max(0.0, self._probe_at - now) or self.reset_timeout)
+
+    def _succeeded(self, probe: bool) -> None:
+        if probe:
+            self._open_for = self.reset_timeout
+            self._transition(CLOSED)
+        if self.state == CLOSED:
+            self._failures = 0
+
+    def _failed(self, probe: bool) -> None:
+        self._failures += 1
+        if probe:
+            self._open(min(self.max_reset_timeout, self._open_for * 2))
+        elif self.state == CLOSED and self._failures >= self.failure_threshold:
+            self._open(self.reset_timeout)
+
+    def _open(self, duration: float) -> None:
+        self._open_for = duration
+        self._probe_at = time.monotonic() + duration
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        dns_circuit_state.labels(provider=self.provider_name).set(_STATE_VALUES[state])
+        dns_circuit_transitions_total.labels(provider=self.provider_name, state=state).inc()
+        if state == OPEN:
+            logger.warning(
+                "[%s] Circuit opened after %d consecutive failures; shedding calls for %.0fs",
+                self.provider_name, self._failures, self._open_for,
+                extra={"provider": self.provider_name, "state_transition": True},
+            )
+        else:
+            logger.info(
+                "[%s] Circuit %s", self.provider_name, "half-open, probing" if state == HALF_OPEN else "closed",
+                extra={"provider": self.provider_name, "state_transition": True},
+            )
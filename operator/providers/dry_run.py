@@ -0,0 +1,82 @@
+"""Dry-run wrapper: record the changes the operator would make instead of making them.
+
+Enabled with DRY_RUN=true. The operator runs its full event pipeline, but
+every write or delete is logged and collected in a plan (latest intended
+change per record set), which main.py serves at ``/plan``. Nothing reaches
+the cloud API.
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from providers.base import DNSProvider, ExtraRecord, RecordType, RoutingPolicy
+
+logger = logging.getLogger(__name__)
+
+
+class DryRunDNSProvider(DNSProvider):
+    """Collect intended changes per record set; the wrapped provider is never written."""
+
+    def __init__(self, provider: DNSProvider):
+        self._provider = provider
+        self._planned: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+
+    @property
+    def provider_name(self) -> str:
+        return self._provider.provider_name
+
+    def is_hostname(self, value: str) -> bool:
+        return self._provider.is_hostname(value)
+
+    def is_retryable_error(self, error: BaseException) -> bool:
+        return self._provider.is_retryable_error(error)
+
+    def error_class(self, error: BaseException) -> str:
+        return self._provider.error_class(error)
+
+    async def create_or_update_record(
+        self,
+        record_name: str,
+        value: str,
+        record_type: RecordType = RecordType.A,
+        ttl: int = 300,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
+    ) -> None:
+        self._plan("upsert", record_name, record_type, value=value, ttl=ttl, routing=routing, extras=extras)
+
+    async def delete_record(
+        self,
+        record_name: str,
+        record_type: RecordType = RecordType.A,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
+    ) -> None:
+        self._plan("delete", record_name, record_type, routing=routing, extras=extras)
+
+    async def write_extra_records(self, extras: Sequence[ExtraRecord], ttl: int = 300, delete: bool = False) -> None:
+        for extra in extras:
+            if delete:
+                self._plan("delete", extra.name, extra.record_type)
+            else:
+                self._plan("upsert", extra.name, extra.record_type, value=" | ".join(extra.values), ttl=ttl)
+
+    def plan(self) -> List[Dict[str, Any]]:
+        return sorted(self._planned.values(), key=lambda c: (c["name"], c["type"]))
+
+    def _plan(self, action, record_name, record_type, **details):
+        routing = details.pop("routing", None)
+        extras = details.pop("extras", ())
+        change = {"action": action, "name": record_name, "type": record_type.value, **details}
+        if routing is not None:
+            change["set_identifier"] = routing.set_identifier
+        if extras:
+            change["extras"] = [{"name": e.name, "type": e.record_type.value, "values": list(e.values)} for e in extras]
+        change["planned_at"] = int(time.time())
+        self._planned[(record_name, record_type.value, change.get("set_identifier", ""))] = change
+        logger.info(
+            "[%s] dry run: would %s %s (%s)%s", self.provider_name, action, record_name, record_type.value,
+            f" -> {details['value']}" if "value" in details else "",
+            extra={"host": record_name, "provider": self.provider_name},
+        )
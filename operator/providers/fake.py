@@ -0,0 +1,86 @@
+"""In-memory DNS provider for local runs and trace replays (CLOUD_PROVIDER=fake).
+
+Records are kept in a dict, and nothing leaves the process. Each call
+blocks an executor thread for a latency, like an SDK call would, so a
+replay reproduces executor and scheduler pressure as well as event
+volume. That latency is ``FAKE_PROVIDER_LATENCY_SECONDS`` by default.
+Calls can also be scripted with ``expect()``: replay.py queues the latency
+and outcome recorded in a trace for each call. A recorded failure is
+raised as FakeProviderError, which is retryable.
+"""
+
+import asyncio
+import os
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from providers.base import DNSProvider, ExtraRecord, RecordType, RoutingPolicy, ZoneRecord
+
+
+class FakeProviderError(Exception):
+    """Replayed failure of a provider call."""
+
+
+class FakeDNSProvider(DNSProvider):
+    """Dict-backed provider with a fixed or scripted latency per call."""
+
+    def __init__(self, latency: Optional[float] = None):
+        if latency is None:
+            latency = float(os.environ.get("FAKE_PROVIDER_LATENCY_SECONDS", 0))
+        self.latency = latency
+        self.records: Dict[Tuple[str, str, str], Tuple[str, int]] = {}  # (name, type, set id) -> (value, ttl)
+        self.calls = 0
+        self._script: Dict[Tuple[str, str], Deque[Tuple[float, Optional[str]]]] = defaultdict(deque)
+
+    @property
+    def provider_name(self) -> str:
+        return "fake"
+
+    def expect(self, operation: str, record_name: str, seconds: float, error: Optional[str] = None) -> None:
+        """Queue the latency (and failure, by error name) of the next ``operation`` on ``record_name``.
+
+        ``operation`` is "upsert" or "delete".
+        """
+        self._script[(operation, record_name)].append((seconds, error))
+
+    async def create_or_update_record(
+        self,
+        record_name: str,
+        value: str,
+        record_type: RecordType = RecordType.A,
+        ttl: int = 300,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
+    ) -> None:
+        await asyncio.to_thread(self._call, "upsert", record_name)
+        set_identifier = routing.set_identifier if routing is not None else ""
+        self.records[(record_name, record_type.zone_type, set_identifier)] = (value, ttl)
+
+    async def delete_record(
+        self,
+        record_name: str,
+        record_type: RecordType = RecordType.A,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
+    ) -> None:
+        await asyncio.to_thread(self._call, "delete", record_name)
+        set_identifier = routing.set_identifier if routing is not None else ""
+        self.records.pop((record_name, record_type.zone_type, set_identifier), None)
+
+    def _call(self, operation: str, record_name: str) -> None:
+        self.calls += 1
+        script = self._script.get((operation, record_name))
+        seconds, error = script.popleft() if script else (self.latency, None)
+        if seconds > 0:
+            time.sleep(seconds)
+        if error is not None:
+            raise FakeProviderError(f"replayed {error} for {operation} {record_name}")
+
+    def _zone_pages(self, page_size: int) -> Iterator[List[ZoneRecord]]:
+        records = [
+            ZoneRecord(name, record_type, ttl, (value,))
+            for (name, record_type, _), (value, ttl) in sorted(self.records.items())
+        ]
+        for start in range(0, len(records), page_size):
+            yield records[start:start + page_size]
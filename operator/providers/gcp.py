@@ -3,13 +3,27 @@
 import asyncio
 import os
 import logging
+import time
+from typing import Optional, Sequence
+
 from google.cloud import dns as google_dns
-from google.api_core.exceptions import GoogleAPICallError
+from google.api_core import retry as api_retry
+from google.api_core.exceptions import Conflict, GoogleAPICallError, NotFound, PreconditionFailed
 
-from providers.base import DNSProvider, RecordType
+from providers.accounting import CHANGE, GET, LIST_PAGE, RETRY
+from providers.aggregation import (
+    OWNER_RECORD_PREFIX, AggregateState, ConcurrentChangeError, OwnerEntry, decode_owner_txt, encode_owner_txt,
+    union,
+)
+from providers.base import DNSProvider, ExtraRecord, RecordType, RoutingPolicy, ZoneRecord, quote_txt
 
 logger = logging.getLogger(__name__)
 
+# Attempts at a routing-policy read-modify-write before giving up on concurrent edits
+ROUTING_CONFLICT_RETRIES = 5
+# Seconds _api keeps retrying transient errors (429, 5xx, dropped connections)
+API_RETRY_TIMEOUT = 30.0
+
 
 class GCPDNSProvider(DNSProvider):
     """Google Cloud DNS provider using Cloud DNS managed zones."""
@@ -20,58 +34,297 @@ class GCPDNSProvider(DNSProvider):
         self._dns_zone = os.environ["GCP_DNS_ZONE"]
         self._client = google_dns.Client(project=self._project_id)
         self._zone = self._client.zone(self._managed_zone, self._dns_zone)
+        # google-cloud-dns does not retry; calls through _api retry transient errors, each retry accounted
+        self._retry = api_retry.Retry(
+            predicate=api_retry.if_transient_error, initial=0.5, maximum=8.0, timeout=API_RETRY_TIMEOUT,
+            on_error=lambda error: self.account_api_call(RETRY),
+        )
 
     @property
     def provider_name(self) -> str:
         return "gcp"
 
     async def create_or_update_record(
-        self, record_name: str, value: str, record_type: RecordType = RecordType.A, ttl: int = 300
+        self,
+        record_name: str,
+        value: str,
+        record_type: RecordType = RecordType.A,
+        ttl: int = 300,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
     ) -> None:
         name = self.extract_record_name(record_name, self._dns_zone)
-        fqdn = f"{name}.{self._dns_zone}."
+        fqdn = self._fqdn(record_name)
         record_type_str = record_type.value
+        if record_type == RecordType.ALIAS:
+            raise ValueError(f"Cloud DNS has no alias records; use a CNAME or an A record for {name}")
+
+        if routing is not None:
+            await self._apply_routing_item(name, fqdn, record_type_str, ttl, routing, value)
+            if extras:
+                await self.write_extra_records(extras, ttl)
+            return
 
         def _upsert():
+            if extras:
+                # One change replaces the primary record set and every extra
+                self._replace_rrsets([(fqdn, record_type_str, [value])] + self._extra_rrsets(extras), ttl)
+                return
             changes = self._zone.changes()
             existing = self._find_record(fqdn, record_type_str)
             if existing:
                 changes.delete_record_set(existing)
             record_set = self._zone.resource_record_set(fqdn, record_type_str, ttl, [value])
             changes.add_record_set(record_set)
+            self.account_api_call(CHANGE)
             changes.create()
 
         try:
             await asyncio.to_thread(_upsert)
-            logger.info(f"[GCP] DNS record upserted: {name} -> {value} ({record_type_str})")
+            logger.info("[GCP] DNS record upserted: %s -> %s (%s)", name, value, record_type_str)
         except GoogleAPICallError as e:
-            logger.error(f"[GCP] Error upserting DNS record {name}: {e.message}")
+            logger.error("[GCP] Error upserting DNS record %s: %s", name, e.message)
             raise
 
-    async def delete_record(self, record_name: str, record_type: RecordType = RecordType.A) -> None:
+    async def delete_record(
+        self,
+        record_name: str,
+        record_type: RecordType = RecordType.A,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
+    ) -> None:
         name = self.extract_record_name(record_name, self._dns_zone)
-        fqdn = f"{name}.{self._dns_zone}."
+        fqdn = self._fqdn(record_name)
         record_type_str = record_type.value
 
+        if routing is not None:
+            await self._apply_routing_item(name, fqdn, record_type_str, None, routing, None)
+            if extras:
+                await self.write_extra_records(extras, delete=True)
+            return
+
         def _delete():
+            if extras:
+                self._replace_rrsets([(fqdn, record_type_str, None)] + self._extra_rrsets(extras, delete=True), None)
+                logger.info("[GCP] DNS record deleted: %s (%s)", name, record_type_str)
+                return
             existing = self._find_record(fqdn, record_type_str)
             if existing:
                 changes = self._zone.changes()
                 changes.delete_record_set(existing)
+                self.account_api_call(CHANGE)
                 changes.create()
-                logger.info(f"[GCP] DNS record deleted: {name} ({record_type_str})")
+                logger.info("[GCP] DNS record deleted: %s (%s)", name, record_type_str)
             else:
-                logger.warning(f"[GCP] DNS record not found for deletion: {name}")
+                logger.warning("[GCP] DNS record not found for deletion: %s", name)
 
         try:
             await asyncio.to_thread(_delete)
         except GoogleAPICallError as e:
-            logger.error(f"[GCP] Error deleting DNS record {name}: {e.message}")
+            logger.error("[GCP] Error deleting DNS record %s: %s", name, e.message)
             raise
 
+    async def write_extra_records(self, extras: Sequence[ExtraRecord], ttl: int = 300, delete: bool = False) -> None:
+        await asyncio.to_thread(self._replace_rrsets, self._extra_rrsets(extras, delete), None if delete else ttl)
+
+    def _extra_rrsets(self, extras, delete=False):
+        return [
+            (
+                self._fqdn(e.name),
+                e.record_type.value,
+                None if delete else [quote_txt(v) if e.record_type == RecordType.TXT else v for v in e.values],
+            )
+            for e in extras
+        ]
+
+    def _fqdn(self, record_name):
+        if record_name == self._dns_zone:  # zone apex
+            return f"{record_name}."
+        return f"{self.extract_record_name(record_name, self._dns_zone)}.{self._dns_zone}."
+
+    def _replace_rrsets(self, rrsets, ttl):
+        """Replace each ``(fqdn, type, rrdatas)`` set (``rrdatas=None`` deletes it) in one change."""
+        deletions = [current for fqdn, rtype, _ in rrsets if (current := self._get_rrset(fqdn, rtype)) is not None]
+        additions = [
+            {"name": fqdn, "type": rtype, "ttl": ttl, "rrdatas": rrdatas}
+            for fqdn, rtype, rrdatas in rrsets if rrdatas is not None
+        ]
+        if deletions or additions:
+            self.account_api_call(CHANGE)
+            self._api("POST", "/changes", data={"additions": additions, "deletions": deletions})
+
+    # -- routing policies ----------------------------------------------------
+    #
+    # Cloud DNS keeps all targets of a routing policy in one record set, so
+    # every spoke edits its own item inside a shared set. The client library
+    # does not model routingPolicy; these calls use the REST API directly.
+
+    async def _apply_routing_item(self, name, fqdn, record_type, ttl, routing, value):
+        if routing.health_check_id:
+            logger.warning("[GCP] Health check IDs are not supported for routing policies; ignoring for %s", name)
+        verb = "upserted" if value is not None else "removed"
+        try:
+            await asyncio.to_thread(self._modify_routing_policy, fqdn, record_type, ttl, routing, value)
+            logger.info("[GCP] %s routing item %s %s for %s", routing.kind, routing.set_identifier, verb, name)
+        except GoogleAPICallError as e:
+            logger.error("[GCP] Error updating routing policy for %s: %s", name, e.message)
+            raise
+
+    def _modify_routing_policy(self, fqdn, record_type, ttl, routing, value):
+        """Add or replace this spoke's item (``value=None`` removes it) in a routing-policy set.
+
+        The change deletes exactly the sets that were read and adds the
+        edited copies. If another spoke changed them in between, the
+        deletion no longer matches, the API rejects the change and the edit
+        is retried on a fresh read.
+        """
+        owner_fqdn = OWNER_RECORD_PREFIX + fqdn
+        last_error = None
+        for _ in range(ROUTING_CONFLICT_RETRIES):
+            current = self._get_rrset(fqdn, record_type)
+            owner_set = self._get_rrset(owner_fqdn, "TXT") if routing.weight is not None else None
+            owners = dict(decode_owner_txt(v) for v in (owner_set or {}).get("rrdatas", []))
+            changed, updated, owners = self._edit_routing_items(
+                current, fqdn, record_type, ttl, routing, value, owners, int(time.time()),
+                default_ttl=(owner_set or {}).get("ttl", 300),
+            )
+            deletions, additions = [], []
+            if changed:
+                deletions += [current] if current else []
+                additions += [updated] if updated else []
+            owner_rrdatas = sorted(f'"{encode_owner_txt(o, e)}"' for o, e in owners.items())
+            if routing.weight is not None and owner_rrdatas != sorted((owner_set or {}).get("rrdatas", [])):
+                deletions += [owner_set] if owner_set else []
+                if owner_rrdatas:
+                    owner_ttl = ttl if ttl is not None else (owner_set or current or {}).get("ttl", 300)
+                    additions.append({"name": owner_fqdn, "type": "TXT", "ttl": owner_ttl, "rrdatas": owner_rrdatas})
+            if not deletions and not additions:
+                return
+            try:
+                self.account_api_call(CHANGE)
+                self._api("POST", "/changes", data={"additions": additions, "deletions": deletions})
+                return
+            except (Conflict, PreconditionFailed) as e:
+                logger.info("[GCP] Concurrent change to %s, retrying", fqdn)
+                last_error = e
+        raise last_error
+
+    @staticmethod
+    def _edit_routing_items(current, fqdn, record_type, ttl, routing, value, owners, now=0, default_ttl=300):
+        """Return (changed, new record set or None, new owner table) with this spoke's item replaced or removed.
+
+        Weights map to a WRR policy; regions map to a geo policy, whose items
+        are keyed by location. WRR items have no key, so each spoke's item is
+        recorded under its set identifier in the owner table (the
+        ``_hdo-owners`` TXT record, see providers.aggregation) and the WRR
+        items are rebuilt from it. Items no entry accounts for, written
+        before the table existed or by other tools, are kept. A removal
+        (``ttl`` None) keeps the set's TTL, or ``default_ttl`` if the set is gone.
+        """
+        owners = dict(owners)
+        if routing.weight is not None:
+            policy_type = "wrr"
+        elif routing.region is not None:
+            policy_type = "geo"
+        else:
+            raise ValueError("Cloud DNS routing policies support the weight or region annotations, not geo-location")
+
+        if current is not None and policy_type not in current.get("routingPolicy", {}):
+            raise ValueError(f"{fqdn} {record_type} already exists without a {policy_type} routing policy")
+
+        items = current["routingPolicy"][policy_type]["items"] if current else []
+        if policy_type == "geo":
+            remaining = [i for i in items if i.get("location") != routing.region]
+            if value is not None:
+                remaining.append({"location": routing.region, "rrdatas": [value]})
+        else:
+            accounted = [list(e.values) for e in owners.values() if e.weight is not None]
+            if value is not None:
+                accounted.append([value])
+            remaining = [i for i in items if i.get("rrdatas") not in accounted]
+            previous = owners.get(routing.set_identifier)
+            if value is None:
+                owners.pop(routing.set_identifier, None)
+            elif previous is None or (previous.values, previous.weight) != ((value,), float(routing.weight)):
+                owners[routing.set_identifier] = OwnerEntry((value,), now, float(routing.weight))
+            remaining += [
+                {"weight": e.weight, "rrdatas": list(e.values)}
+                for _, e in sorted(owners.items()) if e.weight is not None
+            ]
+
+        if not remaining:
+            return current is not None, None, owners
+        if ttl is None:
+            ttl = current["ttl"] if current is not None else default_ttl
+        if current is not None and remaining == items and current.get("ttl") == ttl:
+            return False, current, owners
+        updated = {"name": fqdn, "type": record_type, "ttl": ttl, "routingPolicy": {policy_type: {"items": remaining}}}
+        return True, updated, owners
+
+    # -- aggregation (see providers.aggregation) -------------------------------
+
+    def _read_aggregate(self, record_name, record_type):
+        fqdn = self._fqdn(record_name)
+        record_set = self._get_rrset(fqdn, record_type.value)
+        owner_set = self._get_rrset(OWNER_RECORD_PREFIX + fqdn, "TXT")
+        if record_set is None and owner_set is None:
+            return None
+        owners = dict(decode_owner_txt(v) for v in (owner_set or {}).get("rrdatas", []))
+        return AggregateState((record_set or owner_set).get("ttl", 300), owners, (record_set, owner_set))
+
+    def _write_aggregate(self, record_name, record_type, ttl, owners, previous):
+        fqdn = self._fqdn(record_name)
+        deletions = [old for old in (previous.version if previous else ()) if old is not None]
+        additions = []
+        if owners:
+            additions = [
+                {"name": fqdn, "type": record_type.value, "ttl": ttl, "rrdatas": union(owners)},
+                {
+                    "name": OWNER_RECORD_PREFIX + fqdn,
+                    "type": "TXT",
+                    "ttl": ttl,
+                    "rrdatas": [f'"{encode_owner_txt(o, e)}"' for o, e in sorted(owners.items())],
+                },
+            ]
+        try:
+            self.account_api_call(CHANGE)
+            self._api("POST", "/changes", data={"additions": additions, "deletions": deletions})
+        except (Conflict, PreconditionFailed) as e:
+            raise ConcurrentChangeError(str(e)) from e
+
+    def _get_rrset(self, fqdn, record_type):
+        self.account_api_call(GET)
+        try:
+            return self._api("GET", f"/rrsets/{fqdn}/{record_type}")
+        except NotFound:
+            return None
+
+    def _api(self, method, path, data=None):
+        """Call the Cloud DNS REST API at ``path`` under the managed zone, retrying transient errors.
+
+        google-cloud-dns has no public call for a single record set or for
+        routing policies, so this is the one place that goes through the
+        client's private ``_connection``, the transport the library itself uses.
+        """
+        return self._retry(self._client._connection.api_request)(
+            method=method,
+            path=f"/projects/{self._project_id}/managedZones/{self._managed_zone}{path}",
+            data=data,
+        )
+
     def _find_record(self, fqdn: str, record_type: str):
-        """Find an existing DNS record by FQDN and type."""
-        for record_set in self._zone.list_resource_record_sets():
-            if record_set.name == fqdn and record_set.record_type == record_type:
-                return record_set
-        return None
+        """Find an existing DNS record by FQDN and type (one lookup, not a zone listing)."""
+        resource = self._get_rrset(fqdn, record_type)
+        if resource is None:
+            return None
+        return google_dns.ResourceRecordSet.from_api_repr(resource, self._zone)
+
+    def _zone_pages(self, page_size):
+        # The client library's max_results caps the total, not the page size,
+        # so pages come back at the API's default size.
+        for page in self._zone.list_resource_record_sets().pages:
+            self.account_api_call(LIST_PAGE)
+            yield [
+                ZoneRecord(rs.name.rstrip("."), rs.record_type, rs.ttl, tuple(rs.rrdatas))
+                for rs in page
+            ]
@@ -0,0 +1,301 @@
+"""Multi-provider fan-out implementation.
+
+Writes the same records to several DNS back-ends from a single watch stream.
+Each back-end has its own queue, worker tasks, rate limiter and retries:
+a write is queued for every back-end and the caller returns at once, so a
+slow or failing cloud only falls behind on its own work and never holds up
+the event pipeline or the other back-ends.
+
+Each queue keeps the newest intent per host, so a later write or a delete
+replaces one still waiting, and writes for one host never run concurrently
+on a back-end. A failed call is retried for that back-end and host only,
+with exponential backoff, or after ``retry_after`` for a call shed by an
+open circuit. Permanent errors and calls that keep failing are given up
+on and listed in ``snapshot()`` until the host is written again.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from prometheus_client import Counter, Gauge
+
+from providers.base import DNSProvider, ExtraRecord, RecordType, RoutingPolicy, record_options
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+dns_backend_queue_depth = Gauge(
+    'dns_operator_backend_queue_depth',
+    'Operations queued or running per back-end of a multi-provider fan-out',
+    ['provider']
+)
+
+dns_backend_retries_total = Counter(
+    'dns_operator_backend_retries_total',
+    'Failed back-end operations of a multi-provider fan-out by outcome (scheduled, given_up, recovered)',
+    ['provider', 'outcome']
+)
+
+
+class RateLimiter:
+    """Token bucket limiting calls to ``rate`` per second with a burst of ``burst``.
+
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float = 0.0, burst: int = 1):
+        self._rate = rate
+        self._burst = max(1, burst)
+        self._tokens = float(self._burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self._rate <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+                self._tokens = 1.0
+                self._updated = time.monotonic()
+            self._tokens -= 1
+
+
+@dataclass
+class _Job:
+    """The newest queued operation for one host on one back-end."""
+    key: str
+    operation: str
+    call: Callable[[DNSProvider], Awaitable[None]] = field(repr=False)
+    context: Any = field(default=None, repr=False)  # trace context of the caller
+    attempts: int = 0
+    error: str = ""
+    due: float = 0.0
+
+
+class _Backend:
+    """A wrapped provider with its own queue, workers, rate limiter and retries."""
+
+    def __init__(
+        self,
+        provider: DNSProvider,
+        max_concurrency: int,
+        rate_limit: float,
+        retry_base_delay: float,
+        retry_max_delay: float,
+        retry_max_attempts: int,
+    ):
+        self.provider = provider
+        self.name = provider.provider_name
+        self.workers = max(1, max_concurrency)
+        self.limiter = RateLimiter(rate_limit, burst=self.workers)
+        self.rate_limited = rate_limit > 0
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.retry_max_attempts = retry_max_attempts
+        self._queued: Dict[str, _Job] = {}  # in submission order
+        self._running: Set[str] = set()
+        self._retrying: Dict[str, Tuple[_Job, asyncio.TimerHandle]] = {}
+        self._given_up: Dict[str, _Job] = {}
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks: List[asyncio.Task] = []
+
+    def submit(self, key: str, operation: str, call: Callable[[DNSProvider], Awaitable[None]]) -> None:
+        """Queue ``call`` for ``key``, replacing whatever is waiting or parked for it."""
+        retrying = self._retrying.pop(key, None)
+        if retrying is not None:
+            retrying[1].cancel()
+        self._queued.pop(key, None)
+        self._queued[key] = _Job(key, operation, call, otel_context.get_current())
+        self._wake()
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def drain(self) -> None:
+        """Wait until nothing is queued or running (parked retries excepted)."""
+        await self._idle.wait()
+
+    def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for _, timer in self._retrying.values():
+            timer.cancel()
+        self._tasks = []
+
+    async def run(self, call: Callable[[DNSProvider], Awaitable[None]], context: Any = None) -> None:
+        attributes = {"dns.provider": self.name}
+        with tracer.start_as_current_span("dns.backend", context=context, attributes=attributes):
+            if self.rate_limited:
+                with tracer.start_as_current_span("dns.rate_limit_wait"):
+                    await self.limiter.acquire()
+            await call(self.provider)
+
+    def snapshot(self) -> Dict[str, Any]:
+        def view(job):
+            return {"host": job.key, "operation": job.operation, "attempts": job.attempts, "error": job.error}
+        now = time.time()
+        return {
+            "queued": [view(job) for job in self._queued.values()],
+            "running": sorted(self._running),
+            "retrying": [
+                {**view(job), "retry_in_seconds": round(max(0.0, job.due - now), 1)}
+                for job, _ in self._retrying.values()
+            ],
+            "given_up": [view(job) for job in self._given_up.values()],
+        }
+
+    async def _work(self) -> None:
+        while True:
+            key = next((k for k in self._queued if k not in self._running), None)
+            if key is None:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            job = self._queued.pop(key)
+            self._running.add(key)
+            try:
+                await self.run(job.call, job.context)
+            except Exception as e:
+                self._failed(job, e)
+            else:
+                if self._given_up.pop(key, None) is not None or job.attempts:
+                    dns_backend_retries_total.labels(provider=self.name, outcome="recovered").inc()
+            finally:
+                self._running.discard(key)
+                self._wake()
+
+    def _failed(self, job: _Job, error: BaseException) -> None:
+        retry_after = getattr(error, "retry_after", None)
+        job.attempts += retry_after is None  # a call shed by an open circuit never reached the API
+        job.error = f"{type(error).__name__}: {error}"
+        if job.key in self._queued:
+            return  # a newer intent for the host is already waiting
+        if not self.provider.is_retryable_error(error) or job.attempts >= self.retry_max_attempts:
+            self._given_up[job.key] = job
+            dns_backend_retries_total.labels(provider=self.name, outcome="given_up").inc()
+            logger.error(
+                "[multi] Back-end %s gave up on %s %s after %d attempt(s): %s",
+                self.name, job.operation, job.key, job.attempts, job.error, extra={"host": job.key},
+            )
+            return
+        delay = self._backoff(job.attempts) if retry_after is None else retry_after
+        job.due = time.time() + delay
+        timer = asyncio.get_running_loop().call_later(delay, self._requeue, job)
+        self._retrying[job.key] = (job, timer)
+        dns_backend_retries_total.labels(provider=self.name, outcome="scheduled").inc()
+        logger.warning(
+            "[multi] Back-end %s failed %s %s, retrying in %.1fs: %s",
+            self.name, job.operation, job.key, delay, job.error, extra={"host": job.key},
+        )
+
+    def _requeue(self, job: _Job) -> None:
+        if self._retrying.get(job.key, (None,))[0] is not job:
+            return
+        del self._retrying[job.key]
+        self._queued[job.key] = job
+        self._wake()
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)  # nosec B311 - spreading retries, not security
+
+    def _wake(self) -> None:
+        self._ready.set()
+        busy = len(self._queued) + len(self._running)
+        dns_backend_queue_depth.labels(provider=self.name).set(busy)
+        if busy:
+            self._idle.clear()
+        else:
+            self._idle.set()
+
+
+class MultiDNSProvider(DNSProvider):
+    """Composite provider that queues every operation for each back-end.
+
+    The write methods return once the operation is queued everywhere; use
+    ``drain()`` to wait for the queues to empty.
+    """
+
+    def __init__(
+        self,
+        providers: List[DNSProvider],
+        max_concurrency: int = 8,
+        rate_limits: Optional[Dict[str, float]] = None,
+        retry_base_delay: float = 1.0,
+        retry_max_delay: float = 300.0,
+        retry_max_attempts: int = 10,
+    ):
+        if not providers:
+            raise ValueError("MultiDNSProvider requires at least one provider")
+        rate_limits = rate_limits or {}
+        self._backends = [
+            _Backend(
+                p, max_concurrency, rate_limits.get(p.provider_name, 0.0),
+                retry_base_delay, retry_max_delay, retry_max_attempts,
+            )
+            for p in providers
+        ]
+
+    @property
+    def provider_name(self) -> str:
+        return "+".join(b.provider.provider_name for b in self._backends)
+
+    @property
+    def providers(self) -> List[DNSProvider]:
+        return [b.provider for b in self._backends]
+
+    async def create_or_update_record(
+        self,
+        record_name: str,
+        value: str,
+        record_type: RecordType = RecordType.A,
+        ttl: int = 300,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
+    ) -> None:
+        extra = record_options(routing, extras)
+        self._fan_out(
+            record_name, "upsert", lambda p: p.create_or_update_record(record_name, value, record_type, ttl, **extra),
+        )
+
+    async def delete_record(
+        self,
+        record_name: str,
+        record_type: RecordType = RecordType.A,
+        routing: Optional[RoutingPolicy] = None,
+        extras: Sequence[ExtraRecord] = (),
+    ) -> None:
+        extra = record_options(routing, extras)
+        self._fan_out(record_name, "delete", lambda p: p.delete_record(record_name, record_type, **extra))
+
+    async def write_extra_records(self, extras: Sequence[ExtraRecord], ttl: int = 300, delete: bool = False) -> None:
+        key = "extras:" + ",".join(sorted({f"{e.name}/{e.record_type.value}" for e in extras}))
+        self._fan_out(key, "delete" if delete else "upsert", lambda p: p.write_extra_records(extras, ttl, delete))
+
+    async def drain(self) -> None:
+        """Wait until every back-end has run all queued operations (parked retries excepted)."""
+        await asyncio.gather(*(b.drain() for b in self._backends))
+
+    def close(self) -> None:
+        """Stop the back-end workers; operations still queued are dropped."""
+        for backend in self._backends:
+            backend.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Queued, running, retrying and given-up operations per back-end (for debugging endpoints)."""
+        return {b.name: b.snapshot() for b in self._backends}
+
+    def _fan_out(self, key: str, operation: str, call: Callable[[DNSProvider], Awaitable[None]]) -> None:
+        for backend in self._backends:
+            backend.submit(key, operation, call)
@@ -0,0 +1,69 @@
+"""Incremental comparison of desired records against a streamed zone.
+
+The zone side is consumed as an async stream of ZoneRecords (see
+DNSProvider.iter_zone_records), so a full reconcile holds the desired
+records plus one page of the zone in memory, however large the zone is.
+"""
+
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, NamedTuple, Optional, Tuple
+
+from derivation import DesiredRecord
+from providers.base import ZoneRecord
+
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+
+
+class Change(NamedTuple):
+    """One difference between the desired state and the zone."""
+    action: str
+    name: str
+    record_type: str
+    desired: Optional[DesiredRecord]
+    current: Optional[ZoneRecord]
+
+
+def _normalize(name: str) -> str:
+    return name.rstrip(".").lower()
+
+
+def record_key(name: str, record_type: str) -> Tuple[str, str]:
+    """Key record sets by case-insensitive name (without trailing dot) and type."""
+    return _normalize(name), record_type
+
+
+def matches(desired: DesiredRecord, current: ZoneRecord) -> bool:
+    """Whether a zone record already carries the desired value and TTL."""
+    return (
+        current.ttl == desired.ttl
+        and len(current.values) == 1
+        and _normalize(current.values[0]) == _normalize(desired.value)
+    )
+
+
+async def diff_zone(
+    desired: Iterable[DesiredRecord],
+    zone: AsyncIterable[ZoneRecord],
+    owned: Optional[Callable[[ZoneRecord], bool]] = None,
+) -> AsyncIterator[Change]:
+    """Yield the changes that bring ``zone`` in line with ``desired``.
+
+    Each zone record is compared and dropped as soon as it arrives; desired
+    records are removed from the working set once matched, so memory only
+    shrinks while the zone is read. Zone records nobody asked for are
+    reported as deletions only when ``owned`` claims them; without it the
+    diff never deletes anything.
+    """
+    pending = {record_key(r.domain, r.record_type.value): r for r in desired}
+    async for current in zone:
+        key = record_key(current.name, current.record_type)
+        want = pending.pop(key, None)
+        if want is None:
+            if owned is not None and owned(current):
+                yield Change(DELETE, key[0], current.record_type, None, current)
+        elif not matches(want, current):
+            yield Change(UPDATE, key[0], current.record_type, want, current)
+
+    for (name, record_type), want in pending.items():
+        yield Change(CREATE, name, record_type, want, None)
@@ -0,0 +1,167 @@
+"""Compact in-memory store of the DNS records the operator manages.
+
+With tens of thousands of Ingresses, a dict of DNSRecord objects is mostly
+overhead: every record carries its own copy of the zone suffix and of a
+load balancer target that hundreds of other records share. The store keeps
+records column-wise instead:
+
+* names are split into their first label and a zone suffix; each distinct
+  suffix is stored once and owns a dict of labels to row numbers;
+* values (IPs, target hostnames) live in a refcounted pool and rows refer
+  to them by index;
+* record type, TTL, value index and a content hash are packed into
+  ``array`` columns, so a row costs a few bytes rather than an object.
+
+The content hash makes "is this write a no-op?" one integer comparison.
+"""
+
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from providers.base import DNSRecord, RecordType
+
+_TYPES: List[RecordType] = list(RecordType)
+_TYPE_IDS: Dict[RecordType, int] = {t: i for i, t in enumerate(_TYPES)}
+
+
+def content_hash(value: str, record_type: RecordType, ttl: int) -> int:
+    """Hash of everything but the name; equal records have equal hashes."""
+    return hash((value, record_type.value, ttl))
+
+
+def _split(name: str) -> Tuple[str, str]:
+    label, _, suffix = name.partition(".")
+    return label, suffix
+
+
+class _ValuePool:
+    """Refcounted, de-duplicated string table."""
+
+    def __init__(self):
+        self._values: List[Optional[str]] = []
+        self._refs = array("I")
+        self._ids: Dict[str, int] = {}
+        self._free: List[int] = []
+
+    def acquire(self, value: str) -> int:
+        index = self._ids.get(value)
+        if index is None:
+            if self._free:
+                index = self._free.pop()
+                self._values[index] = value
+                self._refs[index] = 0
+            else:
+                index = len(self._values)
+                self._values.append(value)
+                self._refs.append(0)
+            self._ids[value] = index
+        self._refs[index] += 1
+        return index
+
+    def release(self, index: int) -> None:
+        self._refs[index] -= 1
+        if self._refs[index] == 0:
+            del self._ids[self._values[index]]
+            self._values[index] = None
+            self._free.append(index)
+
+    def __getitem__(self, index: int) -> str:
+        return self._values[index]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+class RecordStore:
+    """Records keyed by name, stored in shared pools and array columns."""
+
+    def __init__(self):
+        self._zones: Dict[str, Dict[str, int]] = {}
+        self._values = _ValuePool()
+        self._value_ids = array("I")
+        self._types = array("B")
+        self._ttls = array("I")
+        self._hashes = array("q")
+        self._free: List[int] = []
+        self._count = 0
+
+    def put(self, record: DNSRecord) -> bool:
+        """Insert or replace ``record``; return False if it was already stored unchanged."""
+        digest = content_hash(record.value, record.record_type, record.ttl)
+        label, suffix = _split(record.name)
+        rows = self._zones.setdefault(suffix, {})
+        row = rows.get(label)
+        if row is not None:
+            if self._hashes[row] == digest and self._row_equals(row, record):
+                return False
+            self._values.release(self._value_ids[row])
+        else:
+            row = self._allocate()
+            rows[label] = row
+            self._count += 1
+
+        self._value_ids[row] = self._values.acquire(record.value)
+        self._types[row] = _TYPE_IDS[record.record_type]
+        self._ttls[row] = record.ttl
+        self._hashes[row] = digest
+        return True
+
+    def get(self, name: str) -> Optional[DNSRecord]:
+        label, suffix = _split(name)
+        row = self._zones.get(suffix, {}).get(label)
+        return None if row is None else self._record(name, row)
+
+    def unchanged(self, name: str, value: str, record_type: RecordType, ttl: int) -> bool:
+        """Whether ``name`` is already stored with exactly this content."""
+        label, suffix = _split(name)
+        row = self._zones.get(suffix, {}).get(label)
+        return (
+            row is not None
+            and self._hashes[row] == content_hash(value, record_type, ttl)
+            and self._row_equals(row, DNSRecord(name, value, record_type, ttl))
+        )
+
+    def remove(self, name: str) -> bool:
+        label, suffix = _split(name)
+        rows = self._zones.get(suffix)
+        row = rows.pop(label, None) if rows is not None else None
+        if row is None:
+            return False
+        if not rows:
+            del self._zones[suffix]
+        self._values.release(self._value_ids[row])
+        self._free.append(row)
+        self._count -= 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {"records": self._count, "zones": len(self._zones), "distinct_values": len(self._values)}
+
+    def __contains__(self, name: str) -> bool:
+        label, suffix = _split(name)
+        return label in self._zones.get(suffix, ())
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[DNSRecord]:
+        for suffix, rows in self._zones.items():
+            for label, row in rows.items():
+                yield self._record(f"{label}.{suffix}" if suffix else label, row)
+
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        for column in (self._value_ids, self._types, self._ttls, self._hashes):
+            column.append(0)
+        return len(self._hashes) - 1
+
+    def _record(self, name: str, row: int) -> DNSRecord:
+        return DNSRecord(name, self._values[self._value_ids[row]], _TYPES[self._types[row]], self._ttls[row])
+
+    def _row_equals(self, row: int, record: DNSRecord) -> bool:
+        return (
+            self._values[self._value_ids[row]] == record.value
+            and _TYPES[self._types[row]] == record.record_type
+            and self._ttls[row] == record.ttl
+        )
@@ -0,0 +1,212 @@
+"""Replay a trace recorded with TRACE_FILE through the operator's event handlers.
+
+Each recorded event is fed to the handler main.py registered for its
+source, at the recorded pace divided by ``--speed`` (0 = as fast as
+possible). Events of one object run in order and those of different
+objects concurrently, as under kopf. Provider calls go to the in-memory
+fake provider, which blocks an executor thread for the latency recorded
+for the same call and repeats recorded failures. Calls the trace has no
+record of take ``--latency`` seconds.
+
+Run from the operator directory with the tuning settings to validate
+(DNS_WORKERS, DNS_SETTLE_SECONDS, EXECUTOR_MAX_WORKERS, CIRCUIT_*, ...):
+
+    python replay.py trace.jsonl.gz [--speed 10] [--latency 0.05] [--format json]
+
+The replay never writes DNS or talks to a cluster: CLOUD_PROVIDER is
+forced to ``fake``, and aggregation, propagation checks, dry run and
+tracing are turned off. Warning events are counted, not posted.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from event_trace import read_trace
+from providers.base import DNSProvider
+from providers.fake import FakeDNSProvider
+
+logger = logging.getLogger(__name__)
+
+# Settings that would reach outside the process, cleared before main.py is imported
+_REPLAY_ENV = {
+    "CLOUD_PROVIDER": "fake", "DRY_RUN": "false", "TRACE_FILE": "",
+    "AGGREGATION_OWNER_ID": "", "PROPAGATION_NAMESERVERS": "",
+}
+
+
+@dataclass
+class ReplayReport:
+    events: int = 0
+    handler_errors: int = 0
+    provider_calls: int = 0
+    warnings: int = 0
+    retry_backlog: int = 0
+    elapsed_seconds: float = 0.0
+    dispatch_lag: List[float] = field(default_factory=list)   # how late each event was handed to its handler
+    handler_seconds: List[float] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "events": self.events,
+            "handler_errors": self.handler_errors,
+            "provider_calls": self.provider_calls,
+            "warnings": self.warnings,
+            "retry_backlog": self.retry_backlog,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "dispatch_lag_seconds": _summary(self.dispatch_lag),
+            "handler_seconds": _summary(self.handler_seconds),
+        }
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def percentile(p):
+        return round(ordered[min(len(ordered) - 1, math.ceil(p * len(ordered)) - 1)], 4)
+    return {"p50": percentile(0.5), "p99": percentile(0.99), "max": round(ordered[-1], 4)}
+
+
+def fake_backend(provider: DNSProvider) -> FakeDNSProvider:
+    """The FakeDNSProvider under the operator's provider wrappers (circuit breaker, ...)."""
+    while not isinstance(provider, FakeDNSProvider):
+        provider = provider._provider
+    return provider
+
+
+def script_provider(provider: FakeDNSProvider, records: Iterable[dict]) -> None:
+    """Queue each recorded provider call's latency and outcome on the fake provider."""
+    for record in records:
+        if "call" in record:
+            operation = "delete" if record["call"] == "delete" else "upsert"
+            provider.expect(operation, record["host"], record["seconds"], record.get("error"))
+
+
+def _object_key(record: dict) -> tuple:
+    metadata = record["object"].get("metadata") or {}
+    return record["source"], metadata.get("uid") or f"{metadata.get('namespace', '')}/{metadata.get('name', '')}"
+
+
+@contextlib.contextmanager
+def _capture_warnings() -> Iterator[List[tuple]]:
+    """Collect what kopf.warn and Warning kopf.event calls would post, outside a running operator."""
+    import kopf
+    posted = []
+
+    def warn(objs, *, reason, message=""):
+        posted.append((reason, message))
+
+    def event(objs, *, type, reason, message=""):
+        if type == "Warning":
+            posted.append((reason, message))
+
+    originals = kopf.warn, kopf.event
+    kopf.warn, kopf.event = warn, event
+    try:
+        yield posted
+    finally:
+        kopf.warn, kopf.event = originals
+
+
+async def replay(operator, records: List[dict], speed: float = 1.0, provider: Optional[FakeDNSProvider] = None):
+    """Feed the recorded events through ``operator`` (the main module) and report how it kept up."""
+    import sources
+    handlers = {
+        sources.INGRESS: operator.ingress_event_handler,
+        sources.SERVICE: operator.service_event_handler,
+        sources.HTTPROUTE: operator.httproute_event_handler,
+        sources.GATEWAY: operator.gateway_event_handler,
+    }
+    provider = provider or fake_backend(operator.dns_provider)
+    script_provider(provider, records)
+    calls_before = provider.calls
+    report = ReplayReport()
+    chains: Dict[tuple, asyncio.Task] = {}
+
+    async def run(previous, handler, event):
+        if previous is not None:
+            await previous
+        began = time.monotonic()
+        try:
+            await handler(event)
+        except Exception as e:
+            report.handler_errors += 1
+            logger.warning("Replayed %s event failed: %s", event["type"], e)
+        report.handler_seconds.append(time.monotonic() - began)
+
+    start = time.monotonic()
+    with _capture_warnings() as warnings:
+        for record in records:
+            if "source" not in record:
+                continue
+            if speed > 0:
+                delay = start + record["t"] / speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                report.dispatch_lag.append(max(0.0, -delay))
+            key = _object_key(record)
+            event = {"type": record["type"], "object": record["object"]}
+            chains[key] = asyncio.create_task(run(chains.get(key), handlers[record["source"]], event))
+            report.events += 1
+
+        await asyncio.gather(*chains.values())
+        while operator.debouncer is not None and len(operator.debouncer):
+            await asyncio.sleep(0.05)
+    report.elapsed_seconds = time.monotonic() - start
+    report.provider_calls = provider.calls - calls_before
+    report.warnings = len(warnings)
+    report.retry_backlog = len(operator.retries)
+    return report
+
+
+def format_text(report: ReplayReport) -> str:
+    summary = report.to_dict()
+    lines = [
+        f"Replayed {report.events} events in {summary['elapsed_seconds']}s "
+        f"({report.provider_calls} provider calls, {report.handler_errors} handler errors, "
+        f"{report.warnings} warnings, {report.retry_backlog} left in the retry backlog)",
+    ]
+    for name in ("dispatch_lag_seconds", "handler_seconds"):
+        if summary[name]:
+            lines.append(f"  {name}: " + ", ".join(f"{k} {v}" for k, v in summary[name].items()))
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a recorded event trace against the fake provider.")
+    parser.add_argument("trace", help="trace file written with TRACE_FILE")
+    parser.add_argument("--speed", type=float, default=1.0, help="pace multiplier (0 = as fast as possible)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per provider call not in the trace")
+    parser.add_argument("--format", choices=("text", "json"), default="text")
+    args = parser.parse_args(argv)
+
+    os.environ.update(_REPLAY_ENV)
+    os.environ["FAKE_PROVIDER_LATENCY_SECONDS"] = str(args.latency)
+    import main as operator
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(operator.ThreadPoolExecutor(max_workers=operator.EXECUTOR_MAX_WORKERS))
+        retries = asyncio.create_task(operator.retries.run())
+        try:
+            return await replay(operator, list(read_trace(args.trace)), args.speed)
+        finally:
+            retries.cancel()
+
+    report = asyncio.run(run())
+    print(json.dumps(report.to_dict(), indent=2) if args.format == "json" else format_text(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
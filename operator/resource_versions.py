@@ -0,0 +1,58 @@
+"""Last reconciled resourceVersion per Ingress.
+
+kopf resumes each watch from the last resourceVersion it saw (the API
+server's bookmarks keep that version fresh on quiet clusters). When the
+version has expired, or the operator restarts, kopf lists every Ingress
+again. Remembering the version each Ingress was last handled at lets the
+event handler tell the replayed objects from the changed ones:
+
+* an ADDED/MODIFIED event at an already handled version is a replay and is
+  dropped before any provider work;
+* an object in a re-list whose version moved on changed while the watch was
+  down, so it is handled as an update;
+* an object first seen in a listing (operator start) is only recorded.
+
+Objects without a resourceVersion are never treated as replays.
+"""
+
+from typing import Dict, Optional
+
+from prometheus_client import Counter
+
+LISTED = "listed"        # first seen in a listing; record only
+REPLAYED = "replayed"    # version already handled; drop
+CHANGED = "changed"      # new version; handle the event
+
+dns_replayed_events_total = Counter(
+    'dns_operator_replayed_events_total',
+    'Ingress events dropped because their resourceVersion was already handled'
+)
+
+
+class ResourceVersionTracker:
+    """Map of Ingress key -> resourceVersion it was last handled at."""
+
+    def __init__(self):
+        self._versions: Dict[str, str] = {}
+
+    def observe(self, key: str, version: Optional[str], listed: bool) -> str:
+        """Record ``version`` for ``key`` and classify the event that carried it.
+
+        ``listed`` is True for objects from a (re-)listing, False for watch
+        events. Returns LISTED, REPLAYED or CHANGED.
+        """
+        previous = self._versions.get(key)
+        if version is not None and version == previous:
+            dns_replayed_events_total.inc()
+            return REPLAYED
+        if version is not None:
+            self._versions[key] = version
+        if listed and previous is None:
+            return LISTED
+        return CHANGED
+
+    def forget(self, key: str) -> None:
+        self._versions.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._versions)
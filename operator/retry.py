@@ -0,0 +1,275 @@
+"""Retry backlog for DNS operations that failed.
+
+A failed write is not dropped: it is parked under its host with the
+operation needed to redo it, and retried with exponential backoff and
+jitter until it succeeds. Operations are keyed by host, so a newer intent
+for the same host (another update, or a delete) replaces the parked one,
+and any later success for the host clears it.
+
+Errors the provider classifies as permanent, and operations that keep
+failing for ``max_attempts`` tries, move to the dead-letter list. They stay
+there until the host is written successfully again, and are visible on
+``/debug/queues`` and through ``dns_operator_retry_dead_letters``.
+
+With ``state_file`` set, the backlog and dead letters are saved as JSON
+and reloaded on start, so pending repairs survive a restart of the
+operator (e.g. on an emptyDir volume). Changes are batched: the file is
+written in a thread at most every ``save_interval`` seconds, with each
+payload reduced by ``slim`` (e.g. to the object's identity) first.
+
+Up to ``concurrency`` due operations are retried at once, so one slow
+back-end does not hold up the retries of every other host.
+
+An exception escaping ``execute`` is classified with ``is_retryable``, like
+a failure reported through ``failed``.
+
+An error with a ``retry_after`` attribute (CircuitOpenError) means the call
+was shed without reaching the API: it is retried after that many seconds
+and does not use up an attempt.
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import math
+import os
+import random
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+dns_retry_backlog = Gauge(
+    'dns_operator_retry_backlog',
+    'Failed DNS operations waiting to be retried'
+)
+
+dns_retry_dead_letters = Gauge(
+    'dns_operator_retry_dead_letters',
+    'Failed DNS operations given up on (permanent error or too many attempts)'
+)
+
+dns_retries_total = Counter(
+    'dns_operator_retries_total',
+    'Failed DNS operations by outcome (scheduled, dead_letter, recovered)',
+    ['outcome']
+)
+
+
+@dataclass(slots=True)
+class RetryEntry:
+    key: str
+    operation: str          # "upsert" or "delete"
+    payload: Any            # JSON-serialisable input to redo the operation (the Ingress body)
+    attempts: int
+    error: str
+    due: float              # unix time of the next attempt (inf while an attempt runs)
+
+
+class RetryQueue:
+    """Backoff scheduler for failed operations, with a dead-letter list."""
+
+    def __init__(
+        self,
+        execute: Callable[[str, Any], Awaitable[None]],
+        base_delay: float = 1.0,
+        max_delay: float = 300.0,
+        max_attempts: int = 10,
+        state_file: str = "",
+        max_dead_letters: int = 1000,
+        concurrency: int = 8,
+        is_retryable: Optional[Callable[[BaseException], bool]] = None,
+        slim: Optional[Callable[[Any], Any]] = None,
+        save_interval: float = 1.0,
+    ):
+        self.execute = execute
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.state_file = state_file
+        self.max_dead_letters = max_dead_letters
+        self.is_retryable = is_retryable or (lambda error: False)
+        self.slim = slim or (lambda payload: payload)
+        self.save_interval = save_interval
+        self._pending: Dict[str, RetryEntry] = {}
+        self._dead: Dict[str, RetryEntry] = {}
+        self._heap: List[tuple] = []  # (due, key); stale items are skipped on pop
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+        self._attempts = set()  # running attempt tasks
+        self._dirty = False
+        self._saver: Optional[asyncio.Task] = None
+        self._flush_requested = asyncio.Event()
+        if state_file:
+            self._load()
+
+    def failed(self, key: str, operation: str, payload: Any, error: BaseException, retryable: bool = True) -> None:
+        """Park a failed operation for retry, or dead-letter it."""
+        previous = self._pending.pop(key, None)
+        self._dead.pop(key, None)
+        retry_after = getattr(error, "retry_after", None)
+        attempts = (previous.attempts if previous else 0) + (retry_after is None)
+        entry = RetryEntry(key, operation, payload, attempts, f"{type(error).__name__}: {error}", math.inf)
+
+        if not retryable or attempts >= self.max_attempts:
+            self._dead[key] = entry
+            while len(self._dead) > self.max_dead_letters:
+                self._dead.pop(next(iter(self._dead)))
+            dns_retries_total.labels(outcome="dead_letter").inc()
+            logger.error(
+                "Giving up on %s %s after %d attempt(s): %s", operation, key, attempts, entry.error,
+                extra={"host": key},
+            )
+        else:
+            entry.due = time.time() + (self.backoff(attempts) if retry_after is None else retry_after)
+            self._pending[key] = entry
+            heapq.heappush(self._heap, (entry.due, key))
+            self._wakeup.set()
+            dns_retries_total.labels(outcome="scheduled").inc()
+            logger.info(
+                "Retrying %s %s in %.1fs (attempt %d)", operation, key, entry.due - time.time(), attempts + 1,
+                extra={"host": key},
+            )
+        self._changed()
+
+    def succeeded(self, key: str) -> None:
+        """Forget any parked or dead-lettered operation for ``key``."""
+        if self._pending.pop(key, None) is not None or self._dead.pop(key, None) is not None:
+            dns_retries_total.labels(outcome="recovered").inc()
+            self._changed()
+
+    def backoff(self, attempts: int) -> float:
+        """Exponential delay capped at ``max_delay``, with equal jitter (half fixed, half random)."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)  # nosec B311 - spreading retries, not security
+
+    def due(self, now: Optional[float] = None) -> List[RetryEntry]:
+        """Pop the entries whose time has come and mark them as running."""
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            at, key = heapq.heappop(self._heap)
+            entry = self._pending.get(key)
+            if entry is not None and entry.due == at:
+                entry.due = math.inf
+                due.append(entry)
+        return due
+
+    async def run(self) -> None:
+        """Retry due operations forever; each attempt reports back through failed/succeeded."""
+        try:
+            while True:
+                for entry in self.due():
+                    task = asyncio.create_task(self._attempt(entry))
+                    self._attempts.add(task)
+                    task.add_done_callback(self._attempts.discard)
+                self._wakeup.clear()
+                timeout = max(0.0, self._heap[0][0] - time.time()) if self._heap else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in list(self._attempts):
+                task.cancel()
+
+    async def _attempt(self, entry: RetryEntry) -> None:
+        async with self._slots:
+            try:
+                await self.execute(entry.operation, entry.payload)
+            except Exception as e:
+                self.failed(entry.key, entry.operation, entry.payload, e, self.is_retryable(e))
+            else:
+                # The operation neither succeeded nor failed again (e.g. it no longer applies)
+                if entry.due == math.inf and self._pending.get(entry.key) is entry:
+                    del self._pending[entry.key]
+                    self._changed()
+
+    def snapshot(self) -> Dict[str, Any]:
+        def view(entry):
+            return {
+                "host": entry.key, "operation": entry.operation, "attempts": entry.attempts, "error": entry.error,
+                **({"retry_in_seconds": round(entry.due - time.time(), 1)} if entry.due != math.inf else {}),
+            }
+        return {
+            "backlog": [view(e) for e in sorted(self._pending.values(), key=lambda e: e.due)],
+            "dead_letters": [view(e) for e in self._dead.values()],
+        }
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _changed(self) -> None:
+        dns_retry_backlog.set(len(self._pending))
+        dns_retry_dead_letters.set(len(self._dead))
+        if not self.state_file:
+            return
+        self._dirty = True
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(self._state())  # no loop (start-up, tests): nothing to stall
+            self._dirty = False
+            return
+        if self._saver is None or self._saver.done():
+            self._saver = asyncio.create_task(self._save_later())
+
+    async def flush(self) -> None:
+        """Write out a pending change of the saved state now (e.g. on shutdown)."""
+        if self._saver is not None and not self._saver.done():
+            self._flush_requested.set()
+            await self._saver
+        elif self._dirty:
+            self._dirty = False
+            await asyncio.to_thread(self._write, self._state())
+
+    async def _save_later(self) -> None:
+        while self._dirty:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), self.save_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._dirty = False
+            await asyncio.to_thread(self._write, self._state())
+        self._flush_requested.clear()
+
+    def _state(self) -> Dict[str, Any]:
+        def saved(entry):
+            return asdict(entry) | {"payload": self.slim(entry.payload), "due": None}
+        return {
+            "pending": [saved(e) for e in self._pending.values()],
+            "dead": [saved(e) for e in self._dead.values()],
+        }
+
+    def _write(self, state: Dict[str, Any]) -> None:
+        tmp = f"{self.state_file}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp, self.state_file)
+        except OSError as e:
+            logger.error("Could not save retry backlog to %s: %s", self.state_file, e)
+
+    def _load(self) -> None:
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error("Ignoring unreadable retry backlog %s: %s", self.state_file, e)
+            return
+        now = time.time()
+        for item in state.get("pending", []):
+            entry = RetryEntry(**{**item, "due": now + self.backoff(1)})
+            self._pending[entry.key] = entry
+            heapq.heappush(self._heap, (entry.due, entry.key))
+        for item in state.get("dead", []):
+            self._dead[item["key"]] = RetryEntry(**{**item, "due": math.inf})
+        logger.info("Loaded %d pending retries and %d dead letters", len(self._pending), len(self._dead))
+        dns_retry_backlog.set(len(self._pending))
+        dns_retry_dead_letters.set(len(self._dead))
@@ -0,0 +1,154 @@
+"""Priority scheduling of DNS provider work."""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from prometheus_client import Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Scheduling classes; lower values are served first."""
+    HIGH = 0    # new records and deletions
+    MEDIUM = 1  # target changes
+    LOW = 2     # resyncs and drift repair
+
+
+scheduler_queue_depth = Gauge(
+    'dns_operator_queue_depth',
+    'Number of DNS operations waiting in the scheduler queue',
+    ['priority']
+)
+
+scheduler_queue_wait_seconds = Histogram(
+    'dns_operator_queue_wait_seconds',
+    'Time DNS operations spent waiting in the scheduler queue',
+    ['priority'],
+    buckets=[0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0]
+)
+
+
+_Job = Tuple[float, str, Callable[[], Awaitable[Any]], asyncio.Future]
+
+
+class PriorityScheduler:
+    """Run DNS work on a fixed pool of workers, highest priority first.
+
+    To keep resyncs from starving completely under a constant stream of
+    high-priority work, a waiting class is served after it has been passed
+    over ``starvation_limit`` times in a row. ``defer`` may hold back whole
+    classes temporarily (e.g. LOW work while the API-call budget is spent);
+    deferred classes are re-checked every ``defer_poll_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        starvation_limit: int = 10,
+        defer: Optional[Callable[[Priority], bool]] = None,
+        defer_poll_interval: float = 1.0,
+    ):
+        self._workers = max(1, workers)
+        self._starvation_limit = max(1, starvation_limit)
+        self._defer = defer
+        self._defer_poll_interval = defer_poll_interval
+        self._queues: Dict[Priority, Deque[_Job]] = {p: deque() for p in Priority}
+        self._skipped: Dict[Priority, int] = {p: 0 for p in Priority}
+        self._available: Optional[asyncio.Condition] = None
+        self._tasks: List[asyncio.Task] = []
+        self._in_flight: Dict[int, Tuple[str, Priority, float]] = {}
+        for priority in Priority:
+            scheduler_queue_depth.labels(priority=priority.name.lower()).set(0)
+
+    async def submit(self, priority: Priority, label: str, job: Callable[[], Awaitable[Any]]) -> Any:
+        """Queue ``job`` with the given priority and wait for its result."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        async with self._available:
+            self._queues[priority].append((time.monotonic(), label, job, future))
+            scheduler_queue_depth.labels(priority=priority.name.lower()).inc()
+            self._available.notify()
+        return await future
+
+    def depth(self, priority: Optional[Priority] = None) -> int:
+        if priority is not None:
+            return len(self._queues[priority])
+        return sum(len(q) for q in self._queues.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Describe queued and running jobs (for debugging endpoints)."""
+        now = time.monotonic()
+        return {
+            "queued": {
+                p.name.lower(): [
+                    {"label": label, "waiting_seconds": round(now - enqueued, 3)}
+                    for enqueued, label, _, _ in self._queues[p]
+                ]
+                for p in Priority
+            },
+            "running": [
+                {"label": label, "priority": p.name.lower(), "running_seconds": round(now - started, 3)}
+                for label, p, started in self._in_flight.values()
+            ],
+        }
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._available = None
+
+    def _ensure_started(self) -> None:
+        if self._tasks:
+            return
+        self._available = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self._workers)]
+
+    def _next_priority(self) -> Optional[Priority]:
+        waiting = [p for p in Priority if self._queues[p] and not (self._defer and self._defer(p))]
+        if not waiting:
+            return None
+        chosen = waiting[0]
+        for p in reversed(waiting[1:]):
+            if self._skipped[p] >= self._starvation_limit:
+                chosen = p
+                break
+        for p in waiting:
+            self._skipped[p] = 0 if p == chosen else self._skipped[p] + (p > chosen)
+        return chosen
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            async with self._available:
+                priority = self._next_priority()
+                timeout = self._defer_poll_interval if self._defer else None
+                while priority is None:
+                    try:
+                        await asyncio.wait_for(self._available.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    priority = self._next_priority()
+                enqueued, label, job, future = self._queues[priority].popleft()
+            name = priority.name.lower()
+            scheduler_queue_depth.labels(priority=name).dec()
+            scheduler_queue_wait_seconds.labels(priority=name).observe(time.monotonic() - enqueued)
+            if future.cancelled():
+                continue
+
+            self._in_flight[worker_id] = (label, priority, time.monotonic())
+            try:
+                result = await job()
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self._in_flight.pop(worker_id, None)
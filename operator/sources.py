@@ -0,0 +1,154 @@
+"""Services of type LoadBalancer and Gateway API HTTPRoutes as record sources.
+
+The rest of the operator (ownership, derivation, debouncing, scheduling,
+retries) works on Ingress-shaped objects: one host in
+``spec.rules[0].host``, the target in ``status.loadBalancer.ingress`` or the
+target-hostname annotation, and the class in ``spec.ingressClassName``. Each
+source here turns its object into such a view, keeping the original
+apiVersion, kind and metadata so keys, ownership ranks and Warning events
+still refer to the real object:
+
+* a Service of type LoadBalancer with a ``hub-dns-operator.io/hostname``
+  annotation points that host at its load balancer; ``loadBalancerClass``
+  plays the role of the Ingress class;
+* an HTTPRoute points its first hostname at the addresses of its parent
+  Gateway; the Gateway's ``gatewayClassName`` plays the role of the Ingress
+  class.
+
+A load balancer or Gateway that only reports a hostname (e.g. an AWS ELB)
+is treated like a target-hostname annotation, so the record becomes a
+CNAME. Gateways are watched only to index their addresses: the
+GatewayIndex tells which routes to re-derive when a Gateway's addresses or
+class change.
+"""
+
+import os
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from annotations import ANNOTATION_TARGET_HOSTNAME
+
+INGRESS = "ingress"
+SERVICE = "service"
+HTTPROUTE = "httproute"
+SOURCE_NAMES = (INGRESS, SERVICE, HTTPROUTE)
+GATEWAY = "gateway"  # watched with the httproute source
+
+# Host a LoadBalancer Service is published under
+ANNOTATION_HOSTNAME = "hub-dns-operator.io/hostname"
+
+GATEWAY_GROUP = "gateway.networking.k8s.io"
+
+GatewayKey = Tuple[str, str]  # (namespace, name)
+
+
+def enabled_sources() -> FrozenSet[str]:
+    """Sources named in SOURCES (comma-separated, default "ingress")."""
+    names = frozenset(s.strip().lower() for s in os.environ.get("SOURCES", INGRESS).split(",") if s.strip())
+    unknown = names - set(SOURCE_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown SOURCES {sorted(unknown)}; expected some of {', '.join(SOURCE_NAMES)}")
+    return names
+
+
+def _view(obj: dict, host: str, class_name: Optional[str], lb_ingress: List[dict], version: Optional[str]) -> dict:
+    metadata = dict(obj.get("metadata") or {})
+    annotations = dict(metadata.get("annotations") or {})
+    if lb_ingress and not lb_ingress[0].get("ip") and lb_ingress[0].get("hostname"):
+        annotations.setdefault(ANNOTATION_TARGET_HOSTNAME, lb_ingress[0]["hostname"])
+    metadata["annotations"] = annotations
+    metadata["resourceVersion"] = version
+    return {
+        "apiVersion": obj.get("apiVersion"),
+        "kind": obj.get("kind"),
+        "metadata": metadata,
+        "spec": {"rules": [{"host": host}], "ingressClassName": class_name},
+        "status": {"loadBalancer": {"ingress": lb_ingress}},
+    }
+
+
+def service_view(service: dict) -> Optional[dict]:
+    """Ingress-shaped view of a Service, or None if it publishes no record."""
+    spec = service.get("spec") or {}
+    annotations = (service.get("metadata") or {}).get("annotations") or {}
+    host = annotations.get(ANNOTATION_HOSTNAME, "").strip()
+    if spec.get("type") != "LoadBalancer" or not host:
+        return None
+    lb_ingress = ((service.get("status") or {}).get("loadBalancer") or {}).get("ingress") or []
+    version = (service.get("metadata") or {}).get("resourceVersion")
+    return _view(service, host, spec.get("loadBalancerClass"), lb_ingress, version)
+
+
+def _key(obj: dict) -> GatewayKey:
+    metadata = obj.get("metadata") or {}
+    return metadata.get("namespace", ""), metadata.get("name", "")
+
+
+def _parent_gateway(route: dict) -> Optional[GatewayKey]:
+    namespace = (route.get("metadata") or {}).get("namespace", "")
+    for ref in (route.get("spec") or {}).get("parentRefs") or []:
+        if ref.get("group", GATEWAY_GROUP) == GATEWAY_GROUP and ref.get("kind", "Gateway") == "Gateway":
+            return ref.get("namespace", namespace), ref["name"]
+    return None
+
+
+class GatewayIndex:
+    """Gateway addresses and the HTTPRoutes attached to each Gateway."""
+
+    def __init__(self):
+        # Gateway -> (gatewayClassName, load balancer entries, resourceVersion)
+        self._gateways: Dict[GatewayKey, Tuple[Optional[str], Tuple[Tuple[str, str], ...], str]] = {}
+        self._routes: Dict[GatewayKey, dict] = {}
+        self._parents: Dict[GatewayKey, GatewayKey] = {}
+
+    def update_gateway(self, gateway: dict) -> List[dict]:
+        """Index a Gateway; return the routes to re-derive if its addresses or class changed."""
+        key = _key(gateway)
+        addresses = tuple(
+            ("hostname" if address.get("type") == "Hostname" else "ip", address["value"])
+            for address in (gateway.get("status") or {}).get("addresses") or [] if address.get("value")
+        )
+        class_name = (gateway.get("spec") or {}).get("gatewayClassName")
+        previous = self._gateways.get(key)
+        self._gateways[key] = (class_name, addresses, (gateway.get("metadata") or {}).get("resourceVersion") or "")
+        if previous is not None and previous[:2] == (class_name, addresses):
+            return []
+        return self._attached(key)
+
+    def remove_gateway(self, gateway: dict) -> List[dict]:
+        """Forget a Gateway; return the routes that lost their target."""
+        key = _key(gateway)
+        if self._gateways.pop(key, None) is None:
+            return []
+        return self._attached(key)
+
+    def route_view(self, route: dict) -> Optional[dict]:
+        """Index an HTTPRoute and return its Ingress-shaped view, or None if it publishes no record.
+
+        The view's resourceVersion combines the route's and the Gateway's,
+        so a Gateway change is not mistaken for a replay of the route.
+        """
+        key = _key(route)
+        self._routes[key] = route
+        parent = _parent_gateway(route)
+        if parent is None:
+            self._parents.pop(key, None)
+        else:
+            self._parents[key] = parent
+        hostnames = (route.get("spec") or {}).get("hostnames") or []
+        if not hostnames or parent is None:
+            return None
+        class_name, addresses, gateway_version = self._gateways.get(parent, (None, (), ""))
+        route_version = (route.get("metadata") or {}).get("resourceVersion")
+        version = f"{route_version}/{gateway_version}" if route_version else None
+        return _view(route, hostnames[0], class_name, [{kind: value} for kind, value in addresses[:1]], version)
+
+    def forget_route(self, route: dict) -> None:
+        key = _key(route)
+        self._routes.pop(key, None)
+        self._parents.pop(key, None)
+
+    def _attached(self, gateway: GatewayKey) -> List[dict]:
+        return [self._routes[route] for route, parent in self._parents.items() if parent == gateway]
+
+    def __len__(self) -> int:
+        return len(self._gateways)
@@ -0,0 +1,144 @@
+"""Tests for cloud API call accounting and the calls-per-minute budget."""
+
+import pytest
+from unittest.mock import MagicMock, patch
+from prometheus_client import REGISTRY
+
+from providers import accounting
+from providers.accounting import ApiCallBudget, SlidingWindowCounter, record_api_call
+from providers.base import RecordType
+
+
+def _calls(provider, kind):
+    return REGISTRY.get_sample_value(
+        "dns_operator_provider_api_calls_total", {"provider": provider, "kind": kind}
+    ) or 0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(accounting.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_sliding_window_expires_old_buckets(clock):
+    window = SlidingWindowCounter(60)
+    window.add(3)
+    clock[0] += 30
+    window.add(2)
+    assert window.total() == 5
+    clock[0] += 31
+    assert window.total() == 2
+    clock[0] += 30
+    assert window.total() == 0
+
+
+def test_budget(clock):
+    window = SlidingWindowCounter(60)
+    budget = ApiCallBudget(5, window=window)
+    window.add(4)
+    assert not budget.exceeded()
+    window.add(1)
+    assert budget.exceeded()
+    clock[0] += 61
+    assert not budget.exceeded()
+    assert not ApiCallBudget(0, window=window).exceeded()
+
+
+@pytest.mark.asyncio
+async def test_budget_wait_for_capacity():
+    window = SlidingWindowCounter(60)
+    budget = ApiCallBudget(1, window=window)
+    await budget.wait_for_capacity()  # returns immediately when under budget
+
+
+def test_record_api_call_labels():
+    before = _calls("test", accounting.CHANGE)
+    record_api_call("test", accounting.CHANGE, 2)
+    record_api_call("test", accounting.RETRY, 0)
+    assert _calls("test", accounting.CHANGE) == before + 2
+
+
+class TestProviderAccounting:
+
+    @pytest.mark.asyncio
+    async def test_aws_counts_changes_lists_and_retries(self, monkeypatch):
+        monkeypatch.setenv("AWS_HOSTED_ZONE_ID", "Z1")
+        monkeypatch.setenv("AWS_DNS_ZONE", "example.com")
+        with patch("providers.aws.boto3") as mock_boto3:
+            client = MagicMock()
+            client.list_resource_record_sets.return_value = {
+                "ResourceRecordSets": [{"Name": "app.example.com.", "Type": "A"}],
+                "ResponseMetadata": {"RetryAttempts": 2},
+            }
+            client.change_resource_record_sets.return_value = {"ResponseMetadata": {"RetryAttempts": 0}}
+            mock_boto3.client.return_value = client
+
+            from providers.aws import AWSDNSProvider
+            provider = AWSDNSProvider()
+            before = {k: _calls("aws", k) for k in ("change", "list_page", "retry")}
+            await provider.create_or_update_record("app.example.com", "1.2.3.4", RecordType.A, 300)
+            await provider.delete_record("app.example.com")
+
+        assert _calls("aws", "change") == before["change"] + 2
+        assert _calls("aws", "list_page") == before["list_page"] + 1
+        assert _calls("aws", "retry") == before["retry"] + 2
+
+    @pytest.mark.asyncio
+    async def test_gcp_counts_one_lookup_per_write(self, monkeypatch):
+        monkeypatch.setenv("GCP_PROJECT_ID", "p")
+        monkeypatch.setenv("GCP_MANAGED_ZONE", "z")
+        monkeypatch.setenv("GCP_DNS_ZONE", "example.com")
+
+        with patch("providers.gcp.google_dns") as mock_dns:
+            mock_dns.Client.return_value._connection.api_request.return_value = {"name": "app.example.com."}
+
+            from providers.gcp import GCPDNSProvider
+            provider = GCPDNSProvider()
+            before = {k: _calls("gcp", k) for k in ("change", "get", "list_page")}
+            await provider.create_or_update_record("app.example.com", "1.2.3.4", RecordType.A, 300)
+
+        assert _calls("gcp", "get") == before["get"] + 1
+        assert _calls("gcp", "list_page") == before["list_page"]
+        assert _calls("gcp", "change") == before["change"] + 1
+
+    @pytest.mark.asyncio
+    async def test_gcp_counts_transient_error_retries(self, monkeypatch):
+        from google.api_core.exceptions import ServiceUnavailable
+        monkeypatch.setenv("GCP_PROJECT_ID", "p")
+        monkeypatch.setenv("GCP_MANAGED_ZONE", "z")
+        monkeypatch.setenv("GCP_DNS_ZONE", "example.com")
+        monkeypatch.setattr("google.api_core.retry.retry_unary.time.sleep", lambda seconds: None)
+
+        with patch("providers.gcp.google_dns") as mock_dns:
+            mock_dns.Client.return_value._connection.api_request.side_effect = [
+                ServiceUnavailable("busy"), {"name": "app.example.com."},
+            ]
+
+            from providers.gcp import GCPDNSProvider
+            provider = GCPDNSProvider()
+            before = _calls("gcp", "retry")
+            await provider.create_or_update_record("app.example.com", "1.2.3.4", RecordType.A, 300)
+
+        assert _calls("gcp", "retry") == before + 1
+
+    def test_azure_counts_every_attempt_after_the_first(self, monkeypatch):
+        monkeypatch.setenv("MANAGED_IDENTITY_CLIENT_ID", "id")
+        monkeypatch.setenv("AZURE_SUBSCRIPTION_ID", "sub")
+        monkeypatch.setenv("AZURE_DNS_ZONE", "example.com")
+        monkeypatch.setenv("AZURE_DNS_RESOURCE_GROUP", "rg")
+
+        with patch("providers.azure.DnsManagementClient") as mock_client, \
+                patch("providers.azure.ManagedIdentityCredential"):
+            from providers.azure import AzureDNSProvider
+            AzureDNSProvider()
+        hook = mock_client.call_args.kwargs["raw_request_hook"]
+
+        before = _calls("azure", "retry")
+        request = MagicMock(context={})
+        for _ in range(3):  # azure-core's retry policy resends the same request
+            hook(request)
+        hook(MagicMock(context={}))
+
+        assert _calls("azure", "retry") == before + 2
@@ -0,0 +1,268 @@
+"""Tests for cross-cluster aggregation of spoke targets."""
+
+import pytest
+from unittest.mock import patch, MagicMock
+
+from providers.aggregation import (
+    AggregateState, AggregatingDNSProvider, ConcurrentChangeError, OwnerEntry,
+    decode_owner_txt, encode_owner_txt, merge_owners, union,
+)
+from providers.base import DNSProvider, RecordType
+
+
+class SharedZoneProvider(DNSProvider):
+    """In-memory zone shared by several spokes, with versioned conditional writes."""
+
+    def __init__(self, zone=None, conflicts=0):
+        self.zone = zone if zone is not None else {}  # name -> (version, AggregateState)
+        self.conflicts = conflicts
+        self.plain_writes = []
+
+    @property
+    def provider_name(self):
+        return "fake"
+
+    async def create_or_update_record(self, record_name, value, record_type=RecordType.A, ttl=300, routing=None):
+        self.plain_writes.append((record_name, value, record_type))
+
+    async def delete_record(self, record_name, record_type=RecordType.A, routing=None):
+        self.plain_writes.append((record_name, None, record_type))
+
+    def _read_aggregate(self, record_name, record_type):
+        if record_name not in self.zone:
+            return None
+        version, state = self.zone[record_name]
+        return AggregateState(state.ttl, dict(state.owners), version)
+
+    def _write_aggregate(self, record_name, record_type, ttl, owners, previous):
+        current_version = self.zone[record_name][0] if record_name in self.zone else None
+        if self.conflicts or (previous.version if previous else None) != current_version:
+            self.conflicts = max(0, self.conflicts - 1)
+            raise ConcurrentChangeError("changed")
+        if owners:
+            self.zone[record_name] = ((current_version or 0) + 1, AggregateState(ttl, dict(owners)))
+        else:
+            del self.zone[record_name]
+
+    def targets(self, name):
+        return union(self.zone[name][1].owners) if name in self.zone else []
+
+
+def test_owner_txt_round_trip():
+    entry = OwnerEntry(("10.0.0.1", "10.0.0.2"), 1700000000)
+    assert decode_owner_txt(f'"{encode_owner_txt("spoke-a", entry)}"') == ("spoke-a", entry)
+
+
+def test_merge_owners_replaces_removes_and_prunes():
+    owners = {"a": OwnerEntry(("1.1.1.1",), 100), "b": OwnerEntry(("2.2.2.2",), 990)}
+    assert merge_owners(owners, "c", ("3.3.3.3",), 1000) == {**owners, "c": OwnerEntry(("3.3.3.3",), 1000)}
+    assert merge_owners(owners, "a", None, 1000) == {"b": owners["b"]}
+    assert merge_owners(owners, "c", None, 1000, stale_after=600) == {"b": owners["b"]}
+
+
+@pytest.mark.asyncio
+async def test_spokes_publish_union_and_drop_out():
+    backend = SharedZoneProvider()
+    spoke_a = AggregatingDNSProvider(backend, "spoke-a")
+    spoke_b = AggregatingDNSProvider(backend, "spoke-b")
+
+    await spoke_a.create_or_update_record("app.example.com", "10.0.0.1")
+    await spoke_b.create_or_update_record("app.example.com", "10.0.0.2")
+    assert backend.targets("app.example.com") == ["10.0.0.1", "10.0.0.2"]
+
+    await spoke_a.create_or_update_record("app.example.com", "10.0.0.3")
+    assert backend.targets("app.example.com") == ["10.0.0.2", "10.0.0.3"]
+
+    await spoke_b.delete_record("app.example.com")
+    assert backend.targets("app.example.com") == ["10.0.0.3"]
+    await spoke_a.delete_record("app.example.com")
+    assert "app.example.com" not in backend.zone
+
+
+@pytest.mark.asyncio
+async def test_unchanged_update_does_not_write():
+    backend = SharedZoneProvider()
+    spoke = AggregatingDNSProvider(backend, "spoke-a")
+    await spoke.create_or_update_record("app.example.com", "10.0.0.1")
+    version = backend.zone["app.example.com"][0]
+    await spoke.create_or_update_record("app.example.com", "10.0.0.1")
+    assert backend.zone["app.example.com"][0] == version
+
+
+@pytest.mark.asyncio
+async def test_conflicts_are_retried_then_raised():
+    backend = SharedZoneProvider(conflicts=2)
+    spoke = AggregatingDNSProvider(backend, "spoke-a")
+    await spoke.create_or_update_record("app.example.com", "10.0.0.1")
+    assert backend.targets("app.example.com") == ["10.0.0.1"]
+
+    backend.conflicts = 100
+    with pytest.raises(ConcurrentChangeError):
+        await spoke.create_or_update_record("app.example.com", "10.0.0.2")
+
+
+@pytest.mark.asyncio
+async def test_stale_spoke_is_pruned_and_live_spoke_refreshes(monkeypatch):
+    import providers.aggregation as aggregation
+    now = [1000]
+    monkeypatch.setattr(aggregation.time, "time", lambda: now[0])
+    backend = SharedZoneProvider()
+    live = AggregatingDNSProvider(backend, "live", stale_after=300)
+    gone = AggregatingDNSProvider(backend, "gone", stale_after=300)
+
+    await gone.create_or_update_record("app.example.com", "10.0.0.9")
+    await live.create_or_update_record("app.example.com", "10.0.0.1")
+
+    now[0] += 200
+    await live.refresh()  # older than stale_after / 3: entry is re-stamped
+    assert backend.zone["app.example.com"][1].owners["live"].updated == 1200
+
+    now[0] += 200
+    await live.refresh()  # "gone" has not written for 400s and is pruned
+    assert backend.targets("app.example.com") == ["10.0.0.1"]
+
+
+@pytest.mark.asyncio
+async def test_cname_and_routed_records_pass_through():
+    from providers.base import RoutingPolicy
+    backend = SharedZoneProvider()
+    spoke = AggregatingDNSProvider(backend, "spoke-a")
+    await spoke.create_or_update_record("www.example.com", "lb.example.net", RecordType.CNAME)
+    await spoke.create_or_update_record("app.example.com", "10.0.0.1", routing=RoutingPolicy("s", weight=1))
+    assert backend.zone == {}
+    assert len(backend.plain_writes) == 2
+
+
+class TestAWSAggregation:
+
+    @pytest.fixture(autouse=True)
+    def setup_env(self, monkeypatch):
+        monkeypatch.setenv("AWS_HOSTED_ZONE_ID", "Z1")
+        monkeypatch.setenv("AWS_DNS_ZONE", "example.com")
+
+    @patch("providers.aws.boto3")
+    def test_read_and_write_in_one_batch(self, mock_boto3):
+        from botocore.exceptions import ClientError
+        a_set = {"Name": "app.example.com.", "Type": "A", "TTL": 60, "ResourceRecords": [{"Value": "10.0.0.1"}]}
+        txt_set = {"Name": "_hdo-owners.app.example.com.", "Type": "TXT", "TTL": 60,
+                   "ResourceRecords": [{"Value": '"owner=spoke-a;values=10.0.0.1;ts=100"'}]}
+        client = MagicMock()
+        client.list_resource_record_sets.side_effect = [
+            {"ResourceRecordSets": [a_set]}, {"ResourceRecordSets": [txt_set]},
+        ]
+        mock_boto3.client.return_value = client
+
+        from providers.aws import AWSDNSProvider
+        provider = AWSDNSProvider()
+        state = provider._read_aggregate("app.example.com", RecordType.A)
+        assert state.owners == {"spoke-a": OwnerEntry(("10.0.0.1",), 100)}
+
+        owners = {**state.owners, "spoke-b": OwnerEntry(("10.0.0.2",), 200)}
+        provider._write_aggregate("app.example.com", RecordType.A, 60, owners, state)
+        changes = client.change_resource_record_sets.call_args.kwargs["ChangeBatch"]["Changes"]
+        assert [(c["Action"], c["ResourceRecordSet"]["Type"]) for c in changes] == [
+            ("DELETE", "A"), ("DELETE", "TXT"), ("CREATE", "A"), ("CREATE", "TXT"),
+        ]
+        assert changes[2]["ResourceRecordSet"]["ResourceRecords"] == [{"Value": "10.0.0.1"}, {"Value": "10.0.0.2"}]
+        assert len(changes[3]["ResourceRecordSet"]["ResourceRecords"]) == 2
+
+        for message in (
+            "Tried to delete resource record set [name='app.example.com.', type='A'] but it was not found",
+            "Tried to delete resource record set [name='app.example.com.', type='A'] "
+            "but the values provided do not match the current values",
+        ):
+            client.change_resource_record_sets.side_effect = ClientError(
+                {"Error": {"Code": "InvalidChangeBatch", "Message": message}}, "ChangeResourceRecordSets"
+            )
+            with pytest.raises(ConcurrentChangeError):
+                provider._write_aggregate("app.example.com", RecordType.A, 60, owners, state)
+
+        client.change_resource_record_sets.side_effect = ClientError(
+            {"Error": {"Code": "InvalidChangeBatch", "Message": "RRSet of type CNAME with DNS name "
+                       "app.example.com. is not permitted as it conflicts with other records"}},
+            "ChangeResourceRecordSets",
+        )
+        with pytest.raises(ClientError):
+            provider._write_aggregate("app.example.com", RecordType.A, 60, owners, state)
+
+
+class TestGCPAggregation:
+
+    @pytest.fixture(autouse=True)
+    def setup_env(self, monkeypatch):
+        monkeypatch.setenv("GCP_PROJECT_ID", "p")
+        monkeypatch.setenv("GCP_MANAGED_ZONE", "z")
+        monkeypatch.setenv("GCP_DNS_ZONE", "example.com")
+
+    @patch("providers.gcp.google_dns")
+    def test_write_is_atomic_and_conditional(self, mock_dns):
+        from google.api_core.exceptions import NotFound, PreconditionFailed
+        api_request = mock_dns.Client.return_value._connection.api_request
+        api_request.side_effect = [NotFound("a"), NotFound("txt"), {}, PreconditionFailed("changed")]
+
+        from providers.gcp import GCPDNSProvider
+        provider = GCPDNSProvider()
+        assert provider._read_aggregate("app.example.com", RecordType.A) is None
+
+        owners = {"spoke-a": OwnerEntry(("10.0.0.1",), 100)}
+        provider._write_aggregate("app.example.com", RecordType.A, 60, owners, None)
+        assert api_request.call_args.kwargs["data"] == {
+            "deletions": [],
+            "additions": [
+                {"name": "app.example.com.", "type": "A", "ttl": 60, "rrdatas": ["10.0.0.1"]},
+                {"name": "_hdo-owners.app.example.com.", "type": "TXT", "ttl": 60,
+                 "rrdatas": ['"owner=spoke-a;values=10.0.0.1;ts=100"']},
+            ],
+        }
+        with pytest.raises(ConcurrentChangeError):
+            provider._write_aggregate("app.example.com", RecordType.A, 60, owners, None)
+
+
+class TestAzureAggregation:
+
+    @pytest.fixture(autouse=True)
+    def setup_env(self, monkeypatch):
+        monkeypatch.setenv("MANAGED_IDENTITY_CLIENT_ID", "c")
+        monkeypatch.setenv("AZURE_SUBSCRIPTION_ID", "s")
+        monkeypatch.setenv("AZURE_DNS_ZONE", "example.com")
+        monkeypatch.setenv("AZURE_DNS_RESOURCE_GROUP", "rg")
+
+    @patch("providers.azure.DnsManagementClient")
+    @patch("providers.azure.ManagedIdentityCredential")
+    def test_owner_table_in_metadata_guarded_by_etag(self, mock_cred, mock_client_cls):
+        from azure.core.exceptions import HttpResponseError
+        current = MagicMock(ttl=60, etag="etag-1", metadata={
+            "hubdns_owner_spoke_a": "owner=spoke-a;values=10.0.0.1;ts=100",
+            "team": "payments",
+        })
+        client = MagicMock()
+        client.record_sets.get.return_value = current
+        mock_client_cls.return_value = client
+
+        from providers.azure import AzureDNSProvider
+        provider = AzureDNSProvider()
+        state = provider._read_aggregate("app.example.com", RecordType.A)
+        assert state.owners == {"spoke-a": OwnerEntry(("10.0.0.1",), 100)}
+
+        owners = {**state.owners, "spoke-b": OwnerEntry(("10.0.0.2",), 200)}
+        provider._write_aggregate("app.example.com", RecordType.A, 60, owners, state)
+        client.record_sets.create_or_update.assert_called_once_with(
+            "rg", "example.com", "app", "A",
+            {
+                "ttl": 60,
+                "arecords": [{"ipv4_address": "10.0.0.1"}, {"ipv4_address": "10.0.0.2"}],
+                "metadata": {
+                    "team": "payments",
+                    "hubdns_owner_spoke_a": "owner=spoke-a;values=10.0.0.1;ts=100",
+                    "hubdns_owner_spoke_b": "owner=spoke-b;values=10.0.0.2;ts=200",
+                },
+            },
+            if_match="etag-1",
+            if_none_match=None,
+        )
+
+        conflict = HttpResponseError("precondition failed")
+        conflict.status_code = 412
+        client.record_sets.delete.side_effect = conflict
+        with pytest.raises(ConcurrentChangeError):
+            provider._write_aggregate("app.example.com", RecordType.A, 60, {}, state)
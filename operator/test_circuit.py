@@ -0,0 +1,148 @@
+"""Tests for the per-back-end circuit breaker."""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from providers.base import DNSProvider, RecordType
+from providers.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreakerDNSProvider, CircuitOpenError
+from retry import RetryQueue
+
+
+class Unavailable(Exception):
+    status_code = 503
+
+
+class FlakyProvider(DNSProvider):
+    def __init__(self):
+        self.calls = 0
+        self.errors = []  # raised by the next calls, in order; then calls succeed
+
+    @property
+    def provider_name(self):
+        return "flaky"
+
+    async def create_or_update_record(self, record_name, value, record_type=RecordType.A, ttl=300, routing=None):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+
+    async def delete_record(self, record_name, record_type=RecordType.A, routing=None):
+        await self.create_or_update_record(record_name, "")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = Clock()
+    with patch("providers.circuit.time.monotonic", clock):
+        yield clock
+
+
+async def _write(breaker):
+    await breaker.create_or_update_record("app.example.com", "10.0.0.1")
+
+
+async def _fail(breaker, count):
+    for _ in range(count):
+        with pytest.raises(Unavailable):
+            await _write(breaker)
+
+
+@pytest.mark.asyncio
+async def test_opens_after_consecutive_transient_failures_and_sheds_calls(clock):
+    backend = FlakyProvider()
+    breaker = CircuitBreakerDNSProvider(backend, failure_threshold=3, reset_timeout=30)
+    backend.errors = [Unavailable(), Unavailable(), Unavailable()]
+
+    await _fail(breaker, 3)
+    assert breaker.state == OPEN
+
+    clock.now += 10
+    with pytest.raises(CircuitOpenError) as excinfo:
+        await breaker.delete_record("app.example.com")
+    assert backend.calls == 3
+    assert excinfo.value.retry_after == pytest.approx(20)
+    assert breaker.is_retryable_error(excinfo.value)
+    assert breaker.snapshot() == {"state": OPEN, "consecutive_failures": 3, "probe_in_seconds": 20.0}
+
+
+@pytest.mark.asyncio
+async def test_permanent_errors_and_successes_do_not_open(clock):
+    backend = FlakyProvider()
+    breaker = CircuitBreakerDNSProvider(backend, failure_threshold=2)
+    backend.errors = [Unavailable(), ValueError("bad record"), Unavailable()]
+
+    await _fail(breaker, 1)
+    with pytest.raises(ValueError):
+        await _write(breaker)
+    await _fail(breaker, 1)
+
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_half_open_probe_closes_or_reopens_with_longer_timeout(clock):
+    backend = FlakyProvider()
+    breaker = CircuitBreakerDNSProvider(backend, failure_threshold=1, reset_timeout=30, max_reset_timeout=50)
+    backend.errors = [Unavailable(), Unavailable(), Unavailable()]
+    await _fail(breaker, 1)
+
+    clock.now += 30
+    await _fail(breaker, 1)  # probe fails: open for 60s, capped at 50
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["probe_in_seconds"] == 50
+
+    clock.now += 50
+    await _fail(breaker, 1)  # capped timeout stays at 50
+    clock.now += 50
+    await _write(breaker)
+    assert breaker.state == CLOSED
+    assert backend.calls == 4
+
+
+@pytest.mark.asyncio
+async def test_half_open_lets_one_probe_through(clock):
+    gate = asyncio.Event()
+
+    class SlowProvider(FlakyProvider):
+        async def create_or_update_record(self, *args, **kwargs):
+            await super().create_or_update_record(*args, **kwargs)
+            await gate.wait()
+
+    backend = SlowProvider()
+    breaker = CircuitBreakerDNSProvider(backend, failure_threshold=1, reset_timeout=30)
+    backend.errors = [Unavailable()]
+    await _fail(breaker, 1)
+
+    clock.now += 30
+    probe = asyncio.create_task(_write(breaker))
+    await asyncio.sleep(0)
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        await _write(breaker)
+
+    gate.set()
+    await probe
+    assert breaker.state == CLOSED
+    assert backend.calls == 2
+
+
+def test_retry_queue_does_not_count_shed_calls():
+    queue = RetryQueue(execute=None, base_delay=1, max_attempts=2)
+
+    queue.failed("app.example.com", "upsert", {}, CircuitOpenError("aws", 45))
+    queue.failed("app.example.com", "upsert", {}, CircuitOpenError("aws", 45))
+
+    [entry] = queue.due(now=time.time() + 46)
+    assert entry.attempts == 0
+    assert queue.snapshot()["dead_letters"] == []
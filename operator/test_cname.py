@@ -122,8 +122,9 @@ class TestGCPCNAMERecordSupport:
     @patch("providers.gcp.google_dns")
     @pytest.mark.asyncio
     async def test_create_cname_record(self, mock_dns):
+        from google.api_core.exceptions import NotFound
+        mock_dns.Client.return_value._connection.api_request.side_effect = NotFound("missing")
         mock_zone = MagicMock()
-        mock_zone.list_resource_record_sets.return_value = []
         mock_changes = MagicMock()
         mock_zone.changes.return_value = mock_changes
         mock_record = MagicMock()
@@ -145,12 +146,11 @@ class TestGCPCNAMERecordSupport:
     @patch("providers.gcp.google_dns")
     @pytest.mark.asyncio
     async def test_delete_cname_record(self, mock_dns):
-        existing_record = MagicMock()
-        existing_record.name = "app.example.com."
-        existing_record.record_type = "CNAME"
+        api_request = mock_dns.Client.return_value._connection.api_request
+        api_request.return_value = {"name": "app.example.com.", "type": "CNAME"}
+        existing_record = mock_dns.ResourceRecordSet.from_api_repr.return_value
 
         mock_zone = MagicMock()
-        mock_zone.list_resource_record_sets.return_value = [existing_record]
         mock_changes = MagicMock()
         mock_zone.changes.return_value = mock_changes
         mock_dns.Client.return_value.zone.return_value = mock_zone
@@ -159,6 +159,7 @@ class TestGCPCNAMERecordSupport:
         provider = GCPDNSProvider()
         await provider.delete_record("app.example.com", RecordType.CNAME)
 
+        assert api_request.call_args.kwargs["path"].endswith("/rrsets/app.example.com./CNAME")
         mock_changes.delete_record_set.assert_called_once_with(existing_record)
         mock_changes.create.assert_called_once()
 
@@ -0,0 +1,136 @@
+"""Tests for the load balancer churn debouncer."""
+
+import asyncio
+
+import pytest
+
+from debounce import Debouncer
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, value):
+        self.calls.append(value)
+
+
+@pytest.mark.asyncio
+async def test_runs_after_settle_window():
+    recorder = Recorder()
+    debouncer = Debouncer(recorder, settle_seconds=0.05, max_delay_seconds=1)
+    debouncer.submit("ing", "1.2.3.4", "v1")
+    assert recorder.calls == []
+    await asyncio.sleep(0.1)
+    assert recorder.calls == ["v1"]
+    assert len(debouncer) == 0
+
+
+@pytest.mark.asyncio
+async def test_events_inside_window_are_coalesced():
+    recorder = Recorder()
+    debouncer = Debouncer(recorder, settle_seconds=0.05, max_delay_seconds=1)
+    for value in ("v1", "v2", "v3"):
+        debouncer.submit("ing", "1.2.3.4", value)
+    await asyncio.sleep(0.1)
+    assert recorder.calls == ["v3"]
+
+
+@pytest.mark.asyncio
+async def test_target_flip_restarts_window():
+    recorder = Recorder()
+    debouncer = Debouncer(recorder, settle_seconds=0.08, max_delay_seconds=1)
+    debouncer.submit("ing", "1.2.3.4", "v1")
+    await asyncio.sleep(0.05)
+    debouncer.submit("ing", "5.6.7.8", "v2")
+    await asyncio.sleep(0.05)
+    assert recorder.calls == []
+    await asyncio.sleep(0.06)
+    assert recorder.calls == ["v2"]
+
+
+@pytest.mark.asyncio
+async def test_max_delay_caps_waiting():
+    recorder = Recorder()
+    debouncer = Debouncer(recorder, settle_seconds=0.05, max_delay_seconds=0.12)
+    for i in range(6):
+        debouncer.submit("ing", f"10.0.0.{i}", f"v{i}")
+        await asyncio.sleep(0.03)
+    assert recorder.calls
+    assert len(recorder.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_target_is_dropped_at_max_delay():
+    recorder = Recorder()
+    debouncer = Debouncer(recorder, settle_seconds=0.02, max_delay_seconds=0.05)
+    debouncer.submit("ing", None, "v1")
+    await asyncio.sleep(0.1)
+    assert recorder.calls == []
+    assert len(debouncer) == 0
+
+
+@pytest.mark.asyncio
+async def test_target_reappearing_is_written():
+    recorder = Recorder()
+    debouncer = Debouncer(recorder, settle_seconds=0.03, max_delay_seconds=1)
+    debouncer.submit("ing", None, "v1")
+    await asyncio.sleep(0.05)
+    debouncer.submit("ing", "1.2.3.4", "v2")
+    await asyncio.sleep(0.06)
+    assert recorder.calls == ["v2"]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_function():
+    recorder = Recorder()
+    debouncer = Debouncer(recorder, 0.03, 1, coalesce=lambda old, new: old + new)
+    debouncer.submit("ing", "1.2.3.4", "a")
+    debouncer.submit("ing", "1.2.3.4", "b")
+    await asyncio.sleep(0.06)
+    assert recorder.calls == ["ab"]
+
+
+@pytest.mark.asyncio
+async def test_cancel():
+    recorder = Recorder()
+    debouncer = Debouncer(recorder, settle_seconds=0.03, max_delay_seconds=1)
+    debouncer.submit("ing", "1.2.3.4", "v1")
+    assert debouncer.cancel("ing") is True
+    assert debouncer.cancel("ing") is False
+    await asyncio.sleep(0.06)
+    assert recorder.calls == []
+
+
+@pytest.mark.asyncio
+async def test_wait_idle_waits_for_a_running_callback():
+    release = asyncio.Event()
+    calls = []
+
+    async def callback(value):
+        calls.append(value)
+        await release.wait()
+
+    debouncer = Debouncer(callback, settle_seconds=0.01, max_delay_seconds=1)
+    debouncer.submit("ing", "1.2.3.4", "v1")
+    await asyncio.sleep(0.03)
+    assert calls == ["v1"]
+    assert debouncer.cancel("ing") is False  # no longer pending, but still running
+
+    waiter = asyncio.create_task(debouncer.wait_idle("ing"))
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+    release.set()
+    await asyncio.wait_for(waiter, 1)
+    await debouncer.wait_idle("other")  # nothing running returns at once
+
+
+@pytest.mark.asyncio
+async def test_keys_are_independent():
+    recorder = Recorder()
+    debouncer = Debouncer(recorder, settle_seconds=0.03, max_delay_seconds=1)
+    debouncer.submit("a", "1.1.1.1", "a1")
+    debouncer.submit("b", "2.2.2.2", "b1")
+    assert {entry["key"] for entry in debouncer.snapshot()} == {"a", "b"}
+    await asyncio.sleep(0.06)
+    assert sorted(recorder.calls) == ["a1", "b1"]
@@ -0,0 +1,115 @@
+"""Tests for the opt-in debug endpoints."""
+
+import asyncio
+import threading
+import time
+import tracemalloc
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+import debug
+
+
+@pytest.fixture
+async def client():
+    test_client = TestClient(TestServer(debug.create_debug_app()))
+    await test_client.start_server()
+    yield test_client
+    await test_client.close()
+
+
+def test_inflight_tracker():
+    tracker = debug.InFlightTracker()
+    with tracker.track("create", "app.example.com", "azure"):
+        calls = tracker.snapshot()
+        assert len(tracker) == 1
+        assert calls[0]["operation"] == "create"
+        assert calls[0]["host"] == "app.example.com"
+        assert "started" not in calls[0]
+    assert len(tracker) == 0
+
+
+def test_sample_stacks_captures_busy_thread():
+    stop = threading.Event()
+
+    def busy_loop_for_profile():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop_for_profile)
+    worker.start()
+    try:
+        samples = debug.sample_stacks(worker.ident, seconds=0.1, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+    assert samples
+    assert any("busy_loop_for_profile" in stack for stack in samples)
+
+
+@pytest.mark.asyncio
+async def test_tasks_endpoint(client):
+    async def sleeper_for_dump():
+        await asyncio.sleep(10)
+
+    task = asyncio.create_task(sleeper_for_dump(), name="sleeper")
+    await asyncio.sleep(0)
+    try:
+        resp = await client.get("/debug/tasks")
+        assert resp.status == 200
+        body = await resp.json()
+        sleeper = next(t for t in body["tasks"] if t["name"] == "sleeper")
+        assert "sleeper_for_dump" in sleeper["coro"]
+        assert sleeper["stack"]
+    finally:
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_queues_and_inflight_endpoints(client, monkeypatch):
+    monkeypatch.setattr(debug, "_queues", {"debounce": lambda: [{"key": "uid-1"}]})
+    resp = await client.get("/debug/queues")
+    assert await resp.json() == {"debounce": [{"key": "uid-1"}]}
+
+    with debug.inflight.track("delete", "app.example.com", "aws"):
+        resp = await client.get("/debug/inflight")
+        body = await resp.json()
+    assert body["count"] == 1
+    assert body["calls"][0]["provider"] == "aws"
+
+
+@pytest.mark.asyncio
+async def test_profile_endpoint(client):
+    async def spin():
+        deadline = time.monotonic() + 0.2
+        while time.monotonic() < deadline:
+            sum(range(1000))
+            await asyncio.sleep(0)
+
+    spinner = asyncio.create_task(spin())
+    resp = await client.get("/debug/profile", params={"seconds": "0.1", "interval": "0.002"})
+    await spinner
+    assert resp.status == 200
+    text = await resp.text()
+    assert text.strip()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in text.strip().splitlines())
+
+
+@pytest.mark.asyncio
+async def test_tracemalloc_endpoint(client):
+    assert not tracemalloc.is_tracing()
+    resp = await client.get("/debug/tracemalloc")
+    assert resp.status == 409
+
+    await client.get("/debug/tracemalloc", params={"action": "start"})
+    try:
+        _allocated = [bytearray(1024) for _ in range(100)]
+        resp = await client.get("/debug/tracemalloc", params={"limit": "5"})
+        body = await resp.json()
+        assert body["current_bytes"] > 0
+        assert 0 < len(body["top"]) <= 5
+        del _allocated
+    finally:
+        resp = await client.get("/debug/tracemalloc", params={"action": "stop"})
+    assert (await resp.json())["tracing"] is False
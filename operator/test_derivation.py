@@ -0,0 +1,83 @@
+"""Tests for precompiled record derivation."""
+
+import pytest
+
+from derivation import DesiredRecord, OperatorConfig, derive_record
+from providers.base import RecordType, is_hostname
+
+
+def _ingress(host="app.example.com", ip="5.6.7.8", annotations=None, ingress_class="nginx"):
+    ingress = {
+        "spec": {"rules": [{"host": host}], "ingressClassName": ingress_class},
+        "metadata": {"annotations": annotations or {}},
+        "status": {"loadBalancer": {"ingress": [{"ip": ip}] if ip else []}},
+    }
+    return ingress
+
+
+def test_config_from_env(monkeypatch):
+    monkeypatch.setenv("CUSTOM_TTL", "60")
+    monkeypatch.setenv("CUSTOM_IP", "")
+    monkeypatch.setenv("INTERNAL_INGRESS_CLASSES", "nginx-internal, private")
+    monkeypatch.delenv("AZURE_DNS_ZONE", raising=False)
+    monkeypatch.delenv("GCP_DNS_ZONE", raising=False)
+    monkeypatch.setenv("AWS_DNS_ZONE", "example.org")
+    config = OperatorConfig.from_env()
+    assert config.ttl == 60
+    assert config.custom_ip is None
+    assert config.internal_ingress_classes == {"nginx-internal", "private"}
+    assert config.zone_suffix == ".example.org"
+
+
+def test_load_balancer_ip():
+    record = derive_record(_ingress(), OperatorConfig(ttl=120))
+    assert record == DesiredRecord("app.example.com", "5.6.7.8", RecordType.A, 120)
+
+
+def test_custom_ip_overrides_a_records():
+    record = derive_record(_ingress(), OperatorConfig(custom_ip="1.2.3.4"))
+    assert record.value == "1.2.3.4"
+
+
+@pytest.mark.parametrize("ingress", [
+    _ingress(ingress_class="nginx-internal"),
+    _ingress(ingress_class=None, annotations={"kubernetes.io/ingress.class": "nginx-internal"}),
+])
+def test_internal_classes_keep_load_balancer_ip(ingress):
+    record = derive_record(ingress, OperatorConfig(custom_ip="1.2.3.4"))
+    assert record.value == "5.6.7.8"
+
+
+def test_hostname_target_becomes_cname_without_custom_ip():
+    annotations = {"hub-dns-operator.io/target-hostname": "backend.example.net"}
+    record = derive_record(_ingress(annotations=annotations), OperatorConfig(custom_ip="1.2.3.4"))
+    assert record.record_type == RecordType.CNAME
+    assert record.value == "backend.example.net"
+
+
+def test_explicit_cname_annotation():
+    annotations = {"hub-dns-operator.io/record-type": "cname",
+                   "hub-dns-operator.io/target-hostname": "backend.example.net"}
+    assert derive_record(_ingress(annotations=annotations), OperatorConfig()).record_type == RecordType.CNAME
+
+
+def test_missing_target_raises():
+    with pytest.raises(ValueError, match="No target value found"):
+        derive_record(_ingress(ip=None), OperatorConfig())
+
+
+def test_results_are_cached_per_relevant_fields():
+    config = OperatorConfig()
+    first = derive_record(_ingress(), config)
+    # Unrelated annotations and fields don't defeat the cache
+    second = derive_record(_ingress(annotations={"team": "web"}), config)
+    assert first is second
+    assert derive_record(_ingress(ip="9.9.9.9"), config) is not first
+
+
+def test_is_hostname_uses_ip_parsing():
+    assert is_hostname("1.2.3.4") is False
+    assert is_hostname("2001:db8::1") is False
+    assert is_hostname("lb.example.com") is True
+    assert is_hostname("1.2.3.4.5") is False
+    assert is_hostname("") is False
@@ -0,0 +1,101 @@
+"""Tests for event trace recording and the fake provider used to replay it."""
+
+import gzip
+
+import pytest
+
+from event_trace import TraceRecorder, compact, read_trace
+from providers.base import RecordType
+from providers.fake import FakeDNSProvider, FakeProviderError
+
+INGRESS = {
+    "apiVersion": "networking.k8s.io/v1", "kind": "Ingress",
+    "metadata": {
+        "name": "app", "namespace": "team", "uid": "u1", "resourceVersion": "42",
+        "managedFields": [{"manager": "kubectl"}],
+        "annotations": {"hub-dns-operator.io/ttl": "60", "kubectl.kubernetes.io/last-applied-configuration": "{}"},
+    },
+    "spec": {"ingressClassName": "nginx", "rules": [{"host": "app.example.com", "http": {"paths": []}}]},
+    "status": {"loadBalancer": {"ingress": [{"ip": "10.0.0.1"}]}},
+}
+
+
+def test_compact_keeps_the_fields_the_operator_reads():
+    assert compact(INGRESS) == {
+        "apiVersion": "networking.k8s.io/v1", "kind": "Ingress",
+        "metadata": {"name": "app", "namespace": "team", "uid": "u1", "resourceVersion": "42",
+                     "annotations": {"hub-dns-operator.io/ttl": "60"}},
+        "spec": {"ingressClassName": "nginx", "rules": [{"host": "app.example.com"}]},
+        "status": {"loadBalancer": {"ingress": [{"ip": "10.0.0.1"}]}},
+    }
+
+
+def test_trace_round_trip(tmp_path):
+    path = str(tmp_path / "trace.jsonl.gz")
+    recorder = TraceRecorder(path)
+    recorder.event("ingress", "ADDED", INGRESS)
+    recorder.call("create", "app.example.com", "aws", 0.25, TimeoutError("slow"))
+    recorder.close()
+
+    event, call = read_trace(path)
+    assert event["source"] == "ingress" and event["type"] == "ADDED"
+    assert event["object"] == compact(INGRESS)
+    assert call == {"t": call["t"], "call": "create", "host": "app.example.com", "provider": "aws",
+                    "seconds": 0.25, "error": "TimeoutError"}
+
+
+def test_truncated_trace_is_read_up_to_the_last_flush(tmp_path):
+    path = str(tmp_path / "trace.jsonl.gz")
+    recorder = TraceRecorder(path, flush_interval=0)
+    recorder.event("ingress", "ADDED", INGRESS)
+    recorder.event("ingress", "MODIFIED", INGRESS)
+    with open(path, "rb") as f:
+        flushed = f.read()
+    recorder.close()
+
+    truncated = tmp_path / "killed.jsonl.gz"
+    truncated.write_bytes(flushed)
+    assert [r["type"] for r in read_trace(str(truncated))] == ["ADDED", "MODIFIED"]
+
+    other = tmp_path / "other.jsonl.gz"
+    with gzip.open(other, "wt") as f:
+        f.write('{"trace": 99}\n')
+    with pytest.raises(ValueError, match="version 1"):
+        list(read_trace(str(other)))
+
+
+@pytest.mark.asyncio
+async def test_fake_provider_replays_scripted_calls():
+    provider = FakeDNSProvider(latency=0)
+    provider.expect("upsert", "app.example.com", 0, "Throttling")
+
+    with pytest.raises(FakeProviderError, match="Throttling"):
+        await provider.create_or_update_record("app.example.com", "10.0.0.1")
+    assert provider.is_retryable_error(FakeProviderError())
+    await provider.create_or_update_record("app.example.com", "10.0.0.1", RecordType.A, 60)
+    assert provider.records == {("app.example.com", "A", ""): ("10.0.0.1", 60)}
+
+    await provider.delete_record("app.example.com")
+    assert provider.records == {}
+    assert provider.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_fake_provider_lists_names_without_the_trailing_dot():
+    provider = FakeDNSProvider(latency=0)
+    await provider.create_or_update_record("app.example.com", "10.0.0.1", RecordType.A, 60)
+    [record] = [r async for r in provider.iter_zone_records()]
+    assert (record.name, record.record_type, record.values) == ("app.example.com", "A", ("10.0.0.1",))
+
+
+def test_replay_counts_kopf_warnings_without_a_running_operator():
+    import kopf
+    from replay import _capture_warnings
+
+    original = kopf.warn
+    with _capture_warnings() as warnings:
+        kopf.warn(INGRESS, reason="DNSHostConflict", message="taken")
+        kopf.event(INGRESS, type="Normal", reason="Written", message="ok")
+        kopf.event(INGRESS, type="Warning", reason="Failed", message="no")
+    assert warnings == [("DNSHostConflict", "taken"), ("Failed", "no")]
+    assert kopf.warn is original
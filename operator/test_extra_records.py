@@ -0,0 +1,204 @@
+"""Tests for alias records and the TXT, SRV and CAA extra records."""
+
+import pytest
+from unittest.mock import patch, MagicMock
+
+from annotations import get_extra_records, get_record_type
+from derivation import OperatorConfig, derive_record
+from providers.base import ExtraRecord, RecordType, quote_txt
+
+TXT = ExtraRecord("app.example.com", RecordType.TXT, ("site-verification=abc",))
+SRV = ExtraRecord("_sip._tcp.app.example.com", RecordType.SRV, ("10 5 5060 app.example.com.",))
+CAA = ExtraRecord("app.example.com", RecordType.CAA, ('0 issue "letsencrypt.org"',))
+
+
+class TestExtraRecordAnnotations:
+    """Tests for alias and extra record annotation parsing."""
+
+    def test_lines_grouped_into_record_sets(self):
+        extras = get_extra_records("app.example.com", {
+            "hub-dns-operator.io/txt": 'site-verification=abc\n"quoted text"\n_dmarc v=DMARC1; p=reject\n',
+            "hub-dns-operator.io/srv": "_sip._tcp 10 5 5060\n_sip._tcp 20 5 5060 backup.example.com",
+            "hub-dns-operator.io/caa": "0 issue letsencrypt.org\n128 IODEF \"mailto:security@example.com\"",
+        })
+        assert extras == (
+            ExtraRecord("app.example.com", RecordType.TXT, ("site-verification=abc", "quoted text")),
+            ExtraRecord("_dmarc.app.example.com", RecordType.TXT, ("v=DMARC1; p=reject",)),
+            ExtraRecord("_sip._tcp.app.example.com", RecordType.SRV, (
+                "10 5 5060 app.example.com.", "20 5 5060 backup.example.com.",
+            )),
+            ExtraRecord("app.example.com", RecordType.CAA, (
+                '0 issue "letsencrypt.org"', '128 iodef "mailto:security@example.com"',
+            )),
+        )
+
+    @pytest.mark.parametrize("annotations", [
+        {"hub-dns-operator.io/srv": "10 5 5060"},
+        {"hub-dns-operator.io/srv": "_sip._tcp 10 5"},
+        {"hub-dns-operator.io/srv": "_sip._tcp 10 5 70000"},
+        {"hub-dns-operator.io/caa": "0 issuer letsencrypt.org"},
+        {"hub-dns-operator.io/caa": "256 issue letsencrypt.org"},
+    ])
+    def test_invalid_lines(self, annotations):
+        with pytest.raises(ValueError):
+            get_extra_records("app.example.com", annotations)
+
+    def test_alias_annotation(self):
+        ingress = {
+            "spec": {"rules": [{"host": "example.com"}]},
+            "metadata": {"annotations": {
+                "hub-dns-operator.io/alias": "Z35SXDOTRQ7X7K/lb-1.us-east-1.elb.amazonaws.com",
+                "hub-dns-operator.io/txt": "site-verification=abc",
+            }},
+        }
+        record = derive_record(ingress, OperatorConfig(custom_ip="1.2.3.4", ttl=300))
+        assert record.record_type == RecordType.ALIAS
+        assert record.value == "Z35SXDOTRQ7X7K/lb-1.us-east-1.elb.amazonaws.com"
+        assert record.extras == (ExtraRecord("example.com", RecordType.TXT, ("site-verification=abc",)),)
+        assert get_record_type(ingress["metadata"]["annotations"]) == RecordType.ALIAS
+
+    def test_quote_txt_splits_long_values(self):
+        assert quote_txt('say "hi"') == '"say \\"hi\\""'
+        assert quote_txt("x" * 300) == f'"{"x" * 255}" "{"x" * 45}"'
+
+
+class TestAWSExtraRecords:
+    """Tests for aliases and extra records in the AWS provider."""
+
+    @pytest.fixture(autouse=True)
+    def setup_env(self, monkeypatch):
+        monkeypatch.setenv("AWS_HOSTED_ZONE_ID", "Z1234567890")
+        monkeypatch.setenv("AWS_DNS_ZONE", "example.com")
+
+    @patch("providers.aws.boto3")
+    @pytest.mark.asyncio
+    async def test_alias_and_extras_in_one_change_batch(self, mock_boto3):
+        mock_client = MagicMock()
+        mock_boto3.client.return_value = mock_client
+        from providers.aws import AWSDNSProvider
+
+        await AWSDNSProvider().create_or_update_record(
+            "example.com", "Z35SXDOTRQ7X7K/lb-1.elb.amazonaws.com", RecordType.ALIAS, 60,
+            extras=(ExtraRecord("example.com", RecordType.TXT, TXT.values), CAA),
+        )
+
+        mock_client.change_resource_record_sets.assert_called_once()
+        changes = mock_client.change_resource_record_sets.call_args.kwargs["ChangeBatch"]["Changes"]
+        assert [c["ResourceRecordSet"]["Type"] for c in changes] == ["A", "TXT", "CAA"]
+        assert changes[0]["ResourceRecordSet"] == {
+            "Name": "example.com.",
+            "Type": "A",
+            "AliasTarget": {
+                "HostedZoneId": "Z35SXDOTRQ7X7K", "DNSName": "lb-1.elb.amazonaws.com", "EvaluateTargetHealth": False,
+            },
+        }
+        assert changes[1]["ResourceRecordSet"]["ResourceRecords"] == [{"Value": '"site-verification=abc"'}]
+        assert changes[2]["ResourceRecordSet"]["ResourceRecords"] == [{"Value": '0 issue "letsencrypt.org"'}]
+
+    @patch("providers.aws.boto3")
+    @pytest.mark.asyncio
+    async def test_delete_removes_existing_extras_with_the_record(self, mock_boto3):
+        primary = {"Name": "app.example.com.", "Type": "A", "TTL": 60, "ResourceRecords": [{"Value": "1.2.3.4"}]}
+        srv = {"Name": "_sip._tcp.app.example.com.", "Type": "SRV", "TTL": 60,
+               "ResourceRecords": [{"Value": "10 5 5060 app.example.com."}]}
+        mock_client = MagicMock()
+        mock_client.list_resource_record_sets.side_effect = [
+            {"ResourceRecordSets": [primary]},
+            {"ResourceRecordSets": [srv]},
+            {"ResourceRecordSets": []},  # the TXT set is already gone
+        ]
+        mock_boto3.client.return_value = mock_client
+        from providers.aws import AWSDNSProvider
+
+        await AWSDNSProvider().delete_record("app.example.com", RecordType.A, extras=(SRV, TXT))
+
+        mock_client.change_resource_record_sets.assert_called_once_with(
+            HostedZoneId="Z1234567890",
+            ChangeBatch={"Changes": [
+                {"Action": "DELETE", "ResourceRecordSet": primary},
+                {"Action": "DELETE", "ResourceRecordSet": srv},
+            ]},
+        )
+
+
+class TestAzureExtraRecords:
+    """Tests for alias record sets and extra records in the Azure provider."""
+
+    @pytest.fixture(autouse=True)
+    def setup_env(self, monkeypatch):
+        monkeypatch.setenv("MANAGED_IDENTITY_CLIENT_ID", "fake-client-id")
+        monkeypatch.setenv("AZURE_SUBSCRIPTION_ID", "fake-sub-id")
+        monkeypatch.setenv("AZURE_DNS_ZONE", "example.com")
+        monkeypatch.setenv("AZURE_DNS_RESOURCE_GROUP", "fake-rg")
+
+    @patch("providers.azure.DnsManagementClient")
+    @patch("providers.azure.ManagedIdentityCredential")
+    @pytest.mark.asyncio
+    async def test_alias_record_set_and_extras(self, mock_cred, mock_client_cls):
+        record_sets = mock_client_cls.return_value.record_sets
+        from providers.azure import AzureDNSProvider
+        target = "/subscriptions/s/resourceGroups/rg/providers/Microsoft.Network/publicIPAddresses/ip"
+
+        await AzureDNSProvider().create_or_update_record(
+            "app.example.com", target, RecordType.ALIAS, 60, extras=(TXT, SRV, CAA),
+        )
+
+        calls = [c.args for c in record_sets.create_or_update.call_args_list]
+        assert calls == [
+            ("fake-rg", "example.com", "app", "A", {"ttl": 60, "target_resource": {"id": target}}),
+            ("fake-rg", "example.com", "app", "TXT", {
+                "ttl": 60, "txt_records": [{"value": ["site-verification=abc"]}],
+            }),
+            ("fake-rg", "example.com", "_sip._tcp.app", "SRV", {"ttl": 60, "srv_records": [
+                {"priority": 10, "weight": 5, "port": 5060, "target": "app.example.com."},
+            ]}),
+            ("fake-rg", "example.com", "app", "CAA", {"ttl": 60, "caa_records": [
+                {"flags": 0, "tag": "issue", "value": "letsencrypt.org"},
+            ]}),
+        ]
+
+    @patch("providers.azure.DnsManagementClient")
+    @patch("providers.azure.ManagedIdentityCredential")
+    @pytest.mark.asyncio
+    async def test_alias_target_must_be_a_resource_id(self, mock_cred, mock_client_cls):
+        from providers.azure import AzureDNSProvider
+        with pytest.raises(ValueError, match="resource ID"):
+            await AzureDNSProvider().create_or_update_record("app.example.com", "lb.example.net", RecordType.ALIAS)
+
+
+class TestGCPExtraRecords:
+    """Tests for extra records in the GCP provider."""
+
+    @pytest.fixture(autouse=True)
+    def setup_env(self, monkeypatch):
+        monkeypatch.setenv("GCP_PROJECT_ID", "fake-project")
+        monkeypatch.setenv("GCP_MANAGED_ZONE", "fake-zone")
+        monkeypatch.setenv("GCP_DNS_ZONE", "example.com")
+
+    @patch("providers.gcp.google_dns")
+    @pytest.mark.asyncio
+    async def test_record_and_extras_replaced_in_one_change(self, mock_dns):
+        from google.api_core.exceptions import NotFound
+        old_txt = {"name": "app.example.com.", "type": "TXT", "ttl": 300, "rrdatas": ['"old"']}
+        api_request = mock_dns.Client.return_value._connection.api_request
+        api_request.side_effect = [NotFound("no A yet"), old_txt, {}]
+        from providers.gcp import GCPDNSProvider
+
+        await GCPDNSProvider().create_or_update_record("app.example.com", "1.2.3.4", RecordType.A, 60, extras=(TXT,))
+
+        change = api_request.call_args.kwargs
+        assert change["method"] == "POST"
+        assert change["data"] == {
+            "additions": [
+                {"name": "app.example.com.", "type": "A", "ttl": 60, "rrdatas": ["1.2.3.4"]},
+                {"name": "app.example.com.", "type": "TXT", "ttl": 60, "rrdatas": ['"site-verification=abc"']},
+            ],
+            "deletions": [old_txt],
+        }
+
+    @patch("providers.gcp.google_dns")
+    @pytest.mark.asyncio
+    async def test_alias_not_supported(self, mock_dns):
+        from providers.gcp import GCPDNSProvider
+        with pytest.raises(ValueError, match="no alias"):
+            await GCPDNSProvider().create_or_update_record("app.example.com", "lb.example.net", RecordType.ALIAS)
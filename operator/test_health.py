@@ -0,0 +1,105 @@
+"""Tests for liveness and readiness signals."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from health import CountingExecutor, HealthMonitor
+
+
+def _monitor(**kwargs):
+    in_flight = kwargs.pop("in_flight", 0)
+    return HealthMonitor(executor_workers=4, in_flight=lambda: in_flight, **kwargs)
+
+
+def test_healthy_by_default():
+    monitor = _monitor()
+    assert monitor.liveness() == (True, [])
+    assert monitor.readiness() == (True, [])
+
+
+def test_loop_lag_thresholds():
+    monitor = _monitor(ready_max_loop_lag=1.0, live_max_loop_lag=10.0)
+    monitor.loop_lag = 2.0
+    assert monitor.liveness()[0] is True
+    ready, problems = monitor.readiness()
+    assert ready is False
+    assert "event loop lag" in problems[0]
+
+    monitor.loop_lag = 11.0
+    assert monitor.liveness()[0] is False
+
+
+def test_executor_saturation():
+    assert _monitor(in_flight=4).readiness()[0] is True
+    ready, problems = _monitor(in_flight=6).readiness()
+    assert ready is False
+    assert "executor utilization 1.50" in problems[0]
+    assert _monitor(in_flight=6, ready_max_executor_utilization=0).readiness()[0] is True
+
+
+def test_provider_reachability():
+    monitor = _monitor(ready_provider_failure_threshold=3)
+    for _ in range(2):
+        monitor.record_provider_result(False)
+    assert monitor.readiness()[0] is True
+    monitor.record_provider_result(False)
+    assert monitor.readiness()[0] is False
+    monitor.record_provider_result(True)
+    assert monitor.readiness()[0] is True
+
+
+def test_watch_staleness(monkeypatch):
+    monitor = _monitor(live_max_watch_idle=60)
+    assert monitor.liveness()[0] is True
+    monitor.record_event()
+    now = time.time()
+    monkeypatch.setattr("health.time.time", lambda: now + 120)
+    alive, problems = monitor.liveness()
+    assert alive is False
+    assert "no watch events" in problems[0]
+
+
+def test_watch_staleness_is_off_by_default(monkeypatch):
+    monitor = _monitor()
+    now = time.time()
+    monkeypatch.setattr("health.time.time", lambda: now + 86400)
+    assert monitor.liveness() == (True, [])
+
+
+@pytest.mark.asyncio
+async def test_lag_monitor_detects_blocked_loop():
+    monitor = _monitor()
+    task = asyncio.create_task(monitor.run_lag_monitor(interval=0.01))
+    await asyncio.sleep(0)
+    time.sleep(0.1)  # block the event loop
+    for _ in range(3):
+        await asyncio.sleep(0)
+    task.cancel()
+    assert monitor.loop_lag >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_lag_monitor_refreshes_executor_gauge():
+    from prometheus_client import REGISTRY
+    monitor = _monitor(in_flight=2)
+    task = asyncio.create_task(monitor.run_lag_monitor(interval=0.01))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    assert REGISTRY.get_sample_value("dns_operator_executor_utilization") == 0.5
+
+
+@pytest.mark.asyncio
+async def test_counting_executor_counts_every_to_thread_call():
+    executor = CountingExecutor(max_workers=1)
+    asyncio.get_running_loop().set_default_executor(executor)
+    blocker = threading.Event()
+
+    calls = [asyncio.create_task(asyncio.to_thread(blocker.wait)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    assert executor.occupied == 3  # one running, two queued behind it
+    blocker.set()
+    await asyncio.gather(*calls)
+    assert executor.occupied == 0
@@ -0,0 +1,100 @@
+"""Tests for structured and sampled logging."""
+
+import json
+import logging
+import queue
+
+import logging_config
+from logging_config import JsonFormatter, SamplingFilter, STATE_TRANSITION
+
+
+def _record(msg, *args, level=logging.INFO, name="main", **extra):
+    logger = logging.getLogger(name)
+    return logger.makeRecord(name, level, __file__, 1, msg, args, None, extra=extra or None)
+
+
+def test_json_formatter_includes_extra_fields():
+    record = _record("[%s] DNS %s %s", "azure", "created", "app.example.com",
+                     host="app.example.com", provider="azure", **STATE_TRANSITION)
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "[azure] DNS created app.example.com"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "main"
+    assert entry["host"] == "app.example.com"
+    assert entry["provider"] == "azure"
+    assert "state_transition" not in entry
+
+
+def test_json_formatter_exception():
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        record = logging.getLogger("main").makeRecord(
+            "main", logging.ERROR, __file__, 1, "failed", (), exc_info=__import__("sys").exc_info()
+        )
+    entry = json.loads(JsonFormatter().format(record))
+    assert "RuntimeError: boom" in entry["exc_info"]
+
+
+def test_sampling_filter_limits_repetitive_messages():
+    sampler = SamplingFilter(interval=60, burst=2)
+    results = [sampler.filter(_record("DNS updated %s", f"host{i}")) for i in range(5)]
+    assert results == [True, True, False, False, False]
+
+
+def test_sampling_filter_keys_by_template():
+    sampler = SamplingFilter(interval=60)
+    assert sampler.filter(_record("DNS updated %s", "a"))
+    assert sampler.filter(_record("DNS upserted %s", "a"))
+    assert sampler.filter(_record("DNS updated %s", "a", sample_key="other"))
+    assert not sampler.filter(_record("DNS updated %s", "b"))
+
+
+def test_sampling_filter_never_drops_errors_or_transitions():
+    sampler = SamplingFilter(interval=60)
+    assert all(sampler.filter(_record("failed %s", "x", level=logging.ERROR)) for _ in range(5))
+    assert all(sampler.filter(_record("DNS created %s", "x", **STATE_TRANSITION)) for _ in range(5))
+
+
+def test_sampling_filter_reports_suppressed_count(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(logging_config.time, "monotonic", lambda: now[0])
+    sampler = SamplingFilter(interval=10)
+    for _ in range(4):
+        sampler.filter(_record("DNS updated"))
+    now[0] += 11
+    record = _record("DNS updated")
+    assert sampler.filter(record)
+    assert record.suppressed == 3
+
+
+def test_configure_logging_async_json(monkeypatch):
+    monkeypatch.setenv("LOG_FORMAT", "json")
+    monkeypatch.setenv("LOG_ASYNC", "true")
+    monkeypatch.setenv("LOG_SAMPLE_INTERVAL", "30")
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    root.handlers = []
+    try:
+        listener = logging_config.configure_logging()
+        assert listener is not None
+        handler = root.handlers[0]
+        assert isinstance(handler.queue, queue.SimpleQueue)
+        assert any(isinstance(f, SamplingFilter) for f in handler.filters)
+        assert isinstance(listener.handlers[0].formatter, JsonFormatter)
+        listener.stop()
+    finally:
+        root.handlers = saved_handlers
+        root.setLevel(saved_level)
+
+
+def test_configure_logging_keeps_existing_configuration(monkeypatch):
+    monkeypatch.setenv("LOG_ASYNC", "true")
+    root = logging.getLogger()
+    sentinel = logging.NullHandler()
+    root.addHandler(sentinel)
+    try:
+        assert logging_config.configure_logging() is None
+        assert sentinel in root.handlers
+    finally:
+        root.removeHandler(sentinel)
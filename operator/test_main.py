@@ -1,6 +1,8 @@
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 import os
+from derivation import DesiredRecord
 from providers.base import RecordType
 
 # Mocked Environment Variables — Azure (default provider)
@@ -18,6 +20,21 @@ with patch("kubernetes.config.load_incluster_config", MagicMock()):
             import main
 
 
+@pytest.fixture(autouse=True)
+def fresh_state():
+    from ownership import HostOwnership
+    from record_store import RecordStore
+    from resource_versions import ResourceVersionTracker
+    from retry import RetryQueue
+    from sources import GatewayIndex
+    with patch.object(main, "host_ownership", HostOwnership()), \
+         patch.object(main, "managed_records", RecordStore()), \
+         patch.object(main, "resource_versions", ResourceVersionTracker()), \
+         patch.object(main, "gateway_index", GatewayIndex()), \
+         patch.object(main, "retries", RetryQueue(main._retry_operation)):
+        yield
+
+
 @pytest.fixture
 def mock_provider():
     with patch.object(main, "dns_provider") as mock:
@@ -25,6 +42,7 @@ def mock_provider():
         mock.create_or_update_record = AsyncMock()
         mock.delete_record = AsyncMock()
         mock.is_hostname = MagicMock(return_value=False)  # Default: treat as IP (not hostname)
+        mock.error_class = MagicMock(return_value="other")
         yield mock
 
 
@@ -232,3 +250,630 @@ def test_configure_handler():
     assert mock_settings.posting.level == 30  # logging.WARNING
     assert mock_settings.watching.connect_timeout == 60
     assert mock_settings.watching.server_timeout == 60
+
+
+# =============================================================================
+# Debounce Tests
+# =============================================================================
+
+@pytest.mark.asyncio
+async def test_ingress_event_handler_debounced(mock_provider):
+    """With a settle window, churn is coalesced into a single create with the final target."""
+    from debounce import Debouncer
+
+    def _event(event_type, ip):
+        status = {"loadBalancer": {"ingress": [{"ip": ip}] if ip else []}}
+        return {
+            "type": event_type,
+            "object": {
+                "spec": {"rules": [{"host": "test.example.com"}], "ingressClassName": "nginx"},
+                "metadata": {"uid": "uid-1", "annotations": {}},
+                "status": status,
+            },
+        }
+
+    debouncer = Debouncer(main._apply_settled, 0.05, 1, coalesce=main._coalesce_actions)
+    with patch.object(main, "debouncer", debouncer), \
+         patch("main.create_or_update_dns_record", new_callable=AsyncMock) as mock_create:
+        await main.ingress_event_handler(_event("ADDED", "5.6.7.8"))
+        await main.ingress_event_handler(_event("MODIFIED", None))
+        await main.ingress_event_handler(_event("MODIFIED", "9.9.9.9"))
+        mock_create.assert_not_called()
+
+        await asyncio.sleep(0.1)
+        mock_create.assert_called_once()
+        ingress, action = mock_create.call_args.args
+        assert action == "create"
+        assert ingress["status"]["loadBalancer"]["ingress"][0]["ip"] == "9.9.9.9"
+
+
+@pytest.mark.asyncio
+async def test_delete_cancels_pending_debounce(mock_provider):
+    from debounce import Debouncer
+    ingress = {
+        "spec": {"rules": [{"host": "test.example.com"}]},
+        "metadata": {"uid": "uid-2", "annotations": {}},
+        "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+    }
+    debouncer = Debouncer(main._apply_settled, 0.05, 1, coalesce=main._coalesce_actions)
+    with patch.object(main, "debouncer", debouncer), \
+         patch("main.create_or_update_dns_record", new_callable=AsyncMock) as mock_create:
+        await main.ingress_event_handler({"type": "ADDED", "object": ingress})
+        await main.ingress_event_handler({"type": "DELETED", "object": ingress})
+        await asyncio.sleep(0.1)
+        mock_create.assert_not_called()
+        mock_provider.delete_record.assert_called_once_with("test.example.com", RecordType.A)
+
+
+@pytest.mark.asyncio
+async def test_delete_waits_for_a_debounced_write_in_flight(mock_provider):
+    from debounce import Debouncer
+    ingress = {
+        "spec": {"rules": [{"host": "test.example.com"}], "ingressClassName": "nginx-internal"},
+        "metadata": {"uid": "uid-3", "annotations": {}},
+        "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+    }
+    release = asyncio.Event()
+    calls = []
+
+    async def blocked_write(*args):
+        calls.append("write")
+        await release.wait()
+
+    async def delete(*args):
+        calls.append("delete")
+
+    mock_provider.create_or_update_record.side_effect = blocked_write
+    mock_provider.delete_record.side_effect = delete
+    debouncer = Debouncer(main._apply_settled, 0.01, 1, coalesce=main._coalesce_actions)
+    with patch.object(main, "debouncer", debouncer), patch.object(main, "scheduler", None):
+        await main.ingress_event_handler({"type": "ADDED", "object": ingress})
+        await asyncio.sleep(0.05)
+        assert calls == ["write"]
+
+        deleting = asyncio.create_task(main.ingress_event_handler({"type": "DELETED", "object": ingress}))
+        await asyncio.sleep(0.02)
+        assert calls == ["write"]
+
+        release.set()
+        await asyncio.wait_for(deleting, 1)
+    assert calls == ["write", "delete"]
+
+
+# =============================================================================
+# Priority Classification Tests
+# =============================================================================
+
+def test_classify_event():
+    from scheduler import Priority
+
+    def _ingress(ip):
+        return {
+            "spec": {"rules": [{"host": "classify.example.com"}]},
+            "metadata": {"uid": "uid-classify", "annotations": {}},
+            "status": {"loadBalancer": {"ingress": [{"ip": ip}]}},
+        }
+
+    with patch.dict(main._observed_targets, clear=True):
+        assert main.classify_event("ADDED", _ingress("1.1.1.1")) == Priority.HIGH
+        assert main.classify_event("MODIFIED", _ingress("1.1.1.1")) == Priority.LOW
+        assert main.classify_event("MODIFIED", _ingress("2.2.2.2")) == Priority.MEDIUM
+        assert main.classify_event("DELETED", _ingress("2.2.2.2")) == Priority.HIGH
+        # Unknown objects seen through MODIFIED (e.g. after a restart) are resync work
+        assert main.classify_event("MODIFIED", _ingress("2.2.2.2")) == Priority.LOW
+
+
+@pytest.mark.asyncio
+async def test_ingress_event_handler_uses_scheduler(mock_provider):
+    from scheduler import PriorityScheduler
+    ingress = {
+        "spec": {"rules": [{"host": "test.example.com"}], "ingressClassName": "nginx"},
+        "metadata": {"uid": "uid-sched", "annotations": {}},
+        "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+    }
+    scheduler = PriorityScheduler(workers=2)
+    with patch.object(main, "scheduler", scheduler):
+        await main.ingress_event_handler({"type": "ADDED", "object": ingress})
+        await main.ingress_event_handler({"type": "DELETED", "object": ingress})
+    await scheduler.close()
+
+    mock_provider.create_or_update_record.assert_called_once_with("test.example.com", "1.2.3.4", RecordType.A, 300)
+    mock_provider.delete_record.assert_called_once_with("test.example.com", RecordType.A)
+
+
+# =============================================================================
+# Health Probe Tests
+# =============================================================================
+
+@pytest.mark.asyncio
+async def test_probes_fail_when_thresholds_exceeded():
+    request = MagicMock()
+    with patch.object(main.health, "loop_lag", 30.0):
+        response = await main.health_check(request)
+        assert response.status == 503
+        assert "event loop lag" in response.text
+
+        response = await main.readiness_check(request)
+        assert response.status == 503
+
+
+@pytest.mark.asyncio
+async def test_provider_failures_mark_operator_unready(mock_provider):
+    mock_provider.delete_record.side_effect = Exception("API error")
+    ingress = {"spec": {"rules": [{"host": "test.example.com"}]}, "metadata": {"annotations": {}}}
+    with patch.object(main.health, "provider_failures", 0):
+        for _ in range(main.health.ready_provider_failure_threshold):
+            await main.delete_dns_record(ingress)
+        response = await main.readiness_check(MagicMock())
+        assert response.status == 503
+        assert "provider failed" in response.text
+    main.health.record_provider_result(True)
+
+
+@pytest.mark.asyncio
+async def test_records_managed_gauge_counts_distinct_records(mock_provider):
+    from prometheus_client import REGISTRY
+    ingress = {
+        "spec": {"rules": [{"host": "gauge.example.com"}], "ingressClassName": "nginx"},
+        "metadata": {"annotations": {}},
+        "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+    }
+    before = len(main.managed_records)
+
+    await main.create_or_update_dns_record(ingress, "create")
+    await main.create_or_update_dns_record(ingress, "update")
+    assert len(main.managed_records) == before + 1
+    assert REGISTRY.get_sample_value("dns_operator_records_managed") == before + 1
+
+    await main.delete_dns_record(ingress)
+    assert "gauge.example.com" not in main.managed_records
+    assert REGISTRY.get_sample_value("dns_operator_records_managed") == before
+
+
+@pytest.mark.asyncio
+async def test_routing_policy_is_passed_to_provider(mock_provider):
+    from providers.base import RoutingPolicy
+    ingress = {
+        "spec": {"rules": [{"host": "shared.example.com"}], "ingressClassName": "nginx-internal"},
+        "metadata": {"annotations": {
+            "hub-dns-operator.io/set-identifier": "spoke-a",
+            "hub-dns-operator.io/region": "eu-west-1",
+        }},
+        "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+    }
+    policy = RoutingPolicy("spoke-a", region="eu-west-1")
+
+    await main.create_or_update_dns_record(ingress, "create")
+    mock_provider.create_or_update_record.assert_called_once_with(
+        "shared.example.com", "5.6.7.8", RecordType.A, 300, routing=policy
+    )
+
+    await main.delete_dns_record(ingress)
+    mock_provider.delete_record.assert_called_once_with("shared.example.com", RecordType.A, routing=policy)
+
+
+@pytest.mark.asyncio
+async def test_ttl_annotation_overrides_custom_ttl(mock_provider):
+    ingress = {
+        "spec": {"rules": [{"host": "ttl.example.com"}], "ingressClassName": "nginx"},
+        "metadata": {"annotations": {"hub-dns-operator.io/ttl": "30"}},
+        "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+    }
+
+    await main.create_or_update_dns_record(ingress, "create")
+    mock_provider.create_or_update_record.assert_called_once_with(
+        "ttl.example.com", "1.2.3.4", RecordType.A, 30
+    )
+
+
+@pytest.mark.asyncio
+async def test_written_records_are_watched_for_propagation(mock_provider):
+    ingress = {
+        "spec": {"rules": [{"host": "watch.example.com"}], "ingressClassName": "nginx"},
+        "metadata": {"annotations": {}},
+        "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+    }
+    checker = MagicMock()
+    with patch.object(main, "propagation", checker):
+        await main.create_or_update_dns_record(ingress, "create")
+        await main.delete_dns_record(ingress)
+
+    assert checker.watch.call_args.args[0].domain == "watch.example.com"
+    checker.cancel.assert_called_once_with("watch.example.com")
+
+
+@pytest.mark.asyncio
+async def test_plan_endpoint_serves_dry_run_changes():
+    import json
+    from providers.dry_run import DryRunDNSProvider
+    dry_run = DryRunDNSProvider(MagicMock(provider_name="azure"))
+    ingress = {
+        "spec": {"rules": [{"host": "dry.example.com"}], "ingressClassName": "nginx"},
+        "metadata": {"annotations": {}},
+        "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+    }
+    with patch.object(main, "dns_provider", dry_run):
+        await main.create_or_update_dns_record(ingress, "create")
+        response = await main.plan_handler(MagicMock())
+
+    body = json.loads(response.text)
+    assert body["count"] == 1
+    assert body["changes"][0]["name"] == "dry.example.com"
+
+
+@pytest.mark.asyncio
+async def test_duplicate_host_has_one_writer_and_is_reference_counted(mock_provider):
+    def ingress(name, created, ip):
+        return {
+            "metadata": {"name": name, "namespace": "team", "uid": name, "creationTimestamp": created,
+                         "annotations": {}},
+            "spec": {"rules": [{"host": "dup.example.com"}], "ingressClassName": "nginx-internal"},
+            "status": {"loadBalancer": {"ingress": [{"ip": ip}]}},
+        }
+    older = ingress("older", "2024-01-01T00:00:00Z", "10.0.0.1")
+    newer = ingress("newer", "2024-06-01T00:00:00Z", "10.0.0.2")
+
+    with patch("main.kopf.warn") as warn:
+        await main.ingress_event_handler({"type": "ADDED", "object": older})
+        await main.ingress_event_handler({"type": "ADDED", "object": newer})
+        await main.ingress_event_handler({"type": "MODIFIED", "object": newer})
+
+    mock_provider.create_or_update_record.assert_called_once_with("dup.example.com", "10.0.0.1", RecordType.A, 300)
+    warn.assert_called_once()
+    assert warn.call_args.args[0] is newer
+    assert warn.call_args.kwargs["reason"] == "DNSHostConflict"
+
+    # Winner goes away: the record is handed over, not deleted
+    await main.ingress_event_handler({"type": "DELETED", "object": older})
+    mock_provider.delete_record.assert_not_called()
+    mock_provider.create_or_update_record.assert_called_with("dup.example.com", "10.0.0.2", RecordType.A, 300)
+
+    # Last owner goes away: the record is deleted
+    await main.ingress_event_handler({"type": "DELETED", "object": newer})
+    mock_provider.delete_record.assert_called_once_with("dup.example.com", RecordType.A)
+
+
+@pytest.mark.asyncio
+async def test_initial_listing_only_rebuilds_ownership(mock_provider):
+    ingress = {
+        "metadata": {"name": "listed", "uid": "listed", "annotations": {}},
+        "spec": {"rules": [{"host": "listed.example.com"}]},
+        "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+    }
+    await main.ingress_event_handler({"type": None, "object": ingress})
+    mock_provider.create_or_update_record.assert_not_called()
+    assert main.host_ownership.owners(("listed.example.com", "")) == [ingress]
+
+
+@pytest.mark.asyncio
+async def test_replayed_resource_versions_cause_no_provider_work(mock_provider):
+    def ingress(version, ip):
+        return {
+            "metadata": {"name": "app", "uid": "app", "resourceVersion": version, "annotations": {}},
+            "spec": {"rules": [{"host": "app.example.com"}], "ingressClassName": "nginx-internal"},
+            "status": {"loadBalancer": {"ingress": [{"ip": ip}]}},
+        }
+
+    await main.ingress_event_handler({"type": "ADDED", "object": ingress("10", "5.6.7.8")})
+    await main.ingress_event_handler({"type": "ADDED", "object": ingress("10", "5.6.7.8")})
+    await main.ingress_event_handler({"type": None, "object": ingress("10", "5.6.7.8")})
+    assert mock_provider.create_or_update_record.call_count == 1
+
+    # Changed while the watch was down: the re-listed object is written
+    await main.ingress_event_handler({"type": None, "object": ingress("12", "5.6.7.9")})
+    assert mock_provider.create_or_update_record.call_count == 2
+    mock_provider.create_or_update_record.assert_called_with("app.example.com", "5.6.7.9", RecordType.A, 300)
+
+
+@pytest.mark.asyncio
+async def test_extra_records_written_and_deleted_with_the_record(mock_provider):
+    from providers.base import ExtraRecord
+    ingress = {
+        "metadata": {"annotations": {"hub-dns-operator.io/txt": "site-verification=abc"}},
+        "spec": {"rules": [{"host": "app.example.com"}], "ingressClassName": "nginx-internal"},
+        "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+    }
+    extras = (ExtraRecord("app.example.com", RecordType.TXT, ("site-verification=abc",)),)
+
+    await main.create_or_update_dns_record(ingress, "create")
+    mock_provider.create_or_update_record.assert_called_once_with(
+        "app.example.com", "5.6.7.8", RecordType.A, 300, extras=extras
+    )
+
+    await main.delete_dns_record(ingress)
+    mock_provider.delete_record.assert_called_once_with("app.example.com", RecordType.A, extras=extras)
+
+
+def test_configure_handler_watch_timeouts(monkeypatch):
+    monkeypatch.setattr(main, "WATCH_SERVER_TIMEOUT_SECONDS", 600)
+    monkeypatch.setattr(main, "WATCH_CLIENT_TIMEOUT_SECONDS", 660)
+    mock_settings = MagicMock()
+    main.configure(settings=mock_settings)
+    assert mock_settings.watching.server_timeout == 600
+    assert mock_settings.watching.client_timeout == 660
+
+
+@pytest.mark.asyncio
+async def test_failed_write_is_retried_until_it_succeeds(mock_provider):
+    ingress = {
+        "spec": {"rules": [{"host": "retry.example.com"}], "ingressClassName": "nginx"},
+        "metadata": {"annotations": {}},
+        "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+    }
+    mock_provider.is_retryable_error = MagicMock(return_value=True)
+    mock_provider.create_or_update_record.side_effect = [Exception("503"), Exception("503"), None]
+
+    await main.create_or_update_dns_record(ingress, "create")
+    assert len(main.retries) == 1
+
+    for _ in range(2):
+        [entry] = main.retries.due(now=float("inf"))
+        await main._retry_operation(entry.operation, entry.payload)
+
+    assert mock_provider.create_or_update_record.call_count == 3
+    assert len(main.retries) == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_repair_write_is_parked_under_the_owning_ingress(mock_provider):
+    ingress = {
+        "spec": {"rules": [{"host": "repair.example.com"}], "ingressClassName": "nginx"},
+        "metadata": {"namespace": "team", "name": "app", "annotations": {}},
+        "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+    }
+    main.host_ownership.claim("team/app", ingress)
+    mock_provider.is_retryable_error = MagicMock(return_value=True)
+    mock_provider.create_or_update_record.side_effect = Exception("503")
+
+    await main._write_owned_record(DesiredRecord("repair.example.com", "1.2.3.4", RecordType.A, 300), force=True)
+
+    [entry] = main.retries.due(now=float("inf"))
+    assert (entry.key, entry.operation, entry.payload) == ("repair.example.com", "upsert", ingress)
+
+
+def test_retry_payload_keeps_identity_host_and_operator_annotations():
+    ingress = {
+        "metadata": {"namespace": "team", "name": "app", "uid": "u1", "managedFields": [{"big": "x"}],
+                     "annotations": {"hub-dns-operator.io/record-type": "CNAME",
+                                     "kubectl.kubernetes.io/last-applied-configuration": "{...}"}},
+        "spec": {"rules": [{"host": "app.example.com", "http": {"paths": []}}], "ingressClassName": "nginx"},
+        "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+    }
+    assert main._retry_payload(ingress) == {
+        "kind": "Ingress",
+        "metadata": {"namespace": "team", "name": "app", "uid": "u1",
+                     "annotations": {"hub-dns-operator.io/record-type": "CNAME"}},
+        "spec": {"rules": [{"host": "app.example.com"}]},
+    }
+
+
+@pytest.mark.asyncio
+async def test_permanent_delete_failure_is_dead_lettered(mock_provider):
+    ingress = {"spec": {"rules": [{"host": "gone.example.com"}]}, "metadata": {"annotations": {}}}
+    mock_provider.is_retryable_error = MagicMock(return_value=False)
+    mock_provider.delete_record.side_effect = Exception("403")
+
+    await main.delete_dns_record(ingress)
+    assert len(main.retries) == 0
+    assert main.retries.snapshot()["dead_letters"][0]["operation"] == "delete"
+
+
+@pytest.mark.asyncio
+async def test_load_balancer_service_publishes_and_releases_its_host(mock_provider):
+    def service(version, annotations, type_="LoadBalancer"):
+        return {
+            "apiVersion": "v1", "kind": "Service",
+            "metadata": {"name": "api", "namespace": "team", "uid": "svc-1", "resourceVersion": version,
+                         "annotations": annotations},
+            "spec": {"type": type_, "loadBalancerClass": "nginx-internal"},
+            "status": {"loadBalancer": {"ingress": [{"ip": "10.0.0.5"}]}},
+        }
+    published = {"hub-dns-operator.io/hostname": "api.example.com"}
+
+    await main.service_event_handler({"type": "ADDED", "object": service("1", published)})
+    mock_provider.create_or_update_record.assert_called_once_with("api.example.com", "10.0.0.5", RecordType.A, 300)
+
+    # No longer a LoadBalancer: the record goes, as if the Service were deleted
+    await main.service_event_handler({"type": "MODIFIED", "object": service("2", published, "ClusterIP")})
+    mock_provider.delete_record.assert_called_once_with("api.example.com", RecordType.A)
+    await main.service_event_handler({"type": "DELETED", "object": service("3", published, "ClusterIP")})
+    mock_provider.delete_record.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_hostname_load_balancer_service_deletes_its_cname(mock_provider):
+    service = {
+        "apiVersion": "v1", "kind": "Service",
+        "metadata": {"name": "api", "namespace": "team", "uid": "svc-2", "resourceVersion": "1",
+                     "annotations": {"hub-dns-operator.io/hostname": "api.example.com"}},
+        "spec": {"type": "LoadBalancer"},
+        "status": {"loadBalancer": {"ingress": [{"hostname": "abc.elb.amazonaws.com"}]}},
+    }
+
+    await main.service_event_handler({"type": "ADDED", "object": service})
+    mock_provider.create_or_update_record.assert_called_once_with(
+        "api.example.com", "abc.elb.amazonaws.com", RecordType.CNAME, 300
+    )
+    await main.service_event_handler({"type": "DELETED", "object": {**service, "status": {}}})
+    mock_provider.delete_record.assert_called_once_with("api.example.com", RecordType.CNAME)
+
+    # Not in the record store (e.g. after a restart): derived from the object instead
+    mock_provider.delete_record.reset_mock()
+    await main.delete_dns_record(main.sources.service_view(service))
+    mock_provider.delete_record.assert_called_once_with("api.example.com", RecordType.CNAME)
+
+
+@pytest.mark.asyncio
+async def test_http_route_is_rewritten_when_its_gateway_moves(mock_provider):
+    route = {
+        "apiVersion": "gateway.networking.k8s.io/v1", "kind": "HTTPRoute",
+        "metadata": {"name": "shop", "namespace": "team", "uid": "route-1", "resourceVersion": "3"},
+        "spec": {"hostnames": ["shop.example.com"], "parentRefs": [{"name": "gw", "namespace": "infra"}]},
+    }
+
+    def gateway(version, ip):
+        return {
+            "metadata": {"name": "gw", "namespace": "infra", "resourceVersion": version},
+            "spec": {"gatewayClassName": "nginx-internal"},
+            "status": {"addresses": [{"type": "IPAddress", "value": ip}]},
+        }
+
+    await main.gateway_event_handler({"type": None, "object": gateway("1", "10.0.0.1")})
+    await main.httproute_event_handler({"type": None, "object": route})
+    mock_provider.create_or_update_record.assert_not_called()
+
+    await main.gateway_event_handler({"type": "MODIFIED", "object": gateway("2", "10.0.0.2")})
+    mock_provider.create_or_update_record.assert_called_once_with(
+        "shop.example.com", "10.0.0.2", RecordType.A, 300
+    )
+
+    await main.httproute_event_handler({"type": "DELETED", "object": route})
+    mock_provider.delete_record.assert_called_once_with("shop.example.com", RecordType.A)
+
+
+@pytest.mark.asyncio
+async def test_replay_feeds_a_trace_through_the_handlers():
+    import replay
+    from providers.fake import FakeDNSProvider
+
+    def record(t, event_type, ip, version):
+        return {"t": t, "source": "ingress", "type": event_type, "object": {
+            "apiVersion": "networking.k8s.io/v1", "kind": "Ingress",
+            "metadata": {"name": "app", "namespace": "team", "uid": "app", "resourceVersion": version,
+                         "annotations": {}},
+            "spec": {"ingressClassName": "nginx-internal", "rules": [{"host": "replay.example.com"}]},
+            "status": {"loadBalancer": {"ingress": [{"ip": ip}]}},
+        }}
+    trace = [
+        record(0.0, "ADDED", "10.0.0.1", "1"),
+        {"t": 0.001, "call": "create", "host": "replay.example.com", "provider": "aws", "seconds": 0.01},
+        record(0.002, "MODIFIED", "10.0.0.2", "2"),
+        record(0.003, "MODIFIED", "10.0.0.2", "2"),  # replayed by a re-list
+        record(0.004, "DELETED", "10.0.0.2", "3"),
+    ]
+    provider = FakeDNSProvider(latency=0)
+
+    with patch.object(main, "dns_provider", provider), patch.object(main, "debouncer", None):
+        report = await replay.replay(main, trace, speed=10, provider=provider)
+
+    assert report.events == 4
+    assert report.provider_calls == 3
+    assert report.handler_errors == 0
+    assert len(report.dispatch_lag) == 4
+    assert provider.records == {}
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_serves_gzip_when_accepted():
+    import gzip
+    request = MagicMock()
+    request.headers = {"Accept-Encoding": "gzip, deflate"}
+    response = await main.metrics_handler(request)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert b"dns_operator_operations_total" in gzip.decompress(response.body)
+
+
+@pytest.mark.asyncio
+async def test_errors_are_counted_by_normalized_class(mock_provider):
+    from prometheus_client import REGISTRY
+    mock_provider.create_or_update_record.side_effect = TimeoutError("slow")
+    mock_provider.error_class.side_effect = None
+    mock_provider.error_class.return_value = "timeout"
+    labels = {"operation": "create", "error_type": "timeout", "provider": "azure"}
+    before = REGISTRY.get_sample_value("dns_operator_errors_total", labels) or 0
+    ingress = {
+        "spec": {"rules": [{"host": "slow.example.com"}], "ingressClassName": "nginx"},
+        "metadata": {"annotations": {}},
+        "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+    }
+
+    await main.create_or_update_dns_record(ingress, "create")
+
+    assert REGISTRY.get_sample_value("dns_operator_errors_total", labels) == before + 1
+
+
+@pytest.mark.asyncio
+async def test_refresh_reaches_aggregating_backends_behind_circuit_breaker_and_dry_run(monkeypatch):
+    from providers.aggregation import AggregatingDNSProvider
+    from providers.dry_run import DryRunDNSProvider
+    from providers.fake import FakeDNSProvider
+    monkeypatch.setenv("CLOUD_PROVIDER", "fake,fake")
+    monkeypatch.setattr(main, "AGGREGATION_OWNER_ID", "spoke-a")
+    monkeypatch.setattr(main, "CIRCUIT_FAILURE_THRESHOLD", 5)
+    monkeypatch.setattr(main, "circuit_breakers", {})
+    monkeypatch.setattr(main, "multi_provider", None)
+    monkeypatch.setattr(main, "aggregating_providers", [])
+    monkeypatch.setattr(main, "create_provider", lambda name: FakeDNSProvider(latency=0))
+    monkeypatch.setattr(main, "dns_provider", DryRunDNSProvider(main.create_dns_provider()))
+    refresh = AsyncMock()
+    monkeypatch.setattr(AggregatingDNSProvider, "refresh", refresh)
+
+    task = asyncio.create_task(main.refresh_aggregated_records(0.01))
+    await asyncio.sleep(0.03)
+    task.cancel()
+
+    assert len(main.aggregating_providers) == 2
+    assert refresh.await_count >= 2
+
+
+@pytest.mark.asyncio
+async def test_target_change_on_update_is_logged_as_state_transition(mock_provider, caplog):
+    from providers.base import DNSRecord
+    from record_store import RecordStore
+    ingress = {
+        "spec": {"rules": [{"host": "moved.example.com"}], "ingressClassName": "nginx-internal"},
+        "metadata": {"annotations": {}},
+        "status": {"loadBalancer": {"ingress": [{"ip": "10.0.0.2"}]}},
+    }
+    store = RecordStore()
+    store.put(DNSRecord("moved.example.com", "10.0.0.1", RecordType.A, 300))
+    retimed = {**ingress, "metadata": {"annotations": {"hub-dns-operator.io/ttl": "60"}}}
+    with patch.object(main, "managed_records", store), caplog.at_level("INFO", logger="main"):
+        await main.create_or_update_dns_record(ingress, "update")
+        await main.create_or_update_dns_record(retimed, "update")  # same target, new TTL
+
+    updates = [r for r in caplog.records if r.getMessage().startswith("[azure] DNS updated moved.example.com")]
+    assert [r.state_transition for r in updates] == [True, False]
+
+
+@pytest.mark.asyncio
+async def test_main_stops_log_listener_on_shutdown():
+    listener = MagicMock()
+    with patch.object(main, "log_listener", listener), \
+         patch.object(main.web, "AppRunner") as runner, patch.object(main.web, "TCPSite") as site, \
+         patch.object(main.kopf, "operator", AsyncMock()):
+        runner.return_value.setup = AsyncMock()
+        runner.return_value.cleanup = AsyncMock()
+        site.return_value.start = AsyncMock()
+        await main.main()
+
+    listener.stop.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_unchanged_write_is_skipped_unless_forced(mock_provider):
+    from prometheus_client import REGISTRY
+    from record_store import RecordStore
+    ingress = {
+        "spec": {"rules": [{"host": "same.example.com"}], "ingressClassName": "nginx"},
+        "metadata": {"annotations": {}},
+        "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+    }
+    labels = {"reason": "unchanged"}
+    before = REGISTRY.get_sample_value("dns_operator_writes_skipped_total", labels) or 0
+    with patch.object(main, "managed_records", RecordStore()):
+        await main.create_or_update_dns_record(ingress, "create")
+        await main.create_or_update_dns_record(ingress, "update")  # off by default: resyncs repair drift
+        assert mock_provider.create_or_update_record.await_count == 2
+        mock_provider.create_or_update_record.reset_mock()
+
+    with patch.object(main, "managed_records", RecordStore()), patch.object(main, "SKIP_UNCHANGED_WRITES", True):
+        await main.create_or_update_dns_record(ingress, "create")
+        await main.create_or_update_dns_record(ingress, "update")  # resync: nothing changed
+        assert mock_provider.create_or_update_record.await_count == 1
+
+        record = main.derive_record(ingress, main.operator_config)
+        await main.write_dns_record(record, "update", force=True)  # drift repair
+        assert mock_provider.create_or_update_record.await_count == 2
+
+    assert REGISTRY.get_sample_value("dns_operator_writes_skipped_total", labels) == before + 1
@@ -0,0 +1,63 @@
+"""Tests for per-record metrics and the cached exposition."""
+
+import asyncio
+import gzip
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import CollectorRegistry, Counter, generate_latest
+
+from metrics import CachedExposition, RecordMetrics
+
+
+def test_only_the_busiest_records_are_exported():
+    registry = CollectorRegistry()
+    records = RecordMetrics(top_k=2, registry=registry)
+    for host, operations in (("a.example.com", 5), ("b.example.com", 1), ("c.example.com", 3)):
+        for _ in range(operations):
+            records.observe(host, success=True)
+    records.observe("b.example.com", success=False)
+    records.observe("b.example.com", success=False)
+
+    def sample(host, status):
+        return registry.get_sample_value("dns_operator_record_operations_total", {"host": host, "status": status})
+
+    assert sample("a.example.com", "success") == 5
+    assert sample("c.example.com", "success") == 3
+    assert sample("b.example.com", "error") is None
+    assert registry.get_sample_value("dns_operator_record_metrics_hosts") == 3
+
+    records.forget("a.example.com")
+    assert sample("b.example.com", "error") == 2
+    assert registry.get_sample_value("dns_operator_record_metrics_hosts") == 2
+
+
+@pytest.mark.asyncio
+async def test_exposition_is_rendered_once_per_interval():
+    registry = CollectorRegistry()
+    counter = Counter("cached_things", "things", registry=registry)
+    exposition = CachedExposition(max_age=60, registry=registry)
+
+    with patch("metrics.generate_latest", wraps=generate_latest) as render:
+        first, second = await asyncio.gather(exposition.get(), exposition.get())
+        counter.inc()
+        third, _ = await exposition.get()
+        assert render.call_count == 1
+    assert first == second and first[1] is None
+    assert third == first[0]  # still the cached rendering
+
+    body, encoding = await exposition.get(accept_gzip=True)
+    assert encoding == "gzip"
+    assert gzip.decompress(body) == first[0]
+
+
+@pytest.mark.asyncio
+async def test_uncached_exposition_renders_every_scrape():
+    registry = CollectorRegistry()
+    counter = Counter("fresh_things", "things", registry=registry)
+    exposition = CachedExposition(max_age=0, registry=registry)
+
+    await exposition.get()
+    counter.inc()
+    body, _ = await exposition.get()
+    assert b"fresh_things_total 1.0" in body
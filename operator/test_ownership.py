@@ -0,0 +1,80 @@
+"""Tests for the host ownership index."""
+
+from prometheus_client import REGISTRY
+
+from ownership import HostOwnership, ingress_name
+
+
+def _ingress(name, host="app.example.com", created="2024-01-01T00:00:00Z", set_identifier=None):
+    annotations = {"hub-dns-operator.io/set-identifier": set_identifier} if set_identifier else {}
+    return {
+        "metadata": {"name": name, "namespace": "team", "creationTimestamp": created, "annotations": annotations},
+        "spec": {"rules": [{"host": host}]},
+    }
+
+
+def _contested():
+    return REGISTRY.get_sample_value("dns_operator_contested_hosts")
+
+
+def test_oldest_claim_wins_regardless_of_arrival_order():
+    index = HostOwnership()
+    newer = _ingress("newer", created="2024-06-01T00:00:00Z")
+    older = _ingress("older", created="2024-01-01T00:00:00Z")
+
+    first = index.claim("uid-newer", newer)
+    assert first.is_winner and not first.new_conflict
+
+    second = index.claim("uid-older", older)
+    assert second.is_winner and second.new_conflict
+    assert second.displaced is newer
+    assert _contested() == 1
+
+    again = index.claim("uid-newer", newer)
+    assert not again.is_winner and not again.new_conflict
+    assert again.winner is older
+    assert index.conflicts() == {"app.example.com": ["team/older", "team/newer"]}
+
+
+def test_name_breaks_creation_time_ties():
+    index = HostOwnership()
+    index.claim("uid-b", _ingress("b"))
+    assert index.claim("uid-a", _ingress("a")).is_winner
+
+
+def test_release_is_reference_counted_and_hands_over():
+    index = HostOwnership()
+    a, b, c = _ingress("a"), _ingress("b"), _ingress("c")
+    for key, ingress in (("a", a), ("b", b), ("c", c)):
+        index.claim(key, ingress)
+
+    loser = index.release("c")
+    assert (loser.was_winner, loser.successor, loser.remaining) == (False, None, 2)
+
+    winner = index.release("a", {"final": True})
+    assert (winner.was_winner, winner.successor, winner.remaining) == (True, b, 1)
+    assert winner.ingress == {"final": True}
+    assert _contested() == 0
+
+    last = index.release("b")
+    assert (last.was_winner, last.successor, last.remaining) == (True, None, 0)
+    assert len(index) == 0
+
+
+def test_unknown_release_reports_other_claimants():
+    index = HostOwnership()
+    index.claim("a", _ingress("a"))
+    result = index.release("never-seen", _ingress("x"))
+    assert (result.was_winner, result.remaining) == (False, 1)
+
+
+def test_host_change_releases_previous_slot_and_set_identifiers_are_separate():
+    index = HostOwnership()
+    index.claim("a", _ingress("a"))
+    assert index.claim("b", _ingress("b", set_identifier="blue")).is_winner
+
+    moved = index.claim("a", _ingress("a", host="new.example.com"))
+    assert moved.is_winner
+    assert moved.moved_from.slot == ("app.example.com", "")
+    assert moved.moved_from.remaining == 0
+    assert ingress_name(moved.winner) == "team/a"
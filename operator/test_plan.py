@@ -0,0 +1,166 @@
+"""Tests for plan mode and the dry-run provider."""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+import plan
+from derivation import OperatorConfig
+from providers.base import DNSProvider, RecordType, RoutingPolicy, ZoneRecord
+from providers.dry_run import DryRunDNSProvider
+from reconcile import CREATE, UPDATE
+
+CONFIG = OperatorConfig(dns_zone="example.com", custom_ip="", ttl=300)
+
+MANIFESTS = """
+apiVersion: networking.k8s.io/v1
+kind: Ingress
+metadata: {name: app, annotations: {}}
+spec: {rules: [{host: app.example.com}]}
+status: {loadBalancer: {ingress: [{ip: 10.0.0.1}]}}
+---
+apiVersion: v1
+kind: List
+items:
+- kind: Ingress
+  metadata: {name: web, annotations: {hub-dns-operator.io/ttl: "60"}}
+  spec: {rules: [{host: web.example.com}]}
+  status: {loadBalancer: {ingress: [{ip: 10.0.0.2}]}}
+- kind: Ingress
+  metadata: {name: pending}
+  spec: {rules: [{host: pending.example.com}]}
+- kind: Service
+  metadata: {name: not-an-ingress}
+"""
+
+
+class ZoneProvider(DNSProvider):
+    def __init__(self, records):
+        self.records = records
+        self.writes = []
+
+    @property
+    def provider_name(self):
+        return "fake"
+
+    async def create_or_update_record(self, record_name, value, record_type=RecordType.A, ttl=300, routing=None):
+        self.writes.append(record_name)
+
+    async def delete_record(self, record_name, record_type=RecordType.A, routing=None):
+        self.writes.append(record_name)
+
+    def _zone_pages(self, page_size):
+        for start in range(0, len(self.records), page_size):
+            yield self.records[start:start + page_size]
+
+
+def _ingress(host, ip="10.0.0.1", annotations=None):
+    return {
+        "metadata": {"annotations": annotations or {}},
+        "spec": {"rules": [{"host": host}]},
+        "status": {"loadBalancer": {"ingress": [{"ip": ip}]}},
+    }
+
+
+def test_load_manifests_yaml_lists_and_json(tmp_path):
+    (tmp_path / "a.yaml").write_text(MANIFESTS)
+    (tmp_path / "b.json").write_text(json.dumps({"kind": "IngressList", "items": [_ingress("api.example.com")]}))
+    ingresses = list(plan.load_manifests([str(tmp_path / "a.yaml"), str(tmp_path / "b.json")]))
+    assert [i["spec"]["rules"][0]["host"] for i in ingresses] == [
+        "app.example.com", "web.example.com", "pending.example.com", "api.example.com",
+    ]
+
+
+def test_desired_state_counts_skips_and_duplicates():
+    state = plan.desired_state([
+        _ingress("app.example.com"),
+        _ingress("app.example.com", "10.0.0.9"),
+        _ingress("web.example.com", annotations={"hub-dns-operator.io/ttl": "60"}),
+        {"metadata": {}, "spec": {"rules": [{}]}},
+        {"metadata": {}, "spec": {"rules": [{"host": "pending.example.com"}]}},
+        _ingress("shared.example.com", annotations={
+            "hub-dns-operator.io/set-identifier": "a", "hub-dns-operator.io/weight": "1",
+        }),
+    ], CONFIG)
+
+    assert state.ingresses == 6
+    assert {k: (r.value, r.ttl) for k, r in state.records.items()} == {
+        ("app.example.com", "A"): ("10.0.0.1", 300),  # equal rank: the first claimant keeps the host
+        ("web.example.com", "A"): ("10.0.0.1", 60),
+    }
+    assert state.skipped == {
+        "duplicate host": 1, "no host": 1, "no target yet or invalid annotations": 1,
+        "routing policy (not diffed)": 1,
+    }
+
+
+def test_desired_state_picks_the_oldest_ingress_for_a_host():
+    newer = _ingress("app.example.com", "10.0.0.9")
+    newer["metadata"].update(namespace="team", name="new", creationTimestamp="2024-05-02T00:00:00Z")
+    older = _ingress("app.example.com", "10.0.0.1")
+    older["metadata"].update(namespace="team", name="old", creationTimestamp="2024-05-01T00:00:00Z")
+
+    for ingresses in ([newer, older], [older, newer]):
+        state = plan.desired_state(ingresses, CONFIG)
+        assert state.records[("app.example.com", "A")].value == "10.0.0.1"
+        assert state.skipped == {"duplicate host": 1}
+
+
+@pytest.mark.asyncio
+async def test_plan_provider_reads_zone_once_and_never_writes():
+    zone = [
+        ZoneRecord("app.example.com.", "A", 300, ("10.0.0.1",)),
+        ZoneRecord("web.example.com.", "A", 300, ("10.0.0.5",)),
+        ZoneRecord("other.example.com.", "A", 300, ("10.0.0.7",)),
+    ]
+    provider = ZoneProvider(zone)
+    state = plan.desired_state(
+        [_ingress("app.example.com"), _ingress("web.example.com"), _ingress("new.example.com")], CONFIG
+    )
+
+    result = await plan.plan_provider(provider, state.records.values(), page_size=2)
+
+    assert [(c.action, c.name) for c in result.changes] == [(UPDATE, "web.example.com"), (CREATE, "new.example.com")]
+    assert result.counts == {CREATE: 1, UPDATE: 1}
+    assert result.estimated_api_calls == {"zone_read": 2, "writes": 2}
+    assert provider.writes == []
+    assert result.to_dict()["changes"][0] == {
+        "action": UPDATE, "name": "web.example.com", "type": "A", "value": "10.0.0.1", "ttl": 300,
+        "current": ["10.0.0.5"], "current_ttl": 300,
+    }
+
+
+def test_main_prints_json_plan(tmp_path, capsys, monkeypatch):
+    monkeypatch.setenv("CLOUD_PROVIDER", "aws")
+    monkeypatch.setenv("CUSTOM_IP", "")
+    (tmp_path / "ingresses.yaml").write_text(MANIFESTS)
+    provider = ZoneProvider([ZoneRecord("app.example.com.", "A", 300, ("10.0.0.1",))])
+
+    with patch.object(plan, "create_provider", return_value=provider) as factory:
+        assert plan.main(["-f", str(tmp_path / "ingresses.yaml"), "--format", "json"]) == 0
+
+    factory.assert_called_once_with("aws")
+    output = json.loads(capsys.readouterr().out)
+    assert output["desired_records"] == 2
+    assert output["plans"][0]["counts"] == {CREATE: 1, UPDATE: 0}
+    assert output["plans"][0]["changes"][0]["name"] == "web.example.com"
+
+
+@pytest.mark.asyncio
+async def test_dry_run_provider_collects_latest_change_per_record_set():
+    backend = ZoneProvider([])
+    dry_run = DryRunDNSProvider(backend)
+
+    await dry_run.create_or_update_record("app.example.com", "10.0.0.1")
+    await dry_run.create_or_update_record("app.example.com", "10.0.0.2", ttl=60)
+    await dry_run.create_or_update_record("shared.example.com", "10.0.0.3", routing=RoutingPolicy("a", weight=1))
+    await dry_run.delete_record("old.example.com", RecordType.CNAME)
+
+    assert backend.writes == []
+    assert [(c["action"], c["name"], c.get("value")) for c in dry_run.plan()] == [
+        ("upsert", "app.example.com", "10.0.0.2"),
+        ("delete", "old.example.com", None),
+        ("upsert", "shared.example.com", "10.0.0.3"),
+    ]
+    assert dry_run.plan()[2]["set_identifier"] == "a"
@@ -0,0 +1,145 @@
+"""Tests for propagation checks, against a local stub nameserver."""
+
+import asyncio
+import socket
+import struct
+
+import pytest
+from prometheus_client import REGISTRY
+
+from derivation import DesiredRecord
+from propagation import PropagationChecker, decode_response, encode_name, encode_query, parse_server, query
+from providers.base import RecordType, RoutingPolicy
+
+
+class StubNameserver(asyncio.DatagramProtocol):
+    """Answer A/CNAME queries from ``zone``: (name, qtype) -> [(ttl, value)]."""
+
+    def __init__(self):
+        self.zone = {}
+        self.queries = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.queries += 1
+        query_id = struct.unpack_from("!H", data)[0]
+        labels, offset = [], 12
+        while data[offset]:
+            labels.append(data[offset + 1:offset + 1 + data[offset]].decode())
+            offset += 1 + data[offset]
+        qtype = struct.unpack_from("!H", data, offset + 1)[0]
+        question = data[12:offset + 5]
+        records = self.zone.get((".".join(labels), qtype))
+        rcode = 0 if records is not None else 3
+        answers = b""
+        for ttl, value in records or []:
+            rdata = socket.inet_aton(value) if qtype == 1 else encode_name(value)
+            # Owner name as a compression pointer to the question
+            answers += struct.pack("!HHHIH", 0xC00C, qtype, 1, ttl, len(rdata)) + rdata
+        header = struct.pack("!HHHHHH", query_id, 0x8400 | rcode, 1, len(records or []), 0, 0)
+        self.transport.sendto(header + question + answers, addr)
+
+
+@pytest.fixture
+async def stub():
+    loop = asyncio.get_running_loop()
+    transport, server = await loop.create_datagram_endpoint(StubNameserver, local_addr=("127.0.0.1", 0))
+    server.address = transport.get_extra_info("sockname")
+    yield server
+    transport.close()
+
+
+def _record(value="10.0.0.1", record_type=RecordType.A, ttl=300, routing=None):
+    return DesiredRecord("app.example.com", value, record_type, ttl, routing)
+
+
+def _checks(result):
+    return REGISTRY.get_sample_value("dns_operator_propagation_checks_total", {"result": result}) or 0
+
+
+def test_parse_server():
+    assert parse_server("10.0.0.53") == ("10.0.0.53", 53)
+    assert parse_server(" ns1.example.net:5353 ") == ("ns1.example.net", 5353)
+    assert parse_server("2001:db8::53") == ("2001:db8::53", 53)
+
+
+def test_decode_response_ignores_other_types():
+    message = bytearray(encode_query(7, "app.example.com", 1))
+    message[2:4] = struct.pack("!H", 0x8400)
+    message[6:8] = struct.pack("!H", 2)
+    message += struct.pack("!HHHIH", 0xC00C, 5, 1, 60, 2) + b"\xc0\x0c"
+    message += struct.pack("!HHHIH", 0xC00C, 1, 1, 60, 4) + socket.inet_aton("10.0.0.1")
+    assert decode_response(bytes(message), 1) == (7, 0, [(60, "10.0.0.1")])
+
+
+@pytest.mark.asyncio
+async def test_query_a_cname_and_nxdomain(stub):
+    stub.zone[("app.example.com", 1)] = [(60, "10.0.0.1"), (60, "10.0.0.2")]
+    stub.zone[("www.example.com", 5)] = [(300, "lb.example.net")]
+
+    assert [a.value for a in await query(stub.address, "app.example.com", RecordType.A)] == ["10.0.0.1", "10.0.0.2"]
+    assert await query(stub.address, "www.example.com.", RecordType.CNAME) == [(300, "lb.example.net")]
+    assert await query(stub.address, "missing.example.com", RecordType.A) == []
+
+
+@pytest.mark.asyncio
+async def test_watch_records_propagation(stub):
+    repaired = []
+    checker = PropagationChecker([stub.address], repaired.append, interval=0.01, deadline=5)
+    before = REGISTRY.get_sample_value("dns_operator_propagation_seconds_count") or 0
+
+    checker.watch(_record())
+    await asyncio.sleep(0.05)
+    assert checker.pending() == 1
+    stub.zone[("app.example.com", 1)] = [(300, "10.0.0.1")]
+    await asyncio.sleep(0.05)
+
+    assert checker.pending() == 0
+    assert repaired == []
+    assert REGISTRY.get_sample_value("dns_operator_propagation_seconds_count") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_unpropagated_write_is_repaired_then_given_up(stub):
+    repaired = []
+
+    async def repair(record):
+        repaired.append(record)
+        checker.watch(record)  # as a real re-write would
+
+    checker = PropagationChecker([stub.address], repair, interval=0.01, deadline=0.02, max_repairs=2)
+    stub.zone[("app.example.com", 1)] = [(300, "10.9.9.9")]
+    before = _checks("timeout")
+
+    checker.watch(_record())
+    await asyncio.sleep(0.3)
+
+    assert repaired == [_record(), _record()]
+    assert checker.pending() == 0
+    assert _checks("timeout") == before + 3
+
+
+@pytest.mark.asyncio
+async def test_new_write_supersedes_watch_and_routed_records_are_skipped(stub):
+    checker = PropagationChecker([stub.address], lambda r: None, interval=0.01, deadline=5)
+    before = _checks("superseded")
+    checker.watch(_record())
+    checker.watch(_record("10.0.0.2"))
+    checker.watch(_record(routing=RoutingPolicy("spoke-a", weight=1)))
+    await asyncio.sleep(0)
+    assert checker.pending() == 1
+    assert _checks("superseded") == before + 1
+    checker.cancel("app.example.com")
+
+
+@pytest.mark.asyncio
+async def test_serves_requires_exact_value_and_ttl(stub):
+    checker = PropagationChecker([stub.address], lambda r: None)
+    stub.zone[("app.example.com", 1)] = [(300, "10.0.0.1")]
+    assert await checker.serves(_record())
+    assert not await checker.serves(_record(ttl=60))
+    stub.zone[("app.example.com", 1)] = [(300, "10.0.0.1"), (300, "10.0.0.2")]
+    assert not await checker.serves(_record())
+    assert not await PropagationChecker([("127.0.0.1", 9)], lambda r: None, timeout=0.05).serves(_record())
@@ -1,5 +1,8 @@
 """Tests for cloud DNS providers (Azure, GCP, AWS)."""
 
+import asyncio
+import time
+
 import pytest
 from unittest.mock import patch, MagicMock
 
@@ -52,6 +55,15 @@ class TestDNSProviderBase:
         with pytest.raises(TypeError):
             DNSProvider()
 
+    def test_zone_enumeration_not_supported_by_default(self):
+        p = self._make_provider()
+
+        async def consume():
+            return [r async for r in p.iter_zone_records()]
+
+        with pytest.raises(NotImplementedError):
+            asyncio.run(consume())
+
 
 # =============================================================================
 # Azure Provider Tests
@@ -141,6 +153,35 @@ class TestAzureDNSProvider:
         with pytest.raises(HttpResponseError):
             await provider.delete_record("app.example.com")
 
+    @patch("providers.azure.DnsManagementClient")
+    @patch("providers.azure.ManagedIdentityCredential")
+    @pytest.mark.asyncio
+    async def test_iter_zone_records(self, mock_cred, mock_client_cls):
+        def record_set(fqdn, rtype, ttl, a=None, cname=None):
+            rs = MagicMock(fqdn=fqdn, type=f"Microsoft.Network/dnszones/{rtype}", ttl=ttl,
+                           a_records=a, aaaa_records=None, txt_records=None, ns_records=None)
+            rs.cname_record = MagicMock(cname=cname) if cname else None
+            return rs
+
+        pages = [
+            [record_set("app.example.com.", "A", 300, a=[MagicMock(ipv4_address="1.2.3.4")])],
+            [record_set("www.example.com.", "CNAME", 60, cname="lb.example.net")],
+        ]
+        mock_client = MagicMock()
+        mock_client.record_sets.list_all_by_dns_zone.return_value.by_page.return_value = iter(pages)
+        mock_client_cls.return_value = mock_client
+
+        from providers.azure import AzureDNSProvider
+        from providers.base import ZoneRecord
+        provider = AzureDNSProvider()
+        records = [r async for r in provider.iter_zone_records(page_size=1)]
+
+        assert records == [
+            ZoneRecord("app.example.com", "A", 300, ("1.2.3.4",)),
+            ZoneRecord("www.example.com", "CNAME", 60, ("lb.example.net",)),
+        ]
+        mock_client.record_sets.list_all_by_dns_zone.assert_called_once_with("fake-rg", "example.com", top=1)
+
 
 # =============================================================================
 # GCP Provider Tests
@@ -165,8 +206,9 @@ class TestGCPDNSProvider:
     @patch("providers.gcp.google_dns")
     @pytest.mark.asyncio
     async def test_create_new_record(self, mock_dns):
+        from google.api_core.exceptions import NotFound
+        mock_dns.Client.return_value._connection.api_request.side_effect = NotFound("missing")
         mock_zone = MagicMock()
-        mock_zone.list_resource_record_sets.return_value = []
         mock_changes = MagicMock()
         mock_zone.changes.return_value = mock_changes
         mock_record = MagicMock()
@@ -181,17 +223,18 @@ class TestGCPDNSProvider:
             "app.example.com.", "A", 300, ["1.2.3.4"]
         )
         mock_changes.add_record_set.assert_called_once_with(mock_record)
+        mock_changes.delete_record_set.assert_not_called()
         mock_changes.create.assert_called_once()
 
     @patch("providers.gcp.google_dns")
     @pytest.mark.asyncio
-    async def test_create_replaces_existing_record(self, mock_dns):
-        existing_record = MagicMock()
-        existing_record.name = "app.example.com."
-        existing_record.record_type = "A"
+    async def test_create_replaces_existing_record_found_by_name_and_type(self, mock_dns):
+        existing = {"name": "app.example.com.", "type": "A", "ttl": 300, "rrdatas": ["5.6.7.8"]}
+        api_request = mock_dns.Client.return_value._connection.api_request
+        api_request.return_value = existing
+        existing_record = mock_dns.ResourceRecordSet.from_api_repr.return_value
 
         mock_zone = MagicMock()
-        mock_zone.list_resource_record_sets.return_value = [existing_record]
         mock_changes = MagicMock()
         mock_zone.changes.return_value = mock_changes
         mock_dns.Client.return_value.zone.return_value = mock_zone
@@ -200,18 +243,22 @@ class TestGCPDNSProvider:
         provider = GCPDNSProvider()
         await provider.create_or_update_record("app.example.com", "1.2.3.4", RecordType.A, 300)
 
+        # One name+type lookup, never a listing of the whole zone
+        api_request.assert_called_once_with(
+            method="GET", path="/projects/fake-project/managedZones/fake-zone/rrsets/app.example.com./A", data=None,
+        )
+        mock_zone.list_resource_record_sets.assert_not_called()
+        mock_dns.ResourceRecordSet.from_api_repr.assert_called_once_with(existing, mock_zone)
         mock_changes.delete_record_set.assert_called_once_with(existing_record)
         mock_changes.add_record_set.assert_called_once()
 
     @patch("providers.gcp.google_dns")
     @pytest.mark.asyncio
     async def test_delete_record_exists(self, mock_dns):
-        existing_record = MagicMock()
-        existing_record.name = "app.example.com."
-        existing_record.record_type = "A"
+        mock_dns.Client.return_value._connection.api_request.return_value = {"name": "app.example.com."}
+        existing_record = mock_dns.ResourceRecordSet.from_api_repr.return_value
 
         mock_zone = MagicMock()
-        mock_zone.list_resource_record_sets.return_value = [existing_record]
         mock_changes = MagicMock()
         mock_zone.changes.return_value = mock_changes
         mock_dns.Client.return_value.zone.return_value = mock_zone
@@ -220,27 +267,30 @@ class TestGCPDNSProvider:
         provider = GCPDNSProvider()
         await provider.delete_record("app.example.com")
 
+        mock_zone.list_resource_record_sets.assert_not_called()
         mock_changes.delete_record_set.assert_called_once_with(existing_record)
         mock_changes.create.assert_called_once()
 
     @patch("providers.gcp.google_dns")
     @pytest.mark.asyncio
     async def test_delete_record_not_found(self, mock_dns):
+        from google.api_core.exceptions import NotFound
+        mock_dns.Client.return_value._connection.api_request.side_effect = NotFound("missing")
         mock_zone = MagicMock()
-        mock_zone.list_resource_record_sets.return_value = []
         mock_dns.Client.return_value.zone.return_value = mock_zone
 
         from providers.gcp import GCPDNSProvider
         provider = GCPDNSProvider()
         # Should not raise, just log warning
         await provider.delete_record("app.example.com")
+        mock_zone.changes.assert_not_called()
 
     @patch("providers.gcp.google_dns")
     @pytest.mark.asyncio
     async def test_create_record_error(self, mock_dns):
-        from google.api_core.exceptions import GoogleAPICallError
+        from google.api_core.exceptions import GoogleAPICallError, NotFound
+        mock_dns.Client.return_value._connection.api_request.side_effect = NotFound("missing")
         mock_zone = MagicMock()
-        mock_zone.list_resource_record_sets.return_value = []
         mock_changes = MagicMock()
         mock_changes.create.side_effect = GoogleAPICallError("API error")
         mock_zone.changes.return_value = mock_changes
@@ -251,6 +301,31 @@ class TestGCPDNSProvider:
         with pytest.raises(GoogleAPICallError):
             await provider.create_or_update_record("app.example.com", "1.2.3.4", RecordType.A, 300)
 
+    @patch("providers.gcp.google_dns")
+    @pytest.mark.asyncio
+    async def test_iter_zone_records(self, mock_dns):
+        def record_set(name, rtype, ttl, rrdatas):
+            rs = MagicMock(record_type=rtype, ttl=ttl, rrdatas=rrdatas)
+            rs.name = name
+            return rs
+
+        mock_zone = MagicMock()
+        mock_zone.list_resource_record_sets.return_value.pages = iter([
+            [record_set("example.com.", "NS", 21600, ["ns1.example.net."])],
+            [record_set("app.example.com.", "A", 300, ["1.2.3.4"])],
+        ])
+        mock_dns.Client.return_value.zone.return_value = mock_zone
+
+        from providers.gcp import GCPDNSProvider
+        from providers.base import ZoneRecord
+        provider = GCPDNSProvider()
+        records = [r async for r in provider.iter_zone_records()]
+
+        assert records == [
+            ZoneRecord("example.com", "NS", 21600, ("ns1.example.net.",)),
+            ZoneRecord("app.example.com", "A", 300, ("1.2.3.4",)),
+        ]
+
 
 # =============================================================================
 # AWS Provider Tests
@@ -361,6 +436,205 @@ class TestAWSDNSProvider:
         provider = AWSDNSProvider()
         assert provider._region == "us-east-1"
 
+    @patch("providers.aws.boto3")
+    @pytest.mark.asyncio
+    async def test_iter_zone_records_follows_pagination(self, mock_boto3):
+        mock_client = MagicMock()
+        mock_client.list_resource_record_sets.side_effect = [
+            {
+                "ResourceRecordSets": [
+                    {"Name": "app.example.com.", "Type": "A", "TTL": 300, "ResourceRecords": [{"Value": "1.2.3.4"}]},
+                ],
+                "IsTruncated": True,
+                "NextRecordName": "www.example.com.",
+                "NextRecordType": "A",
+            },
+            {
+                "ResourceRecordSets": [
+                    {"Name": "www.example.com.", "Type": "A",
+                     "AliasTarget": {"DNSName": "lb.elb.amazonaws.com.", "HostedZoneId": "Z2"}},
+                ],
+                "IsTruncated": False,
+            },
+        ]
+        mock_boto3.client.return_value = mock_client
+
+        from providers.aws import AWSDNSProvider
+        from providers.base import ZoneRecord
+        provider = AWSDNSProvider()
+        records = [r async for r in provider.iter_zone_records(page_size=1)]
+
+        assert records == [
+            ZoneRecord("app.example.com", "A", 300, ("1.2.3.4",)),
+            ZoneRecord("www.example.com", "A", 0, ("lb.elb.amazonaws.com.",)),
+        ]
+        second_call = mock_client.list_resource_record_sets.call_args_list[1].kwargs
+        assert second_call == {
+            "HostedZoneId": "Z1234567890", "MaxItems": "1",
+            "StartRecordName": "www.example.com.", "StartRecordType": "A",
+        }
+
+
+# =============================================================================
+# Multi-Provider Fan-Out Tests
+# =============================================================================
+
+class TestMultiDNSProvider:
+    """Tests for MultiDNSProvider."""
+
+    def _make_backend(self, name, delay=0.0, error=None, retryable=True):
+        from unittest.mock import AsyncMock
+        backend = MagicMock()
+        backend.provider_name = name
+        backend.is_retryable_error = MagicMock(return_value=retryable)
+        errors = list(error) if isinstance(error, list) else None
+
+        async def _call(*args, **kwargs):
+            await asyncio.sleep(delay)
+            if errors:
+                raise errors.pop(0)
+            if error and errors is None:
+                raise error
+
+        backend.create_or_update_record = AsyncMock(side_effect=_call)
+        backend.delete_record = AsyncMock(side_effect=_call)
+        return backend
+
+    def test_provider_name(self):
+        from providers.multi import MultiDNSProvider
+        provider = MultiDNSProvider([self._make_backend("azure"), self._make_backend("aws")])
+        assert provider.provider_name == "azure+aws"
+
+    def test_requires_providers(self):
+        from providers.multi import MultiDNSProvider
+        with pytest.raises(ValueError):
+            MultiDNSProvider([])
+
+    @pytest.mark.asyncio
+    async def test_create_fans_out_to_all_backends(self):
+        from providers.multi import MultiDNSProvider
+        azure, aws = self._make_backend("azure"), self._make_backend("aws")
+        provider = MultiDNSProvider([azure, aws])
+        await provider.create_or_update_record("app.example.com", "1.2.3.4", RecordType.A, 300)
+        await provider.drain()
+
+        azure.create_or_update_record.assert_called_once_with("app.example.com", "1.2.3.4", RecordType.A, 300)
+        aws.create_or_update_record.assert_called_once_with("app.example.com", "1.2.3.4", RecordType.A, 300)
+        provider.close()
+
+    @pytest.mark.asyncio
+    async def test_delete_fans_out_to_all_backends(self):
+        from providers.multi import MultiDNSProvider
+        azure, gcp = self._make_backend("azure"), self._make_backend("gcp")
+        provider = MultiDNSProvider([azure, gcp])
+        await provider.delete_record("app.example.com", RecordType.CNAME)
+        await provider.drain()
+
+        azure.delete_record.assert_called_once_with("app.example.com", RecordType.CNAME)
+        gcp.delete_record.assert_called_once_with("app.example.com", RecordType.CNAME)
+        provider.close()
+
+    @pytest.mark.asyncio
+    async def test_failure_is_retried_on_that_backend_only(self):
+        """A failing back-end is retried for its own host; the others are written once."""
+        from providers.multi import MultiDNSProvider
+        azure = self._make_backend("azure", error=[RuntimeError("503")])
+        aws = self._make_backend("aws")
+        provider = MultiDNSProvider([azure, aws], retry_base_delay=0.01)
+
+        await provider.create_or_update_record("app.example.com", "1.2.3.4")
+        await provider.drain()
+        assert provider.snapshot()["azure"]["retrying"][0]["host"] == "app.example.com"
+        await asyncio.sleep(0.05)
+        await provider.drain()
+
+        assert azure.create_or_update_record.call_count == 2
+        aws.create_or_update_record.assert_called_once()
+        assert provider.snapshot()["azure"]["retrying"] == []
+        provider.close()
+
+    @pytest.mark.asyncio
+    async def test_permanent_failure_is_given_up_until_the_host_is_written(self):
+        from providers.multi import MultiDNSProvider
+        azure = self._make_backend("azure", error=[ValueError("400")], retryable=False)
+        provider = MultiDNSProvider([azure], retry_base_delay=0.01)
+
+        await provider.create_or_update_record("app.example.com", "1.2.3.4")
+        await provider.drain()
+        await asyncio.sleep(0.03)
+        assert azure.create_or_update_record.call_count == 1
+        assert provider.snapshot()["azure"]["given_up"][0]["error"] == "ValueError: 400"
+
+        await provider.create_or_update_record("app.example.com", "5.6.7.8")
+        await provider.drain()
+        assert provider.snapshot()["azure"]["given_up"] == []
+        provider.close()
+
+    @pytest.mark.asyncio
+    async def test_circuit_retry_after_is_honoured_per_backend(self):
+        from providers.circuit import CircuitOpenError
+        from providers.multi import MultiDNSProvider
+        azure = self._make_backend("azure", error=[CircuitOpenError("azure", 30)])
+        provider = MultiDNSProvider([azure, self._make_backend("aws")], retry_base_delay=0.01)
+
+        await provider.create_or_update_record("app.example.com", "1.2.3.4")
+        await provider.drain()
+        [parked] = provider.snapshot()["azure"]["retrying"]
+        assert parked["attempts"] == 0 and parked["retry_in_seconds"] > 29
+        provider.close()
+
+    @pytest.mark.asyncio
+    async def test_newest_intent_replaces_a_queued_one(self):
+        from providers.multi import MultiDNSProvider
+        azure = self._make_backend("azure", delay=0.05)
+        provider = MultiDNSProvider([azure], max_concurrency=1)
+
+        await provider.create_or_update_record("busy.example.com", "1.2.3.4")
+        await provider.create_or_update_record("app.example.com", "1.2.3.4")
+        await provider.delete_record("app.example.com")
+        await provider.drain()
+
+        azure.create_or_update_record.assert_called_once_with("busy.example.com", "1.2.3.4", RecordType.A, 300)
+        azure.delete_record.assert_called_once_with("app.example.com", RecordType.A)
+        provider.close()
+
+    @pytest.mark.asyncio
+    async def test_backends_run_concurrently(self):
+        from providers.multi import MultiDNSProvider
+        provider = MultiDNSProvider([self._make_backend("azure", delay=0.2), self._make_backend("aws", delay=0.2)])
+        start = time.monotonic()
+        await provider.create_or_update_record("app.example.com", "1.2.3.4")
+        await provider.drain()
+        assert time.monotonic() - start < 0.35
+        provider.close()
+
+    @pytest.mark.asyncio
+    async def test_slow_backend_does_not_stall_others(self):
+        """Neither the caller nor the other back-ends wait for a saturated back-end."""
+        from providers.multi import MultiDNSProvider
+        slow = self._make_backend("azure", delay=0.3)
+        fast = self._make_backend("aws")
+        provider = MultiDNSProvider([slow, fast], max_concurrency=1)
+
+        start = time.monotonic()
+        for i in range(3):
+            await provider.create_or_update_record(f"app{i}.example.com", "1.2.3.4")
+        assert time.monotonic() - start < 0.05
+
+        await asyncio.sleep(0.05)
+        assert fast.create_or_update_record.call_count == 3
+        assert slow.create_or_update_record.call_count == 1
+        provider.close()
+
+    @pytest.mark.asyncio
+    async def test_rate_limiter(self):
+        from providers.multi import RateLimiter
+        limiter = RateLimiter(rate=20, burst=1)
+        start = time.monotonic()
+        for _ in range(3):
+            await limiter.acquire()
+        assert time.monotonic() - start >= 0.09
+
 
 # =============================================================================
 # Provider Factory Tests
@@ -409,3 +683,181 @@ class TestProviderFactory:
         from main import create_dns_provider
         with pytest.raises(ValueError, match="Unsupported cloud provider"):
             create_dns_provider()
+
+    @patch("kubernetes.config.load_incluster_config", MagicMock())
+    def test_factory_multi(self, monkeypatch):
+        monkeypatch.setenv("CLOUD_PROVIDER", "azure, aws")
+        monkeypatch.setenv("MANAGED_IDENTITY_CLIENT_ID", "x")
+        monkeypatch.setenv("AZURE_SUBSCRIPTION_ID", "x")
+        monkeypatch.setenv("AZURE_DNS_ZONE", "example.com")
+        monkeypatch.setenv("AZURE_DNS_RESOURCE_GROUP", "x")
+        monkeypatch.setenv("AWS_HOSTED_ZONE_ID", "x")
+        monkeypatch.setenv("AWS_DNS_ZONE", "example.com")
+        with patch("providers.azure.ManagedIdentityCredential", MagicMock()), \
+             patch("providers.azure.DnsManagementClient", MagicMock()), \
+             patch("providers.aws.boto3", MagicMock()):
+            import main
+            from providers.multi import MultiDNSProvider
+            monkeypatch.setattr(main, "multi_provider", None)
+            provider = main.create_dns_provider()
+            assert isinstance(provider, MultiDNSProvider)
+            assert provider.provider_name == "azure+aws"
+            assert main.multi_provider is provider
+
+    @patch("kubernetes.config.load_incluster_config", MagicMock())
+    def test_factory_aggregation(self, monkeypatch):
+        monkeypatch.setenv("CLOUD_PROVIDER", "aws")
+        monkeypatch.setenv("AWS_HOSTED_ZONE_ID", "x")
+        monkeypatch.setenv("AWS_DNS_ZONE", "example.com")
+        with patch("providers.aws.boto3", MagicMock()):
+            import main
+            from providers.aggregation import AggregatingDNSProvider
+            monkeypatch.setattr(main, "AGGREGATION_OWNER_ID", "spoke-eu-1")
+            provider = main.create_dns_provider()
+            assert isinstance(provider, AggregatingDNSProvider)
+            assert provider.owner_id == "spoke-eu-1"
+            assert provider.provider_name == "aws"
+
+    @patch("kubernetes.config.load_incluster_config", MagicMock())
+    def test_factory_circuit_breaker_per_backend(self, monkeypatch):
+        monkeypatch.setenv("CLOUD_PROVIDER", "gcp,aws")
+        monkeypatch.setenv("GCP_PROJECT_ID", "x")
+        monkeypatch.setenv("GCP_MANAGED_ZONE", "x")
+        monkeypatch.setenv("GCP_DNS_ZONE", "example.com")
+        monkeypatch.setenv("AWS_HOSTED_ZONE_ID", "x")
+        monkeypatch.setenv("AWS_DNS_ZONE", "example.com")
+        with patch("providers.gcp.google_dns", MagicMock()), patch("providers.aws.boto3", MagicMock()):
+            import main
+            from providers.circuit import CircuitBreakerDNSProvider
+            monkeypatch.setattr(main, "CIRCUIT_FAILURE_THRESHOLD", 3)
+            monkeypatch.setattr(main, "circuit_breakers", {})
+            monkeypatch.setattr(main, "multi_provider", None)
+            provider = main.create_dns_provider()
+            assert all(isinstance(p, CircuitBreakerDNSProvider) for p in provider.providers)
+            assert sorted(main.circuit_breakers) == ["aws", "gcp"]
+            assert provider.provider_name == "gcp+aws"
+
+
+# =============================================================================
+# Retryable Error Classification Tests
+# =============================================================================
+
+class TestRetryableErrors:
+    """Tests for DNSProvider.is_retryable_error and its provider overrides."""
+
+    def test_base_classification(self):
+        from google.api_core.exceptions import Forbidden, ServiceUnavailable, TooManyRequests
+        p = TestDNSProviderBase()._make_provider()
+        assert p.is_retryable_error(ConnectionError("reset"))
+        assert p.is_retryable_error(ServiceUnavailable("down"))
+        assert p.is_retryable_error(TooManyRequests("slow down"))
+        assert not p.is_retryable_error(Forbidden("denied"))
+        assert not p.is_retryable_error(ValueError("bad annotation"))
+
+    @patch("providers.aws.boto3")
+    def test_aws(self, mock_boto3, monkeypatch):
+        from botocore.exceptions import ClientError, EndpointConnectionError, NoCredentialsError
+        monkeypatch.setenv("AWS_HOSTED_ZONE_ID", "Z1")
+        monkeypatch.setenv("AWS_DNS_ZONE", "example.com")
+        from providers.aws import AWSDNSProvider
+        p = AWSDNSProvider()
+
+        def client_error(code, status):
+            return ClientError({"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}, "Change")
+
+        assert p.is_retryable_error(client_error("Throttling", 400))
+        assert p.is_retryable_error(client_error("PriorRequestNotComplete", 400))
+        assert p.is_retryable_error(client_error("Unknown", 503))
+        assert not p.is_retryable_error(client_error("InvalidChangeBatch", 400))
+        assert not p.is_retryable_error(client_error("AccessDenied", 403))
+        assert p.is_retryable_error(EndpointConnectionError(endpoint_url="https://route53.amazonaws.com"))
+        assert not p.is_retryable_error(NoCredentialsError())
+
+    @patch("providers.azure.DnsManagementClient")
+    @patch("providers.azure.ManagedIdentityCredential")
+    def test_azure(self, mock_cred, mock_client, monkeypatch):
+        from azure.core.exceptions import ClientAuthenticationError, HttpResponseError, ServiceRequestError
+        for name, value in (("MANAGED_IDENTITY_CLIENT_ID", "c"), ("AZURE_SUBSCRIPTION_ID", "s"),
+                            ("AZURE_DNS_ZONE", "example.com"), ("AZURE_DNS_RESOURCE_GROUP", "rg")):
+            monkeypatch.setenv(name, value)
+        from providers.azure import AzureDNSProvider
+        p = AzureDNSProvider()
+
+        def http_error(status):
+            error = HttpResponseError("failed")
+            error.status_code = status
+            return error
+
+        assert p.is_retryable_error(http_error(429))
+        assert p.is_retryable_error(http_error(500))
+        assert not p.is_retryable_error(http_error(400))
+        assert p.is_retryable_error(ServiceRequestError("connection reset"))
+        assert not p.is_retryable_error(ClientAuthenticationError("no token"))
+
+    def test_aggregation_retries_concurrent_changes(self):
+        from providers.aggregation import AggregatingDNSProvider, ConcurrentChangeError
+        backend = MagicMock(provider_name="aws")
+        backend.is_retryable_error.return_value = False
+        provider = AggregatingDNSProvider(backend, "spoke-a")
+        assert provider.is_retryable_error(ConcurrentChangeError("changed"))
+        assert not provider.is_retryable_error(Exception("denied"))
+
+
+class TestErrorClasses:
+    """Tests for DNSProvider.error_class and its provider overrides."""
+
+    def test_base_classification(self):
+        from google.api_core.exceptions import Forbidden, NotFound, ServiceUnavailable, TooManyRequests
+        p = TestDNSProviderBase()._make_provider()
+        assert p.error_class(TooManyRequests("slow down")) == "throttled"
+        assert p.error_class(ServiceUnavailable("down")) == "server"
+        assert p.error_class(Forbidden("denied")) == "auth"
+        assert p.error_class(NotFound("gone")) == "not_found"
+        assert p.error_class(TimeoutError()) == "timeout"
+        assert p.error_class(ConnectionResetError()) == "connection"
+        assert p.error_class(ValueError("bad annotation")) == "invalid"
+        assert p.error_class(RuntimeError("?")) == "other"
+
+    @patch("providers.aws.boto3")
+    def test_aws(self, mock_boto3, monkeypatch):
+        from botocore.exceptions import ClientError, EndpointConnectionError, NoCredentialsError, ReadTimeoutError
+        monkeypatch.setenv("AWS_HOSTED_ZONE_ID", "Z1")
+        monkeypatch.setenv("AWS_DNS_ZONE", "example.com")
+        from providers.aws import AWSDNSProvider
+        p = AWSDNSProvider()
+
+        def client_error(code, status):
+            return ClientError({"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}, "Change")
+
+        assert p.error_class(client_error("Throttling", 400)) == "throttled"
+        assert p.error_class(client_error("InvalidChangeBatch", 400)) == "invalid"
+        assert p.error_class(client_error("NoSuchHostedZone", 404)) == "not_found"
+        assert p.error_class(EndpointConnectionError(endpoint_url="https://route53.amazonaws.com")) == "connection"
+        assert p.error_class(ReadTimeoutError(endpoint_url="https://route53.amazonaws.com")) == "timeout"
+        assert p.error_class(NoCredentialsError()) == "auth"
+
+    @patch("providers.azure.DnsManagementClient")
+    @patch("providers.azure.ManagedIdentityCredential")
+    def test_azure(self, mock_cred, mock_client, monkeypatch):
+        from azure.core.exceptions import ClientAuthenticationError, ServiceRequestError, ServiceResponseTimeoutError
+        for name, value in (("MANAGED_IDENTITY_CLIENT_ID", "c"), ("AZURE_SUBSCRIPTION_ID", "s"),
+                            ("AZURE_DNS_ZONE", "example.com"), ("AZURE_DNS_RESOURCE_GROUP", "rg")):
+            monkeypatch.setenv(name, value)
+        from providers.azure import AzureDNSProvider
+        p = AzureDNSProvider()
+
+        assert p.error_class(ClientAuthenticationError("no token")) == "auth"
+        assert p.error_class(ServiceRequestError("connection reset")) == "connection"
+        assert p.error_class(ServiceResponseTimeoutError("slow")) == "timeout"
+
+    def test_wrappers(self):
+        from providers.aggregation import AggregatingDNSProvider, ConcurrentChangeError
+        from providers.base import ERROR_CLASSES
+        from providers.circuit import CircuitBreakerDNSProvider, CircuitOpenError
+        aws = MagicMock(provider_name="aws")
+        aws.error_class.return_value = "throttled"
+
+        assert CircuitBreakerDNSProvider(aws).error_class(CircuitOpenError("aws", 30)) == "circuit_open"
+        assert AggregatingDNSProvider(aws, "spoke-a").error_class(ConcurrentChangeError("changed")) == "conflict"
+        assert AggregatingDNSProvider(aws, "spoke-a").error_class(Exception()) == "throttled"
+        assert set(ERROR_CLASSES) >= {"circuit_open", "conflict", "other"}
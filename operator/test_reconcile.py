@@ -0,0 +1,55 @@
+"""Tests for the streaming zone diff."""
+
+import pytest
+
+from derivation import DesiredRecord
+from providers.base import RecordType, ZoneRecord
+from reconcile import CREATE, DELETE, UPDATE, diff_zone
+
+
+async def _stream(records):
+    for record in records:
+        yield record
+
+
+async def _diff(desired, zone, owned=None):
+    return [(c.action, c.name, c.record_type) async for c in diff_zone(desired, _stream(zone), owned)]
+
+
+@pytest.mark.asyncio
+async def test_in_sync_zone_yields_nothing():
+    desired = [DesiredRecord("app.example.com", "lb.example.net", RecordType.CNAME, 300)]
+    zone = [
+        ZoneRecord("example.com", "NS", 21600, ("ns1.example.net.",)),
+        ZoneRecord("App.Example.com", "CNAME", 300, ("lb.example.net.",)),
+    ]
+    assert await _diff(desired, zone) == []
+
+
+@pytest.mark.asyncio
+async def test_creates_and_updates():
+    desired = [
+        DesiredRecord("app.example.com", "1.2.3.4", RecordType.A, 300),
+        DesiredRecord("new.example.com", "1.2.3.5", RecordType.A, 300),
+        DesiredRecord("ttl.example.com", "1.2.3.6", RecordType.A, 60),
+    ]
+    zone = [
+        ZoneRecord("app.example.com", "A", 300, ("9.9.9.9",)),
+        ZoneRecord("ttl.example.com", "A", 300, ("1.2.3.6",)),
+    ]
+    assert await _diff(desired, zone) == [
+        (UPDATE, "app.example.com", "A"),
+        (UPDATE, "ttl.example.com", "A"),
+        (CREATE, "new.example.com", "A"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_deletes_only_owned_records():
+    zone = [
+        ZoneRecord("example.com", "NS", 21600, ("ns1.example.net.",)),
+        ZoneRecord("old.example.com", "A", 300, ("1.2.3.4",)),
+    ]
+    assert await _diff([], zone) == []
+    owned = lambda record: record.record_type == "A"  # noqa: E731
+    assert await _diff([], zone, owned) == [(DELETE, "old.example.com", "A")]
@@ -0,0 +1,55 @@
+"""Tests for the compact record store."""
+
+from providers.base import DNSRecord, RecordType
+from record_store import RecordStore
+
+
+def _a(name, value="10.0.0.1", ttl=300):
+    return DNSRecord(name, value, RecordType.A, ttl)
+
+
+def test_put_get_and_change_detection():
+    store = RecordStore()
+    assert store.put(_a("app.example.com"))
+    assert not store.put(_a("app.example.com"))
+    assert store.put(_a("app.example.com", ttl=60))
+    assert store.get("app.example.com") == _a("app.example.com", ttl=60)
+    assert store.get("missing.example.com") is None
+    assert "app.example.com" in store
+    assert len(store) == 1
+
+
+def test_unchanged():
+    store = RecordStore()
+    store.put(DNSRecord("www.example.com", "lb.example.net", RecordType.CNAME, 300))
+    assert store.unchanged("www.example.com", "lb.example.net", RecordType.CNAME, 300)
+    assert not store.unchanged("www.example.com", "lb.example.net", RecordType.A, 300)
+    assert not store.unchanged("other.example.com", "lb.example.net", RecordType.CNAME, 300)
+
+
+def test_shared_values_and_zones_are_pooled():
+    store = RecordStore()
+    for i in range(100):
+        store.put(_a(f"app-{i}.example.com", value=f"10.0.0.{i % 3}"))
+    store.put(_a("app.other.io"))
+    assert store.stats() == {"records": 101, "zones": 2, "distinct_values": 3}
+
+
+def test_remove_releases_rows_and_values():
+    store = RecordStore()
+    store.put(_a("a.example.com", value="10.0.0.1"))
+    store.put(_a("b.example.com", value="10.0.0.2"))
+    assert store.remove("a.example.com")
+    assert not store.remove("a.example.com")
+    assert store.stats() == {"records": 1, "zones": 1, "distinct_values": 1}
+
+    store.put(_a("c.example.com", value="10.0.0.3"))
+    assert sorted(r.name for r in store) == ["b.example.com", "c.example.com"]
+    assert store.get("c.example.com").value == "10.0.0.3"
+    assert store.get("b.example.com").value == "10.0.0.2"
+
+
+def test_single_label_names():
+    store = RecordStore()
+    store.put(_a("localhost"))
+    assert list(store) == [_a("localhost")]
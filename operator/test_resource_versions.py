@@ -0,0 +1,23 @@
+"""Tests for the resourceVersion tracker."""
+
+from resource_versions import CHANGED, LISTED, REPLAYED, ResourceVersionTracker
+
+
+def test_listing_records_then_replays_are_dropped():
+    tracker = ResourceVersionTracker()
+    assert tracker.observe("a", "1", listed=True) == LISTED
+    assert tracker.observe("a", "1", listed=False) == REPLAYED
+    assert tracker.observe("a", "1", listed=True) == REPLAYED
+    assert tracker.observe("a", "2", listed=True) == CHANGED
+    assert tracker.observe("a", "3", listed=False) == CHANGED
+    assert len(tracker) == 1
+
+
+def test_forget_and_missing_versions():
+    tracker = ResourceVersionTracker()
+    assert tracker.observe("a", "1", listed=False) == CHANGED
+    tracker.forget("a")
+    assert tracker.observe("a", "1", listed=False) == CHANGED
+    assert tracker.observe("b", None, listed=False) == CHANGED
+    assert tracker.observe("b", None, listed=False) == CHANGED
+    assert len(tracker) == 1
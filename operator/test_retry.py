@@ -0,0 +1,183 @@
+"""Tests for the retry backlog."""
+
+import asyncio
+import json
+import math
+
+import pytest
+from prometheus_client import REGISTRY
+
+from retry import RetryQueue
+
+
+class Boom(Exception):
+    pass
+
+
+def _queue(**kwargs):
+    calls = []
+
+    async def execute(operation, payload):
+        calls.append((operation, payload))
+
+    queue = RetryQueue(execute, **kwargs)
+    return queue, calls
+
+
+def test_backoff_is_exponential_capped_and_jittered():
+    queue, _ = _queue(base_delay=1, max_delay=10)
+    for attempts, delay in ((1, 1), (2, 2), (3, 4), (5, 10), (9, 10)):
+        samples = [queue.backoff(attempts) for _ in range(50)]
+        assert all(delay / 2 <= s <= delay for s in samples)
+        assert len(set(samples)) > 1
+
+
+def test_failures_are_parked_per_host_and_cleared_by_success():
+    queue, _ = _queue(base_delay=1)
+    queue.failed("app.example.com", "upsert", {"v": 1}, Boom("503"))
+    queue.failed("app.example.com", "delete", {"v": 2}, Boom("503"))
+
+    assert len(queue) == 1
+    entry = queue.snapshot()["backlog"][0]
+    assert (entry["operation"], entry["attempts"], entry["error"]) == ("delete", 2, "Boom: 503")
+    assert REGISTRY.get_sample_value("dns_operator_retry_backlog") == 1
+
+    queue.succeeded("app.example.com")
+    assert len(queue) == 0
+    assert REGISTRY.get_sample_value("dns_operator_retry_backlog") == 0
+
+
+def test_due_pops_only_ripe_entries_once():
+    queue, _ = _queue(base_delay=10)
+    queue.failed("a", "upsert", {}, Boom())
+    assert queue.due() == []
+    [entry] = queue.due(now=math.inf)
+    assert entry.key == "a" and entry.due == math.inf
+    assert queue.due(now=math.inf) == []
+
+
+def test_permanent_errors_and_exhausted_attempts_are_dead_lettered():
+    queue, _ = _queue(max_attempts=2)
+    queue.failed("bad.example.com", "upsert", {}, Boom("403"), retryable=False)
+    queue.failed("flaky.example.com", "upsert", {}, Boom("503"))
+    queue.failed("flaky.example.com", "upsert", {}, Boom("503"))
+
+    assert len(queue) == 0
+    assert [d["host"] for d in queue.snapshot()["dead_letters"]] == ["bad.example.com", "flaky.example.com"]
+    assert REGISTRY.get_sample_value("dns_operator_retry_dead_letters") == 2
+
+    queue.succeeded("bad.example.com")
+    assert REGISTRY.get_sample_value("dns_operator_retry_dead_letters") == 1
+
+
+@pytest.mark.asyncio
+async def test_run_retries_until_success():
+    attempts = []
+
+    async def execute(operation, payload):
+        attempts.append(operation)
+        if len(attempts) < 3:
+            queue.failed("app.example.com", operation, payload, Boom("throttled"))
+        else:
+            queue.succeeded("app.example.com")
+
+    queue = RetryQueue(execute, base_delay=0.01, max_delay=0.02)
+    runner = asyncio.create_task(queue.run())
+    queue.failed("app.example.com", "upsert", {}, Boom("throttled"))
+    await asyncio.sleep(0.2)
+    runner.cancel()
+
+    assert attempts == ["upsert"] * 3
+    assert len(queue) == 0
+
+
+@pytest.mark.asyncio
+async def test_run_dead_letters_operations_that_raise():
+    async def execute(operation, payload):
+        raise ValueError("no load balancer address")
+
+    queue = RetryQueue(execute, base_delay=0.01)
+    runner = asyncio.create_task(queue.run())
+    queue.failed("app.example.com", "upsert", {}, Boom())
+    await asyncio.sleep(0.05)
+    runner.cancel()
+    assert queue.snapshot()["dead_letters"][0]["error"] == "ValueError: no load balancer address"
+
+
+@pytest.mark.asyncio
+async def test_run_does_not_hold_due_entries_behind_a_slow_one():
+    release = asyncio.Event()
+    done = []
+
+    async def execute(operation, payload):
+        if payload["host"] == "slow.example.com":
+            await release.wait()
+        done.append(payload["host"])
+        queue.succeeded(payload["host"])
+
+    queue = RetryQueue(execute, base_delay=0.01, concurrency=2)
+    runner = asyncio.create_task(queue.run())
+    queue.failed("slow.example.com", "upsert", {"host": "slow.example.com"}, Boom())
+    queue.failed("fast.example.com", "upsert", {"host": "fast.example.com"}, Boom())
+    await asyncio.sleep(0.1)
+    assert done == ["fast.example.com"]
+
+    release.set()
+    await asyncio.sleep(0.01)
+    runner.cancel()
+    assert done == ["fast.example.com", "slow.example.com"]
+    assert len(queue) == 0
+
+
+def test_state_file_round_trip(tmp_path):
+    state_file = str(tmp_path / "retry.json")
+    queue, _ = _queue(state_file=state_file)
+    queue.failed("app.example.com", "upsert", {"spec": {"rules": [{"host": "app.example.com"}]}}, Boom())
+    queue.failed("bad.example.com", "delete", {}, Boom(), retryable=False)
+
+    restored, _ = _queue(state_file=state_file)
+    assert len(restored) == 1
+    [entry] = restored.due(now=math.inf)
+    assert (entry.key, entry.operation, entry.attempts) == ("app.example.com", "upsert", 1)
+    assert entry.payload["spec"]["rules"][0]["host"] == "app.example.com"
+    assert [d["host"] for d in restored.snapshot()["dead_letters"]] == ["bad.example.com"]
+
+
+@pytest.mark.asyncio
+async def test_state_file_is_written_in_batches_with_slim_payloads(tmp_path):
+    state_file = tmp_path / "retry.json"
+    queue, _ = _queue(state_file=str(state_file), save_interval=0.05, slim=lambda payload: payload["name"])
+    for i in range(50):
+        queue.failed(f"app{i}.example.com", "upsert", {"name": f"app{i}", "spec": "big"}, Boom())
+    assert not state_file.exists()
+
+    await asyncio.sleep(0.1)
+    saved = json.loads(state_file.read_text())
+    assert len(saved["pending"]) == 50 and saved["pending"][0]["payload"] == "app0"
+
+    queue.succeeded("app0.example.com")
+    await queue.flush()
+    assert len(json.loads(state_file.read_text())["pending"]) == 49
+
+
+@pytest.mark.asyncio
+async def test_run_classifies_errors_raised_by_execute():
+    async def execute(operation, payload):
+        raise Boom("503")
+
+    queue = RetryQueue(execute, base_delay=10, is_retryable=lambda error: "503" in str(error))
+    runner = asyncio.create_task(queue.run())
+    queue.failed("app.example.com", "upsert", {}, Boom("503"))
+    [entry] = queue.due(now=math.inf)
+    await queue._attempt(entry)
+    runner.cancel()
+
+    assert len(queue) == 1 and queue.snapshot()["dead_letters"] == []
+    assert queue.snapshot()["backlog"][0]["attempts"] == 2
+
+
+def test_unreadable_state_file_is_ignored(tmp_path):
+    state_file = tmp_path / "retry.json"
+    state_file.write_text("{not json")
+    queue, _ = _queue(state_file=str(state_file))
+    assert len(queue) == 0
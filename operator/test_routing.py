@@ -0,0 +1,440 @@
+"""Tests for weighted, latency and geo routing policies."""
+
+import pytest
+from unittest.mock import patch, MagicMock
+
+from annotations import get_routing_policy
+from derivation import OperatorConfig, derive_record
+from providers.base import RecordType, RoutingPolicy
+
+
+class TestRoutingAnnotations:
+    """Tests for routing policy annotation parsing."""
+
+    def test_no_set_identifier_means_simple_routing(self):
+        assert get_routing_policy({"hub-dns-operator.io/weight": "10"}) is None
+
+    def test_weighted(self):
+        policy = get_routing_policy({
+            "hub-dns-operator.io/set-identifier": "spoke-eu",
+            "hub-dns-operator.io/weight": "40",
+            "hub-dns-operator.io/health-check-id": "hc-1",
+        })
+        assert policy == RoutingPolicy("spoke-eu", weight=40, health_check_id="hc-1")
+        assert policy.kind == "weighted"
+
+    def test_latency(self):
+        policy = get_routing_policy({
+            "hub-dns-operator.io/set-identifier": "spoke-eu",
+            "hub-dns-operator.io/region": "eu-west-1",
+        })
+        assert policy.region == "eu-west-1"
+        assert policy.kind == "latency"
+
+    def test_geo(self):
+        policy = get_routing_policy({
+            "hub-dns-operator.io/set-identifier": "spoke-us-ca",
+            "hub-dns-operator.io/geo-location": "country=US, subdivision=CA",
+        })
+        assert policy.geo == (("country", "US"), ("subdivision", "CA"))
+        assert policy.kind == "geo"
+
+    @pytest.mark.parametrize("annotations", [
+        {},
+        {"hub-dns-operator.io/weight": "10", "hub-dns-operator.io/region": "eu-west-1"},
+        {"hub-dns-operator.io/weight": "256"},
+        {"hub-dns-operator.io/weight": "-1"},
+        {"hub-dns-operator.io/geo-location": "planet=earth"},
+    ])
+    def test_invalid_policies(self, annotations):
+        with pytest.raises(ValueError):
+            get_routing_policy({"hub-dns-operator.io/set-identifier": "spoke", **annotations})
+
+    def test_derived_record_carries_policy(self):
+        ingress = {
+            "spec": {"rules": [{"host": "app.example.com"}]},
+            "metadata": {"annotations": {
+                "hub-dns-operator.io/set-identifier": "spoke-a",
+                "hub-dns-operator.io/weight": "10",
+            }},
+            "status": {"loadBalancer": {"ingress": [{"ip": "5.6.7.8"}]}},
+        }
+        record = derive_record(ingress, OperatorConfig())
+        assert record.routing == RoutingPolicy("spoke-a", weight=10)
+
+
+class TestAWSRoutingPolicies:
+    """Tests for routing policies in the AWS provider."""
+
+    @pytest.fixture(autouse=True)
+    def setup_env(self, monkeypatch):
+        monkeypatch.setenv("AWS_HOSTED_ZONE_ID", "Z1234567890")
+        monkeypatch.setenv("AWS_DNS_ZONE", "example.com")
+        monkeypatch.setenv("AWS_REGION", "us-east-1")
+
+    async def _upsert(self, mock_boto3, routing):
+        mock_client = MagicMock()
+        mock_boto3.client.return_value = mock_client
+
+        from providers.aws import AWSDNSProvider
+        provider = AWSDNSProvider()
+        await provider.create_or_update_record("app.example.com", "1.2.3.4", RecordType.A, 60, routing=routing)
+        return mock_client.change_resource_record_sets.call_args.kwargs["ChangeBatch"]["Changes"][0]
+
+    @patch("providers.aws.boto3")
+    @pytest.mark.asyncio
+    async def test_weighted_record_with_health_check(self, mock_boto3):
+        change = await self._upsert(mock_boto3, RoutingPolicy("spoke-a", weight=40, health_check_id="hc-1"))
+        assert change == {
+            "Action": "UPSERT",
+            "ResourceRecordSet": {
+                "Name": "app.example.com.",
+                "Type": "A",
+                "TTL": 60,
+                "ResourceRecords": [{"Value": "1.2.3.4"}],
+                "SetIdentifier": "spoke-a",
+                "Weight": 40,
+                "HealthCheckId": "hc-1",
+            },
+        }
+
+    @patch("providers.aws.boto3")
+    @pytest.mark.asyncio
+    async def test_latency_record(self, mock_boto3):
+        change = await self._upsert(mock_boto3, RoutingPolicy("spoke-eu", region="eu-west-1"))
+        assert change["ResourceRecordSet"]["Region"] == "eu-west-1"
+        assert change["ResourceRecordSet"]["SetIdentifier"] == "spoke-eu"
+
+    @patch("providers.aws.boto3")
+    @pytest.mark.asyncio
+    async def test_geo_record(self, mock_boto3):
+        policy = RoutingPolicy("spoke-ca", geo=(("country", "US"), ("subdivision", "CA")))
+        change = await self._upsert(mock_boto3, policy)
+        assert change["ResourceRecordSet"]["GeoLocation"] == {"CountryCode": "US", "SubdivisionCode": "CA"}
+
+    @patch("providers.aws.boto3")
+    @pytest.mark.asyncio
+    async def test_delete_only_touches_own_set(self, mock_boto3):
+        own = {"Name": "app.example.com.", "Type": "A", "SetIdentifier": "spoke-a", "Weight": 10,
+               "TTL": 60, "ResourceRecords": [{"Value": "1.2.3.4"}]}
+        mock_client = MagicMock()
+        mock_client.list_resource_record_sets.return_value = {"ResourceRecordSets": [own]}
+        mock_boto3.client.return_value = mock_client
+
+        from providers.aws import AWSDNSProvider
+        provider = AWSDNSProvider()
+        await provider.delete_record("app.example.com", RecordType.A, routing=RoutingPolicy("spoke-a", weight=10))
+
+        assert mock_client.list_resource_record_sets.call_args.kwargs["StartRecordIdentifier"] == "spoke-a"
+        mock_client.change_resource_record_sets.assert_called_once_with(
+            HostedZoneId="Z1234567890",
+            ChangeBatch={"Changes": [{"Action": "DELETE", "ResourceRecordSet": own}]},
+        )
+
+        # A simple-routing delete never removes another spoke's weighted set
+        mock_client.change_resource_record_sets.reset_mock()
+        await provider.delete_record("app.example.com", RecordType.A)
+        mock_client.change_resource_record_sets.assert_not_called()
+
+
+class TestGCPRoutingPolicies:
+    """Tests for Cloud DNS routing policies in the GCP provider."""
+
+    @pytest.fixture(autouse=True)
+    def setup_env(self, monkeypatch):
+        monkeypatch.setenv("GCP_PROJECT_ID", "fake-project")
+        monkeypatch.setenv("GCP_MANAGED_ZONE", "fake-zone")
+        monkeypatch.setenv("GCP_DNS_ZONE", "example.com")
+
+    def _provider(self, mock_dns, responses):
+        api_request = mock_dns.Client.return_value._connection.api_request
+        api_request.reset_mock()
+        api_request.side_effect = responses
+
+        from providers.gcp import GCPDNSProvider
+        return GCPDNSProvider(), api_request
+
+    @staticmethod
+    def _wrr(*items, ttl=60):
+        return {
+            "name": "app.example.com.", "type": "A", "ttl": ttl,
+            "routingPolicy": {"wrr": {"items": [{"weight": float(w), "rrdatas": [ip]} for w, ip in items]}},
+        }
+
+    @staticmethod
+    def _owners(*entries, ttl=60):
+        """The owner TXT set recording each spoke's WRR item: entries of (set identifier, weight, ip)."""
+        return {
+            "name": "_hdo-owners.app.example.com.", "type": "TXT", "ttl": ttl,
+            "rrdatas": sorted(f'"owner={s};values={ip};ts=1;weight={w}"' for s, w, ip in entries),
+        }
+
+    @staticmethod
+    def _owner_ids(change):
+        txt = [a for a in change["additions"] if a["type"] == "TXT"]
+        return sorted(r.split(";")[0] for r in txt[0]["rrdatas"]) if txt else []
+
+    @patch("providers.gcp.google_dns")
+    @pytest.mark.asyncio
+    async def test_weighted_item_joins_existing_policy(self, mock_dns):
+        from google.api_core.exceptions import NotFound
+        current = self._wrr((60, "10.0.0.1"))
+        owners = self._owners(("spoke-a", 60, "10.0.0.1"))
+        provider, api_request = self._provider(mock_dns, [current, owners, {}])
+
+        await provider.create_or_update_record(
+            "app.example.com", "10.0.0.2", RecordType.A, 60, routing=RoutingPolicy("spoke-b", weight=40)
+        )
+
+        change = api_request.call_args_list[2].kwargs
+        assert change["method"] == "POST"
+        assert change["path"] == "/projects/fake-project/managedZones/fake-zone/changes"
+        assert change["data"]["deletions"] == [current, owners]
+        assert change["data"]["additions"][0] == self._wrr((60, "10.0.0.1"), (40, "10.0.0.2"))
+        assert self._owner_ids(change["data"]) == ['"owner=spoke-a', '"owner=spoke-b']
+        mock_dns.Client.return_value.zone.return_value.changes.assert_not_called()
+
+        # First write of a brand-new policy
+        provider, api_request = self._provider(mock_dns, [NotFound("missing"), NotFound("missing"), {}])
+        await provider.create_or_update_record(
+            "app.example.com", "10.0.0.1", RecordType.A, 60, routing=RoutingPolicy("spoke-a", weight=60)
+        )
+        change = api_request.call_args_list[2].kwargs["data"]
+        assert change["deletions"] == []
+        assert change["additions"][0] == self._wrr((60, "10.0.0.1"))
+        assert self._owner_ids(change) == ['"owner=spoke-a']
+
+    @patch("providers.gcp.google_dns")
+    @pytest.mark.asyncio
+    async def test_conflicting_change_is_retried_on_fresh_read(self, mock_dns):
+        from google.api_core.exceptions import PreconditionFailed
+        stale = self._wrr((60, "10.0.0.1"))
+        fresh = self._wrr((60, "10.0.0.1"), (50, "10.0.0.3"))
+        owners = self._owners(("spoke-a", 60, "10.0.0.1"))
+        fresh_owners = self._owners(("spoke-a", 60, "10.0.0.1"), ("spoke-c", 50, "10.0.0.3"))
+        provider, api_request = self._provider(
+            mock_dns, [stale, owners, PreconditionFailed("changed"), fresh, fresh_owners, {}]
+        )
+
+        await provider.create_or_update_record(
+            "app.example.com", "10.0.0.2", RecordType.A, 60, routing=RoutingPolicy("spoke-b", weight=40)
+        )
+
+        change = api_request.call_args_list[5].kwargs["data"]
+        assert change["deletions"] == [fresh, fresh_owners]
+        assert change["additions"][0] == self._wrr((60, "10.0.0.1"), (40, "10.0.0.2"), (50, "10.0.0.3"))
+
+    @patch("providers.gcp.google_dns")
+    @pytest.mark.asyncio
+    async def test_changed_target_replaces_own_item(self, mock_dns):
+        routing = RoutingPolicy("spoke-b", weight=40)
+        owners = self._owners(("spoke-a", 60, "10.0.0.1"), ("spoke-b", 40, "10.0.0.2"))
+        provider, api_request = self._provider(mock_dns, [
+            self._wrr((60, "10.0.0.1"), (40, "10.0.0.2")), owners, {},
+        ])
+
+        # The IP changed while this process did not know the old one (e.g. across a restart)
+        await provider.create_or_update_record("app.example.com", "10.0.0.9", RecordType.A, 60, routing=routing)
+
+        change = api_request.call_args_list[2].kwargs["data"]
+        assert change["additions"][0] == self._wrr((60, "10.0.0.1"), (40, "10.0.0.9"))
+        assert "values=10.0.0.9" in [r for r in change["additions"][1]["rrdatas"] if "spoke-b" in r][0]
+
+    @patch("providers.gcp.google_dns")
+    @pytest.mark.asyncio
+    async def test_delete_after_restart_removes_only_own_item(self, mock_dns):
+        # spoke-a and spoke-b share an IP; a fresh provider (nothing in memory) deletes spoke-b's item
+        current = self._wrr((60, "10.0.0.1"), (40, "10.0.0.1"), (50, "10.0.0.3"))
+        owners = self._owners(("spoke-a", 60, "10.0.0.1"), ("spoke-b", 40, "10.0.0.1"), ("spoke-c", 50, "10.0.0.3"))
+        provider, api_request = self._provider(mock_dns, [current, owners, {}])
+
+        await provider.delete_record("app.example.com", RecordType.A, routing=RoutingPolicy("spoke-b", weight=40))
+
+        change = api_request.call_args_list[2].kwargs["data"]
+        assert change["deletions"] == [current, owners]
+        assert change["additions"][0] == self._wrr((60, "10.0.0.1"), (50, "10.0.0.3"))
+        assert self._owner_ids(change) == ['"owner=spoke-a', '"owner=spoke-c']
+
+    @patch("providers.gcp.google_dns")
+    @pytest.mark.asyncio
+    async def test_last_spoke_out_deletes_policy_and_owner_table(self, mock_dns):
+        current = self._wrr((40, "10.0.0.2"))
+        owners = self._owners(("spoke-b", 40, "10.0.0.2"))
+        provider, api_request = self._provider(mock_dns, [current, owners, {}])
+
+        await provider.delete_record("app.example.com", RecordType.A, routing=RoutingPolicy("spoke-b", weight=40))
+
+        assert api_request.call_args_list[2].kwargs["data"] == {"additions": [], "deletions": [current, owners]}
+
+    @patch("providers.gcp.google_dns")
+    @pytest.mark.asyncio
+    async def test_delete_with_set_gone_rebuilds_remaining_items_from_owner_table(self, mock_dns):
+        from google.api_core.exceptions import NotFound
+        owners = self._owners(("spoke-a", 60, "10.0.0.1"), ("spoke-b", 40, "10.0.0.2"), ttl=120)
+        provider, api_request = self._provider(mock_dns, [NotFound("deleted out of band"), owners, {}])
+
+        await provider.delete_record("app.example.com", RecordType.A, routing=RoutingPolicy("spoke-b", weight=40))
+
+        change = api_request.call_args_list[2].kwargs["data"]
+        assert change["deletions"] == [owners]
+        assert change["additions"][0] == self._wrr((60, "10.0.0.1"), ttl=120)
+        assert self._owner_ids(change) == ['"owner=spoke-a']
+
+    def test_region_maps_to_geo_items(self):
+        from providers.gcp import GCPDNSProvider
+        current = {"name": "app.example.com.", "type": "A", "ttl": 60, "routingPolicy": {"geo": {"items": [
+            {"location": "us-east1", "rrdatas": ["10.0.0.1"]},
+            {"location": "europe-west1", "rrdatas": ["10.0.0.2"]},
+        ]}}}
+        routing = RoutingPolicy("spoke-eu", region="europe-west1")
+
+        changed, updated, _ = GCPDNSProvider._edit_routing_items(
+            current, "app.example.com.", "A", 60, routing, "10.0.0.5", {}
+        )
+        assert changed
+        assert updated["routingPolicy"]["geo"]["items"][-1] == {"location": "europe-west1", "rrdatas": ["10.0.0.5"]}
+
+        changed, updated, _ = GCPDNSProvider._edit_routing_items(
+            current, "app.example.com.", "A", None, routing, None, {}
+        )
+        assert updated["routingPolicy"]["geo"]["items"] == [{"location": "us-east1", "rrdatas": ["10.0.0.1"]}]
+
+    def test_geo_location_and_simple_sets_are_rejected(self):
+        from providers.gcp import GCPDNSProvider
+        with pytest.raises(ValueError):
+            GCPDNSProvider._edit_routing_items(
+                None, "app.example.com.", "A", 60, RoutingPolicy("s", geo=(("country", "DE"),)), "10.0.0.1", {}
+            )
+        simple = {"name": "app.example.com.", "type": "A", "ttl": 60, "rrdatas": ["10.0.0.1"]}
+        with pytest.raises(ValueError):
+            GCPDNSProvider._edit_routing_items(
+                simple, "app.example.com.", "A", 60, RoutingPolicy("s", weight=1), "10.0.0.2", {}
+            )
+
+
+class TestAzureMultiValueRouting:
+    """Tests for multi-value A record routing in the Azure provider."""
+
+    @pytest.fixture(autouse=True)
+    def setup_env(self, monkeypatch):
+        monkeypatch.setenv("MANAGED_IDENTITY_CLIENT_ID", "fake-client-id")
+        monkeypatch.setenv("AZURE_SUBSCRIPTION_ID", "fake-sub-id")
+        monkeypatch.setenv("AZURE_DNS_ZONE", "example.com")
+        monkeypatch.setenv("AZURE_DNS_RESOURCE_GROUP", "fake-rg")
+
+    @staticmethod
+    def _record_set(addresses, metadata, etag="etag-1", ttl=60):
+        return MagicMock(
+            a_records=[MagicMock(ipv4_address=a) for a in addresses], metadata=metadata, etag=etag, ttl=ttl
+        )
+
+    def _provider(self, mock_client_cls, current):
+        mock_client = MagicMock()
+        mock_client.record_sets.get.side_effect = current if isinstance(current, list) else [current]
+        mock_client_cls.return_value = mock_client
+
+        from providers.azure import AzureDNSProvider
+        return AzureDNSProvider(), mock_client.record_sets
+
+    @patch("providers.azure.DnsManagementClient")
+    @patch("providers.azure.ManagedIdentityCredential")
+    @pytest.mark.asyncio
+    async def test_spoke_joins_shared_record_set(self, mock_cred, mock_client_cls):
+        current = self._record_set(["10.0.0.1"], {"hubdns_set_spoke_a": "10.0.0.1"})
+        provider, record_sets = self._provider(mock_client_cls, current)
+
+        await provider.create_or_update_record(
+            "app.example.com", "10.0.0.2", RecordType.A, 60, routing=RoutingPolicy("spoke-b", weight=50)
+        )
+
+        record_sets.create_or_update.assert_called_once_with(
+            "fake-rg", "example.com", "app", "A",
+            {
+                "ttl": 60,
+                "arecords": [{"ipv4_address": "10.0.0.1"}, {"ipv4_address": "10.0.0.2"}],
+                "metadata": {"hubdns_set_spoke_a": "10.0.0.1", "hubdns_set_spoke_b": "10.0.0.2"},
+            },
+            if_match="etag-1",
+            if_none_match=None,
+        )
+
+    @patch("providers.azure.DnsManagementClient")
+    @patch("providers.azure.ManagedIdentityCredential")
+    @pytest.mark.asyncio
+    async def test_first_spoke_creates_set_only_if_absent(self, mock_cred, mock_client_cls):
+        from azure.core.exceptions import ResourceNotFoundError
+        provider, record_sets = self._provider(mock_client_cls, ResourceNotFoundError("missing"))
+
+        await provider.create_or_update_record(
+            "app.example.com", "10.0.0.1", RecordType.A, 60, routing=RoutingPolicy("spoke-a", weight=50)
+        )
+
+        kwargs = record_sets.create_or_update.call_args.kwargs
+        assert kwargs == {"if_match": None, "if_none_match": "*"}
+
+    @patch("providers.azure.DnsManagementClient")
+    @patch("providers.azure.ManagedIdentityCredential")
+    @pytest.mark.asyncio
+    async def test_weight_zero_drains_spoke(self, mock_cred, mock_client_cls):
+        owners = {"hubdns_set_spoke_a": "10.0.0.1", "hubdns_set_spoke_b": "10.0.0.2"}
+        current = self._record_set(["10.0.0.1", "10.0.0.2"], owners)
+        provider, record_sets = self._provider(mock_client_cls, current)
+
+        await provider.create_or_update_record(
+            "app.example.com", "10.0.0.2", RecordType.A, 60, routing=RoutingPolicy("spoke-b", weight=0)
+        )
+
+        params = record_sets.create_or_update.call_args.args[4]
+        assert params["arecords"] == [{"ipv4_address": "10.0.0.1"}]
+        assert params["metadata"] == {"hubdns_set_spoke_a": "10.0.0.1"}
+
+    @patch("providers.azure.DnsManagementClient")
+    @patch("providers.azure.ManagedIdentityCredential")
+    @pytest.mark.asyncio
+    async def test_aggregation_entries_do_not_count_as_spoke_claims(self, mock_cred, mock_client_cls):
+        owners = {
+            "hubdns_set_spoke_a": "10.0.0.1",
+            "hubdns_owner_spoke_x": "owner=spoke-x;values=10.0.0.2;ts=100",
+            "hubdns_spoke_b": "10.0.0.2",  # written before the prefixes were split
+        }
+        current = self._record_set(["10.0.0.1", "10.0.0.2"], owners)
+        provider, record_sets = self._provider(mock_client_cls, current)
+
+        await provider.create_or_update_record(
+            "app.example.com", "10.0.0.3", RecordType.A, 60, routing=RoutingPolicy("spoke-b", weight=50)
+        )
+
+        params = record_sets.create_or_update.call_args.args[4]
+        assert params["arecords"] == [{"ipv4_address": "10.0.0.1"}, {"ipv4_address": "10.0.0.3"}]
+        assert params["metadata"] == {
+            "hubdns_set_spoke_a": "10.0.0.1",
+            "hubdns_owner_spoke_x": "owner=spoke-x;values=10.0.0.2;ts=100",
+            "hubdns_set_spoke_b": "10.0.0.3",
+        }
+
+    @patch("providers.azure.DnsManagementClient")
+    @patch("providers.azure.ManagedIdentityCredential")
+    @pytest.mark.asyncio
+    async def test_last_spoke_deletes_set_and_conflicts_retry(self, mock_cred, mock_client_cls):
+        from azure.core.exceptions import HttpResponseError
+        conflict = HttpResponseError("precondition failed")
+        conflict.status_code = 412
+        provider, record_sets = self._provider(mock_client_cls, [
+            self._record_set(["10.0.0.1"], {"hubdns_set_spoke_a": "10.0.0.1"}, etag="etag-1"),
+            self._record_set(["10.0.0.1"], {"hubdns_set_spoke_a": "10.0.0.1"}, etag="etag-2"),
+        ])
+        record_sets.delete.side_effect = [conflict, None]
+
+        await provider.delete_record("app.example.com", RecordType.A, routing=RoutingPolicy("spoke-a", weight=50))
+
+        assert [c.kwargs["if_match"] for c in record_sets.delete.call_args_list] == ["etag-1", "etag-2"]
+
+    @patch("providers.azure.DnsManagementClient")
+    @patch("providers.azure.ManagedIdentityCredential")
+    @pytest.mark.asyncio
+    async def test_cname_routing_is_rejected(self, mock_cred, mock_client_cls):
+        provider, record_sets = self._provider(mock_client_cls, None)
+        with pytest.raises(ValueError):
+            await provider.create_or_update_record(
+                "app.example.com", "lb.example.net", RecordType.CNAME, 60, routing=RoutingPolicy("s", weight=1)
+            )
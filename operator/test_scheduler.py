@@ -0,0 +1,127 @@
+"""Tests for the priority scheduler."""
+
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from scheduler import Priority, PriorityScheduler
+
+
+def _depth(priority):
+    return REGISTRY.get_sample_value("dns_operator_queue_depth", {"priority": priority})
+
+
+async def _fill(scheduler, order, jobs):
+    """Block the single worker, queue ``jobs`` behind it, then release it."""
+    gate = asyncio.Event()
+
+    async def blocker():
+        await gate.wait()
+
+    def make_job(label):
+        async def job():
+            order.append(label)
+            return label
+        return job
+
+    first = asyncio.create_task(scheduler.submit(Priority.LOW, "blocker", blocker))
+    await asyncio.sleep(0)
+    tasks = [asyncio.create_task(scheduler.submit(p, label, make_job(label))) for p, label in jobs]
+    await asyncio.sleep(0)
+    return gate, [first] + tasks
+
+
+@pytest.mark.asyncio
+async def test_submit_returns_result():
+    scheduler = PriorityScheduler(workers=2)
+
+    async def job():
+        return 42
+
+    assert await scheduler.submit(Priority.HIGH, "job", job) == 42
+    await scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_submit_propagates_exceptions():
+    scheduler = PriorityScheduler(workers=1)
+
+    async def job():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await scheduler.submit(Priority.HIGH, "job", job)
+    await scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_high_priority_preempts_queued_low_priority():
+    scheduler = PriorityScheduler(workers=1)
+    order = []
+    gate, tasks = await _fill(scheduler, order, [
+        (Priority.LOW, "resync-1"),
+        (Priority.LOW, "resync-2"),
+        (Priority.MEDIUM, "target-change"),
+        (Priority.HIGH, "new-host"),
+    ])
+    assert scheduler.depth() == 4
+    assert _depth("low") == 2
+    assert _depth("high") == 1
+
+    gate.set()
+    await asyncio.gather(*tasks)
+    assert order == ["new-host", "target-change", "resync-1", "resync-2"]
+    assert scheduler.depth() == 0
+    assert _depth("low") == 0
+    await scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_starvation_protection():
+    scheduler = PriorityScheduler(workers=1, starvation_limit=2)
+    order = []
+    jobs = [(Priority.LOW, "low")] + [(Priority.HIGH, f"high-{i}") for i in range(5)]
+    gate, tasks = await _fill(scheduler, order, jobs)
+
+    gate.set()
+    await asyncio.gather(*tasks)
+    assert order.index("low") == 2
+    await scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_lists_queued_and_running_jobs():
+    scheduler = PriorityScheduler(workers=1)
+    order = []
+    gate, tasks = await _fill(scheduler, order, [(Priority.MEDIUM, "update app")])
+
+    snapshot = scheduler.snapshot()
+    assert [job["label"] for job in snapshot["queued"]["medium"]] == ["update app"]
+    assert snapshot["running"][0]["label"] == "blocker"
+
+    gate.set()
+    await asyncio.gather(*tasks)
+    await scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_deferred_class_waits_until_released():
+    deferring = {"low": True}
+    scheduler = PriorityScheduler(
+        workers=1, defer=lambda p: p == Priority.LOW and deferring["low"], defer_poll_interval=0.01
+    )
+    order = []
+
+    async def job(label):
+        order.append(label)
+
+    low = asyncio.create_task(scheduler.submit(Priority.LOW, "resync", lambda: job("resync")))
+    await scheduler.submit(Priority.HIGH, "new-host", lambda: job("new-host"))
+    await asyncio.sleep(0.03)
+    assert order == ["new-host"]
+
+    deferring["low"] = False
+    await asyncio.wait_for(low, timeout=1)
+    assert order == ["new-host", "resync"]
+    await scheduler.close()
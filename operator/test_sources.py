@@ -0,0 +1,91 @@
+"""Tests for the Service and HTTPRoute sources."""
+
+import pytest
+
+from sources import GatewayIndex, enabled_sources, service_view
+
+
+def _service(annotations=None, lb=None, type_="LoadBalancer"):
+    return {
+        "apiVersion": "v1", "kind": "Service",
+        "metadata": {"name": "api", "namespace": "team", "uid": "svc-1", "resourceVersion": "7",
+                     "annotations": annotations or {}},
+        "spec": {"type": type_, "loadBalancerClass": "internal"},
+        "status": {"loadBalancer": {"ingress": lb or []}},
+    }
+
+
+def _gateway(addresses, version="1", class_name="public"):
+    return {
+        "metadata": {"name": "gw", "namespace": "infra", "resourceVersion": version},
+        "spec": {"gatewayClassName": class_name},
+        "status": {"addresses": addresses},
+    }
+
+
+def _route(name="shop", hostnames=("shop.example.com",), version="3"):
+    return {
+        "apiVersion": "gateway.networking.k8s.io/v1", "kind": "HTTPRoute",
+        "metadata": {"name": name, "namespace": "team", "resourceVersion": version},
+        "spec": {"hostnames": list(hostnames), "parentRefs": [{"name": "gw", "namespace": "infra"}]},
+    }
+
+
+def test_service_view():
+    view = service_view(_service({"hub-dns-operator.io/hostname": "api.example.com"}, [{"ip": "10.0.0.5"}]))
+
+    assert view["kind"] == "Service"
+    assert view["metadata"]["uid"] == "svc-1"
+    assert view["metadata"]["resourceVersion"] == "7"
+    assert view["spec"] == {"rules": [{"host": "api.example.com"}], "ingressClassName": "internal"}
+    assert view["status"]["loadBalancer"]["ingress"] == [{"ip": "10.0.0.5"}]
+
+
+def test_service_with_hostname_load_balancer_targets_it():
+    view = service_view(_service(
+        {"hub-dns-operator.io/hostname": "api.example.com"}, [{"hostname": "lb-1.elb.amazonaws.com"}],
+    ))
+    assert view["metadata"]["annotations"]["hub-dns-operator.io/target-hostname"] == "lb-1.elb.amazonaws.com"
+
+
+def test_services_without_a_record():
+    assert service_view(_service()) is None
+    assert service_view(_service({"hub-dns-operator.io/hostname": "api.example.com"}, type_="ClusterIP")) is None
+
+
+def test_route_follows_its_gateway():
+    index = GatewayIndex()
+    route = _route()
+
+    pending = index.route_view(route)
+    assert pending["status"]["loadBalancer"]["ingress"] == []
+    assert index.update_gateway(_gateway([{"type": "IPAddress", "value": "10.0.0.9"}])) == [route]
+
+    view = index.route_view(route)
+    assert view["spec"] == {"rules": [{"host": "shop.example.com"}], "ingressClassName": "public"}
+    assert view["status"]["loadBalancer"]["ingress"] == [{"ip": "10.0.0.9"}]
+    assert view["metadata"]["resourceVersion"] == "3/1"
+
+    # Status churn without an address change does not touch the routes
+    assert index.update_gateway(_gateway([{"type": "IPAddress", "value": "10.0.0.9"}], version="2")) == []
+    assert index.update_gateway(_gateway([{"type": "Hostname", "value": "gw.example.net"}], version="3")) == [route]
+    assert index.route_view(route)["metadata"]["annotations"] == {
+        "hub-dns-operator.io/target-hostname": "gw.example.net",
+    }
+
+    index.forget_route(route)
+    assert index.remove_gateway(_gateway([])) == []
+    assert len(index) == 0
+
+
+def test_route_without_hostnames_publishes_nothing():
+    assert GatewayIndex().route_view(_route(hostnames=())) is None
+
+
+def test_enabled_sources(monkeypatch):
+    assert enabled_sources() == {"ingress"}
+    monkeypatch.setenv("SOURCES", "ingress, Service,httproute")
+    assert enabled_sources() == {"ingress", "service", "httproute"}
+    monkeypatch.setenv("SOURCES", "ingress,tcproute")
+    with pytest.raises(ValueError, match="tcproute"):
+        enabled_sources()
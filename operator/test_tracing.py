@@ -0,0 +1,163 @@
+"""Tests for OpenTelemetry spans (tracing.py)."""
+
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from opentelemetry import trace
+
+import tracing
+from providers.fake import FakeDNSProvider
+from providers.multi import MultiDNSProvider
+from scheduler import Priority, PriorityScheduler
+
+os.environ["CLOUD_PROVIDER"] = "azure"
+os.environ["MANAGED_IDENTITY_CLIENT_ID"] = "fake-client-id"
+os.environ["AZURE_SUBSCRIPTION_ID"] = "fake-subscription-id"
+os.environ["AZURE_DNS_ZONE"] = "example.com"
+os.environ["AZURE_DNS_RESOURCE_GROUP"] = "fake-resource-group"
+os.environ["CUSTOM_IP"] = "1.2.3.4"
+
+with patch("kubernetes.config.load_incluster_config", MagicMock()):
+    with patch("providers.azure.ManagedIdentityCredential", MagicMock()):
+        with patch("providers.azure.DnsManagementClient", MagicMock()):
+            import main
+
+
+@pytest.fixture(scope="module")
+def span_exporter():
+    pytest.importorskip("opentelemetry.sdk")
+    exporter = tracing.configure("memory", sample_ratio=1.0)
+    yield exporter
+    tracing.shutdown()
+
+
+@pytest.fixture
+def spans(span_exporter):
+    span_exporter.clear()
+    yield lambda: {span.name: span for span in span_exporter.get_finished_spans()}
+    span_exporter.clear()
+
+
+def _ingress(host="app.example.com", version="1"):
+    return {
+        "metadata": {"namespace": "team", "name": "app", "uid": "uid-app", "resourceVersion": version,
+                     "annotations": {}},
+        "spec": {"rules": [{"host": host}], "ingressClassName": "nginx-internal"},
+        "status": {"loadBalancer": {"ingress": [{"ip": "10.0.0.1"}]}},
+    }
+
+
+@pytest.mark.asyncio
+async def test_disabled_tracing_is_a_no_op():
+    if tracing.enabled():
+        pytest.skip("tracing configured by an earlier test")
+    job = AsyncMock()
+    assert tracing.carry(job, "dns.queue") is job
+    tracing.defer("key")
+    with tracing.span("dns.event") as span, tracing.settled_span("dns.apply", "key") as settled:
+        assert span is None and settled is None
+    assert tracing._deferred == {}
+
+
+@pytest.mark.asyncio
+async def test_event_traced_through_to_the_provider_call(spans):
+    with patch.object(main, "dns_provider") as provider, \
+         patch.object(main, "host_ownership", main.HostOwnership()), \
+         patch.object(main, "resource_versions", main.ResourceVersionTracker()), \
+         patch.object(main, "managed_records", main.RecordStore()), \
+         patch.object(main, "debouncer", None), patch.object(main, "scheduler", None):
+        provider.provider_name = "azure"
+        provider.create_or_update_record = AsyncMock()
+        await main.ingress_event_handler({"type": "ADDED", "object": _ingress()})
+
+    finished = spans()
+    event, apply, derive, call = (finished[n] for n in ("dns.event", "dns.apply", "dns.derive", "dns.provider"))
+    assert event.parent is None
+    assert event.attributes["k8s.object.name"] == "app" and event.attributes["dns.source"] == "ingress"
+    assert apply.parent.span_id == event.context.span_id
+    assert derive.parent.span_id == apply.context.span_id
+    assert call.parent.span_id == apply.context.span_id
+    assert dict(call.attributes) == {"dns.operation": "create", "dns.host": "app.example.com", "dns.provider": "azure"}
+    assert {span.context.trace_id for span in finished.values()} == {event.context.trace_id}
+
+
+@pytest.mark.asyncio
+async def test_coalesced_write_continues_the_first_event_and_links_the_rest(spans):
+    contexts = []
+    for _ in range(3):
+        with tracing.span("dns.event"):
+            contexts.append(trace.get_current_span().get_span_context())
+            tracing.defer("team/app")
+    with tracing.settled_span("dns.apply", "team/app"):
+        pass
+
+    apply = spans()["dns.apply"]
+    assert apply.context.trace_id == contexts[0].trace_id
+    assert apply.parent.span_id == contexts[0].span_id
+    assert [link.context.span_id for link in apply.links] == [c.span_id for c in contexts[1:]]
+    assert apply.attributes["dns.coalesced_events"] == 3
+    assert "team/app" not in tracing._deferred
+
+
+@pytest.mark.asyncio
+async def test_coalesced_write_prefers_a_sampled_event(spans):
+    unsampled = trace.SpanContext(0xa, 0x1, is_remote=False, trace_flags=trace.TraceFlags(0))
+    tracing._deferred["team/app"] = [unsampled]
+    with tracing.span("dns.event"):
+        sampled = trace.get_current_span().get_span_context()
+        tracing.defer("team/app")
+    with tracing.settled_span("dns.apply", "team/app"):
+        pass
+
+    apply = spans()["dns.apply"]
+    assert apply.parent.span_id == sampled.span_id
+    assert [link.context.span_id for link in apply.links] == [unsampled.span_id]
+
+
+@pytest.mark.asyncio
+async def test_queue_wait_recorded_and_job_run_in_the_submitters_trace(spans):
+    scheduler = PriorityScheduler(workers=1)
+    seen = []
+
+    async def job():
+        seen.append(trace.get_current_span().get_span_context())
+
+    try:
+        with tracing.span("dns.apply"):
+            apply = trace.get_current_span().get_span_context()
+            await scheduler.submit(Priority.HIGH, "job", tracing.carry(job, "dns.queue", {"dns.priority": "high"}))
+    finally:
+        await scheduler.close()
+
+    queue = spans()["dns.queue"]
+    assert queue.parent.span_id == apply.span_id
+    assert queue.start_time <= queue.end_time
+    assert seen == [apply]
+
+
+@pytest.mark.asyncio
+async def test_backend_and_rate_limit_spans_and_api_call_events(spans):
+    fake = FakeDNSProvider(latency=0)
+    provider = MultiDNSProvider([fake], rate_limits={"fake": 100.0})
+    with tracing.span("dns.provider"):
+        await provider.create_or_update_record("app.example.com", "10.0.0.1")
+        await provider.drain()
+        fake.account_api_call("change")
+
+    finished = spans()
+    assert finished["dns.backend"].attributes["dns.provider"] == "fake"
+    assert finished["dns.rate_limit_wait"].parent.span_id == finished["dns.backend"].context.span_id
+    events = finished["dns.provider"].events
+    assert [(e.name, e.attributes["dns.api_call.kind"]) for e in events] == [("dns.api_call", "change")]
+
+
+def test_unknown_exporter_rejected():
+    with pytest.raises(ValueError, match="TRACING_EXPORTER"):
+        tracing.configure("jaeger")
+    assert tracing.configure("none") is None
+
+
+def test_sampler_follows_the_configured_ratio(span_exporter):
+    sampler = trace.get_tracer_provider().sampler
+    assert "TraceIdRatioBased{1.0}" in sampler.get_description()
@@ -0,0 +1,88 @@
+"""Tests for per-record TTL overrides and adaptive TTLs."""
+
+from derivation import DesiredRecord
+from providers.base import RecordType
+from ttl_policy import TtlPolicy
+
+
+def _record(value="10.0.0.1", ttl=300):
+    return DesiredRecord("app.example.com", value, RecordType.A, ttl)
+
+
+def _policy():
+    return TtlPolicy(300, min_ttl=30, max_ttl=3600, stable_seconds=600, min_update_interval=900)
+
+
+def _write(policy, record, annotations=None, now=0):
+    record = policy.apply(record, annotations or {}, now=now)
+    policy.record_written(record, now=now)
+    return record.ttl
+
+
+def test_disabled_policy_keeps_base_ttl_and_no_state():
+    policy = TtlPolicy(300)
+    assert policy.apply(_record(), {}) == _record()
+    assert policy.apply(_record(), {"hub-dns-operator.io/ttl": "45"}).ttl == 45
+    assert policy.apply(_record(), {"hub-dns-operator.io/ttl": "soon"}).ttl == 300
+    assert len(policy) == 0
+
+
+def test_moving_record_gets_low_ttl_then_raised_after_stability():
+    policy = _policy()
+    assert _write(policy, _record(), now=0) == 300
+    assert _write(policy, _record("10.0.0.2"), now=100) == 30
+    assert policy.due(now=500) == []
+    # Stable since t=100, but the last TTL write was less than min_update_interval ago
+    assert policy.due(now=800) == []
+    [raised] = policy.due(now=1000)
+    assert (raised.value, raised.ttl) == ("10.0.0.2", 3600)
+
+
+def test_ttl_raises_are_rate_limited_but_lowering_is_not():
+    policy = _policy()
+    _write(policy, _record(), now=0)
+    [raised] = policy.due(now=900)
+    policy.record_written(raised, now=900)
+
+    # Target moves: lowered immediately, even though the last TTL write was recent
+    assert _write(policy, _record("10.0.0.2"), now=1000) == 30
+    # An event while stable does not raise the TTL before min_update_interval has passed
+    assert _write(policy, _record("10.0.0.2"), now=1700) == 30
+    assert [r.ttl for r in policy.due(now=1900)] == [3600]
+
+
+def test_planned_change_lowers_ttl_ahead_of_time():
+    policy = _policy()
+    _write(policy, _record(), now=0)
+    policy.record_written(policy.due(now=900)[0], now=900)
+
+    annotations = {"hub-dns-operator.io/planned-change-at": "10000"}
+    # Cached answers may live for 3600s, so lowering starts an hour before the change
+    assert _write(policy, _record(), annotations, now=5000) == 3600
+    assert _write(policy, _record(), annotations, now=6400) == 30
+    assert policy.due(now=7000) == []
+
+
+def test_planned_change_accepts_iso_timestamps():
+    policy = _policy()
+    annotations = {"hub-dns-operator.io/planned-change-at": "1970-01-01T02:00:00+00:00"}
+    assert _write(policy, _record(), annotations, now=7000) == 30
+
+
+def test_forget_drops_state():
+    policy = _policy()
+    _write(policy, _record())
+    policy.forget("app.example.com")
+    assert len(policy) == 0
+
+
+def test_due_record_is_not_returned_again_until_written_or_rearmed():
+    policy = _policy()
+    _write(policy, _record(), now=0)
+    [raised] = policy.due(now=900)
+    assert policy.due(now=1000) == []  # its write is still queued
+
+    policy.rearm(raised)  # that write failed
+    [again] = policy.due(now=1100)
+    policy.record_written(again, now=1100)
+    assert policy.due(now=5000) == []
@@ -0,0 +1,160 @@
+"""OpenTelemetry spans from a received event to the provider SDK calls it caused.
+
+Off unless TRACING_EXPORTER names an exporter: "otlp" (configured by the
+standard OTEL_EXPORTER_OTLP_* variables), "file" (JSON lines, one span per
+line) or "memory" (for tests). Disabled, ``span()`` returns a null context
+and nothing is kept. The SDK and the OTLP exporter are imported only when
+configured.
+
+A trace starts at each watch event (``dns.event``) and follows it through
+``dns.derive``, ``dns.queue`` (waiting for a scheduler worker),
+``dns.rate_limit_wait``, ``dns.apply`` and ``dns.provider``. Under a multi
+provider, each back-end gets a ``dns.backend`` span. Every cloud API call is
+added as a span event. When the debouncer merges several events into one
+write, the ``dns.apply`` span continues the first sampled event's trace and
+links to the others.
+
+Sampling is decided once per event (TRACING_SAMPLE_RATIO) and inherited by
+everything after it. Unsampled spans are non-recording, so a low ratio
+keeps the cost negligible at high event rates.
+"""
+
+import contextlib
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Mapping, Optional
+
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+
+EXPORTERS = ("none", "otlp", "file", "memory")
+TRACER_NAME = "hub-dns-operator"
+
+# Events linked to one coalesced write, at most
+MAX_LINKS = 32
+
+_provider = None
+_tracer: Optional[trace.Tracer] = None
+_deferred: Dict[Hashable, List[trace.SpanContext]] = {}
+
+
+def configure(exporter: str = "none", sample_ratio: float = 1.0, file_path: str = "", version: str = ""):
+    """Install a tracer provider exporting to ``exporter``; return the span exporter (None when "none").
+
+    Needs opentelemetry-sdk, and opentelemetry-exporter-otlp-proto-http for
+    "otlp". The provider becomes OpenTelemetry's global one, so spans made
+    through the API elsewhere (providers/) are exported as well.
+    """
+    global _provider, _tracer
+    if exporter not in EXPORTERS:
+        raise ValueError(f"Unknown TRACING_EXPORTER {exporter!r}; expected one of {', '.join(EXPORTERS)}")
+    if exporter == "none":
+        return None
+    if _tracer is not None:
+        raise RuntimeError("tracing is already configured")
+    if exporter == "file" and not file_path:
+        raise ValueError("TRACING_EXPORTER=file needs TRACING_SPAN_FILE")
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": TRACER_NAME, "service.version": version}),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+    )
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        span_exporter = OTLPSpanExporter()
+        provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    elif exporter == "file":
+        out = open(file_path, "a", encoding="utf-8")
+        span_exporter = ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+        provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    else:
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+        span_exporter = InMemorySpanExporter()
+        provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+
+    trace.set_tracer_provider(provider)
+    _provider = provider
+    _tracer = provider.get_tracer(TRACER_NAME, version)
+    return span_exporter
+
+
+def shutdown() -> None:
+    """Export the spans still buffered and stop tracing."""
+    global _provider, _tracer
+    if _provider is not None:
+        _provider.shutdown()
+    _provider = _tracer = None
+    _deferred.clear()
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, attributes: Optional[Mapping[str, Any]] = None):
+    """Context manager for a span ``name`` under the current one (a null context when disabled)."""
+    if _tracer is None:
+        return contextlib.nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def defer(key: Hashable) -> None:
+    """Remember the current span as one of the events a pending write for ``key`` will settle."""
+    if _tracer is None:
+        return
+    span_context = trace.get_current_span().get_span_context()
+    if not span_context.is_valid:
+        return
+    pending = _deferred.setdefault(key, [])
+    if len(pending) < MAX_LINKS:
+        pending.append(span_context)
+
+
+def discard(key: Hashable) -> None:
+    """Forget the events deferred for ``key`` (its pending write was cancelled)."""
+    _deferred.pop(key, None)
+
+
+def settled_span(name: str, key: Hashable, attributes: Optional[Mapping[str, Any]] = None):
+    """Span ``name`` for the write that settles the events deferred for ``key``.
+
+    It continues the trace of the first sampled event (or the first event)
+    and links to the other events. With nothing deferred, e.g. when writes
+    are not debounced, it is an ordinary child of the current span.
+    """
+    if _tracer is None:
+        return contextlib.nullcontext()
+    events = _deferred.pop(key, None)
+    if not events:
+        return span(name, attributes)
+    parent = next((event for event in events if event.trace_flags.sampled), events[0])
+    links = [trace.Link(event) for event in events if event is not parent]
+    attributes = {**(attributes or {}), "dns.coalesced_events": len(events)}
+    return _tracer.start_as_current_span(
+        name, context=trace.set_span_in_context(trace.NonRecordingSpan(parent)), links=links, attributes=attributes,
+    )
+
+
+def carry(job: Callable[[], Awaitable[Any]], name: str, attributes: Optional[Mapping[str, Any]] = None):
+    """``job`` run in the caller's trace context, its wait until started recorded as span ``name``.
+
+    For work handed to another task, such as a scheduler worker, which
+    would otherwise run in that task's context.
+    """
+    if _tracer is None:
+        return job
+    captured = otel_context.get_current()
+    submitted = time.time_ns()
+
+    async def run():
+        _tracer.start_span(name, context=captured, attributes=attributes, start_time=submitted).end()
+        token = otel_context.attach(captured)
+        try:
+            return await job()
+        finally:
+            otel_context.detach(token)
+    return run
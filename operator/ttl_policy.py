@@ -0,0 +1,163 @@
+"""Per-record TTL policy: annotation overrides and adaptive TTLs.
+
+A single global TTL forces a choice between cheap resolver caching (high
+TTL) and fast failover (low TTL). The policy picks a TTL per record:
+
+* ``hub-dns-operator.io/ttl`` pins a record's TTL explicitly;
+* records whose target changed recently are "moving" and get ``min_ttl``;
+* records unchanged for ``stable_seconds`` are raised to ``max_ttl``;
+* ``hub-dns-operator.io/planned-change-at`` (unix time or ISO 8601) lowers
+  the TTL ahead of a planned move, early enough for cached answers with
+  the old TTL to expire before the change;
+* TTL-only raises are written at most once per ``min_update_interval`` per
+  record, so adaptive TTLs never add meaningful write volume. Lowering is
+  never delayed, since it protects failover.
+
+With ``min_ttl`` and ``max_ttl`` both 0 the policy is off and every record
+keeps the base TTL (CUSTOM_TTL) unless annotated.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from derivation import DesiredRecord
+
+logger = logging.getLogger(__name__)
+
+ANNOTATION_TTL = "hub-dns-operator.io/ttl"
+ANNOTATION_PLANNED_CHANGE_AT = "hub-dns-operator.io/planned-change-at"
+
+
+@lru_cache(maxsize=1024)
+def parse_ttl(value: str) -> Optional[int]:
+    if value.isdigit() and int(value) > 0:
+        return int(value)
+    logger.warning("Ignoring invalid %s annotation: %r", ANNOTATION_TTL, value)
+    return None
+
+
+@lru_cache(maxsize=1024)
+def parse_planned_change(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        logger.warning("Ignoring invalid %s annotation: %r", ANNOTATION_PLANNED_CHANGE_AT, value)
+        return None
+
+
+@dataclass(slots=True)
+class _HostState:
+    record: DesiredRecord  # last record applied, with the TTL that was chosen
+    first_seen: float
+    changed_at: Optional[float] = None  # last target change observed by this process
+    planned_change_at: Optional[float] = None
+    written_ttl: Optional[int] = None
+    ttl_written_at: float = 0.0
+    pending: bool = False  # a TTL-only change returned by due() has not landed yet
+
+
+class TtlPolicy:
+    """Choose the TTL for each record write and find records due a TTL-only change."""
+
+    def __init__(
+        self,
+        base_ttl: int,
+        min_ttl: int = 0,
+        max_ttl: int = 0,
+        stable_seconds: float = 3600,
+        min_update_interval: float = 300,
+    ):
+        self.base_ttl = base_ttl
+        self.low_ttl = min_ttl or base_ttl
+        self.high_ttl = max_ttl or base_ttl
+        self.adaptive = bool(min_ttl or max_ttl)
+        self.stable_seconds = stable_seconds
+        self.min_update_interval = min_update_interval
+        self._hosts: Dict[str, _HostState] = {}
+
+    def apply(self, record: DesiredRecord, annotations: dict, now: Optional[float] = None) -> DesiredRecord:
+        """Return ``record`` with the TTL this write should use."""
+        override = annotations.get(ANNOTATION_TTL)
+        if override and parse_ttl(override):
+            self._hosts.pop(record.domain, None)
+            return replace(record, ttl=parse_ttl(override))
+        if not self.adaptive:
+            return record
+
+        now = time.time() if now is None else now
+        state = self._hosts.get(record.domain)
+        if state is None:
+            state = self._hosts[record.domain] = _HostState(record, first_seen=now)
+        elif (state.record.value, state.record.record_type) != (record.value, record.record_type):
+            state.changed_at = now
+        planned = annotations.get(ANNOTATION_PLANNED_CHANGE_AT)
+        state.planned_change_at = parse_planned_change(planned) if planned else None
+
+        ttl = self._desired_ttl(state, now)
+        if state.written_ttl is not None and ttl > state.written_ttl and not self._may_raise(state, now):
+            ttl = state.written_ttl
+        state.record = replace(record, ttl=ttl)
+        return state.record
+
+    def record_written(self, record: DesiredRecord, now: Optional[float] = None) -> None:
+        """Note that ``record`` (as returned by apply or due) reached the provider."""
+        state = self._hosts.get(record.domain)
+        if state is None:
+            return
+        if state.written_ttl != record.ttl:
+            state.ttl_written_at = time.time() if now is None else now
+        state.written_ttl = record.ttl
+        state.pending = False
+
+    def rearm(self, record: DesiredRecord) -> None:
+        """Let ``due`` return ``record``'s host again, after its TTL-only write ended without landing."""
+        state = self._hosts.get(record.domain)
+        if state is not None:
+            state.pending = False
+
+    def due(self, now: Optional[float] = None) -> List[DesiredRecord]:
+        """Records whose TTL should change now, without any change to their target.
+
+        A record returned here is not returned again until ``record_written``
+        or ``rearm`` is called for it, so a slow write is never queued twice.
+        """
+        now = time.time() if now is None else now
+        due = []
+        for state in self._hosts.values():
+            if state.written_ttl is None or state.pending:
+                continue
+            ttl = self._desired_ttl(state, now)
+            if ttl < state.written_ttl or (ttl > state.written_ttl and self._may_raise(state, now)):
+                state.record = replace(state.record, ttl=ttl)
+                state.pending = True
+                due.append(state.record)
+        return due
+
+    def forget(self, host: str) -> None:
+        self._hosts.pop(host, None)
+
+    def __len__(self) -> int:
+        return len(self._hosts)
+
+    def _desired_ttl(self, state: _HostState, now: float) -> int:
+        planned = state.planned_change_at
+        if planned is not None:
+            lead = max(state.written_ttl or 0, self.high_ttl)
+            if planned - lead <= now <= planned + self.stable_seconds:
+                return self.low_ttl
+        if state.changed_at is not None and now - state.changed_at < self.stable_seconds:
+            return self.low_ttl
+        if now - (state.changed_at or state.first_seen) >= self.stable_seconds:
+            return self.high_ttl
+        return self.base_ttl
+
+    def _may_raise(self, state: _HostState, now: float) -> bool:
+        return now - state.ttl_written_at >= self.min_update_interval